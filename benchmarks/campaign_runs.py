@@ -0,0 +1,218 @@
+"""Check that campaign runs pause, resume, recover and retry without re-sending.
+
+Runs campaign runs against a local fake SendGrid endpoint
+(``sendgrid_fake.FakeSendGridServer``) in a scratch database:
+
+- a run on the background worker is paused part-way, then resumed
+- a worker that "died" mid-batch (recipients left 'sending', some of them
+  already recorded in email_sends) is picked up again
+- a sender that fails after delivering some batches, then the run is resumed
+- a rejected batch is recorded as failed, then retried
+
+and checks that every recipient is delivered exactly once and that the run
+counters match the staged recipients. Exits non-zero if a check fails.
+
+Usage (from the repository root):
+    python benchmarks/campaign_runs.py --contacts 600 --batch-size 50
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+SUBJECT = "Hello {{first_name|there}}"
+UNSUBSCRIBE = '<p><a href="mailto:info@elbitat.com?subject=Unsubscribe">Unsubscribe</a></p>'
+TEMPLATE = "<p>Hi {{first_name}}, news for {{company_name}}.</p>" + UNSUBSCRIBE
+
+
+def _add_contacts(count: int, offset: int) -> List[int]:
+    from elbitat_agent.database import get_connection
+
+    conn = get_connection()
+    with conn:
+        conn.executemany(
+            "INSERT INTO email_contacts (email, company_name, status) VALUES (?, ?, 'active')",
+            [(f"guest.{i}@agency{i}.example", f"Agency {i}") for i in range(offset, offset + count)],
+        )
+    ids = [row[0] for row in conn.execute("SELECT id FROM email_contacts WHERE id > ? ORDER BY id", (offset,))]
+    conn.close()
+    return ids
+
+
+class CrashingSender:
+    """Delivers ``batches`` batches, then fails the way a dropped connection does."""
+
+    def __init__(self, batch_size: int, batches: int):
+        self.batch_size = batch_size
+        self.batches = batches
+        self.recipients = []
+
+    def send(self, subject: str, html_content: str, recipients, custom_args=None):
+        batch = []
+        for recipient in recipients:
+            batch.append(recipient)
+            if len(batch) < self.batch_size:
+                continue
+            if not self.batches:
+                raise ConnectionError("Connection reset by peer")
+            self.batches -= 1
+            self.recipients.extend(r.email for r in batch)
+            yield [{'contact_id': r.contact_id, 'email': r.email, 'success': True, 'status_code': 202,
+                    'message_id': f"crash-{r.contact_id}", 'error': None} for r in batch]
+            batch = []
+
+
+def _states(run_id: int) -> Counter:
+    from elbitat_agent.database import get_connection
+
+    conn = get_connection()
+    states = Counter(dict(conn.execute(
+        "SELECT state, COUNT(*) FROM email_campaign_run_recipients WHERE run_id = ? GROUP BY state", (run_id,))))
+    conn.close()
+    return states
+
+
+def _consistent(run: dict) -> bool:
+    states = _states(run['id'])
+    return (run['sent'] == states['sent'] and run['failed'] == states['failed']
+            and run['skipped'] == states['skipped'] and run['total'] == sum(states.values()))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Check pausing, resuming and retrying campaign runs.")
+    parser.add_argument("--contacts", type=int, default=600, help="Recipients per run")
+    parser.add_argument("--batch-size", type=int, default=50, help="Recipients per request and checkpoint")
+    parser.add_argument("--latency", type=float, default=0.02, help="Simulated round trip per request, in seconds")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="elbitat_runs_check_"))
+    os.environ["DB_PATH"] = str(workdir)
+    os.environ["EMAIL_SENDING_ENABLED"] = "true"
+    os.environ["SENDGRID_API_KEY"] = "SG.fake"
+    os.environ["SENDGRID_REQUESTS_PER_SECOND"] = "0"
+    os.environ["SENDGRID_MAX_CONCURRENCY"] = "2"
+
+    from elbitat_agent.agents import campaign_runs
+    from elbitat_agent.database import (
+        claim_email_campaign_run, get_connection, get_email_campaign_run, next_email_campaign_run_batch,
+        save_email_campaign
+    )
+    from elbitat_agent.sendgrid_fake import FakeSendGridServer
+
+    failures = []
+
+    def check(name: str, condition: bool) -> None:
+        print(f"   {'ok  ' if condition else 'FAIL'} {name}")
+        if not condition:
+            failures.append(name)
+
+    quiet = contextlib.redirect_stdout(io.StringIO())
+    with FakeSendGridServer(latency=args.latency, api_key="SG.fake") as server:
+        os.environ["SENDGRID_API_URL"] = server.url
+        with quiet:
+            campaign_id = save_email_campaign("Runs check", SUBJECT, TEMPLATE)
+
+        print(f"== pause and resume ({args.contacts} recipients, batches of {args.batch_size})")
+        with quiet:
+            contacts = _add_contacts(args.contacts, 0)
+            run_id = campaign_runs.create_campaign_run(campaign_id, contacts + contacts[:10],
+                                                       batch_size=args.batch_size)
+            started = campaign_runs.start_campaign_run(run_id)
+            again = campaign_runs.start_campaign_run(run_id)
+            while not server.requests:
+                time.sleep(0.001)
+            campaign_runs.pause_campaign_run(run_id)
+            campaign_runs.wait_for_campaign_run(run_id)
+        paused = get_email_campaign_run(run_id)
+        print(f"   paused after {paused['sent']} of {paused['total']}")
+        check("worker started once", started and not again)
+        check("duplicate contact IDs staged once", paused['total'] == args.contacts)
+        check("paused part-way with a consistent checkpoint",
+              paused['status'] == 'paused' and 0 < paused['sent'] < args.contacts and _consistent(paused)
+              and _states(run_id)['sending'] == 0)
+        with quiet:
+            campaign_runs.start_campaign_run(run_id)
+            campaign_runs.wait_for_campaign_run(run_id)
+        run = get_email_campaign_run(run_id)
+        check("resumed to completion", run['status'] == 'completed' and run['sent'] == args.contacts
+              and _consistent(run))
+        check("every recipient delivered exactly once",
+              sorted(server.recipients) == sorted(f"guest.{i}@agency{i}.example" for i in range(args.contacts)))
+
+        print("== worker died mid-batch")
+        server.requests.clear()
+        with quiet:
+            contacts = _add_contacts(args.contacts, args.contacts)
+            run_id = campaign_runs.create_campaign_run(campaign_id, contacts, batch_size=args.batch_size)
+            # A worker takes two batches and dies: the first was delivered and
+            # recorded in email_sends, the second was never sent
+            claim_email_campaign_run(run_id, "dead-worker")
+            first = next_email_campaign_run_batch(run_id, args.batch_size)
+            next_email_campaign_run_batch(run_id, args.batch_size)
+            conn = get_connection()
+            with conn:
+                conn.executemany("INSERT INTO email_sends (campaign_id, contact_id, status, message_id, run_id) "
+                                 "VALUES (?, ?, 'sent', 'before-crash', ?)",
+                                 [(campaign_id, r['contact_id'], run_id) for r in first])
+            conn.close()
+            blocked = campaign_runs.run_campaign(run_id)
+            conn = get_connection()
+            with conn:
+                # Let the dead worker's heartbeat go stale
+                conn.execute("UPDATE email_campaign_runs SET heartbeat_at = '2000-01-01' WHERE id = ?", (run_id,))
+            conn.close()
+            run = campaign_runs.run_campaign(run_id)
+        check("live run not claimed twice", blocked is None)
+        resent = set(server.recipients) & {r['email'] for r in first}
+        check("recorded sends adopted, not re-sent", not resent and run['sent'] == args.contacts)
+        check("unsent batch sent after recovery", run['status'] == 'completed' and _consistent(run)
+              and len(server.recipients) == args.contacts - len(first))
+
+        print("== sender failed mid-run, then resumed")
+        server.requests.clear()
+        with quiet:
+            contacts = _add_contacts(20, args.contacts * 2)
+            run_id = campaign_runs.create_campaign_run(campaign_id, contacts, batch_size=5)
+            crashing = CrashingSender(5, batches=2)
+            failed = campaign_runs.run_campaign(run_id, sender=crashing)
+            run = campaign_runs.run_campaign(run_id)
+        check("outcomes buffered when the run failed are recorded",
+              failed['status'] == 'failed' and failed['sent'] == len(crashing.recipients) == 10)
+        check("resume sends only to recipients not yet sent to",
+              run['status'] == 'completed' and run['sent'] == 20 and _consistent(run)
+              and not set(server.recipients) & set(crashing.recipients) and len(server.recipients) == 10)
+
+        print("== failed batch, then retry")
+        server.requests.clear()
+        with quiet:
+            contacts = _add_contacts(args.batch_size * 4, args.contacts * 2 + 20)
+            run_id = campaign_runs.create_campaign_run(campaign_id, contacts, batch_size=args.batch_size)
+            server.fail_next(400, message="Invalid sender")
+            run = campaign_runs.run_campaign(run_id)
+        check("rejected batch recorded as failed", run['status'] == 'completed'
+              and run['failed'] == args.batch_size and _consistent(run))
+        with quiet:
+            retried = campaign_runs.retry_failed_recipients(run_id)
+            run = campaign_runs.run_campaign(run_id)
+        check("retry sends only the failed recipients", retried == args.batch_size
+              and run['sent'] == args.batch_size * 4 and run['failed'] == 0
+              and len(server.recipients) == len(set(server.recipients)) == args.batch_size * 4)
+        check("completed runs cannot be claimed again", campaign_runs.run_campaign(run_id) is None)
+
+    print("\nAll checks passed" if not failures else f"\n{len(failures)} failed check(s)")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
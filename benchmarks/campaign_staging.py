@@ -0,0 +1,218 @@
+"""Benchmark and check pre-rendered campaign staging.
+
+Fills a scratch database with active contacts and a saved campaign, then
+times what the Send Campaign tab does on every rerun:
+
+- before: load every active contact ID to count the recipients, and render
+  the preview from the template (layout, compile, personalise)
+- staged: count the recipients with one COUNT query and show the stored
+  render (``email_campaigns.campaign_render``)
+
+Then checks that a render is stored once per content hash and the campaign
+points at it, that fragments get the Elbitat layout while full documents are
+sent as written, that the stored preview matches ``personalize_email``,
+that only real links count as an unsubscribe link (the layout's unfilled
+``{{unsubscribe_url}}`` does not), that a run sends its staged render (and a
+run staged before renders were stored sends its template as written), that
+a run is refused without an unsubscribe link or with EMAIL_SENDING_ENABLED
+off, and that a campaign without a render is staged on first view. Exits
+non-zero if a check fails.
+
+Usage (from the repository root):
+    python benchmarks/campaign_staging.py --contacts 20000
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+SUBJECT = "Hello {{first_name}} from Elbitat"
+UNSUBSCRIBE = '<p><a href="mailto:info@elbitat.com?subject=Unsubscribe">Unsubscribe</a></p>'
+TEMPLATE = ("<p>Hi {{first_name|there}},</p><p>News for {{company_name}} in {{country}}.</p>"
+            + "<p>Elba, <a href=\"#\" class=\"button\">Book</a>.</p>" * 50 + UNSUBSCRIBE)
+
+
+class RecordingSender:
+    """Batch sender that accepts every recipient and keeps what it was given."""
+
+    def __init__(self):
+        self.subject = self.html = None
+        self.recipients = []
+
+    def send(self, subject: str, html_content: str, recipients, custom_args: Dict = None):
+        self.subject, self.html = subject, html_content
+        for recipient in recipients:
+            self.recipients.append(recipient)
+            yield [{'contact_id': recipient.contact_id, 'email': recipient.email, 'success': True,
+                    'status_code': 202, 'message_id': f"m{recipient.contact_id}", 'error': None}]
+
+
+def _fill(text: str, substitutions: Dict[str, str]) -> str:
+    # What the provider does with the substitution tags (-first_name- is a
+    # prefix of the tag of {{first_name|there}}, so longest first)
+    for tag, value in sorted(substitutions.items(), key=lambda item: -len(item[0])):
+        text = text.replace(tag, value)
+    return text
+
+
+def _add_contacts(count: int) -> List[int]:
+    from elbitat_agent.database import get_connection
+
+    conn = get_connection()
+    with conn:
+        conn.executemany(
+            "INSERT INTO email_contacts (email, company_name, country, status) VALUES (?, ?, ?, 'active')",
+            [(f"anna.{i}@agency{i}.example", f"Agency {i}", "Italy" if i % 2 else None) for i in range(count)],
+        )
+    ids = [row[0] for row in conn.execute("SELECT id FROM email_contacts ORDER BY id")]
+    conn.close()
+    return ids
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark pre-rendered campaign staging.")
+    parser.add_argument("--contacts", type=int, default=20000, help="Active contacts")
+    parser.add_argument("--reruns", type=int, default=50, help="Send tab reruns to time")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="elbitat_staging_bench_"))
+    os.environ["DB_PATH"] = str(workdir)
+    os.environ["EMAIL_SENDING_ENABLED"] = "true"
+
+    from elbitat_agent.agents.campaign_runs import create_campaign_run, run_campaign, start_campaign_run
+    from elbitat_agent.agents.email_campaigns import (
+        PREVIEW_CONTACT, campaign_html, campaign_render, create_html_template, has_unsubscribe_link,
+        personalize_email, stage_campaign_render, template_problems
+    )
+    from elbitat_agent.database import (
+        create_email_campaign_run, get_all_email_campaigns, get_connection, get_email_campaign_run,
+        get_email_contact_ids, get_email_contacts_by_ids, query_email_contacts, save_email_campaign
+    )
+
+    failures = []
+
+    def check(name: str, condition: bool) -> None:
+        print(f"   {'ok  ' if condition else 'FAIL'} {name}")
+        if not condition:
+            failures.append(name)
+
+    def campaign(campaign_id: int) -> Dict:
+        return next(c for c in get_all_email_campaigns() if c['id'] == campaign_id)
+
+    quiet = contextlib.redirect_stdout(io.StringIO())
+    with quiet:
+        contact_ids = _add_contacts(args.contacts)
+        campaign_id = save_email_campaign("Staging", SUBJECT, TEMPLATE)
+        stage_campaign_render(SUBJECT, TEMPLATE, campaign_id)
+    print(f"== {args.contacts} active contacts, {args.reruns} Send tab reruns")
+
+    def before() -> None:
+        selected = campaign(campaign_id)
+        len(get_email_contact_ids(status='active'))
+        personalize_email(campaign_html(selected['template']), PREVIEW_CONTACT)
+        template_problems(selected['subject']) + template_problems(selected['template'])
+
+    def staged() -> None:
+        query_email_contacts(status='active', limit=0)['total']
+        campaign_render(campaign(campaign_id))
+
+    timings = {}
+    for name, rerun in (("before", before), ("staged", staged)):
+        rerun()
+        started = time.perf_counter()
+        for _ in range(args.reruns):
+            rerun()
+        timings[name] = (time.perf_counter() - started) / args.reruns
+    print(f"   before: {timings['before'] * 1000:8.3f} ms per rerun (all IDs loaded, preview rendered)")
+    print(f"   staged: {timings['staged'] * 1000:8.3f} ms per rerun ({timings['before'] / timings['staged']:.0f}x faster)")
+
+    print("== checks")
+    render = campaign_render(campaign(campaign_id))
+    with quiet:
+        again = stage_campaign_render(SUBJECT, TEMPLATE, campaign_id)
+    conn = get_connection()
+    stored = conn.execute("SELECT COUNT(*) FROM email_campaign_renders").fetchone()[0]
+    conn.close()
+    check("one stored render per content, and the campaign points at it",
+          stored == 1 and again['content_hash'] == render['content_hash']
+          and campaign(campaign_id)['render_hash'] == render['content_hash'])
+
+    document = "<!DOCTYPE html><html><body><p>Hi {{first_name}} {{nickname}}</p></body></html>"
+    with quiet:
+        full = stage_campaign_render(SUBJECT, document)
+    check("fragments get the layout, documents are sent as written",
+          '<div class="content">' in render['html'] and full['preview_html'] == document.replace(
+              "{{first_name}}", "John") and full['content_hash'] != render['content_hash'])
+    check("problems stored with the render", full['problems'] == template_problems(document) != [])
+    check("preview matches personalize_email in the layout",
+          render['preview_html'] == personalize_email(campaign_html(TEMPLATE), PREVIEW_CONTACT)
+          and render['preview_subject'] == "Hello John from Elbitat")
+
+    check("sending needs a working unsubscribe link",
+          has_unsubscribe_link(render['html'])
+          and not has_unsubscribe_link(create_html_template("<p>Hi</p>"))
+          and has_unsubscribe_link('<a href="mailto:info@elbitat.com?subject=Unsubscribe">Opt out</a>')
+          and has_unsubscribe_link('<A HREF="https://elbitat.com/optout">\n  Unsubscribe\n</A>'))
+
+    sample = contact_ids[:20]
+    with quiet:
+        run_id = create_campaign_run(campaign_id, sample)
+        sender = RecordingSender()
+        run = run_campaign(run_id, sender=sender)
+    contacts = {c['id']: c for c in get_email_contacts_by_ids(sample)}
+    delivered = {r.contact_id: (_fill(sender.subject, r.substitutions), _fill(sender.html, r.substitutions))
+                 for r in sender.recipients}
+    expected = {i: (personalize_email(SUBJECT, c), personalize_email(campaign_html(TEMPLATE), c))
+                for i, c in contacts.items()}
+    check("run sends its staged render", get_email_campaign_run(run_id)['render_hash'] == render['content_hash']
+          and sender.html == render['html'] and run['sent'] == len(sample) and delivered == expected)
+
+    with quiet:
+        old_run = create_email_campaign_run(campaign_id, contact_ids[20:25], SUBJECT, TEMPLATE)
+        sender = RecordingSender()
+        run_campaign(old_run, sender=sender)
+    check("run staged before renders sends the template as written",
+          sender.html.startswith("<p>Hi -first_name-") and len(sender.recipients) == 5)
+
+    with quiet:
+        no_link = create_email_campaign_run(campaign_id, contact_ids[25:30], SUBJECT, "<p>Hi {{first_name}}</p>")
+        refused_no_link = _raises(lambda: run_campaign(no_link, sender=RecordingSender()))
+        os.environ["EMAIL_SENDING_ENABLED"] = "false"
+        disabled = create_campaign_run(campaign_id, contact_ids[30:35])
+        refused_disabled = (_raises(lambda: run_campaign(disabled, sender=RecordingSender()))
+                            and _raises(lambda: start_campaign_run(disabled)))
+        os.environ["EMAIL_SENDING_ENABLED"] = "true"
+    check("runs are refused without an unsubscribe link or with sending disabled",
+          refused_no_link and refused_disabled
+          and get_email_campaign_run(no_link)['status'] == get_email_campaign_run(disabled)['status'] == 'pending')
+
+    with quiet:
+        unstaged = save_email_campaign("Unstaged", "Hi {{first_name}}", "<p>Second campaign</p>")
+        first_view = campaign_render(campaign(unstaged))
+    check("a campaign without a render is staged on first view",
+          first_view is not None and campaign(unstaged)['render_hash'] == first_view['content_hash'])
+
+    print("\nAll checks passed" if not failures else f"\n{len(failures)} failed check(s)")
+    sys.exit(1 if failures else 0)
+
+
+def _raises(call) -> bool:
+    try:
+        call()
+    except ValueError:
+        return True
+    return False
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""Benchmark and check streaming CSV export and import of email contacts.
+
+Fills a scratch database with contacts (some with commas, quotes, line
+breaks and accents in their company names and notes) and compares:
+
+- export: the Contact List's previous export (pages of
+  ``query_email_contacts`` joined into one string with f-strings) against
+  ``contacts_csv.write_contacts_csv`` (one cursor read in chunks, written
+  with the ``csv`` module to a file)
+- import: ``save_email_contact`` per row (timed on a sample) against
+  ``contacts_csv.import_contacts_csv`` (validated rows upserted in batches)
+
+Peak Python memory is measured with tracemalloc for two file sizes, to show
+it stays flat. Then checks that the export round-trips exactly, that
+re-importing changes nothing, that invalid rows are reported by line and
+skipped, that existing contacts keep their status and values unless the
+file says otherwise (bounced/unsubscribed is applied and suppressed), and
+that semicolon-separated files with other header names are read. Exits
+non-zero if a check fails.
+
+Usage (from the repository root):
+    python benchmarks/contacts_csv.py --contacts 100000
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import csv
+import io
+import itertools
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def _company(i: int) -> str:
+    if i % 10 == 0:
+        return f'Spa & Wellness, Agency {i}'
+    if i % 10 == 1:
+        return f'The "Blue" Travel Co {i}'
+    if i % 10 == 2:
+        return f'Agenzia Viaggi Città {i}'
+    return f'Agency {i}'
+
+
+def _fill(count: int) -> None:
+    from elbitat_agent.database import get_connection
+
+    conn = get_connection()
+    with conn:
+        conn.execute('DELETE FROM email_contacts')
+        conn.executemany(
+            "INSERT INTO email_contacts (email, company_name, website, country, industry, status, source, notes) "
+            "VALUES (?, ?, ?, ?, ?, 'active', 'benchmark', ?)",
+            [(f"guest.{i}@agency{i}.example", _company(i), f"https://agency{i}.example",
+              "Denmark, Sweden" if i % 3 == 0 else "Italy", "Travel",
+              "Met at the fair;\nwants spring offers" if i % 7 == 0 else None) for i in range(count)],
+        )
+    conn.close()
+
+
+def _rows(conn) -> list:
+    return conn.execute("SELECT email, company_name, website, country, industry, status, source, notes "
+                        "FROM email_contacts ORDER BY email").fetchall()
+
+
+def _old_export() -> str:
+    from elbitat_agent.database import query_email_contacts
+
+    output = io.StringIO()
+    output.write("Email,Company,Website,Country,Industry,Status,Source\n")
+    after = None
+    while True:
+        export_page = query_email_contacts(limit=500, after=after)
+        for contact in export_page['items']:
+            output.write(f"{contact['email']},{contact['company_name']},{contact.get('website', '')},{contact.get('country', '')},{contact.get('industry', '')},{contact['status']},{contact.get('source', '')}\n")
+        after = export_page['next_cursor']
+        if after is None:
+            break
+    return output.getvalue()
+
+
+def _head(source: Path, target: Path, rows: int) -> None:
+    """Copy the header and the first rows of a CSV file."""
+    with open(source, newline='', encoding='utf-8') as f, open(target, 'w', newline='', encoding='utf-8') as out:
+        csv.writer(out).writerows(itertools.islice(csv.reader(f), rows + 1))
+
+
+def _peak(call) -> float:
+    """Peak traced memory of a call, in MiB."""
+    tracemalloc.start()
+    try:
+        call()
+        return tracemalloc.get_traced_memory()[1] / 2 ** 20
+    finally:
+        tracemalloc.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark streaming contact CSV export and import.")
+    parser.add_argument("--contacts", type=int, default=100000, help="Contacts to export and import")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="elbitat_contacts_csv_bench_"))
+    os.environ["DB_PATH"] = str(workdir)
+
+    from elbitat_agent.contacts_csv import ContactImportError, import_contacts_csv, write_contacts_csv
+    from elbitat_agent.database import get_connection, is_email_suppressed, save_email_contact
+
+    failures = []
+
+    def check(name: str, condition: bool) -> None:
+        print(f"   {'ok  ' if condition else 'FAIL'} {name}")
+        if not condition:
+            failures.append(name)
+
+    quiet = contextlib.redirect_stdout(io.StringIO())
+    path = workdir / "contacts.csv"
+
+    def export(target: Path = path) -> int:
+        with open(target, 'w', newline='', encoding='utf-8') as f:
+            return write_contacts_csv(f)
+
+    with quiet:
+        _fill(args.contacts)
+    print(f"== {args.contacts} contacts")
+
+    started = time.perf_counter()
+    old_csv = _old_export()
+    old_export = time.perf_counter() - started
+    started = time.perf_counter()
+    exported = export()
+    new_export = time.perf_counter() - started
+    misparsed = sum(1 for row in csv.reader(io.StringIO(old_csv)) if len(row) != 7)
+    print(f"   export, pages + f-strings: {old_export:6.2f} s  ({misparsed} rows misparsed)")
+    print(f"   export, cursor + csv:      {new_export:6.2f} s  ({old_export / new_export:.1f}x faster)")
+
+    conn = get_connection()
+    original = _rows(conn)
+    conn.close()
+
+    sample = 500
+    lines = list(csv.DictReader(io.StringIO(path.read_text(encoding='utf-8'))))[:sample]
+    with quiet:
+        conn = get_connection()
+        with conn:
+            conn.execute('DELETE FROM email_contacts')
+        conn.close()
+        started = time.perf_counter()
+        for row in lines:
+            save_email_contact(row['Email'], row['Company'], row['Website'], row['Country'], row['Industry'],
+                               row['Source'], row['Status'])
+        per_row = (time.perf_counter() - started) / sample
+        conn = get_connection()
+        with conn:
+            conn.execute('DELETE FROM email_contacts')
+        conn.close()
+    print(f"   import, save_email_contact per row: {per_row * args.contacts:6.2f} s  "
+          f"(estimated from {sample} rows)")
+
+    started = time.perf_counter()
+    result = import_contacts_csv(path)
+    new_import = time.perf_counter() - started
+    print(f"   import, validated batches:          {new_import:6.2f} s  "
+          f"({per_row * args.contacts / new_import:.0f}x faster)  {result['inserted']} inserted")
+
+    # Peak memory for a tenth of the rows vs all of them
+    small = workdir / "small.csv"
+    _head(path, small, args.contacts // 10)
+    peaks = {}
+    for name, source in (("small", small), ("full", path)):
+        peaks[name] = (_peak(lambda: import_contacts_csv(source)), _peak(lambda: export(workdir / "peak.csv")))
+    print(f"   peak memory, {args.contacts // 10} vs {args.contacts} rows: import {peaks['small'][0]:.1f} vs "
+          f"{peaks['full'][0]:.1f} MiB, export {peaks['small'][1]:.1f} vs {peaks['full'][1]:.1f} MiB")
+
+    print("== checks")
+    conn = get_connection()
+    imported = _rows(conn)
+    conn.close()
+    check("export writes every contact", exported == args.contacts)
+    with open(path, newline='', encoding='utf-8') as f:
+        parsed = sorted(tuple(value or None for value in row) for row in list(csv.reader(f))[1:])
+    check("export round-trips commas, quotes, line breaks and accents", parsed == original)
+    check("import restores the exported contacts", imported == original and result['invalid'] == 0)
+    check("memory stays flat as the file grows",
+          peaks['full'][0] < 2 * peaks['small'][0] + 1 and peaks['full'][1] < 2 * peaks['small'][1] + 1)
+
+    again = import_contacts_csv(path)
+    conn = get_connection()
+    check("re-import updates in place and changes nothing",
+          (again['inserted'], again['updated']) == (0, args.contacts) and _rows(conn) == original)
+    conn.execute("UPDATE email_contacts SET status = 'contacted' WHERE email IN ('guest.1@agency1.example', "
+                 "'guest.2@agency2.example')")
+    conn.commit()
+    conn.close()
+
+    edits = ("Email,Company,Status,Notes\n"
+             "guest.1@agency1.example,,active,Called back\n"
+             "guest.2@agency2.example,New Name,unsubscribed,\n"
+             "not-an-address,Broken,,\n"
+             "new.contact@elbitat.example,Elbitat,,\n"
+             "other@elbitat.example,Other,maybe,\n"
+             ",,,\n")
+    result = import_contacts_csv(io.BytesIO(edits.encode('utf-8')))
+    conn = get_connection()
+    first, second = (conn.execute("SELECT company_name, status, notes FROM email_contacts WHERE email = ?",
+                                  (email,)).fetchone()
+                     for email in ('guest.1@agency1.example', 'guest.2@agency2.example'))
+    conn.close()
+    check("invalid rows reported by line and skipped",
+          result['errors'] == ["line 4: invalid email address 'not-an-address'",
+                               "line 6: unknown status 'maybe' (expected one of new, active, contacted, "
+                               "bounced, unsubscribed)"] and result['inserted'] == 1 and result['updated'] == 2)
+    check("existing contacts keep their status and non-empty values",
+          first == (_company(1), 'contacted', 'Called back'))
+    check("unsubscribed in the file is applied and suppressed",
+          second == ('New Name', 'unsubscribed', None) and is_email_suppressed('guest.2@agency2.example'))
+
+    semicolons = '\ufeffE-mail;Company name;Nation\nsemi@elbitat.example;"Rossi; Bianchi & Co";Italy\n'
+    result = import_contacts_csv(io.BytesIO(semicolons.encode('utf-8')))
+    conn = get_connection()
+    row = conn.execute("SELECT company_name, country, status, source FROM email_contacts WHERE email = ?",
+                       ("semi@elbitat.example",)).fetchone()
+    count = conn.execute("SELECT COUNT(*) FROM email_contacts").fetchone()[0]
+    conn.close()
+    check("semicolon-separated file with other header names",
+          result['inserted'] == 1 and row == ('Rossi; Bianchi & Co', 'Italy', 'active', 'csv_import'))
+
+    try:
+        import_contacts_csv(io.BytesIO(b"Name,Company\nAnna,Rossi\n"))
+        rejected = False
+    except ContactImportError:
+        rejected = True
+    try:
+        import_contacts_csv(io.BytesIO("Email\nlatin1@elbitat.example\ncaf\xe9@x.example\n".encode('latin-1')))
+        undecodable = False
+    except ContactImportError:
+        undecodable = True
+    conn = get_connection()
+    unchanged = conn.execute("SELECT COUNT(*) FROM email_contacts").fetchone()[0] == count
+    conn.close()
+    check("unreadable files rejected without changing anything", rejected and undecodable and unchanged)
+
+    print("\nAll checks passed" if not failures else f"\n{len(failures)} failed check(s)")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""Benchmark and check campaign sending against a local fake SendGrid endpoint.
+
+Starts ``sendgrid_fake.FakeSendGridServer`` (with a simulated round trip),
+fills a scratch database with contacts and runs ``send_campaign``:
+
+- one recipient per request, one request at a time (the previous behaviour)
+- batched: up to 1000 personalizations per request, requests in parallel
+
+Then checks that every recipient got exactly one ``email_sends`` row with the
+right status, that the delivered emails (substitutions applied by the fake)
+match ``personalize_email`` in the campaign layout, that a 429 is retried,
+that a rejected batch is recorded as failed for each of its recipients, and
+that only requests SendGrid cannot have accepted are retried (a 5xx or a read
+timeout is reported as "Delivery unknown"; a refused connection is retried).
+Exits non-zero if a check fails.
+
+Usage (from the repository root):
+    python benchmarks/email_sending.py --contacts 2000 --latency 0.02
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import os
+import socket
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+SUBJECT = "Hello {{first_name}} from Elbitat"
+UNSUBSCRIBE = '<p><a href="mailto:info@elbitat.com?subject=Unsubscribe">Unsubscribe</a></p>'
+TEMPLATE = ("<p>Hi {{first_name}},</p><p>News for {{company_name}} in {{country}}.</p>" + "<p>Elba.</p>" * 200
+            + UNSUBSCRIBE)
+
+
+def _add_contacts(count: int) -> List[int]:
+    from elbitat_agent.database import get_connection
+
+    conn = get_connection()
+    with conn:
+        conn.executemany(
+            "INSERT INTO email_contacts (email, company_name, website, country, status) VALUES (?, ?, ?, ?, 'active')",
+            [(f"anna.{i}@agency{i}.example", f"Agency {i}", f"https://agency{i}.example", "Italy")
+             for i in range(count)],
+        )
+    ids = [row[0] for row in conn.execute("SELECT id FROM email_contacts ORDER BY id")]
+    conn.close()
+    return ids
+
+
+def _reset(campaign_id: int) -> None:
+    from elbitat_agent.cache import bump_table_version
+    from elbitat_agent.database import get_connection
+
+    conn = get_connection()
+    with conn:
+        conn.execute("UPDATE email_contacts SET status = 'active'")
+    conn.close()
+    bump_table_version('email_contacts')
+
+
+def _sends(campaign_id: int) -> Dict[str, int]:
+    from elbitat_agent.database import get_connection
+
+    conn = get_connection()
+    rows = conn.execute(
+        "SELECT status, COUNT(*), COUNT(DISTINCT contact_id), COUNT(message_id) FROM email_sends "
+        "WHERE campaign_id = ? GROUP BY status", (campaign_id,)
+    ).fetchall()
+    conn.close()
+    return {status: {'rows': n, 'contacts': distinct, 'message_ids': ids} for status, n, distinct, ids in rows}
+
+
+def _timed_send(campaign_id: int, contact_ids: List[int], batch_size: int) -> tuple:
+    from elbitat_agent.agents.email_campaigns import send_campaign
+
+    _reset(campaign_id)
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        stats = send_campaign(campaign_id, contact_ids, SUBJECT, TEMPLATE, batch_size=batch_size)
+    return stats, time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark batched SendGrid sending against a local fake.")
+    parser.add_argument("--contacts", type=int, default=1000, help="Number of recipients")
+    parser.add_argument("--latency", type=float, default=0.02, help="Simulated round trip per request, in seconds")
+    parser.add_argument("--concurrency", type=int, default=4, help="Parallel requests when batching")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="elbitat_email_bench_"))
+    os.environ["DB_PATH"] = str(workdir)
+    os.environ["EMAIL_SENDING_ENABLED"] = "true"
+    os.environ["SENDGRID_API_KEY"] = "SG.fake"
+    os.environ["SENDGRID_REQUESTS_PER_SECOND"] = "0"
+
+    from elbitat_agent.agents.email_campaigns import campaign_html, personalize_email
+    from elbitat_agent.database import get_email_contacts_by_ids, save_email_campaign
+    from elbitat_agent.agents.email_delivery import DELIVERY_UNKNOWN, BatchRecipient, SendGridBatchSender
+    from elbitat_agent.sendgrid_fake import FakeSendGridServer
+
+    failures = []
+
+    def check(name: str, condition: bool) -> None:
+        print(f"   {'ok  ' if condition else 'FAIL'} {name}")
+        if not condition:
+            failures.append(name)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        contact_ids = _add_contacts(args.contacts)
+        campaigns = [save_email_campaign(f"Benchmark {i}", SUBJECT, TEMPLATE) for i in range(4)]
+
+    with FakeSendGridServer(latency=args.latency, api_key="SG.fake") as server:
+        os.environ["SENDGRID_API_URL"] = server.url
+
+        print(f"== {args.contacts} recipients, {args.latency * 1000:.0f} ms per request")
+        os.environ["SENDGRID_MAX_CONCURRENCY"] = "1"
+        stats, serial = _timed_send(campaigns[0], contact_ids, batch_size=1)
+        print(f"   one request per recipient: {serial:7.2f} s  {stats}")
+
+        os.environ["SENDGRID_MAX_CONCURRENCY"] = str(args.concurrency)
+        server.requests.clear()
+        stats, batched = _timed_send(campaigns[1], contact_ids, batch_size=1000)
+        print(f"   batched (1000 per request, {args.concurrency} in parallel): {batched:7.2f} s  {stats}"
+              f"  ({serial / batched:.0f}x faster, {len(server.requests)} requests)")
+
+        print("== checks")
+        sends = _sends(campaigns[1]).get('sent', {})
+        check("one 'sent' row per recipient, with a message ID",
+              sends == {'rows': args.contacts, 'contacts': args.contacts, 'message_ids': args.contacts})
+        check("every recipient delivered once", sorted(server.recipients) == sorted(
+            c['email'] for c in get_email_contacts_by_ids(contact_ids)))
+        expected = {c['email']: (personalize_email(SUBJECT, c), personalize_email(campaign_html(TEMPLATE), c))
+                    for c in get_email_contacts_by_ids(contact_ids[:50])}
+        delivered = {m['email']: (m['subject'], m['html']) for m in server.messages() if m['email'] in expected}
+        check("substitutions render like personalize_email", delivered == expected)
+
+        server.requests.clear()
+        server.fail_next(429, retry_after=0)
+        stats, _ = _timed_send(campaigns[2], contact_ids[:10], batch_size=1000)
+        check("429 retried, then sent", stats['sent'] == 10 and len(server.requests) == 2)
+
+        server.fail_next(400, message="Invalid sender")
+        stats, _ = _timed_send(campaigns[3], contact_ids[:10], batch_size=5)
+        sends = _sends(campaigns[3])
+        check("rejected batch recorded as failed per recipient",
+              stats == {'sent': 5, 'failed': 5, 'skipped': 0}
+              and sends.get('failed', {}).get('rows') == 5 and sends.get('sent', {}).get('rows') == 5)
+
+        batch = [BatchRecipient(contact_id=i, email=f"unknown.{i}@agency{i}.example") for i in range(3)]
+        server.requests.clear()
+        server.fail_next(503)
+        results = SendGridBatchSender(requests_per_second=0).send_batch("Hi", "<p>Hi</p>", batch)
+        check("5xx not retried, batch reported as delivery unknown", len(server.requests) == 1
+              and all(not r['success'] and r['error'].startswith(DELIVERY_UNKNOWN) for r in results))
+
+    # The fake answers after the client gave up (its broken pipe goes to stderr)
+    with FakeSendGridServer(latency=0.5, api_key="SG.fake") as slow, contextlib.redirect_stderr(io.StringIO()):
+        results = SendGridBatchSender(api_url=slow.url, requests_per_second=0, timeout=0.1).send_batch(
+            "Hi", "<p>Hi</p>", batch)
+        time.sleep(0.6)
+        check("read timeout not retried (the request was accepted), delivery unknown",
+              len(slow.requests) == 1 and all(r['error'].startswith(DELIVERY_UNKNOWN) for r in results))
+
+    with socket.socket() as closed:
+        closed.bind(("127.0.0.1", 0))
+        closed_url = f"http://127.0.0.1:{closed.getsockname()[1]}/v3/mail/send"
+    attempts = []
+    refused = SendGridBatchSender(api_url=closed_url, requests_per_second=0, max_retries=2)
+    post = refused._post
+    refused._post = lambda body: attempts.append(1) or post(body)
+    with mock.patch("time.sleep"):
+        results = refused.send_batch("Hi", "<p>Hi</p>", batch)
+    check("connection refused (nothing sent) retried",
+          len(attempts) == 3 and not any(r['success'] or r['error'].startswith(DELIVERY_UNKNOWN) for r in results))
+
+    print("\nAll checks passed" if not failures else f"\n{len(failures)} failed check(s)")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Benchmark the compiled email template renderer against repeated str.replace.
+
+Renders a campaign's subject and body for many contacts, the way previews,
+test sends and per-contact sends do:
+
+- replace: one ``str.replace`` pass over the whole template per placeholder
+  (what ``personalize_email`` did before)
+- compiled: ``personalize_email`` now; the template is tokenised once and
+  each contact is a single join
+
+Then checks that both give identical output for templates without
+fallbacks, that fallbacks and unknown placeholders behave as documented,
+and that SendGrid substitutions match ``personalize_email``. Exits non-zero
+if a check fails.
+
+Usage (from the repository root):
+    python benchmarks/email_templates.py --contacts 5000 --size 20000
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+SUBJECT = "{{first_name}}, a wellness week on Elba for {{company_name}}"
+PARAGRAPH = ("<p>Hi {{first_name}}, guests from {{country}} love our spa. "
+             "See <a href=\"{{website}}\">your page</a> or reply to {{email}}.</p>\n"
+             "<p>" + "Sea, pine forest and thermal pools. " * 8 + "</p>\n")
+
+
+def _template(size: int) -> str:
+    copies = max(1, size // len(PARAGRAPH))
+    return PARAGRAPH * copies
+
+
+def _contacts(count: int) -> List[Dict]:
+    return [{'email': f"anna.{i}@agency{i}.example", 'company_name': f"Agency {i}",
+             'website': f"https://agency{i}.example", 'country': "Italy",
+             'first_name': '' if i % 3 else f"Anna{i}"}
+            for i in range(count)]
+
+
+def personalize_replace(template: str, contact: Dict) -> str:
+    """The previous implementation: one replace per placeholder."""
+    from elbitat_agent.agents.email_campaigns import placeholder_values
+
+    personalized = template
+    for name, value in placeholder_values(contact).items():
+        personalized = personalized.replace('{{' + name + '}}', value or '')
+    return personalized
+
+
+def _timed(render, template: str, contacts: List[Dict]) -> float:
+    started = time.perf_counter()
+    for contact in contacts:
+        render(SUBJECT, contact)
+        render(template, contact)
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark compiled email template rendering.")
+    parser.add_argument("--contacts", type=int, default=5000, help="Contacts to render for")
+    parser.add_argument("--size", type=int, default=20000, help="Approximate template size in characters")
+    args = parser.parse_args()
+
+    from elbitat_agent.agents.email_campaigns import (
+        personalize_email, placeholder_values, substitution_template, template_problems
+    )
+
+    template = _template(args.size)
+    contacts = _contacts(args.contacts)
+    placeholders = template.count('{{')
+
+    print(f"== {args.contacts} contacts, {len(template)} character body with {placeholders} placeholders")
+    replace = _timed(personalize_replace, template, contacts)
+    print(f"   str.replace per placeholder: {replace:7.3f} s  ({replace / args.contacts * 1e6:6.1f} us per contact)")
+    compiled = _timed(personalize_email, template, contacts)
+    print(f"   compiled, one join:          {compiled:7.3f} s  ({compiled / args.contacts * 1e6:6.1f} us per contact)"
+          f"  ({replace / compiled:.1f}x faster)")
+
+    failures = []
+
+    def check(name: str, condition: bool) -> None:
+        print(f"   {'ok  ' if condition else 'FAIL'} {name}")
+        if not condition:
+            failures.append(name)
+
+    print("== checks")
+    check("same output as str.replace", all(
+        personalize_email(text, c) == personalize_replace(text, c)
+        for c in contacts[:200] for text in (SUBJECT, template)))
+    check("fallback used only when the value is empty",
+          personalize_email("Hi {{ first_name | there }}!", {'first_name': ''}) == "Hi there!"
+          and personalize_email("Hi {{first_name|there}}!", {'first_name': 'Anna'}) == "Hi Anna!")
+    check("unknown placeholders kept as written and reported",
+          personalize_email("{{unsubscribe_url}} {{email}}", {'email': 'a@b.example'})
+          == "{{unsubscribe_url}} a@b.example"
+          and len(template_problems("{{unsubscribe_url}}")) == 1)
+    check("unmatched braces reported", len(template_problems("Hi {{first_name}")) == 1
+          and template_problems(template) == [])
+
+    text = "{{first_name|there}} at {{company_name}}: {{first_name}}"
+    tagged, tags = substitution_template(text)
+    for contact in ({'email': 'x@y.example', 'first_name': 'Anna', 'company_name': 'Acme'},
+                    {'email': '', 'company_name': 'Acme'}):
+        delivered = tagged
+        for tag, (name, default) in tags.items():
+            delivered = delivered.replace(tag, placeholder_values(contact)[name] or default)
+        check(f"substitutions match personalize_email ({contact.get('first_name') or 'fallback'})",
+              delivered == personalize_email(text, contact))
+
+    print("\nAll checks passed" if not failures else f"\n{len(failures)} failed check(s)")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
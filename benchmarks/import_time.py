@@ -0,0 +1,92 @@
+"""Import-time benchmark for the CLI and Streamlit app entry points.
+
+Runs ``python -X importtime -c "import <module>"`` in a fresh interpreter
+(several times, keeping the fastest run) and reports the total import time,
+the slowest modules and which heavy optional dependencies got imported.
+
+Usage (from the repository root):
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py elbitat_agent.main --top 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+DEFAULT_TARGETS = ["elbitat_agent.main", "streamlit_app"]
+
+# Dependencies that should only be imported when actually used
+HEAVY_MODULES = ["streamlit", "supabase", "openai", "bs4", "sendgrid", "requests", "tiktoken"]
+
+
+def measure_import(module: str) -> Tuple[int, Dict[str, Tuple[int, int]], str]:
+    """Import ``module`` in a fresh interpreter with ``-X importtime``.
+
+    Returns:
+        (total microseconds, {module: (self_us, cumulative_us)}, error output)
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+    )
+    timings: Dict[str, Tuple[int, int]] = {}
+    errors: List[str] = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            errors.append(line)
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # header line
+        name = parts[2].strip()
+        timings[name] = (int(parts[0]), int(parts[1]))
+
+    total = timings.get(module, (0, 0))[1]
+    error = "\n".join(errors) if result.returncode else ""
+    return total, timings, error
+
+
+def report(module: str, runs: int, top: int) -> None:
+    best = None
+    for _ in range(runs):
+        total, timings, error = measure_import(module)
+        if error:
+            print(f"== {module}: import failed\n{error}\n")
+            return
+        if best is None or total < best[0]:
+            best = (total, timings)
+
+    total, timings = best
+    print(f"== {module}: {total / 1000:.1f} ms (best of {runs})")
+
+    print(f"   Slowest {top} modules (cumulative ms, self ms):")
+    slowest = sorted(timings.items(), key=lambda item: item[1][1], reverse=True)
+    for name, (self_us, cumulative_us) in slowest[1:top + 1]:
+        print(f"   {cumulative_us / 1000:9.1f} {self_us / 1000:9.1f}  {name}")
+
+    loaded = [m for m in HEAVY_MODULES if m in timings]
+    print(f"   Heavy dependencies imported: {', '.join(loaded) if loaded else 'none'}")
+    print()
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Measure import time of the entry points.")
+    parser.add_argument("modules", nargs="*", default=DEFAULT_TARGETS, help="Modules to import")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per module (fastest is reported)")
+    parser.add_argument("--top", type=int, default=10, help="Number of slowest modules to list")
+    args = parser.parse_args(argv)
+
+    for module in args.modules:
+        report(module, args.runs, args.top)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""Benchmark recording email send outcomes: one at a time vs. buffered.
+
+Records the outcomes of a large send (most sent, some failed) in a scratch
+database two ways:
+
+- per email: an email_sends insert and sent_count update, plus
+  ``update_email_contact_status`` for each sent email (what ``send_campaign``
+  did before), i.e. a connection and a transaction per call
+- buffered: ``EmailSendRecorder``, which flushes 1000 outcomes at a time
+  with ``record_email_sends`` (one executemany, one counter update and one
+  bulk contact status update per flush)
+
+Commits are counted with a trace callback on every connection. Then checks
+that both leave the same email_sends rows and contact statuses, and that
+sent_count only counts emails actually sent. Exits non-zero if a check
+fails.
+
+Usage (from the repository root):
+    python benchmarks/send_recording.py --sends 10000
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def _add_contacts(count: int) -> List[int]:
+    from elbitat_agent.database import get_connection
+
+    conn = get_connection()
+    with conn:
+        conn.executemany("INSERT INTO email_contacts (email, status) VALUES (?, 'active')",
+                         [(f"guest.{i}@agency{i}.example",) for i in range(count)])
+    ids = [row[0] for row in conn.execute("SELECT id FROM email_contacts ORDER BY id")]
+    conn.close()
+    return ids
+
+
+def _outcomes(contact_ids: List[int]) -> List[Dict]:
+    return [{'contact_id': i, 'state': 'failed', 'error': 'HTTP 400: Invalid address'} if i % 10 == 0 else
+            {'contact_id': i, 'state': 'sent', 'message_id': f"msg-{i}"}
+            for i in contact_ids]
+
+
+def _record_send(campaign_id: int, outcome: Dict) -> None:
+    """Record one outcome the way the removed ``record_email_send`` did."""
+    from elbitat_agent.database import get_connection
+
+    conn = get_connection()
+    conn.execute("INSERT INTO email_sends (campaign_id, contact_id, status, sent_at, error_message, message_id) "
+                 "VALUES (?, ?, ?, CURRENT_TIMESTAMP, ?, ?)",
+                 (campaign_id, outcome['contact_id'], outcome['state'], outcome.get('error'),
+                  outcome.get('message_id')))
+    if outcome['state'] == 'sent':
+        conn.execute("UPDATE email_campaigns SET sent_count = sent_count + 1, updated_at = CURRENT_TIMESTAMP "
+                     "WHERE id = ?", (campaign_id,))
+    conn.commit()
+    conn.close()
+
+
+def _state(campaign_id: int) -> tuple:
+    """Return the recorded sends, contacted contacts and sent_count, then reset the contacts."""
+    from elbitat_agent.database import get_connection
+
+    conn = get_connection()
+    sends = conn.execute("SELECT contact_id, status, message_id, error_message FROM email_sends "
+                         "WHERE campaign_id = ? ORDER BY contact_id", (campaign_id,)).fetchall()
+    contacted = conn.execute("SELECT id FROM email_contacts WHERE status = 'contacted' ORDER BY id").fetchall()
+    sent_count = conn.execute("SELECT sent_count FROM email_campaigns WHERE id = ?", (campaign_id,)).fetchone()[0]
+    conn.execute("UPDATE email_contacts SET status = 'active'")
+    conn.commit()
+    conn.close()
+    return sends, contacted, sent_count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark buffered email send recording.")
+    parser.add_argument("--sends", type=int, default=10000, help="Send outcomes to record")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="elbitat_recording_bench_"))
+    os.environ["DB_PATH"] = str(workdir)
+
+    from elbitat_agent import database
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        contact_ids = _add_contacts(args.sends)
+        campaigns = [database.save_email_campaign(f"Recording {i}", "Hi", "<p>Hi</p>") for i in range(2)]
+    outcomes = _outcomes(contact_ids)
+
+    statements = Counter()
+    connect = database.get_connection
+
+    def traced_connection():
+        conn = connect()
+        conn.set_trace_callback(lambda sql: statements.update([sql.split(None, 1)[0].upper()]))
+        return conn
+
+    def per_email() -> None:
+        for o in outcomes:
+            _record_send(campaigns[0], o)
+            if o['state'] == 'sent':
+                database.update_email_contact_status(o['contact_id'], 'contacted')
+
+    def buffered() -> None:
+        with database.EmailSendRecorder(campaigns[1]) as recorder:
+            for start in range(0, len(outcomes), 50):
+                recorder.add(outcomes[start:start + 50])
+
+    print(f"== {args.sends} send outcomes")
+    results, states = {}, []
+    for campaign_id, (name, record) in zip(campaigns, (("per email", per_email), ("buffered", buffered))):
+        statements.clear()
+        started = time.perf_counter()
+        with mock.patch.object(database, "get_connection", traced_connection):
+            record()
+        elapsed = time.perf_counter() - started
+        print(f"   {name:<10} {elapsed:7.2f} s  {statements['COMMIT']:6d} transactions")
+        results[name] = elapsed
+        states.append(_state(campaign_id))
+    print(f"   {results['per email'] / results['buffered']:.0f}x faster")
+
+    failures = []
+
+    def check(name: str, condition: bool) -> None:
+        print(f"   {'ok  ' if condition else 'FAIL'} {name}")
+        if not condition:
+            failures.append(name)
+
+    print("== checks")
+    (old_sends, old_contacted, old_count), (new_sends, new_contacted, new_count) = states
+    check("same email_sends rows", old_sends == new_sends and len(new_sends) == args.sends)
+    check("same contacts marked contacted", old_contacted == new_contacted)
+    sent = sum(1 for o in outcomes if o['state'] == 'sent')
+    check("sent_count counts only emails sent", old_count == new_count == sent)
+
+    print("\nAll checks passed" if not failures else f"\n{len(failures)} failed check(s)")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""Benchmark and check campaign sending over SMTP against a local SMTP sink.
+
+Starts ``smtp_fake.FakeSMTPServer`` (login required, with a simulated
+round trip per read) and sends the same personalised email:
+
+- a connection per email: connect, log in, send, quit for each recipient
+  (timed on a sample and reported per message)
+- one persistent connection, one command per round trip
+- one persistent connection, pipelined (MAIL/RCPT/DATA in one write)
+- ``send_campaign(backend='smtp')`` over a scratch database: several
+  pipelined connections, with a rate limit on gmail.com recipients
+
+Then checks that every recipient got exactly one ``email_sends`` row, that
+a rejected address is recorded as failed with the server's reply, that the
+delivered emails match ``personalize_email`` in the campaign layout, that
+results have the same keys as the SendGrid sender's, that gmail.com
+messages were spaced out to the domain's rate, that a temporary failure and
+a server-side disconnect are retried, that a connection lost after the
+message was sent is reported as delivery unknown instead of resent (with
+and without pipelining), and that a wrong password fails fast.
+Exits non-zero if a check fails.
+
+Usage (from the repository root):
+    python benchmarks/smtp_sending.py --contacts 2000 --latency 0.005
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import os
+import smtplib
+import sys
+import tempfile
+import time
+from email.message import EmailMessage
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+SUBJECT = "Hello {{first_name}} from Elbitat"
+UNSUBSCRIBE = '<p><a href="mailto:info@elbitat.com?subject=Unsubscribe">Unsubscribe</a></p>'
+TEMPLATE = ("<p>Hi {{first_name}},</p><p>News for {{company_name}} in {{country}}.</p>" + "<p>Elba.</p>" * 200
+            + UNSUBSCRIBE)
+GMAIL_RATE = 40
+
+
+def _add_contacts(count: int) -> List[int]:
+    from elbitat_agent.database import get_connection
+
+    # Every 20th recipient is at gmail.com, the rest at their own agency domain
+    conn = get_connection()
+    with conn:
+        conn.executemany(
+            "INSERT INTO email_contacts (email, company_name, website, country, status) VALUES (?, ?, ?, ?, 'active')",
+            [(f"anna.{i}@{'gmail.com' if i % 20 == 0 else f'agency{i}.example'}", f"Agency {i}",
+              f"https://agency{i}.example", "Italy") for i in range(count)],
+        )
+    ids = [row[0] for row in conn.execute("SELECT id FROM email_contacts ORDER BY id")]
+    conn.close()
+    return ids
+
+
+def _sends(campaign_id: int) -> Dict[str, tuple]:
+    from elbitat_agent.database import get_connection
+
+    conn = get_connection()
+    rows = conn.execute(
+        "SELECT status, COUNT(*), COUNT(DISTINCT contact_id), COUNT(message_id), MAX(error_message) "
+        "FROM email_sends WHERE campaign_id = ? GROUP BY status", (campaign_id,)
+    ).fetchall()
+    conn.close()
+    return {status: (n, distinct, ids, error) for status, n, distinct, ids, error in rows}
+
+
+def _connection_per_email(server, contacts: List[Dict]) -> None:
+    from elbitat_agent.agents.email_campaigns import campaign_html, personalize_email
+
+    for contact in contacts:
+        message = EmailMessage()
+        message['From'], message['To'] = "noreply@elbitat.com", contact['email']
+        message['Subject'] = personalize_email(SUBJECT, contact)
+        message.set_content(personalize_email(campaign_html(TEMPLATE), contact), subtype='html')
+        with smtplib.SMTP(server.host, server.port) as smtp:
+            smtp.login("elbitat", "secret")
+            smtp.send_message(message)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark SMTP sending against a local SMTP sink.")
+    parser.add_argument("--contacts", type=int, default=1000, help="Number of recipients")
+    parser.add_argument("--latency", type=float, default=0.005, help="Simulated round trip per read, in seconds")
+    parser.add_argument("--connections", type=int, default=4, help="Parallel connections for the campaign send")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="elbitat_smtp_bench_"))
+    os.environ["DB_PATH"] = str(workdir)
+    os.environ["EMAIL_SENDING_ENABLED"] = "true"
+
+    from elbitat_agent.agents.email_campaigns import (
+        campaign_html, personalize_email, placeholder_values, send_campaign, send_test_email,
+        substitution_template
+    )
+    from elbitat_agent.agents.email_delivery import DELIVERY_UNKNOWN, BatchRecipient, SendGridBatchSender
+    from elbitat_agent.agents.smtp_delivery import DomainThrottle, SMTPBatchSender
+    from elbitat_agent.database import get_email_contacts_by_ids, save_email_campaign
+    from elbitat_agent.smtp_fake import FakeSMTPServer
+
+    failures = []
+
+    def check(name: str, condition: bool) -> None:
+        print(f"   {'ok  ' if condition else 'FAIL'} {name}")
+        if not condition:
+            failures.append(name)
+
+    quiet = contextlib.redirect_stdout(io.StringIO())
+    with quiet:
+        contact_ids = _add_contacts(args.contacts)
+        campaigns = [save_email_campaign(f"SMTP {i}", SUBJECT, TEMPLATE) for i in range(2)]
+    contacts = get_email_contacts_by_ids(contact_ids)
+    rejected = contacts[-3]['email']
+
+    # The same batch the campaign run would build
+    batch_subject, subject_tags = substitution_template(SUBJECT)
+    batch_html, html_tags = substitution_template(TEMPLATE)
+    tags = {**subject_tags, **html_tags}
+
+    def recipients(rows: List[Dict]) -> List[BatchRecipient]:
+        return [BatchRecipient(contact_id=c['id'], email=c['email'], substitutions={
+            tag: placeholder_values(c)[name] or default for tag, (name, default) in tags.items()}) for c in rows]
+
+    os.environ.update({"EMAIL_BACKEND": "smtp", "SMTP_SECURITY": "none", "SMTP_USERNAME": "elbitat",
+                       "SMTP_PASSWORD": "secret", "SMTP_MAX_CONNECTIONS": str(args.connections),
+                       "SMTP_DOMAIN_RATES": f"gmail.com={GMAIL_RATE}"})
+    with FakeSMTPServer(latency=args.latency, username="elbitat", password="secret", reject=[rejected],
+                        messages_per_connection=250) as server:
+        os.environ["SMTP_HOST"], os.environ["SMTP_PORT"] = server.host, str(server.port)
+        print(f"== {args.contacts} recipients, {args.latency * 1000:.0f} ms per round trip")
+
+        sample = contacts[:100]
+        started = time.perf_counter()
+        _connection_per_email(server, sample)
+        per_email = (time.perf_counter() - started) / len(sample)
+        print(f"   connection per email:         {per_email * 1000:7.2f} ms per message (sample of {len(sample)})")
+
+        timings = {}
+        for pipelining in (False, True):
+            sender = SMTPBatchSender(max_connections=1, pipelining=pipelining, throttle=DomainThrottle({}))
+            reads = server.reads
+            started = time.perf_counter()
+            results = sender.send_batch(batch_subject, batch_html, recipients(contacts[:200]))
+            timings[pipelining] = (time.perf_counter() - started) / len(results)
+            print(f"   1 connection, {'pipelined' if pipelining else 'unpipelined'}: {timings[pipelining] * 1000:9.2f} "
+                  f"ms per message ({(server.reads - reads) / len(results):.1f} round trips each)")
+
+        server.accepted.clear()
+        connections, logins = server.connections, server.logins
+        started = time.perf_counter()
+        with quiet:
+            stats = send_campaign(campaigns[0], contact_ids, SUBJECT, TEMPLATE, batch_size=200)
+        elapsed = time.perf_counter() - started
+        print(f"   send_campaign, {args.connections} connections: {elapsed / args.contacts * 1000:7.2f} ms per message "
+              f"({elapsed:.2f} s, {stats}, gmail.com at {GMAIL_RATE}/s)")
+        print(f"   {per_email * args.contacts / elapsed:.0f}x faster than a connection per email")
+
+        print("== checks")
+        sends = _sends(campaigns[0])
+        check("one email_sends row per recipient",
+              sends.get('sent', (0,))[:3] == (args.contacts - 1,) * 3 and sends.get('failed', (0,))[:2] == (1, 1))
+        check("rejected address recorded as failed with the server's reply",
+              'failed' in sends and '550' in sends['failed'][3] and rejected not in server.recipients)
+        check("every other recipient delivered once",
+              sorted(server.recipients) == sorted(c['email'] for c in contacts if c['email'] != rejected))
+        expected = {c['email']: (personalize_email(SUBJECT, c), personalize_email(campaign_html(TEMPLATE), c).rstrip('\n'))
+                    for c in contacts[:50]}
+        delivered = {m['email']: (m['subject'], m['html'].rstrip('\n')) for m in server.messages() if m['email'] in expected}
+        check("substitutions render like personalize_email", delivered == {e: v for e, v in expected.items()
+                                                                           if e != rejected})
+        check("connections reused, renewed after the server's 421, one login each",
+              server.connections - connections > 1 and server.logins - logins == server.connections - connections
+              and server.connections - connections <= args.contacts // 250 + 2 * args.connections)
+        gmail = sorted(m['at'] for m in server.messages() if m['email'].endswith('@gmail.com'))
+        span = gmail[-1] - gmail[0]
+        check(f"gmail.com spaced to {GMAIL_RATE}/s ({len(gmail)} messages over {span:.2f} s)",
+              span >= (len(gmail) - 1) / GMAIL_RATE * 0.9)
+
+        sendgrid_keys = set(SendGridBatchSender(api_key="").send_batch("s", "h", recipients(contacts[:1]))[0])
+        smtp_keys = set(SMTPBatchSender().send_batch(batch_subject, batch_html, recipients(contacts[:1]))[0])
+        check("results have the SendGrid sender's keys", smtp_keys == sendgrid_keys)
+
+        server.accepted.clear()
+        server.fail_next(451, count=2, message="4.3.0 Try again later")
+        retried = SMTPBatchSender(retry_delay=0, throttle=DomainThrottle({})).send_batch(
+            batch_subject, batch_html, recipients(contacts[100:110]))
+        check("temporary failure retried",
+              all(r['success'] for r in retried) and len(server.recipients) == 10)
+
+        for pipelining in (True, False):
+            server.accepted.clear()
+            server.drop_reply_next()
+            lost = SMTPBatchSender(retry_delay=0, pipelining=pipelining, throttle=DomainThrottle({})).send_batch(
+                batch_subject, batch_html, recipients(contacts[110:113]))
+            check(f"reply lost after the message is not resent ({'pipelined' if pipelining else 'unpipelined'})",
+                  [r['error'].startswith(DELIVERY_UNKNOWN) for r in lost if not r['success']] == [True]
+                  and sorted(server.recipients) == sorted(c['email'] for c in contacts[110:113]))
+
+        logins = server.connections
+        started = time.perf_counter()
+        wrong = SMTPBatchSender(password="wrong", throttle=DomainThrottle({})).send_batch(
+            batch_subject, batch_html, recipients(contacts[:200]))
+        check("wrong password fails fast without a login per message",
+              {r['status_code'] for r in wrong} == {535} and server.connections - logins <= args.connections
+              and time.perf_counter() - started < 5)
+
+        result = send_test_email(TEMPLATE, SUBJECT, "test@elbitat.example")
+        check("send_test_email uses the configured backend",
+              result['success'] and server.recipients[-1] == "test@elbitat.example")
+
+        check("unknown backend rejected", _raises(lambda: send_campaign(campaigns[1], contact_ids[:5], SUBJECT,
+                                                                        TEMPLATE, backend="carrier-pigeon"))
+              and not _sends(campaigns[1]))
+
+    print("\nAll checks passed" if not failures else f"\n{len(failures)} failed check(s)")
+    sys.exit(1 if failures else 0)
+
+
+def _raises(call) -> bool:
+    try:
+        call()
+    except ValueError:
+        return True
+    return False
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""Benchmark and fault-injection checks for the draft storage writers.
+
+Benchmark: saves N drafts one by one (``save_draft_dict``) and in one call
+(``save_drafts``), with and without fsync, against a scratch SQLite database
+and workspace.
+
+Fault injection (``--faults``): interrupts backup writes at each stage -
+while the JSON is being written, at the rename, by killing the process
+mid-write - and fails a bulk database save half-way, then checks that the
+previous file contents survive intact, that no temporary file is left where
+the writer could clean up, and that the bulk save left no partial batch.
+Exits non-zero if a check fails.
+
+Usage (from the repository root):
+    python benchmarks/storage_writes.py --drafts 500
+    python benchmarks/storage_writes.py --faults
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+from unittest import mock
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+
+def _draft(i: int) -> Dict:
+    return {
+        "request": {
+            "title": f"Storage draft {i}",
+            "goal": "bookings",
+            "month": "2025-07",
+            "platforms": ["instagram", "facebook"],
+            "brief": "Sunset dinners on the terrace overlooking the sea. " * 4,
+        },
+        "copy_by_platform": {"instagram": {"caption": "Caption " * 30}},
+        "selected_images": [],
+    }
+
+
+def _scratch_environment() -> Path:
+    workdir = Path(tempfile.mkdtemp(prefix="elbitat_storage_"))
+    os.environ["DB_PATH"] = str(workdir)
+    os.environ["ELBITAT_WORKSPACE"] = str(workdir / "workspace")
+    os.environ.setdefault("BACKUP_MODE", "sync")
+    return workdir
+
+
+# ----- benchmark -----
+
+def benchmark(drafts: int) -> None:
+    _scratch_environment()
+    from elbitat_agent import file_storage
+
+    def timed(label: str, operation: Callable[[], object]) -> None:
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            operation()
+        elapsed = time.perf_counter() - started
+        print(f"   {label:<32} {elapsed * 1000:9.1f} ms  {elapsed * 1000 / drafts:7.3f} ms/draft")
+
+    for fsync in ("false", "true"):
+        os.environ["BACKUP_FSYNC"] = fsync
+        print(f"== fsync={fsync}, {drafts} drafts")
+        timed("save_draft_dict, one by one",
+              lambda: [file_storage.save_draft_dict(_draft(i), f"one_{fsync}_{i}.json") for i in range(drafts)])
+        timed("save_drafts, one call",
+              lambda: file_storage.save_drafts((f"bulk_{fsync}_{i}.json", _draft(i)) for i in range(drafts)))
+
+
+# ----- fault injection -----
+
+class InjectedFault(Exception):
+    pass
+
+
+def _temp_files(directory: Path) -> List[Path]:
+    return list(directory.glob(".*.tmp"))
+
+
+def _partial_dump(data, f, **kwargs) -> None:
+    # Write the first half of the document, then fail
+    text = json.dumps(data, **kwargs)
+    f.write(text[:len(text) // 2])
+    raise InjectedFault("disk full")
+
+
+def fault_checks() -> List[str]:
+    """Run the fault scenarios; returns the failed check descriptions."""
+    workdir = _scratch_environment()
+    os.environ["BACKUP_MODE"] = "sync"
+    from elbitat_agent import backup, database
+    from elbitat_agent.backup import write_json_atomic
+
+    failures: List[str] = []
+    target = workdir / "faults" / "draft.json"
+    original = {"version": 1}
+    write_json_atomic(target, original)
+
+    def check(name: str, condition: bool) -> None:
+        print(f"   {'ok  ' if condition else 'FAIL'} {name}")
+        if not condition:
+            failures.append(name)
+
+    def intact() -> bool:
+        return json.loads(target.read_text(encoding="utf-8")) == original
+
+    print("== interrupted writes")
+    for name, patch in [
+        ("partial JSON write", mock.patch.object(backup.json, "dump", _partial_dump)),
+        ("failed rename", mock.patch.object(backup.os, "replace", side_effect=InjectedFault("rename"))),
+        ("failed fsync", mock.patch.object(backup.os, "fsync", side_effect=InjectedFault("fsync"))),
+    ]:
+        raised = False
+        with patch:
+            try:
+                write_json_atomic(target, {"version": 2}, fsync=True)
+            except InjectedFault:
+                raised = True
+        check(f"{name}: error reported", raised)
+        check(f"{name}: previous file intact", intact())
+        check(f"{name}: temporary file removed", not _temp_files(target.parent))
+
+    raised = False
+    try:
+        write_json_atomic(target, {"version": {1, 2}})
+    except TypeError:
+        raised = True
+    check("unserialisable data: error reported, previous file intact", raised and intact())
+
+    print("== process killed mid-write")
+    script = (
+        "import json, os, sys\n"
+        f"sys.path.insert(0, {str(REPO_ROOT)!r})\n"
+        "from elbitat_agent import backup\n"
+        "def dump(data, f, **kwargs):\n"
+        "    f.write(json.dumps(data)[:5]); f.flush(); os._exit(9)\n"
+        "backup.json.dump = dump\n"
+        f"backup.write_json_atomic({str(target)!r}, {{'version': 3}})\n"
+    )
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True)
+    check("child was killed mid-write", result.returncode == 9)
+    check("previous file intact after the crash", intact())
+    leftovers = _temp_files(target.parent)
+    check("*.json loaders skip the leftover temporary file",
+          bool(leftovers) and not any(p.match("*.json") for p in leftovers))
+    for path in leftovers:
+        path.unlink()
+
+    print("== async writer error")
+    os.environ["BACKUP_MODE"] = "async"
+    errors_before = backup.get_backup_stats()["errors"]
+    with mock.patch.object(backup.json, "dump", _partial_dump), contextlib.redirect_stdout(io.StringIO()):
+        backup.save_backup(target, {"version": 4})
+        backup.flush_backups(timeout=10)
+    os.environ["BACKUP_MODE"] = "sync"
+    check("error counted", backup.get_backup_stats()["errors"] == errors_before + 1)
+    check("previous file intact", intact())
+
+    print("== bulk database save failing half-way")
+    batch = [(f"bulk_{i}.json", _draft(i)) for i in range(10)]
+    batch[5] = ("bulk_5.json", {**_draft(5), "bad": {1, 2}})  # not JSON-serialisable
+    with contextlib.redirect_stdout(io.StringIO()):
+        saved = database.save_drafts_to_db(batch)
+        stored = {d["_filename"] for d in database.get_all_drafts.uncached()}
+    check("failure reported", saved is False)
+    check("no draft of the batch saved", not stored & {name for name, _ in batch})
+
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark and fault-test the storage writers.")
+    parser.add_argument("--drafts", type=int, default=300, help="Number of drafts per benchmark run")
+    parser.add_argument("--faults", action="store_true", help="Run the fault-injection checks instead")
+    args = parser.parse_args()
+
+    if args.faults:
+        failures = fault_checks()
+        print(f"\n{len(failures)} failed check(s)" if failures else "\nAll checks passed")
+        sys.exit(1 if failures else 0)
+    benchmark(args.drafts)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Benchmark the Supabase code path offline against the SQLite stand-in.
+
+Compares the cached process-wide client with rebuilding the client for every
+operation (the previous behaviour, reproduced by resetting the client before
+each call). Runs draft saves, single-draft reads and summary pages through
+``elbitat_agent.database`` with its read cache bypassed. Building a
+stand-in client only costs a SQLite connect; against real Supabase each new
+client also means a new HTTP connection and TLS handshake, so the gap there
+is larger.
+
+Usage (from the repository root):
+    python benchmarks/supabase_client.py --drafts 200 --latency 0.02
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def _draft(i: int) -> Dict:
+    return {
+        "request": {
+            "title": f"Benchmark draft {i}",
+            "goal": "bookings" if i % 2 else "awareness",
+            "month": "2025-07",
+            "platforms": ["instagram", "facebook"],
+            "brief": "Sunset dinners on the terrace overlooking the sea. " * 4,
+        },
+        "copy_by_platform": {"instagram": {"caption": "Caption " * 30, "hashtags": "#elba #elbitat"}},
+        "selected_images": [],
+    }
+
+
+def run(drafts: int, before_call: Callable[[], None]) -> List[Tuple[str, int, float]]:
+    """Time the operations; returns (name, calls, seconds) rows."""
+    from elbitat_agent import database
+
+    results = []
+
+    def timed(name: str, count: int, operation: Callable[[int], object]) -> None:
+        started = time.perf_counter()
+        # The data layer logs every operation; keep that out of the timings
+        with contextlib.redirect_stdout(io.StringIO()):
+            for i in range(count):
+                before_call()
+                operation(i)
+        results.append((name, count, time.perf_counter() - started))
+
+    timed("save_draft_to_db", drafts, lambda i: database.save_draft_to_db(f"bench_{i}.json", _draft(i)))
+    timed("get_draft", drafts, lambda i: database.get_draft.uncached(f"bench_{i}.json"))
+    timed("get_draft_summaries", max(1, drafts // 10),
+          lambda i: database.get_draft_summaries.uncached(limit=12, offset=i * 12))
+    return results
+
+
+def report(label: str, results: List[Tuple[str, int, float]]) -> None:
+    print(f"== {label}")
+    for name, count, elapsed in results:
+        print(f"   {name:<20} {count:5d} calls  {elapsed * 1000 / count:8.2f} ms/call")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the Supabase path against the SQLite stand-in.")
+    parser.add_argument("--drafts", type=int, default=200, help="Number of drafts to save and read")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="Simulated network round trip per request, in seconds")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="elbitat_supabase_bench_"))
+    os.environ["SUPABASE_URL"] = f"sqlite://{workdir / 'supabase.db'}"
+    os.environ["DB_PATH"] = str(workdir / "sqlite")
+
+    from elbitat_agent import supabase_db
+    from elbitat_agent.supabase_fake import FakeSupabaseClient
+
+    def new_client() -> None:
+        # What every operation used to do: build a fresh client
+        supabase_db.set_supabase_client(
+            FakeSupabaseClient.from_url(os.environ["SUPABASE_URL"], latency=args.latency)
+        )
+
+    new_client()
+    report("cached client", run(args.drafts, lambda: None))
+    report("new client per call", run(args.drafts, new_client))
+    print(f"\nData left in {workdir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""Benchmark suppression list lookups and check that sends skip suppressed addresses.
+
+Fills a scratch database with a large suppression list and a contact list,
+then compares ways of filtering a send's recipients:
+
+- scan: look each recipient up in a list of all contacts, checking for a
+  bounced/unsubscribed status (the only option before the suppression
+  table), timed on a sample and reported per address
+- indexed: one primary-key lookup per address (``is_email_suppressed``)
+- filter: ``load_suppression_filter`` once, then the in-memory Bloom filter
+  with database confirmation of possible matches
+
+Then checks that the filter finds exactly the suppressed addresses, that
+marking a contact unsubscribed suppresses it (and reactivating it lifts only
+that suppression), that a campaign run skips suppressed recipients
+without sending to them (against the fake SendGrid endpoint), and that an
+unreadable suppression list fails lookups and runs instead of letting every
+address through. Exits non-zero if a check fails.
+
+Usage (from the repository root):
+    python benchmarks/suppression.py --suppressed 100000 --recipients 20000
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark suppression list lookups.")
+    parser.add_argument("--suppressed", type=int, default=100000, help="Addresses on the suppression list")
+    parser.add_argument("--recipients", type=int, default=20000, help="Recipients to filter")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="elbitat_suppression_bench_"))
+    os.environ["DB_PATH"] = str(workdir)
+    os.environ["EMAIL_SENDING_ENABLED"] = "true"
+    os.environ["SENDGRID_API_KEY"] = "SG.fake"
+    os.environ["SENDGRID_REQUESTS_PER_SECOND"] = "0"
+
+    from elbitat_agent.agents import campaign_runs
+    from elbitat_agent.database import (
+        get_all_email_contacts, get_connection, is_email_suppressed, save_email_campaign, suppress_emails,
+        update_email_contact_status
+    )
+    from elbitat_agent.sendgrid_fake import FakeSendGridServer
+    from elbitat_agent.suppression import email_hash, load_suppression_filter
+
+    # Every 20th recipient is on the suppression list, alongside many other addresses
+    recipients = [f"Guest.{i}@Agency{i}.example" for i in range(args.recipients)]
+    expected = {email for i, email in enumerate(recipients) if i % 20 == 0}
+    quiet = contextlib.redirect_stdout(io.StringIO())
+    with quiet:
+        suppress_emails([f"old.{i}@bounced.example" for i in range(args.suppressed - len(expected))], 'bounced')
+        suppress_emails([e.lower() for e in expected], 'unsubscribed', source='benchmark')
+        conn = get_connection()
+        with conn:
+            conn.executemany("INSERT INTO email_contacts (email, status) VALUES (?, ?)",
+                             [(email, 'unsubscribed' if email in expected else 'active') for email in recipients])
+        conn.close()
+
+    print(f"== {args.recipients} recipients, {args.suppressed} suppressed addresses")
+
+    sample = recipients[:200]
+    started = time.perf_counter()
+    contacts = get_all_email_contacts()
+    scanned = {e for e in sample
+               if any(c['email'] == e and c['status'] in ('bounced', 'unsubscribed') for c in contacts)}
+    scan = (time.perf_counter() - started) / len(sample)
+    print(f"   scan contact list:      {scan * 1e6:10.1f} us per address (sample of {len(sample)})")
+
+    started = time.perf_counter()
+    indexed = {e for e in recipients if is_email_suppressed(e)}
+    per_lookup = (time.perf_counter() - started) / len(recipients)
+    print(f"   indexed lookup:         {per_lookup * 1e6:10.1f} us per address")
+
+    started = time.perf_counter()
+    suppressions = load_suppression_filter()
+    load = time.perf_counter() - started
+    started = time.perf_counter()
+    found = suppressions.suppressed(recipients)
+    per_filtered = (time.perf_counter() - started) / len(recipients)
+    print(f"   bloom filter + confirm: {per_filtered * 1e6:10.1f} us per address "
+          f"(load {load:.2f} s, {len(suppressions.bloom.bits) / 1024:.0f} KiB, {suppressions.bloom.hash_count} hashes)")
+    print(f"   {scan / per_filtered:.0f}x faster than scanning, {per_lookup / per_filtered:.0f}x faster than per-address lookups")
+
+    failures = []
+
+    def check(name: str, condition: bool) -> None:
+        print(f"   {'ok  ' if condition else 'FAIL'} {name}")
+        if not condition:
+            failures.append(name)
+
+    print("== checks")
+    probes = [f"never.{i}@clean.example" for i in range(20000)]
+    false_positives = sum(1 for e in probes if email_hash(e) in suppressions.bloom)
+    print(f"   false positive rate {false_positives / len(probes):.4f}")
+    check("filter finds exactly the suppressed recipients", set(found) == expected == indexed
+          and set(found.values()) == {'unsubscribed'} and scanned == expected & set(sample))
+    check("false positives confirmed away", not suppressions.suppressed(probes))
+
+    with quiet:
+        conn = get_connection()
+        contact_id = conn.execute("SELECT id FROM email_contacts WHERE email = ?", (recipients[1],)).fetchone()[0]
+        conn.close()
+        update_email_contact_status(contact_id, 'bounced')
+    check("unsubscribed/bounced contact status suppresses the address", is_email_suppressed(recipients[1]))
+
+    with quiet:
+        conn = get_connection()
+        lifted, kept = (conn.execute("SELECT id FROM email_contacts WHERE email = ?", (email,)).fetchone()[0]
+                        for email in (recipients[2], recipients[0]))
+        conn.close()
+        update_email_contact_status(lifted, 'bounced')
+        update_email_contact_status(lifted, 'active')
+        update_email_contact_status(kept, 'active')
+    check("reactivating lifts only suppressions that came from the contact status",
+          not is_email_suppressed(recipients[2]) and is_email_suppressed(recipients[0]))
+
+    with FakeSendGridServer(api_key="SG.fake") as server:
+        os.environ["SENDGRID_API_URL"] = server.url
+        with quiet:
+            conn = get_connection()
+            with conn:
+                conn.execute("UPDATE email_contacts SET status = 'active'")
+            ids = [row[0] for row in conn.execute("SELECT id FROM email_contacts ORDER BY id LIMIT 400")]
+            conn.close()
+            campaign_id = save_email_campaign("Suppression check", "Hi {{first_name}}",
+                                              '<p>Hi</p><p><a href="mailto:info@elbitat.com?subject=Unsubscribe">'
+                                              'Unsubscribe</a></p>')
+            run_id = campaign_runs.create_campaign_run(campaign_id, ids, batch_size=100)
+            run = campaign_runs.run_campaign(run_id)
+        blocked = {e.lower() for e in expected} | {recipients[1].lower()}
+        delivered = {e.lower() for e in server.recipients}
+        first = {e.lower() for e in recipients[:400]}
+        check("run skips suppressed recipients without sending to them",
+              not delivered & blocked and delivered == first - blocked
+              and run['skipped'] == len(first & blocked) and run['sent'] == len(first - blocked))
+        print(f"   (run {run_id}: {run['sent']} sent, {run['skipped']} suppressed)")
+
+        # The suppression list cannot be read: nothing may be sent
+        delivered = len(server.recipients)
+        with quiet:
+            conn = get_connection()
+            ids = [row[0] for row in conn.execute("SELECT id FROM email_contacts ORDER BY id DESC LIMIT 100")]
+            run_id = campaign_runs.create_campaign_run(campaign_id, ids, batch_size=100)
+            with conn:
+                conn.execute("ALTER TABLE email_suppressions RENAME TO email_suppressions_unreadable")
+            try:
+                lookup_raised = _raises(lambda: suppressions.suppressed(recipients[:40]))
+                run = campaign_runs.run_campaign(run_id)
+            finally:
+                with conn:
+                    conn.execute("ALTER TABLE email_suppressions_unreadable RENAME TO email_suppressions")
+                conn.close()
+        check("unreadable suppression list fails the lookup and the run, sending nothing",
+              lookup_raised and run['status'] == 'failed' and len(server.recipients) == delivered)
+
+    print("\nAll checks passed" if not failures else f"\n{len(failures)} failed check(s)")
+    sys.exit(1 if failures else 0)
+
+
+def _raises(call) -> bool:
+    try:
+        call()
+    except Exception:
+        return True
+    return False
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""Load-test the open/click tracking service and check what it records.
+
+Starts ``tracking.TrackingServer`` on a free local port over a scratch
+database holding one sent campaign, then fires open-pixel and click
+requests at it from client processes (keep-alive connections), and
+reports requests per second and latency. For comparison it also times
+writing events to the database one at a time, which is what a service
+without the in-memory buffer would do per request.
+
+Then checks that every accepted event was stored, that opened/clicked
+counts and timestamps count each recipient once (a click counts as an
+open), that redirects go to the signed URL, that links personalised with
+placeholders are signed with the recipient's values, and that forged or
+mismatched tokens are rejected. Exits non-zero if a check fails.
+
+Usage (from the repository root):
+    python benchmarks/tracking_load.py --requests 20000 --clients 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import http.client
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+LINKS = ["https://elbitat.com/offers", "https://elbitat.com/spa?utm_source=email"]
+
+
+def _client(port: int, paths: List[str]) -> Tuple[Counter, List[float], List[str]]:
+    """Request the paths over one keep-alive connection; returns (statuses, latencies, redirect targets)."""
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    statuses, latencies, locations = Counter(), [], []
+    for path in paths:
+        started = time.perf_counter()
+        conn.request("GET", path)
+        response = conn.getresponse()
+        response.read()
+        latencies.append(time.perf_counter() - started)
+        statuses[response.status] += 1
+        if response.status == 302:
+            locations.append(response.getheader("Location"))
+    conn.close()
+    return statuses, latencies, locations
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load-test the tracking service.")
+    parser.add_argument("--requests", type=int, default=20000, help="Requests to send")
+    parser.add_argument("--clients", type=int, default=4, help="Client processes, one connection each")
+    parser.add_argument("--recipients", type=int, default=2000, help="Recipients of the campaign")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="elbitat_tracking_bench_"))
+    os.environ["DB_PATH"] = str(workdir)
+    os.environ["TRACKING_SECRET"] = "benchmark-secret"
+
+    from elbitat_agent.database import get_connection, record_email_sends, record_tracking_events, save_email_campaign
+    from elbitat_agent.agents.email_campaigns import substitution_template
+    from elbitat_agent.tracking import (
+        EventBuffer, TrackingServer, instrument_html, make_token, recipient_tracking, verify_token
+    )
+
+    quiet = contextlib.redirect_stdout(io.StringIO())
+    with quiet:
+        conn = get_connection()
+        with conn:
+            conn.executemany("INSERT INTO email_contacts (email, status) VALUES (?, 'active')",
+                             [(f"guest.{i}@agency{i}.example",) for i in range(args.recipients)])
+        contact_ids = [row[0] for row in conn.execute("SELECT id FROM email_contacts ORDER BY id")]
+        conn.close()
+        campaign_id = save_email_campaign("Tracking load", "Hi", "<p>Hi</p>")
+        baseline_campaign = save_email_campaign("Tracking baseline", "Hi", "<p>Hi</p>")
+        for campaign in (campaign_id, baseline_campaign):
+            record_email_sends(campaign, [{'contact_id': i, 'state': 'sent', 'message_id': f"m{i}"}
+                                          for i in contact_ids])
+
+    # 70% opens, 30% clicks on one of the links, spread over the recipients
+    rng = random.Random(7)
+    paths, opened, clicked = [], set(), set()
+    for _ in range(args.requests):
+        contact_id = rng.choice(contact_ids)
+        if rng.random() < 0.7:
+            paths.append(f"/o/{make_token('open', campaign_id, contact_id)}.gif")
+            opened.add(contact_id)
+        else:
+            paths.append(f"/c/{make_token('click', campaign_id, contact_id, rng.choice(LINKS))}")
+            clicked.add(contact_id)
+
+    print(f"== {args.requests} requests from {args.clients} client processes")
+    events = 500
+    started = time.perf_counter()
+    for i in range(events):
+        record_tracking_events([('open', baseline_campaign, contact_ids[i % len(contact_ids)], None, datetime.now())])
+    direct = events / (time.perf_counter() - started)
+    print(f"   one transaction per event: {direct:8.0f} events/s")
+
+    server = TrackingServer(port=0, buffer=EventBuffer(flush_interval=0.25))
+    port = int(server.url.rsplit(":", 1)[1])
+    with server:
+        chunks = [paths[i::args.clients] for i in range(args.clients)]
+        started = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=args.clients) as pool:
+            results = list(pool.map(_client, [port] * args.clients, chunks))
+        elapsed = time.perf_counter() - started
+
+        statuses = sum((r[0] for r in results), Counter())
+        latencies = sorted(latency for r in results for latency in r[1])
+        locations = [location for r in results for location in r[2]]
+        print(f"   tracking service:          {args.requests / elapsed:8.0f} requests/s  "
+              f"(p50 {latencies[len(latencies) // 2] * 1000:.2f} ms, "
+              f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.2f} ms)")
+
+        forged = make_token('open', campaign_id, contact_ids[0])[:-2] + "AA"
+        bad = _client(port, [f"/o/{forged}.gif", f"/c/{make_token('open', campaign_id, contact_ids[0])}",
+                             "/o/not-a-token.gif"])[0]
+    stats = server.buffer.stats
+    print(f"   {stats['flushes']} flushes for {stats['events']} events")
+
+    failures = []
+
+    def check(name: str, condition: bool) -> None:
+        print(f"   {'ok  ' if condition else 'FAIL'} {name}")
+        if not condition:
+            failures.append(name)
+
+    print("== checks")
+    conn = get_connection()
+    stored = conn.execute("SELECT kind, COUNT(*) FROM email_tracking_events WHERE campaign_id = ? GROUP BY kind",
+                          (campaign_id,)).fetchall()
+    opened_count, clicked_count = conn.execute(
+        "SELECT opened_count, clicked_count FROM email_campaigns WHERE id = ?", (campaign_id,)).fetchone()
+    stamped = conn.execute("SELECT COUNT(opened_at), COUNT(clicked_at) FROM email_sends WHERE campaign_id = ?",
+                           (campaign_id,)).fetchone()
+    conn.close()
+    check("all requests answered", statuses == Counter({200: sum(p.startswith('/o/') for p in paths),
+                                                        302: sum(p.startswith('/c/') for p in paths)}))
+    check("every event stored", sum(n for _, n in stored) == args.requests)
+    check("opens and clicks counted once per recipient",
+          (opened_count, clicked_count) == (len(opened | clicked), len(clicked)) == stamped)
+    check("redirects go to the signed links", set(locations) <= set(LINKS) and len(locations) == statuses[302])
+    check("forged and mismatched tokens rejected", bad == Counter({404: 3}) and server.rejected == 3)
+
+    # A personalised link: the tags are filled in before the URL is signed
+    html, tags = substitution_template(
+        '<a href="https://elbitat.com/offers?agency={{company_name|guest}}&c={{country}}">Offers</a>')
+    html, links = instrument_html(html)
+    substitutions = {tag: {'company_name': "Rossi & Figli", 'country': ''}[name] or default
+                     for tag, (name, default) in tags.items()}
+    values = recipient_tracking(campaign_id, contact_ids[0], links, base_url="https://t.example",
+                                substitutions=substitutions)
+    signed = verify_token(values['-track_click_0-'].rsplit('/', 1)[1])[3]
+    check("personalised links signed with the recipient's values",
+          signed == "https://elbitat.com/offers?agency=Rossi%20%26%20Figli&c=" and '-track_click_0-' in html)
+
+    print("\nAll checks passed" if not failures else f"\n{len(failures)} failed check(s)")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Benchmark workspace path resolution and the file save/load calls using it.
+
+Compares the memoised workspace (resolved once, subfolders created on first
+use) with resolving it on every call, which is what every save and load did
+before: a mkdir of the workspace, a touch/unlink write probe and a mkdir of
+the subfolder. The "per call" numbers are reproduced by patching
+``config.get_workspace`` to build a fresh workspace each time (the old
+``_ensure_dirs`` also re-created all six subfolders, so the real gap was a
+little larger).
+
+Runs in a scratch home folder, with the database disabled so the numbers
+are only the file side of ``save_draft_dict`` / ``load_draft``.
+
+Usage (from the repository root):
+    python benchmarks/workspace_paths.py --calls 2000
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List, Tuple
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def run(calls: int) -> List[Tuple[str, float]]:
+    """Time the operations; returns (name, seconds per call) rows."""
+    from elbitat_agent import config, file_storage
+
+    draft = {"request": {"title": "Workspace benchmark", "platforms": ["instagram"]}, "copy_by_platform": {}}
+    results = []
+
+    def timed(name: str, operation: Callable[[int], object]) -> None:
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for i in range(calls):
+                operation(i)
+        results.append((name, (time.perf_counter() - started) / calls))
+
+    timed("get_workspace_path", lambda i: config.get_workspace_path())
+    timed("save_draft_dict", lambda i: file_storage.save_draft_dict(draft, f"bench_{i % 50}.json"))
+    timed("load_draft", lambda i: file_storage.load_draft(f"bench_{i % 50}.json"))
+    timed("list_request_files", lambda i: file_storage.list_request_files())
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark workspace path resolution.")
+    parser.add_argument("--calls", type=int, default=2000, help="Calls per operation")
+    args = parser.parse_args()
+
+    home = Path(tempfile.mkdtemp(prefix="elbitat_workspace_bench_"))
+    os.environ["HOME"] = str(home)
+    os.environ.pop("ELBITAT_WORKSPACE", None)
+    os.environ["BACKUP_MODE"] = "sync"
+
+    from elbitat_agent import config, file_storage
+
+    def resolve_every_call() -> config.Workspace:
+        return config.Workspace(config._resolve_workspace_path())
+
+    with mock.patch.object(file_storage, "USE_DATABASE", False):
+        memoised = run(args.calls)
+        with mock.patch.object(config, "get_workspace", resolve_every_call):
+            per_call = run(args.calls)
+
+    print(f"{'operation':<20} {'per call':>12} {'memoised':>12} {'speed-up':>9}")
+    for (name, before), (_, after) in zip(per_call, memoised):
+        print(f"{name:<20} {before * 1e6:9.1f} us {after * 1e6:9.1f} us {before / after:8.1f}x")
+    print(f"\nWorkspace: {config.get_workspace_path()}")
+
+
+if __name__ == "__main__":
+    main()
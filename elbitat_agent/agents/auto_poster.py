@@ -4,10 +4,10 @@ from __future__ import annotations
 
 from pathlib import Path
 from typing import List, Dict
-import json
 
 from ..models import AdDraft
-from ..config import SocialMediaConfig, get_workspace_path
+from ..config import SocialMediaConfig, get_workspace_dir
+from ..backup import write_json_atomic, fsync_enabled
 
 try:
     from .instagram_poster import InstagramPoster
@@ -99,9 +99,7 @@ def auto_post_draft(draft: AdDraft, platforms: List[str] | None = None) -> Dict[
 
 def _save_posting_results(draft: AdDraft, results: Dict[str, Dict]) -> None:
     """Save posting results to the posted folder."""
-    base = get_workspace_path()
-    posted_dir = base / "posted"
-    posted_dir.mkdir(parents=True, exist_ok=True)
+    posted_dir = get_workspace_dir("posted")
     
     safe_title = draft.request.title.replace(" ", "_").lower()
     filename = f"{safe_title}.posted.json"
@@ -112,8 +110,14 @@ def _save_posting_results(draft: AdDraft, results: Dict[str, Dict]) -> None:
         "results": results,
     }
     
-    with path.open("w", encoding="utf-8") as f:
-        json.dump(payload, f, indent=2, ensure_ascii=False)
+    write_json_atomic(path, payload, indent=2, fsync=fsync_enabled())
+    
+    # Record the post for the dashboard's counters and recent activity
+    try:
+        from ..database import record_activity_event
+        record_activity_event("posted", filename, draft.request.title, results)
+    except Exception as e:
+        print(f"Could not record posting activity: {e}")
 
 
 def check_api_configuration() -> Dict[str, bool]:
@@ -0,0 +1,292 @@
+"""Resumable email campaign runs, executed by a background worker.
+
+A run snapshots a campaign's subject and template, points at their stored
+render (see ``email_campaigns.stage_campaign_render``) and stages its
+recipients in send order. The worker takes them a batch at a time, skips
+addresses on the suppression list (see ``suppression``), sends the rest
+with the configured backend (SendGrid or SMTP, see
+``email_delivery.make_batch_sender``) and checkpoints the outcomes, so a
+run can be paused and resumed - or picked up again after the process
+died - without re-sending to anyone it already reached. Failed
+recipients can be put back and retried.
+
+    run_id = create_campaign_run(campaign_id, contact_ids)
+    start_campaign_run(run_id)     # sends on a background thread
+    pause_campaign_run(run_id)     # stops once the batches in flight finish
+    start_campaign_run(run_id)     # carries on from the checkpoint
+
+Run status: pending -> running -> completed, or paused / failed (both
+resumable) / cancelled. The state lives in the database (see the campaign
+run functions in ``database``), so any process can pause a run or resume
+one whose worker died.
+
+Runs are only sent when sending is enabled (EMAIL_SENDING_ENABLED) and the
+email has an unsubscribe link; otherwise starting one raises ValueError.
+"""
+
+from __future__ import annotations
+
+import os
+import socket
+import threading
+from typing import Dict, List, Optional
+
+from .email_delivery import (
+    MAX_PERSONALIZATIONS, BatchRecipient, email_backend, make_batch_sender, sending_enabled
+)
+
+_workers: Dict[int, threading.Thread] = {}
+_workers_lock = threading.Lock()
+
+
+def create_campaign_run(campaign_id: int, contact_ids: List[int], subject: str = None,
+                        template: str = None, batch_size: int = MAX_PERSONALIZATIONS) -> Optional[int]:
+    """Stage a run of a campaign for the given contacts and return its ID.
+
+    The email is rendered and stored first, unless that exact render is
+    stored already, so the worker only fills in each recipient's values.
+
+    Args:
+        campaign_id: Database ID of the campaign
+        contact_ids: Contacts to send to, in send order
+        subject: Subject line (default: the campaign's)
+        template: Email HTML template (default: the campaign's)
+        batch_size: Recipients per checkpoint (and per SendGrid request)
+    """
+    from ..database import create_email_campaign_run, get_all_email_campaigns
+    from .email_campaigns import stage_campaign_render
+
+    if subject is None or template is None:
+        campaign = next((c for c in get_all_email_campaigns() if c['id'] == campaign_id), None)
+        if campaign is None:
+            print(f"Campaign {campaign_id} not found")
+            return None
+        subject = campaign['subject'] if subject is None else subject
+        template = campaign['template'] if template is None else template
+
+    render = stage_campaign_render(subject, template)
+    if render is None:
+        return None
+    batch_size = max(1, min(int(batch_size), MAX_PERSONALIZATIONS))
+    return create_email_campaign_run(campaign_id, contact_ids, subject, template, batch_size,
+                                     render_hash=render['content_hash'])
+
+
+def run_campaign(run_id: int, sender=None, backend: str = None) -> Optional[Dict]:
+    """Claim a run and send it on the calling thread.
+
+    Args:
+        run_id: ID of the run
+        sender: Batch sender to use (default: one for ``backend``)
+        backend: 'sendgrid' or 'smtp' (default: EMAIL_BACKEND)
+
+    Returns:
+        The run after this worker stopped, or None if it could not be claimed
+        (already running elsewhere, completed or cancelled)
+
+    Raises:
+        ValueError: If the backend is unknown or the run may not be sent
+            (see check_sendable)
+    """
+    from ..database import claim_email_campaign_run, get_email_campaign_run
+
+    backend = email_backend(backend)
+    run = get_email_campaign_run(run_id)
+    if run is not None:
+        check_sendable(_run_html(run))
+    if not claim_email_campaign_run(run_id, _worker_name()):
+        return None
+    _execute(run_id, sender, backend)
+    return get_email_campaign_run(run_id)
+
+
+def start_campaign_run(run_id: int, backend: str = None) -> bool:
+    """Claim a run (new, paused, failed or abandoned) and send it on a background thread.
+
+    Args:
+        run_id: ID of the run
+        backend: 'sendgrid' or 'smtp' (default: EMAIL_BACKEND)
+
+    Returns:
+        Whether a worker was started
+
+    Raises:
+        ValueError: If the backend is unknown or the run may not be sent
+            (see check_sendable)
+    """
+    from ..database import claim_email_campaign_run, get_email_campaign_run
+
+    backend = email_backend(backend)
+    run = get_email_campaign_run(run_id)
+    if run is not None:
+        check_sendable(_run_html(run))
+    with _workers_lock:
+        worker = _workers.get(run_id)
+        if worker is not None and worker.is_alive():
+            return False
+        if not claim_email_campaign_run(run_id, _worker_name()):
+            return False
+        worker = threading.Thread(target=_execute, args=(run_id, None, backend), name=f"campaign-run-{run_id}", daemon=True)
+        _workers[run_id] = worker
+        worker.start()
+        return True
+
+
+def check_sendable(html: str) -> None:
+    """Check that a campaign email may be sent.
+
+    Raises:
+        ValueError: If sending is disabled (EMAIL_SENDING_ENABLED) or the
+            email has no unsubscribe link
+    """
+    from .email_campaigns import has_unsubscribe_link
+
+    if not sending_enabled():
+        raise ValueError('Email sending is disabled - set EMAIL_SENDING_ENABLED = "true" to enable it')
+    if not has_unsubscribe_link(html):
+        raise ValueError("The email has no unsubscribe link - add one to the template before sending")
+
+
+def pause_campaign_run(run_id: int) -> bool:
+    """Ask a run to stop after the batches in flight; it can be resumed later."""
+    from ..database import set_email_campaign_run_status
+    return set_email_campaign_run_status(run_id, 'paused', ('pending', 'running'))
+
+
+def cancel_campaign_run(run_id: int) -> bool:
+    """Stop a run for good; its unsent recipients are not sent to."""
+    from ..database import set_email_campaign_run_status
+    return set_email_campaign_run_status(run_id, 'cancelled', ('pending', 'running', 'paused', 'failed'))
+
+
+def retry_failed_recipients(run_id: int) -> int:
+    """Put a run's failed recipients back in the queue; return how many.
+
+    A finished run becomes paused - start it again to send to them.
+    """
+    from ..database import retry_failed_email_campaign_run
+    return retry_failed_email_campaign_run(run_id)
+
+
+def is_campaign_run_active(run_id: int) -> bool:
+    """Whether this process has a live worker for the run."""
+    with _workers_lock:
+        worker = _workers.get(run_id)
+        return worker is not None and worker.is_alive()
+
+
+def wait_for_campaign_run(run_id: int, timeout: float = None) -> bool:
+    """Wait for this process's worker for the run to stop; return False on timeout."""
+    with _workers_lock:
+        worker = _workers.get(run_id)
+    if worker is not None:
+        worker.join(timeout)
+        return not worker.is_alive()
+    return True
+
+
+def _run_html(run: Dict) -> str:
+    """The HTML a run sends: its stored render, or the template as written (see _execute)."""
+    from ..database import get_email_campaign_render
+
+    render = get_email_campaign_render(run['render_hash']) if run['render_hash'] else None
+    return render['html'] if render is not None else run['template']
+
+
+def _worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.current_thread().name}"
+
+
+def _execute(run_id: int, sender=None, backend: str = None) -> None:
+    """Send a claimed run's pending recipients, checkpointing as outcomes are recorded."""
+    from ..database import (
+        EmailSendRecorder, finish_email_campaign_run, get_email_campaign_render, get_email_campaign_run,
+        get_email_contacts_by_ids, next_email_campaign_run_batch, set_email_campaign_run_status
+    )
+    from ..suppression import load_suppression_filter
+    from ..tracking import instrument_html, recipient_tracking, tracking_enabled
+    from .email_campaigns import placeholder_values, substitution_template
+
+    run = get_email_campaign_run(run_id)
+    if run is None:
+        return
+    render = get_email_campaign_render(run['render_hash']) if run['render_hash'] else None
+    if render is not None:
+        batch_subject, batch_html, tags = render['subject'], render['html'], render['tags']
+    else:
+        # Staged before renders were stored: the template as written
+        batch_subject, subject_tags = substitution_template(run['subject'])
+        batch_html, html_tags = substitution_template(run['template'])
+        tags = {**subject_tags, **html_tags}
+    # Open pixel and click links, signed per recipient (see tracking)
+    track = tracking_enabled()
+    if track:
+        batch_html, links = instrument_html(batch_html)
+    recorder = EmailSendRecorder(run['campaign_id'], run_id)
+    stop = threading.Event()
+
+    def record(outcomes: List[Dict]) -> None:
+        # The run status comes back with each flush; stop taking recipients
+        # once it was paused or cancelled
+        if recorder.add(outcomes) not in (None, 'running'):
+            stop.set()
+
+    def recipients():
+        # Runs on this thread, between sender batches
+        while not stop.is_set():
+            batch = next_email_campaign_run_batch(run_id, run['batch_size'])
+            if not batch:
+                return
+            blocked = suppressions.suppressed(r['email'] for r in batch)
+            skipped = [{'contact_id': r['contact_id'], 'state': 'skipped',
+                        'error': f"Suppressed ({blocked[r['email']]})"}
+                       for r in batch if r['email'] in blocked]
+            batch = [r for r in batch if r['email'] not in blocked]
+            contacts = {c['id']: c for c in get_email_contacts_by_ids([r['contact_id'] for r in batch])}
+            for r in batch:
+                contact = contacts.get(r['contact_id'])
+                # Deleted, or reached by another run since this one was staged
+                if contact is None or contact.get('status') == 'contacted':
+                    skipped.append({'contact_id': r['contact_id'], 'state': 'skipped'})
+                    continue
+                values = placeholder_values({**contact, 'email': r['email']})
+                substitutions = {tag: values[name] or default for tag, (name, default) in tags.items()}
+                if track:
+                    substitutions.update(recipient_tracking(run['campaign_id'], r['contact_id'], links,
+                                                            substitutions=substitutions))
+                yield BatchRecipient(contact_id=r['contact_id'], email=r['email'], substitutions=substitutions)
+            if skipped:
+                record(skipped)
+
+    try:
+        # Bounced and unsubscribed addresses, as of the start of this worker;
+        # if they cannot be read the run fails rather than mailing them
+        suppressions = load_suppression_filter()
+        sender = sender or make_batch_sender(backend, batch_size=run['batch_size'])
+        for results in sender.send(batch_subject, batch_html, recipients(),
+                                   custom_args={'campaign_id': run['campaign_id'], 'run_id': run_id}):
+            record([
+                {'contact_id': r['contact_id'], 'state': 'sent', 'message_id': r['message_id']}
+                if r['success'] else
+                {'contact_id': r['contact_id'], 'state': 'failed', 'error': r['error']}
+                for r in results
+            ])
+            failed = [r for r in results if not r['success']]
+            if not failed:
+                print(f"[run {run_id}] Sent batch of {len(results)}")
+            else:
+                print(f"[run {run_id}] Batch of {len(results)}: {len(failed)} failed ({failed[0]['error']})")
+        recorder.flush()
+    except Exception as e:
+        print(f"Campaign run {run_id} stopped: {e}")
+        # Outcomes still buffered were delivered; without them the recipients
+        # would go back to pending when the run is resumed and be sent again
+        try:
+            recorder.flush()
+        except Exception as flush_error:
+            print(f"[run {run_id}] Could not record buffered outcomes: {flush_error}")
+        set_email_campaign_run_status(run_id, 'failed', ('running',), error_message=str(e))
+        return
+
+    status = finish_email_campaign_run(run_id)
+    print(f"[run {run_id}] {status}")
@@ -0,0 +1,165 @@
+"""Conversation context compaction for long-running agent chats.
+
+Keeps the most recent turns verbatim and folds older turns into a rolling
+summary so that the prompt sent on each turn stays within a token budget
+instead of growing with the length of the conversation.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+# (previous_summary, turns_to_fold) -> new_summary
+Summarizer = Callable[[str, List[Dict[str, str]]], str]
+
+# Per-message overhead of the chat format (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+_encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """Count tokens locally.
+
+    Uses tiktoken when it is installed, otherwise a ~4 characters per token
+    estimate, which is close enough for budgeting English prompts.
+    """
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text))
+    return len(text) // 4 + 1
+
+
+def count_message_tokens(messages: List[Dict[str, str]]) -> int:
+    """Count tokens for a list of chat messages."""
+    return sum(count_tokens(m.get("content", "")) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+
+def extractive_summary(previous_summary: str, turns: List[Dict[str, str]], max_chars: int = 300) -> str:
+    """Local summarizer: keep the first sentence or so of every folded turn."""
+    lines = [previous_summary] if previous_summary else []
+    for turn in turns:
+        speaker = "User" if turn.get("role") == "user" else "Strategist"
+        text = " ".join(turn.get("content", "").split())
+        first = text.split(". ")[0]
+        if len(first) > max_chars:
+            first = first[:max_chars].rstrip() + "..."
+        lines.append(f"- {speaker}: {first}")
+    return "\n".join(lines)
+
+
+@dataclass
+class ConversationContext:
+    """Rolling-summary context for one conversation.
+
+    Store one instance per conversation (e.g. in ``st.session_state``) so
+    older turns are summarised once and the summary is reused on later
+    turns.
+
+    Attributes:
+        token_budget: Maximum prompt tokens (system prompt included)
+        keep_recent: Number of most recent turns always sent verbatim
+        summary: Rolling summary of the turns folded so far
+        summarized_turns: How many leading turns the summary covers
+    """
+
+    token_budget: int = 3000
+    keep_recent: int = 6
+    summary: str = ""
+    summarized_turns: int = 0
+
+    def reset(self) -> None:
+        self.summary = ""
+        self.summarized_turns = 0
+
+    def build_messages(
+        self,
+        system_prompt: str,
+        history: List[Dict[str, str]],
+        trailing: Optional[List[Dict[str, str]]] = None,
+        summarize: Optional[Summarizer] = None,
+    ) -> List[Dict[str, str]]:
+        """Return the messages to send, compacted to fit ``token_budget``.
+
+        Args:
+            system_prompt: The agent's system prompt
+            history: Full conversation so far (role/content dicts)
+            trailing: Messages appended after the history (new user message,
+                final instruction); always sent verbatim
+            summarize: Summarizer for folded turns (defaults to
+                ``extractive_summary``)
+
+        Returns:
+            List of chat messages for the API call
+        """
+        summarize = summarize or extractive_summary
+        trailing = trailing or []
+        system = {"role": "system", "content": system_prompt}
+
+        # A shorter history means the conversation was restarted
+        if len(history) < self.summarized_turns:
+            self.reset()
+
+        # Nothing summarised yet and everything fits: send verbatim
+        full = [system, *history, *trailing]
+        if not self.summarized_turns and count_message_tokens(full) <= self.token_budget:
+            return full
+
+        # Fold older turns in batches (the verbatim window grows up to twice
+        # keep_recent) so the summarizer runs every few turns, not every turn
+        if len(history) - self.summarized_turns > 2 * self.keep_recent:
+            self._fold(history, len(history) - self.keep_recent, summarize)
+
+        fixed_tokens = count_message_tokens([system, *trailing])
+        recent = list(history[self.summarized_turns:])
+
+        # Still over budget: fold more of the recent turns (keep at least one)
+        drop = 0
+        while len(recent) - drop > 1 and fixed_tokens + self._summary_tokens() + count_message_tokens(recent[drop:]) > self.token_budget:
+            drop += 1
+        if drop:
+            self._fold(history, self.summarized_turns + drop, summarize)
+            recent = recent[drop:]
+
+        messages = [system]
+        summary_message = self._summary_message(self.token_budget - fixed_tokens - count_message_tokens(recent))
+        if summary_message:
+            messages.append(summary_message)
+        messages.extend(recent)
+        messages.extend(trailing)
+        return messages
+
+    def _fold(self, history: List[Dict[str, str]], until: int, summarize: Summarizer) -> None:
+        if until <= self.summarized_turns:
+            return
+        turns = history[self.summarized_turns:until]
+        try:
+            self.summary = summarize(self.summary, turns)
+        except Exception as e:
+            print(f"⚠️ Error summarizing conversation, using extractive summary: {e}")
+            self.summary = extractive_summary(self.summary, turns)
+        self.summarized_turns = until
+
+    def _summary_tokens(self, summary: Optional[str] = None) -> int:
+        summary = self.summary if summary is None else summary
+        if not summary:
+            return 0
+        return count_tokens(SUMMARY_PREFIX + summary) + MESSAGE_OVERHEAD_TOKENS
+
+    def _summary_message(self, available_tokens: int) -> Optional[Dict[str, str]]:
+        summary = self.summary
+        # Trim the oldest part of the summary if it alone exceeds the budget
+        while summary and self._summary_tokens(summary) > available_tokens:
+            summary = summary[len(summary) // 4 + 1:]
+        if not summary:
+            return None
+        return {"role": "system", "content": SUMMARY_PREFIX + summary}
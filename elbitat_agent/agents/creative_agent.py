@@ -1,37 +1,28 @@
 from __future__ import annotations
 
-import os
-from typing import Dict
+import json
+import re
+from typing import Dict, List, Optional
 
 from ..models import AdRequest, AdDraft
 from ..media_selector import select_images_for_ad, copy_selected_images_to_workspace
 
+# Fields generated for each supported platform (see AdDraft.copy_by_platform)
+PLATFORM_FIELDS: Dict[str, List[str]] = {
+    "instagram": ["caption", "hashtags"],
+    "facebook": ["message"],
+    "tiktok": ["caption", "script"],
+}
+
 
 def generate_ai_content(request: AdRequest) -> Dict[str, Dict[str, str]]:
     """Generate creative content using OpenAI."""
     try:
-        from openai import OpenAI
-        
-        # Try to get API key from Streamlit secrets first, then environment
-        api_key = None
-        try:
-            import streamlit as st
-            if hasattr(st, 'secrets') and 'OPENAI_API_KEY' in st.secrets:
-                api_key = st.secrets["OPENAI_API_KEY"]
-        except:
-            pass
-        
-        if not api_key:
-            api_key = os.getenv("OPENAI_API_KEY")
-        
-        if not api_key:
-            raise ValueError("OPENAI_API_KEY not found in secrets or environment variables")
-        
-        print(f"✅ Using OpenAI API (key starts with: {api_key[:15]}...)")
-        client = OpenAI(api_key=api_key)
+        from ..openai_client import chat_completion
         
         # Build prompt based on platforms
-        platforms_str = ", ".join(request.platforms)
+        platforms = [p for p in request.platforms if p in PLATFORM_FIELDS]
+        platforms_str = ", ".join(platforms)
         
         prompt = f"""You are a professional social media content creator for Elbitat, a luxury hotel on Elba Island, Italy.
 
@@ -44,27 +35,34 @@ Create engaging social media content for the following campaign:
 **Language:** {request.language}
 **Brief:** {request.brief}
 
-Generate platform-specific content with the following format:
+Generate platform-specific content for each platform listed above:
 
 For Instagram:
-- Caption: Engaging caption (2-3 sentences, include emojis, conversational tone)
-- Hashtags: 8-12 relevant hashtags (including #Elbitat #ElbaIsland)
+- caption: Engaging caption (2-3 sentences, include emojis, conversational tone)
+- hashtags: 8-12 relevant hashtags (including #Elbitat #ElbaIsland)
 
 For Facebook:
-- Message: Detailed post (3-4 sentences, more informative)
+- message: Detailed post (3-4 sentences, more informative)
 
 For TikTok:
-- Caption: Short catchy caption
-- Script: Brief video script outline (3-4 scenes)
+- caption: Short catchy caption
+- script: Brief video script outline (3-4 scenes)
+
+Respond with a single JSON object keyed by platform name, e.g.
+{{"instagram": {{"caption": "...", "hashtags": "..."}}, "facebook": {{"message": "..."}}}}
 
 Make the content compelling, authentic, and aligned with the campaign goal of "{request.goal}"."""
 
-        response = client.chat.completions.create(
+        response = chat_completion(
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": "You are a creative social media content writer for a luxury Italian hotel. Write engaging, authentic content that drives bookings and engagement."},
                 {"role": "user", "content": prompt}
             ],
+            response_format={
+                "type": "json_schema",
+                "json_schema": build_content_schema(platforms),
+            },
             temperature=0.8,
             max_tokens=1000
         )
@@ -73,19 +71,9 @@ Make the content compelling, authentic, and aligned with the campaign goal of "{
         print(f"📝 AI Generated Content:\n{ai_content[:200]}...\n")
         
         # Parse the AI response into structured format
-        copy: Dict[str, Dict[str, str]] = {}
-        
-        if "instagram" in request.platforms:
-            copy["instagram"] = parse_instagram_content(ai_content, request)
-            print(f"✅ Instagram parsed: {copy['instagram']['caption'][:50]}...")
-        
-        if "facebook" in request.platforms:
-            copy["facebook"] = parse_facebook_content(ai_content, request)
-            print(f"✅ Facebook parsed: {copy['facebook']['message'][:50]}...")
-        
-        if "tiktok" in request.platforms:
-            copy["tiktok"] = parse_tiktok_content(ai_content, request)
-            print(f"✅ TikTok parsed: {copy['tiktok']['caption'][:30]}...")
+        copy = parse_ai_content(ai_content, request)
+        for platform, fields in copy.items():
+            print(f"✅ {platform.capitalize()} parsed: {next(iter(fields.values()))[:50]}...")
         
         return copy
         
@@ -102,207 +90,193 @@ Make the content compelling, authentic, and aligned with the campaign goal of "{
         return generate_placeholder_content(request)
 
 
-def parse_instagram_content(ai_content: str, request: AdRequest) -> Dict[str, str]:
-    """Parse Instagram content from AI response."""
-    lines = ai_content.split('\n')
-    caption = ""
-    hashtags = ""
-    
-    # Find Instagram section (flexible matching)
-    ig_start = -1
-    for i, line in enumerate(lines):
-        if 'instagram' in line.lower() and (line.startswith('##') or line.startswith('**') or ':' in line):
-            ig_start = i
-            break
-    
-    if ig_start >= 0:
-        # Extract caption and hashtags
-        in_caption = False
-        in_hashtags = False
-        
-        for j in range(ig_start + 1, len(lines)):
-            line = lines[j].strip()
-            
-            # Stop at divider or next platform
-            if line.startswith('---') or (line.startswith('###') and any(p in line.lower() for p in ['facebook', 'tiktok'])):
-                break
-            
-            # Check for caption marker
-            if '**caption' in line.lower() and ':' in line:
-                in_caption = True
-                in_hashtags = False
-                # Check if caption is on the same line
-                text = line.split(':', 1)[1].strip()
-                if text and not text.startswith('**'):
-                    caption = text
-                    in_caption = False
-                continue
-            
-            # Check for hashtags marker
-            if '**hashtag' in line.lower() and ':' in line:
-                in_caption = False
-                in_hashtags = True
-                # Check if hashtags are on the same line
-                text = line.split(':', 1)[1].strip()
-                if text and text.startswith('#'):
-                    hashtags = text
-                    in_hashtags = False
+def build_content_schema(platforms: List[str]) -> Dict:
+    """Build the JSON schema the model must follow for the given platforms."""
+    properties = {
+        platform: {
+            "type": "object",
+            "properties": {name: {"type": "string"} for name in PLATFORM_FIELDS[platform]},
+            "required": list(PLATFORM_FIELDS[platform]),
+            "additionalProperties": False,
+        }
+        for platform in platforms
+    }
+    return {
+        "name": "social_media_copy",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": properties,
+            "required": list(properties),
+            "additionalProperties": False,
+        },
+    }
+
+
+def parse_ai_content(ai_content: str, request: AdRequest) -> Dict[str, Dict[str, str]]:
+    """Parse the AI response once into ``copy_by_platform``.
+
+    The response is expected to be JSON matching ``build_content_schema``.
+    If it is not (e.g. a model without structured output support), the text
+    is scanned once with ``_scan_platform_sections`` instead. Missing or too
+    short fields are filled with fallbacks derived from the request.
+    """
+    sections = _load_json_content(ai_content)
+    if sections is None:
+        print("⚠️ AI response is not valid JSON, using fallback text parser")
+        sections = _scan_platform_sections(ai_content)
+
+    copy: Dict[str, Dict[str, str]] = {}
+    for platform in request.platforms:
+        if platform not in PLATFORM_FIELDS:
+            continue
+        fields = sections.get(platform)
+        if not isinstance(fields, dict):
+            fields = {}
+        fields = {name: _as_text(fields.get(name)) for name in PLATFORM_FIELDS[platform]}
+        copy[platform] = _FINALIZERS[platform](fields, request)
+    return copy
+
+
+def _as_text(value) -> str:
+    """Coerce a JSON field value (string, list of strings or null) to text."""
+    if isinstance(value, list):
+        separator = " " if all(str(v).startswith("#") for v in value) else "\n"
+        return separator.join(str(v).strip() for v in value).strip()
+    return str(value or "").strip()
+
+
+def _load_json_content(ai_content: str) -> Optional[Dict]:
+    """Return the JSON object in the AI response, or None if there is none."""
+    text = ai_content.strip()
+    # Tolerate markdown code fences around the JSON
+    if text.startswith("```"):
+        text = text.strip("`")
+        if text.lower().startswith("json"):
+            text = text[4:]
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    return {str(key).lower(): value for key, value in data.items()}
+
+
+_PLATFORM_HEADER = re.compile(
+    r"^(?:#{1,6}\s+|\*\*|__)?\s*(?:for\s+)?(instagram|facebook|tiktok)\b[^:]*:?\s*(?:\*\*|__)?\s*:?$",
+    re.IGNORECASE,
+)
+_FIELD_MARKER = re.compile(
+    r"^(?:[-*]\s+)?(?:\*\*|__)?\s*(caption|hashtags?|message|script(?:\s+outline)?)\s*(?:\*\*|__)?\s*:\s*(?:\*\*|__)?\s*(.*)$",
+    re.IGNORECASE,
+)
+
+
+def _scan_platform_sections(ai_content: str) -> Dict[str, Dict[str, str]]:
+    """Single-pass fallback parser for free-form (markdown) AI responses.
+
+    Walks the lines once, tracking the current platform section and field,
+    and collects the text under each ``Caption:``/``Hashtags:``/``Message:``/
+    ``Script:`` marker.
+    """
+    sections: Dict[str, Dict[str, List[str]]] = {}
+    platform: Optional[str] = None
+    field_name: Optional[str] = None
+
+    for raw_line in ai_content.splitlines():
+        line = raw_line.strip()
+
+        if line.startswith("---"):
+            platform = field_name = None
+            continue
+
+        header = _PLATFORM_HEADER.match(line)
+        if header:
+            platform = header.group(1).lower()
+            field_name = None
+            continue
+
+        if platform is None:
+            continue
+
+        marker = _FIELD_MARKER.match(line)
+        if marker:
+            field_name = marker.group(1).lower().split()[0]
+            if field_name == "hashtag":
+                field_name = "hashtags"
+            if field_name not in PLATFORM_FIELDS[platform]:
+                field_name = None
                 continue
-            
-            # Collect caption from next line(s) if not yet captured
-            if in_caption and line and not caption:
-                if not line.startswith('**') and not line.startswith('#'):
-                    caption = line
-                    in_caption = False
-            
-            # Collect hashtags from next line if not yet captured
-            if in_hashtags and line:
-                if line.startswith('#'):
-                    hashtags = line
-                    break
-    
+            sections.setdefault(platform, {}).setdefault(field_name, [])
+            text = marker.group(2).strip()
+            if text:
+                sections[platform][field_name].append(text)
+            continue
+
+        if field_name and line and not line.startswith("###"):
+            sections[platform][field_name].append(line)
+
+    return {
+        platform: {name: "\n".join(lines) for name, lines in fields.items()}
+        for platform, fields in sections.items()
+    }
+
+
+def _finalize_instagram(fields: Dict[str, str], request: AdRequest) -> Dict[str, str]:
+    caption = fields["caption"].replace("**", "").strip()
+    hashtags = fields["hashtags"]
+
     # If hashtags weren't found separately, try to extract from caption
-    if not hashtags and caption and '#' in caption:
-        # Split caption and hashtags
-        parts = caption.split('#', 1)
-        if len(parts) == 2:
-            caption = parts[0].strip()
-            hashtags = '#' + parts[1]
-    
+    if not hashtags and "#" in caption:
+        caption, _, tags = caption.partition("#")
+        caption = caption.strip()
+        hashtags = "#" + tags
+
     # Fallbacks
     if not caption or len(caption) < 20:
         caption = f"✨ {request.title} ✨\n\n{request.brief[:150] if len(request.brief) > 150 else request.brief}"
-    
+
     if not hashtags:
         hashtags = "#Elbitat #ElbaIsland #ItalyTravel #WellnessRetreat"
     else:
         # Clean up hashtags
-        hashtags = hashtags.replace('*', '').replace('###', '').strip()
-    
+        hashtags = " ".join(hashtags.replace("*", "").split())
+
     return {"caption": caption, "hashtags": hashtags}
 
 
-def parse_facebook_content(ai_content: str, request: AdRequest) -> Dict[str, str]:
-    """Parse Facebook content from AI response."""
-    lines = ai_content.split('\n')
-    message = ""
-    
-    # Find Facebook section
-    fb_start = -1
-    for i, line in enumerate(lines):
-        if 'facebook' in line.lower():
-            fb_start = i
-            break
-    
-    if fb_start >= 0:
-        # Extract message
-        in_message = False
-        
-        for j in range(fb_start + 1, len(lines)):
-            line = lines[j].strip()
-            
-            # Stop at divider or next platform
-            if line.startswith('---') or (line.startswith('###') and 'tiktok' in line.lower()):
-                break
-            
-            # Check for message marker
-            if '**message' in line.lower() and ':' in line:
-                in_message = True
-                # Check if message is on the same line
-                text = line.split(':', 1)[1].strip()
-                if text and not text.startswith('**'):
-                    message = text
-                    break
-                continue
-            
-            # Collect message from next line if not yet captured
-            if in_message and line and not message:
-                if not line.startswith('**') and not line.startswith('###') and not line.startswith('#'):
-                    message = line
-                    break
-    
+def _finalize_facebook(fields: Dict[str, str], request: AdRequest) -> Dict[str, str]:
+    message = fields["message"].replace("**", "").strip()
+
     # Fallback
     if not message or len(message) < 20:
         message = f"{request.title}\n\n{request.brief}\n\nDiscover the perfect blend of luxury and wellness at Elbitat Hotel on Elba Island. Book your transformative retreat today!"
-    
+
     return {"message": message}
 
 
-def parse_tiktok_content(ai_content: str, request: AdRequest) -> Dict[str, str]:
-    """Parse TikTok content from AI response."""
-    lines = ai_content.split('\n')
-    caption = ""
-    script = ""
-    
-    # Find TikTok section (flexible matching)
-    tt_start = -1
-    for i, line in enumerate(lines):
-        if 'tiktok' in line.lower() and (line.startswith('##') or line.startswith('**') or ':' in line):
-            tt_start = i
-            break
-    
-    if tt_start >= 0:
-        script_lines = []
-        in_caption = False
-        in_script = False
-        
-        for j in range(tt_start + 1, len(lines)):
-            line = lines[j].strip()
-            
-            # Stop at divider
-            if line.startswith('---'):
-                break
-            
-            # Skip empty lines unless collecting script
-            if not line and not in_script:
-                continue
-            
-            # Check for caption marker
-            if '**caption' in line.lower() and ':' in line:
-                in_caption = True
-                in_script = False
-                # Check if caption is on same line
-                text = line.split(':', 1)[1].strip().replace('**', '').strip()
-                if text:  # Only if there's actual content, not just markdown
-                    caption = text
-                    in_caption = False
-                continue
-            
-            # Collect caption from next line if not yet captured
-            if in_caption and line and not caption:
-                caption = line.replace('**', '').strip()
-                in_caption = False
-                continue
-            
-            # Check for script marker
-            if ('**script' in line.lower() or 'script outline' in line.lower()) and ':' in line:
-                in_caption = False
-                in_script = True
-                # Check if script text on same line
-                text = line.split(':', 1)[1].strip()
-                if text:
-                    script_lines.append(text)
-                continue
-            
-            # Collect script lines
-            if in_script and line:
-                # Skip ### headers but keep content
-                if not line.startswith('###'):
-                    script_lines.append(line)
-        
-        if script_lines:
-            script = '\n'.join(script_lines)
-    
+def _finalize_tiktok(fields: Dict[str, str], request: AdRequest) -> Dict[str, str]:
+    caption = fields["caption"].replace("**", "").strip()
+    script = fields["script"]
+
     # Fallbacks
     if not caption or len(caption) < 10:
         caption = f"{request.title} 🏖️✨ #Elbitat #ElbaIsland"
-    
+
     if not script or len(script) < 20:
         script = f"Scene 1: Stunning aerial view of Elbitat Hotel on Elba Island\nScene 2: {request.brief[:80]}\nScene 3: Close-up of luxury amenities\nScene 4: Call to action - Book your stay today!"
-    
+
     return {"caption": caption, "script": script}
 
 
+_FINALIZERS = {
+    "instagram": _finalize_instagram,
+    "facebook": _finalize_facebook,
+    "tiktok": _finalize_tiktok,
+}
+
+
 def generate_placeholder_content(request: AdRequest) -> Dict[str, Dict[str, str]]:
     """Generate simple placeholder content when OpenAI is not available."""
     copy: Dict[str, Dict[str, str]] = {}
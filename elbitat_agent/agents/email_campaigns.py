@@ -1,10 +1,59 @@
-"""Email campaign management and sending with SendGrid integration."""
+"""Email campaign management and sending with SendGrid (or SMTP) integration."""
 
-import os
+import hashlib
 import re
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
-import streamlit as st
+
+from ..config import get_secret
+
+
+# Placeholders filled in per contact
+PLACEHOLDERS = ('email', 'company_name', 'website', 'first_name', 'country')
+_PLACEHOLDER_SET = frozenset(PLACEHOLDERS)
+
+# Sample recipient for previews
+PREVIEW_CONTACT = {
+    'company_name': 'Acme Corp',
+    'first_name': 'John',
+    'email': 'john@acme.com',
+    'website': 'https://acme.com',
+    'country': 'Denmark'
+}
+
+# Bump when campaign_html or the render format changes, so campaigns are re-rendered
+RENDER_VERSION = 1
+
+# Web and mailto links with their text, to find an unsubscribe link
+_LINK_WITH_TEXT = re.compile(r'''<a\b[^>]*?\bhref\s*=\s*(["'])((?:https?://|mailto:)[^"']+)\1[^>]*>(.*?)</a\s*>''',
+                             re.IGNORECASE | re.DOTALL)
+
+
+def placeholder_values(contact: Dict) -> Dict[str, str]:
+    """Return the value of each placeholder for a contact."""
+    # Extract first name from email if not provided
+    first_name = contact.get('first_name', '')
+    if not first_name and contact.get('email'):
+        first_name = contact['email'].split('@')[0].split('.')[0].capitalize()
+    
+    return {
+        'email': contact.get('email', ''),
+        'company_name': contact.get('company_name', ''),
+        'website': contact.get('website', ''),
+        'first_name': first_name,
+        'country': contact.get('country', ''),
+    }
+
+
+def compiled_template(template: str):
+    """Compile a template against the contact placeholders (cached by source)."""
+    from .email_templates import compile_template
+    return compile_template(template, _PLACEHOLDER_SET)
+
+
+def template_problems(template: str) -> List[str]:
+    """Describe placeholders in a template that will not be filled in (empty if none)."""
+    return compiled_template(template).problems
 
 
 def personalize_email(template: str, contact: Dict) -> str:
@@ -13,6 +62,9 @@ def personalize_email(template: str, contact: Dict) -> str:
     Supported placeholders:
         {{email}}, {{company_name}}, {{website}}, {{first_name}}, {{country}}
     
+    A placeholder may give a fallback for contacts without that value,
+    e.g. ``{{first_name|there}}``.
+    
     Args:
         template: Email template with placeholders
         contact: Contact dictionary with data
@@ -20,26 +72,90 @@ def personalize_email(template: str, contact: Dict) -> str:
     Returns:
         Personalized email text
     """
-    personalized = template
+    return compiled_template(template).render(placeholder_values(contact))
+
+
+def substitution_template(template: str) -> Tuple[str, Dict[str, Tuple[str, str]]]:
+    """Turn ``{{name}}`` placeholders into SendGrid substitution tags (``-name-``).
     
-    # Extract first name from email if not provided
-    first_name = contact.get('first_name', '')
-    if not first_name and contact.get('email'):
-        first_name = contact['email'].split('@')[0].split('.')[0].capitalize()
+    Returns:
+        (template with tags, {tag: (placeholder name, fallback)})
+    """
+    return compiled_template(template).tagged()
+
+
+def campaign_html(template: str) -> str:
+    """The HTML sent for a campaign template.
+    
+    Content fragments (like the default templates) are wrapped in the
+    Elbitat layout; complete HTML documents are sent as written.
+    """
+    if re.search(r'<html[\s>]', template, re.IGNORECASE):
+        return template
+    return create_html_template(template, include_unsubscribe=False)
+
+
+def has_unsubscribe_link(html: str) -> bool:
+    """Whether an email body has a working unsubscribe link.
+    
+    A web or mailto link counts if "unsubscribe" appears in its address or
+    text; an unfilled ``{{unsubscribe_url}}`` placeholder does not.
+    """
+    return any('unsubscribe' in (href + text).lower() for _, href, text in _LINK_WITH_TEXT.findall(html))
+
+
+def render_campaign(subject: str, template: str) -> Dict:
+    """Render a campaign's email once, for previews and sending.
     
-    # Replace all placeholders
-    replacements = {
-        '{{email}}': contact.get('email', ''),
-        '{{company_name}}': contact.get('company_name', ''),
-        '{{website}}': contact.get('website', ''),
-        '{{first_name}}': first_name,
-        '{{country}}': contact.get('country', ''),
+    Returns:
+        Dictionary with 'content_hash' (of the subject and final HTML),
+        'subject' and 'html' with substitution tags, 'tags' ({tag:
+        (placeholder name, fallback)}), 'preview_subject' and 'preview_html'
+        (filled in for PREVIEW_CONTACT) and 'problems' (see template_problems)
+    """
+    html = campaign_html(template)
+    content = f"{RENDER_VERSION}\0{subject}\0{html}".encode('utf-8')
+    tagged_subject, subject_tags = substitution_template(subject)
+    tagged_html, html_tags = substitution_template(html)
+    return {
+        'content_hash': hashlib.sha256(content).hexdigest(),
+        'subject': tagged_subject,
+        'html': tagged_html,
+        'tags': {**subject_tags, **html_tags},
+        'preview_subject': personalize_email(subject, PREVIEW_CONTACT),
+        'preview_html': personalize_email(html, PREVIEW_CONTACT),
+        'problems': template_problems(subject) + template_problems(template),
     }
+
+
+def stage_campaign_render(subject: str, template: str, campaign_id: int = None) -> Optional[Dict]:
+    """Render a campaign's email and store it (a no-op if that exact render is stored).
+    
+    Args:
+        subject: Email subject line
+        template: Email HTML template
+        campaign_id: Campaign to point at the render, if any
     
-    for placeholder, value in replacements.items():
-        personalized = personalized.replace(placeholder, value)
+    Returns:
+        The render (see render_campaign), or None if it could not be stored
+    """
+    from ..database import save_email_campaign_render
+    
+    render = render_campaign(subject, template)
+    if not save_email_campaign_render(render, campaign_id):
+        return None
+    return render
+
+
+def campaign_render(campaign: Dict) -> Optional[Dict]:
+    """The stored render of a campaign, staging it first if it has none."""
+    from ..database import get_email_campaign_render
     
-    return personalized
+    if campaign.get('render_hash'):
+        render = get_email_campaign_render(campaign['render_hash'])
+        if render is not None:
+            return render
+    return stage_campaign_render(campaign['subject'], campaign['template'], campaign['id'])
 
 
 def send_email_sendgrid(to_email: str, subject: str, html_content: str, 
@@ -57,7 +173,8 @@ def send_email_sendgrid(to_email: str, subject: str, html_content: str,
     """
     try:
         # Check if SendGrid is configured
-        if not hasattr(st, 'secrets') or 'SENDGRID_API_KEY' not in st.secrets:
+        api_key = get_secret('SENDGRID_API_KEY')
+        if not api_key:
             return {
                 'success': False,
                 'error': 'SendGrid API key not configured in secrets'
@@ -67,11 +184,9 @@ def send_email_sendgrid(to_email: str, subject: str, html_content: str,
         from sendgrid import SendGridAPIClient
         from sendgrid.helpers.mail import Mail, Email, To, Content
         
-        api_key = st.secrets['SENDGRID_API_KEY']
-        
         # Use configured sender email or default
         if not from_email:
-            from_email = st.secrets.get('SENDGRID_FROM_EMAIL', 'noreply@elbitat.com')
+            from_email = get_secret('SENDGRID_FROM_EMAIL', 'noreply@elbitat.com')
         
         # Create email message
         message = Mail(
@@ -98,6 +213,38 @@ def send_email_sendgrid(to_email: str, subject: str, html_content: str,
         }
 
 
+def send_email_smtp(to_email: str, subject: str, html_content: str,
+                    from_email: str = None) -> Dict[str, any]:
+    """Send an email through the configured SMTP relay (see smtp_delivery).
+    
+    Returns:
+        Dictionary like ``send_email_sendgrid``'s: 'success', 'status_code',
+        'message_id', and 'error' if failed
+    """
+    from .email_delivery import BatchRecipient
+    from .smtp_delivery import SMTPBatchSender
+    
+    try:
+        sender = SMTPBatchSender(from_email=from_email, max_connections=1)
+        result = sender.send_batch(subject, html_content, [BatchRecipient(contact_id=0, email=to_email)])[0]
+    except Exception as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }
+    return {key: result[key] for key in ('success', 'status_code', 'message_id', 'error')}
+
+
+def send_email(to_email: str, subject: str, html_content: str,
+               from_email: str = None, backend: str = None) -> Dict[str, any]:
+    """Send an email with a delivery backend ('sendgrid' or 'smtp', default EMAIL_BACKEND)."""
+    from .email_delivery import email_backend
+    
+    if email_backend(backend) == 'smtp':
+        return send_email_smtp(to_email, subject, html_content, from_email)
+    return send_email_sendgrid(to_email, subject, html_content, from_email)
+
+
 def send_test_email(template: str, subject: str, test_email: str) -> Dict[str, any]:
     """Send a test email with dummy data to verify template.
     
@@ -118,73 +265,51 @@ def send_test_email(template: str, subject: str, test_email: str) -> Dict[str, a
         'country': 'Denmark'
     }
     
-    # Personalize template
-    personalized_content = personalize_email(template, test_contact)
+    # Personalize template (in the layout recipients get)
+    personalized_content = personalize_email(campaign_html(template), test_contact)
     
     # Send email
-    return send_email_sendgrid(test_email, subject, personalized_content)
+    return send_email(test_email, subject, personalized_content)
 
 
 def send_campaign(campaign_id: int, contact_ids: List[int], 
-                 subject: str, template: str, batch_size: int = 50) -> Dict[str, int]:
+                 subject: str, template: str, batch_size: int = 1000,
+                 backend: str = None) -> Dict[str, int]:
     """Send email campaign to multiple contacts.
     
+    The send is staged as a campaign run (see campaign_runs) and executed
+    on the calling thread, so if it is interrupted it can be resumed with
+    ``start_campaign_run`` without re-sending. With SendGrid, recipients
+    are sent in batched requests (see email_delivery) and the placeholders
+    filled in by SendGrid substitutions; with SMTP, over persistent
+    connections to the relay (see smtp_delivery).
+    
     Args:
         campaign_id: Database ID of the campaign
         contact_ids: List of contact IDs to send to
         subject: Email subject line
         template: Email HTML template
-        batch_size: Number of emails to send before pausing (rate limiting)
+        batch_size: Recipients per SendGrid request (at most 1000)
+        backend: 'sendgrid' or 'smtp' (default: EMAIL_BACKEND)
     
     Returns:
         Statistics dictionary with sent, failed, and skipped counts
+    
+    Raises:
+        ValueError: If the backend is unknown, sending is disabled or the
+            email has no unsubscribe link (see campaign_runs.check_sendable)
     """
-    from .database import get_all_email_contacts, record_email_send, update_email_contact_status
+    from .campaign_runs import check_sendable, create_campaign_run, run_campaign
+    from .email_delivery import email_backend
     
     stats = {'sent': 0, 'failed': 0, 'skipped': 0}
+    backend = email_backend(backend)
+    check_sendable(campaign_html(template))
     
-    # Get all contacts
-    all_contacts = get_all_email_contacts()
-    contacts_to_send = [c for c in all_contacts if c['id'] in contact_ids]
-    
-    for i, contact in enumerate(contacts_to_send, 1):
-        try:
-            # Skip if already contacted
-            if contact.get('status') == 'contacted':
-                stats['skipped'] += 1
-                continue
-            
-            # Personalize email
-            personalized_content = personalize_email(template, contact)
-            personalized_subject = personalize_email(subject, contact)
-            
-            # Send email
-            result = send_email_sendgrid(
-                to_email=contact['email'],
-                subject=personalized_subject,
-                html_content=personalized_content
-            )
-            
-            if result.get('success'):
-                # Record successful send
-                record_email_send(campaign_id, contact['id'], status='sent')
-                update_email_contact_status(contact['id'], 'contacted')
-                stats['sent'] += 1
-                print(f"[{i}/{len(contacts_to_send)}] Sent to {contact['email']}")
-            else:
-                # Record failed send
-                record_email_send(campaign_id, contact['id'], status='failed')
-                stats['failed'] += 1
-                print(f"[{i}/{len(contacts_to_send)}] Failed: {result.get('error')}")
-            
-            # Rate limiting: pause every batch_size emails
-            if i % batch_size == 0:
-                import time
-                time.sleep(2)  # 2 second pause between batches
-                
-        except Exception as e:
-            print(f"Error sending to {contact.get('email')}: {e}")
-            stats['failed'] += 1
+    run_id = create_campaign_run(campaign_id, contact_ids, subject, template, batch_size=batch_size)
+    run = run_campaign(run_id, backend=backend) if run_id is not None else None
+    if run:
+        stats = {key: run[key] for key in stats}
     
     return stats
 
@@ -285,23 +410,7 @@ def generate_ai_email_content(
         Dictionary with 'subject' and 'body' keys containing generated content
     """
     try:
-        from openai import OpenAI
-
-        # Try to get API key from Streamlit secrets first, then environment
-        api_key = None
-        try:
-            if hasattr(st, 'secrets') and 'OPENAI_API_KEY' in st.secrets:
-                api_key = st.secrets["OPENAI_API_KEY"]
-        except:
-            pass
-
-        if not api_key:
-            api_key = os.getenv("OPENAI_API_KEY")
-
-        if not api_key:
-            raise ValueError("OPENAI_API_KEY not found in secrets or environment variables")
-
-        client = OpenAI(api_key=api_key)
+        from ..openai_client import chat_completion
 
         # Build the prompt
         key_points_text = "\n".join([f"- {point}" for point in key_points])
@@ -340,7 +449,7 @@ BODY:
 
 Make the email compelling and action-oriented while maintaining authenticity and professionalism."""
 
-        response = client.chat.completions.create(
+        response = chat_completion(
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": "You are an expert email marketing copywriter specializing in luxury wellness and hospitality."},
@@ -0,0 +1,263 @@
+"""Batched email delivery through the SendGrid v3 mail/send API.
+
+Instead of one API request per recipient, recipients are grouped into
+requests of up to 1000 personalizations (SendGrid's limit). The subject and
+body are sent once per request with substitution tags (``-first_name-``);
+each personalization carries that recipient's values. Requests go out
+concurrently on a small thread pool under a requests-per-second limit.
+A request is retried with backoff (honouring ``Retry-After``) only when
+SendGrid cannot have accepted it: after a 429, or when the connection failed
+before the request was sent. A 5xx response or a connection lost while
+waiting for the response leaves the batch's delivery unknown - it is
+reported as failed with a "Delivery unknown" error instead of being sent
+again, so an operator can check SendGrid's activity before retrying.
+
+SendGrid accepts or rejects a request as a whole, so every recipient of a
+batch gets the batch's outcome and its ``X-Message-Id``. Each
+personalization also carries ``custom_args`` (e.g. the contact ID) so
+SendGrid's event webhooks can be mapped back to recipients.
+
+Settings (Streamlit secrets, or upper-cased environment variables):
+    SENDGRID_API_KEY, SENDGRID_FROM_EMAIL
+    SENDGRID_API_URL - mail/send endpoint; point it at a local
+        ``sendgrid_fake.FakeSendGridServer`` to test offline
+    SENDGRID_MAX_CONCURRENCY - parallel requests (default 4)
+    SENDGRID_REQUESTS_PER_SECOND - request rate limit (default 10)
+    EMAIL_BACKEND - 'sendgrid' (default) or 'smtp' (see ``smtp_delivery``)
+    EMAIL_SENDING_ENABLED - 'true' to allow sending campaigns (app, CLI and resumed runs)
+        (off by default)
+"""
+
+from __future__ import annotations
+
+import http.client
+import itertools
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from ..config import get_secret
+
+DEFAULT_API_URL = "https://api.sendgrid.com/v3/mail/send"
+MAX_PERSONALIZATIONS = 1000
+RETRY_STATUSES = {429}
+DELIVERY_UNKNOWN = "Delivery unknown"
+BACKENDS = ('sendgrid', 'smtp')
+
+
+@dataclass
+class BatchRecipient:
+    """One recipient of a batched send."""
+
+    contact_id: int
+    email: str
+    # Substitution tag -> value, e.g. {'-first_name-': 'Anna'}
+    substitutions: Dict[str, str] = field(default_factory=dict)
+
+
+class RateLimiter:
+    """Spaces calls out to at most ``rate`` per second, across threads."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next = time.monotonic()
+
+    def wait(self) -> None:
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class SendGridBatchSender:
+    """Sends one message to many recipients in batched, concurrent requests.
+
+    Args:
+        api_key: SendGrid API key (default: SENDGRID_API_KEY)
+        from_email: Sender address (default: SENDGRID_FROM_EMAIL)
+        api_url: mail/send endpoint (default: SENDGRID_API_URL or SendGrid's)
+        batch_size: Personalizations per request (at most 1000)
+        max_concurrency: Requests in flight at once
+        requests_per_second: Request rate limit (0 for none)
+        max_retries: Retries of a request after a 429 or a failed connection
+        timeout: Seconds to wait for a response
+    """
+
+    def __init__(self, api_key: str = None, from_email: str = None, api_url: str = None,
+                 batch_size: int = MAX_PERSONALIZATIONS, max_concurrency: int = None,
+                 requests_per_second: float = None, max_retries: int = 3, timeout: float = 30.0):
+        self.api_key = api_key or get_secret('SENDGRID_API_KEY')
+        self.from_email = from_email or get_secret('SENDGRID_FROM_EMAIL', 'noreply@elbitat.com')
+        self.api_url = api_url or get_secret('SENDGRID_API_URL', DEFAULT_API_URL)
+        self.batch_size = max(1, min(int(batch_size), MAX_PERSONALIZATIONS))
+        self.max_concurrency = max(1, int(max_concurrency or get_secret('SENDGRID_MAX_CONCURRENCY', 4)))
+        rate = requests_per_second if requests_per_second is not None else get_secret('SENDGRID_REQUESTS_PER_SECOND', 10)
+        self.rate_limiter = RateLimiter(float(rate))
+        self.max_retries = max_retries
+        self.timeout = timeout
+
+    def build_payload(self, subject: str, html_content: str, batch: List[BatchRecipient],
+                      custom_args: Dict[str, str] = None) -> Dict:
+        """Build the mail/send request body for one batch."""
+        payload = {
+            'personalizations': [
+                {
+                    'to': [{'email': r.email}],
+                    'substitutions': r.substitutions,
+                    'custom_args': {'contact_id': str(r.contact_id)},
+                }
+                for r in batch
+            ],
+            'from': {'email': self.from_email},
+            'subject': subject,
+            'content': [{'type': 'text/html', 'value': html_content}],
+        }
+        if custom_args:
+            payload['custom_args'] = {k: str(v) for k, v in custom_args.items()}
+        return payload
+
+    def send(self, subject: str, html_content: str, recipients: Iterable[BatchRecipient],
+             custom_args: Dict[str, str] = None) -> Iterator[List[Dict]]:
+        """Send to all recipients; yields each batch's per-recipient results as it completes.
+
+        Each result has the keys of ``send_email_sendgrid``'s result
+        ('success', 'status_code', 'message_id', 'error') plus 'contact_id'
+        and 'email'. Batches may complete out of order.
+        """
+        batches = _chunks(recipients, self.batch_size)
+        if not self.api_key:
+            for batch in batches:
+                yield _batch_results(batch, {'success': False,
+                                             'error': 'SendGrid API key not configured in secrets'})
+            return
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="sendgrid") as pool:
+            in_flight = set()
+            for batch in batches:
+                # Keep the number of prepared batches bounded
+                while len(in_flight) >= self.max_concurrency * 2:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+                in_flight.add(pool.submit(self.send_batch, subject, html_content, batch, custom_args))
+            while in_flight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+
+    def send_batch(self, subject: str, html_content: str, batch: List[BatchRecipient],
+                   custom_args: Dict[str, str] = None) -> List[Dict]:
+        """Send one batch (with retries) and return its per-recipient results."""
+        body = json.dumps(self.build_payload(subject, html_content, batch, custom_args),
+                          ensure_ascii=False).encode('utf-8')
+        outcome: Dict = {}
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.wait()
+            status, headers, text, error, sent = self._post(body)
+            if status in (200, 201, 202):
+                outcome = {'success': True, 'status_code': status,
+                           'message_id': headers.get('X-Message-Id', '')}
+                break
+            error = error or _error_message(status, text)
+            if sent and (status is None or status >= 500):
+                # SendGrid may have accepted the request; sending it again could
+                # email every recipient of the batch twice
+                outcome = {'success': False, 'status_code': status,
+                           'error': f"{DELIVERY_UNKNOWN} ({error}) - check SendGrid's activity before retrying"}
+                break
+            outcome = {'success': False, 'status_code': status, 'error': error}
+            if (sent and status not in RETRY_STATUSES) or attempt == self.max_retries:
+                break
+            time.sleep(_retry_delay(headers, attempt))
+        return _batch_results(batch, outcome)
+
+    def _post(self, body: bytes) -> Tuple[Optional[int], Dict[str, str], str, Optional[str], bool]:
+        """POST a request body; returns (status, headers, response text, network error, sent).
+
+        ``sent`` is False only if the connection failed before the whole
+        request was sent, so SendGrid cannot have accepted it.
+        """
+        request = urllib.request.Request(self.api_url, data=body, method='POST', headers={
+            'Authorization': f'Bearer {self.api_key}',
+            'Content-Type': 'application/json',
+        })
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return (response.status, dict(response.headers), response.read().decode('utf-8', 'replace'),
+                        None, True)
+        except urllib.error.HTTPError as e:
+            return e.code, dict(e.headers or {}), e.read().decode('utf-8', 'replace'), None, True
+        except urllib.error.URLError as e:
+            # urlopen wraps only errors raised while connecting and sending the request
+            return None, {}, '', str(e.reason), False
+        except (OSError, http.client.HTTPException) as e:
+            # Lost while waiting for or reading the response (e.g. a read timeout)
+            return None, {}, '', str(e) or type(e).__name__, True
+
+
+def sending_enabled() -> bool:
+    """Return whether campaigns may be sent (the EMAIL_SENDING_ENABLED setting)."""
+    return str(get_secret('EMAIL_SENDING_ENABLED', 'false')).lower() in ('1', 'true', 'yes', 'on')
+
+
+def email_backend(backend: str = None) -> str:
+    """Resolve a delivery backend name (default: EMAIL_BACKEND or 'sendgrid').
+
+    Raises:
+        ValueError: If the backend is not one of BACKENDS
+    """
+    backend = (backend or get_secret('EMAIL_BACKEND', 'sendgrid')).strip().lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown email backend {backend!r} (expected one of {', '.join(BACKENDS)})")
+    return backend
+
+
+def make_batch_sender(backend: str = None, batch_size: int = MAX_PERSONALIZATIONS):
+    """Create the batch sender of a backend (SendGridBatchSender or SMTPBatchSender)."""
+    if email_backend(backend) == 'smtp':
+        from .smtp_delivery import SMTPBatchSender
+        return SMTPBatchSender(batch_size=batch_size)
+    return SendGridBatchSender(batch_size=batch_size)
+
+
+def _chunks(items: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(items)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _batch_results(batch: List[BatchRecipient], outcome: Dict) -> List[Dict]:
+    result = {'success': False, 'status_code': None, 'message_id': '', 'error': None, **outcome}
+    return [{**result, 'contact_id': r.contact_id, 'email': r.email} for r in batch]
+
+
+def _error_message(status: Optional[int], text: str) -> str:
+    try:
+        errors = json.loads(text).get('errors') or []
+        messages = [e.get('message', '') for e in errors if isinstance(e, dict)]
+        if messages:
+            return f"HTTP {status}: {'; '.join(messages)}"
+    except (ValueError, AttributeError):
+        pass
+    return f"HTTP {status}: {text[:200]}" if text else f"HTTP {status}"
+
+
+def _retry_delay(headers: Dict[str, str], attempt: int) -> float:
+    retry_after = headers.get('Retry-After') or headers.get('retry-after')
+    try:
+        return max(0.0, float(retry_after))
+    except (TypeError, ValueError):
+        return min(2 ** attempt, 30)
@@ -1,11 +1,10 @@
 """Email discovery agent for finding business contact emails from the web."""
 
 import re
-import requests
-from bs4 import BeautifulSoup
 from typing import List, Dict, Optional
 from urllib.parse import urlparse, urljoin, quote, unquote
-import streamlit as st
+
+from ..config import get_secret
 
 
 # Email regex pattern
@@ -24,12 +23,14 @@ def search_companies(query: str, country: str = None, limit: int = 10) -> List[D
         List of company results with name and website
     """
     try:
+        import requests
+        
         # Get API key from secrets
-        if not hasattr(st, 'secrets') or 'SERPER_API_KEY' not in st.secrets:
+        api_key = get_secret('SERPER_API_KEY')
+        if not api_key:
             print("Serper API key not configured. Using fallback search.")
             return _fallback_search(query, country, limit)
         
-        api_key = st.secrets['SERPER_API_KEY']
         url = "https://google.serper.dev/search"
         
         # Build search query
@@ -71,6 +72,9 @@ def search_companies(query: str, country: str = None, limit: int = 10) -> List[D
 def _fallback_search(query: str, country: str = None, limit: int = 10) -> List[Dict]:
     """Fallback search using multiple methods (no API needed)."""
     try:
+        import requests
+        from bs4 import BeautifulSoup
+        
         # Build search query
         search_query = query
         if country:
@@ -172,6 +176,9 @@ def extract_emails_from_website(website_url: str, max_pages: int = 3) -> List[st
     emails = set()
     
     try:
+        import requests
+        from bs4 import BeautifulSoup
+        
         # Normalize URL
         if not website_url.startswith(('http://', 'https://')):
             website_url = 'https://' + website_url
@@ -0,0 +1,111 @@
+"""Compiled email templates with ``{{placeholder}}`` fields.
+
+A template is tokenised once into literal text and placeholder slots;
+rendering for a contact is then a single ``''.join`` instead of one
+``str.replace`` pass over the whole HTML per placeholder. Compiled templates
+are cached by source, so a campaign's subject and body are compiled once
+however many contacts they are rendered for.
+
+Syntax:
+    {{first_name}}           the contact's value, or '' if it is empty
+    {{first_name|there}}     the contact's value, or 'there' if it is empty
+
+Placeholders that are not in the known set are left in the output as
+written, and reported by ``CompiledTemplate.problems``.
+"""
+
+from __future__ import annotations
+
+import functools
+import hashlib
+import re
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+_TOKEN = re.compile(r"\{\{\s*([A-Za-z_][A-Za-z0-9_]*)\s*(?:\|([^{}]*))?\}\}")
+
+
+class CompiledTemplate:
+    """A template split into literal parts and placeholder slots.
+
+    Args:
+        source: Template text
+        names: Known placeholder names; others are kept as literal text
+    """
+
+    def __init__(self, source: str, names: FrozenSet[str]):
+        self.source = source
+        self.names = names
+        self.unknown: List[str] = []
+        # Literals at even indices, placeholder slots (filled on render) at odd ones
+        parts: List[str] = []
+        slots: List[Tuple[int, str, str]] = []
+        literal = []
+        position = 0
+        for match in _TOKEN.finditer(source):
+            name, default = match.group(1), (match.group(2) or '').strip()
+            literal.append(source[position:match.start()])
+            position = match.end()
+            if name not in names:
+                if name not in self.unknown:
+                    self.unknown.append(name)
+                literal.append(match.group(0))
+                continue
+            parts.append(''.join(literal))
+            literal = []
+            slots.append((len(parts), name, default))
+            parts.append('')
+        literal.append(source[position:])
+        parts.append(''.join(literal))
+        self._parts = parts
+        self._slots = slots
+
+    @property
+    def fields(self) -> List[Tuple[str, str]]:
+        """(name, default) of each placeholder, in order of appearance."""
+        return [(name, default) for _, name, default in self._slots]
+
+    @property
+    def problems(self) -> List[str]:
+        """Human-readable problems: unknown placeholders and stray braces."""
+        problems = [f"Unknown placeholder {{{{{name}}}}} will be sent as written" for name in self.unknown]
+        stray = _TOKEN.sub('', self.source)
+        if '{{' in stray or '}}' in stray:
+            problems.append("Unmatched '{{' or '}}' - placeholders must look like {{first_name}}")
+        return problems
+
+    def render(self, values: Dict[str, Optional[str]]) -> str:
+        """Fill in the placeholders from ``values`` (falling back to their defaults)."""
+        parts = self._parts.copy()
+        for index, name, default in self._slots:
+            parts[index] = values.get(name) or default
+        return ''.join(parts)
+
+    def tagged(self) -> Tuple[str, Dict[str, Tuple[str, str]]]:
+        """Replace each placeholder with a substitution tag, for provider-side rendering.
+
+        Tags depend only on the placeholder's name and default, so templates
+        tagged separately (subject and body) share tags.
+
+        Returns:
+            (tagged template, {tag: (name, default)})
+        """
+        tags = {}
+        parts = self._parts.copy()
+        for index, name, default in self._slots:
+            tag = substitution_tag(name, default)
+            tags[tag] = (name, default)
+            parts[index] = tag
+        return ''.join(parts), tags
+
+
+def substitution_tag(name: str, default: str = '') -> str:
+    """Substitution tag for a placeholder (``-first_name-``)."""
+    if not default:
+        return f'-{name}-'
+    return f'-{name}-{hashlib.sha1(default.encode("utf-8")).hexdigest()[:8]}-'
+
+
+@functools.lru_cache(maxsize=64)
+def compile_template(source: str, names: FrozenSet[str]) -> CompiledTemplate:
+    """Compile (or fetch the cached compilation of) a template."""
+    return CompiledTemplate(source, names)
@@ -1,35 +1,30 @@
 """Marketing Strategist Agent - Creates comprehensive marketing plans."""
 
 from __future__ import annotations
-import os
-import streamlit as st
 from typing import Dict, List, Optional
 from datetime import datetime, timedelta
 
+from .conversation_context import ConversationContext
 
-def generate_marketing_plan(conversation_history: List[Dict[str, str]]) -> Dict:
+# Prompt token budget per call; older turns are summarised to stay within it
+PLAN_TOKEN_BUDGET = 6000
+CHAT_TOKEN_BUDGET = 3000
+
+
+def generate_marketing_plan(conversation_history: List[Dict[str, str]],
+                            context: Optional[ConversationContext] = None) -> Dict:
     """Generate a comprehensive marketing plan based on conversation with user.
     
     Args:
         conversation_history: List of messages with 'role' and 'content'
+        context: Rolling-summary context for this conversation (keeps the
+            prompt within PLAN_TOKEN_BUDGET)
         
     Returns:
         Marketing plan dictionary with strategy, timeline, and post specifications
     """
     try:
-        import openai
-        
-        # Get API key from secrets or environment
-        api_key = None
-        if hasattr(st, 'secrets') and 'OPENAI_API_KEY' in st.secrets:
-            api_key = st.secrets['OPENAI_API_KEY']
-        else:
-            api_key = os.getenv('OPENAI_API_KEY')
-        
-        if not api_key:
-            raise ValueError("OpenAI API key not found")
-        
-        client = openai.OpenAI(api_key=api_key)
+        from ..openai_client import chat_completion
         
         # System prompt for marketing strategist
         system_prompt = """You are an expert marketing strategist specializing in wellness, hospitality, and holistic health campaigns.
@@ -77,19 +72,22 @@ Output your marketing plan in this JSON structure:
 
 Be specific, actionable, and data-driven in your recommendations."""
 
-        # Build messages for API call
-        messages = [{"role": "system", "content": system_prompt}]
-        messages.extend(conversation_history)
-        
-        # Add final instruction to generate plan
-        messages.append({
-            "role": "user",
-            "content": "Based on our conversation, please create a comprehensive marketing plan in the JSON format specified. Include specific posts with week numbers, themes, and services to highlight."
-        })
+        # Build messages for API call, compacting older turns if needed
+        if context is None:
+            context = ConversationContext(token_budget=PLAN_TOKEN_BUDGET)
+        messages = context.build_messages(
+            system_prompt,
+            conversation_history,
+            trailing=[{
+                "role": "user",
+                "content": "Based on our conversation, please create a comprehensive marketing plan in the JSON format specified. Include specific posts with week numbers, themes, and services to highlight."
+            }],
+            summarize=_openai_summarize,
+        )
         
         print("🎯 Generating marketing plan with GPT-4o-mini...")
         
-        response = client.chat.completions.create(
+        response = chat_completion(
             model="gpt-4o-mini",
             messages=messages,
             temperature=0.7,
@@ -206,30 +204,21 @@ Scheduled for: {post_date.strftime('%B %d, %Y')}"""
     return post_requests
 
 
-def chat_with_marketing_agent(user_message: str, conversation_history: List[Dict[str, str]]) -> str:
+def chat_with_marketing_agent(user_message: str, conversation_history: List[Dict[str, str]],
+                              context: Optional[ConversationContext] = None) -> str:
     """Interactive conversation with marketing strategist to define campaign scope.
     
     Args:
         user_message: User's message
         conversation_history: Previous conversation
+        context: Rolling-summary context for this conversation (keeps the
+            prompt within CHAT_TOKEN_BUDGET)
         
     Returns:
         Agent's response
     """
     try:
-        import openai
-        
-        # Get API key
-        api_key = None
-        if hasattr(st, 'secrets') and 'OPENAI_API_KEY' in st.secrets:
-            api_key = st.secrets['OPENAI_API_KEY']
-        else:
-            api_key = os.getenv('OPENAI_API_KEY')
-        
-        if not api_key:
-            raise ValueError("OpenAI API key not found")
-        
-        client = openai.OpenAI(api_key=api_key)
+        from ..openai_client import chat_completion
         
         # System prompt for conversational strategist
         system_prompt = """You are a friendly and expert marketing strategist specializing in wellness, hospitality, and holistic health.
@@ -246,11 +235,16 @@ Your role is to have a conversation with clients to understand their marketing n
 
 Be conversational, ask one or two questions at a time, and build understanding gradually. Show enthusiasm and expertise. When you have enough information, summarize what you've learned and ask if they're ready to see a detailed marketing plan."""
 
-        messages = [{"role": "system", "content": system_prompt}]
-        messages.extend(conversation_history)
-        messages.append({"role": "user", "content": user_message})
+        if context is None:
+            context = ConversationContext(token_budget=CHAT_TOKEN_BUDGET)
+        messages = context.build_messages(
+            system_prompt,
+            conversation_history,
+            trailing=[{"role": "user", "content": user_message}],
+            summarize=_openai_summarize,
+        )
         
-        response = client.chat.completions.create(
+        response = chat_completion(
             model="gpt-4o-mini",
             messages=messages,
             temperature=0.8,
@@ -261,3 +255,22 @@ Be conversational, ask one or two questions at a time, and build understanding g
         
     except Exception as e:
         return f"I apologize, but I encountered an error: {str(e)}. Please try again."
+
+
+def _openai_summarize(previous_summary: str, turns: List[Dict[str, str]]) -> str:
+    """Fold conversation turns into the rolling summary with GPT-4o-mini."""
+    from ..openai_client import chat_completion
+
+    transcript = "\n".join(
+        f"{'User' if t['role'] == 'user' else 'Strategist'}: {t['content']}" for t in turns
+    )
+    response = chat_completion(
+        model="gpt-4o-mini",
+        messages=[
+            {"role": "system", "content": "You maintain a concise running summary of a marketing planning conversation. Keep every concrete decision: goals, audience, services, timeline, posting frequency, brand voice and platforms. Use short bullet points."},
+            {"role": "user", "content": f"Current summary:\n{previous_summary or '(none)'}\n\nNew conversation turns:\n{transcript}\n\nReturn the updated summary."}
+        ],
+        temperature=0.2,
+        max_tokens=400
+    )
+    return response.choices[0].message.content.strip()
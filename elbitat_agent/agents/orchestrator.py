@@ -3,11 +3,10 @@ from __future__ import annotations
 from datetime import datetime
 from pathlib import Path
 from typing import Iterable, List
-import json
 
 from ..models import AdRequest, AdDraft
-from ..file_storage import load_all_requests, save_draft
-from ..config import get_workspace_path
+from ..file_storage import load_all_requests, save_drafts, draft_filename, save_scheduled_post
+from ..config import get_workspace_dir
 from .creative_agent import generate_simple_draft
 
 
@@ -16,9 +15,9 @@ def generate_drafts_for_all_requests() -> List[AdDraft]:
     requests = load_all_requests()
     drafts: List[AdDraft] = []
     for req in requests:
-        draft = generate_simple_draft(req)
-        save_draft(draft)
-        drafts.append(draft)
+        drafts.append(generate_simple_draft(req))
+    # One transaction and one batch of backup files for the whole run
+    save_drafts((draft_filename(draft), draft.to_dict()) for draft in drafts)
     return drafts
 
 
@@ -31,29 +30,25 @@ def schedule_draft_for_publication(
       - transform the draft into platform-specific API payloads
       - call Meta/TikTok APIs to schedule or publish
 
-    For now we just save a JSON file into `scheduled/` so we can build and test
-    the file-based pipeline.
+    For now we store it as a pending scheduled post (database row plus the
+    JSON file in `scheduled/`, see file_storage.save_scheduled_post), where the
+    Scheduled Posts page lists it. Scheduling a draft again replaces its post.
     """
-    base = get_workspace_path()
-    scheduled_dir = base / "scheduled"
-    scheduled_dir.mkdir(parents=True, exist_ok=True)
-
-    safe_title = draft.request.title.replace(" ", "_").lower()
+    safe_title = draft.request.title.replace(" ", "_").replace("/", "_").replace("\\", "_").lower()
     filename = f"{safe_title}.scheduled.json"
-    path = scheduled_dir / filename
 
     payload = {
         "draft": draft.to_dict(),
         "publish_at": publish_at.isoformat() if publish_at else None,
     }
 
-    with path.open("w", encoding="utf-8") as f:
-        json.dump(payload, f, indent=2, ensure_ascii=False)
+    if not save_scheduled_post(payload, filename, overwrite=True):
+        raise OSError(f"Could not save scheduled post {filename}")
 
-    return path
+    return get_workspace_dir("scheduled") / filename
 
 
 def schedule_all_drafts(drafts: Iterable[AdDraft], publish_at: datetime | None = None):
-    """Schedule a batch of drafts for publication (file-based placeholder)."""
+    """Schedule a batch of drafts for publication (placeholder, see schedule_draft_for_publication)."""
     for draft in drafts:
         schedule_draft_for_publication(draft, publish_at=publish_at)
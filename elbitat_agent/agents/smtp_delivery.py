@@ -0,0 +1,485 @@
+"""Batched email delivery over SMTP, as an alternative to SendGrid.
+
+``SMTPBatchSender`` has the interface of ``email_delivery.SendGridBatchSender``
+(the same ``send`` generator, the same per-recipient results), so campaign
+runs can use either backend (see ``email_delivery.make_batch_sender``).
+
+Messages go out over a few persistent connections to one SMTP relay, each
+opened, secured and authenticated once and then reused (renewed after
+``SMTP_MESSAGES_PER_CONNECTION`` messages, or when the server drops it).
+When the server supports PIPELINING (RFC 2920) the MAIL, RCPT and DATA
+commands of a message go out in one write, so a message costs two round
+trips instead of four. Recipient domains can be throttled: messages to,
+say, gmail.com are spaced out to the domain's rate, while messages to other
+domains keep the connections busy in the meantime.
+
+Unlike SendGrid, the server accepts or rejects each message, so results are
+per recipient: 'status_code' is the SMTP reply code and 'message_id' the
+Message-ID header of the email. Temporary (4xx) replies and connections
+that fail before the message is sent are retried. A connection lost after
+the message and its final "." went out is not: the relay may already have
+queued it, so the recipient is reported as failed with a "Delivery unknown"
+error rather than emailed twice.
+
+Settings (Streamlit secrets, or upper-cased environment variables):
+    SMTP_HOST, SMTP_PORT (default 587), SMTP_USERNAME, SMTP_PASSWORD
+    SMTP_FROM_EMAIL - sender address (default: SENDGRID_FROM_EMAIL)
+    SMTP_SECURITY - 'starttls' (default), 'ssl' or 'none'
+    SMTP_MAX_CONNECTIONS - parallel connections (default 4)
+    SMTP_MESSAGES_PER_CONNECTION - messages before reconnecting (default 500)
+    SMTP_DOMAIN_RATES - messages per second by recipient domain, e.g.
+        "gmail.com=5,outlook.com=2" (default: DEFAULT_DOMAIN_RATES)
+    SMTP_DEFAULT_DOMAIN_RATE - rate for other domains (default 0, no limit)
+"""
+
+from __future__ import annotations
+
+import binascii
+import heapq
+import queue
+import re
+import smtplib
+import ssl
+import threading
+import time
+from collections import deque
+from email.header import Header
+from email.utils import formatdate, make_msgid
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from ..config import get_secret
+from .email_delivery import DELIVERY_UNKNOWN, MAX_PERSONALIZATIONS, BatchRecipient, _chunks
+
+# Messages per second to the big mailbox providers, which throttle (and
+# eventually block) senders that go faster
+DEFAULT_DOMAIN_RATES = {
+    'gmail.com': 10, 'googlemail.com': 10,
+    'outlook.com': 5, 'hotmail.com': 5, 'live.com': 5,
+}
+SECURITY_MODES = ('starttls', 'ssl', 'none')
+_LINE_BREAKS = re.compile(r'[\r\n]+')
+
+
+class DomainThrottle:
+    """Messages-per-second limits by recipient domain.
+
+    Args:
+        rates: Domain -> messages per second
+        default_rate: Rate for domains not in ``rates`` (0 for no limit)
+    """
+
+    def __init__(self, rates: Dict[str, float] = None, default_rate: float = 0):
+        rates = DEFAULT_DOMAIN_RATES if rates is None else rates
+        self.intervals = {domain.lower(): 1.0 / float(rate) for domain, rate in rates.items() if float(rate) > 0}
+        self.default_interval = 1.0 / float(default_rate) if default_rate and float(default_rate) > 0 else 0.0
+
+    @classmethod
+    def parse(cls, rates: str, default_rate: float = 0) -> "DomainThrottle":
+        """Build from a "domain=rate,domain=rate" setting."""
+        parsed = {}
+        for item in filter(None, (part.strip() for part in rates.split(','))):
+            domain, _, rate = item.partition('=')
+            try:
+                parsed[domain.strip()] = float(rate)
+            except ValueError:
+                raise ValueError(f"Invalid domain rate {item!r} (expected domain=messages_per_second)") from None
+        return cls(parsed, default_rate)
+
+    def interval(self, domain: str) -> float:
+        """Seconds between messages to a domain (0 for no limit)."""
+        return self.intervals.get(domain, self.default_interval)
+
+
+class _DomainQueue:
+    """Queue of messages that hands each one out when its domain's rate allows.
+
+    Messages to unthrottled domains go out in order; each throttled domain
+    has its own queue and next free slot, kept in a heap, and is served as
+    soon as its slot comes up.
+    """
+
+    def __init__(self, throttle: DomainThrottle):
+        self.throttle = throttle
+        self._ready: deque = deque()
+        self._throttled: Dict[str, deque] = {}
+        self._slots: List[Tuple[float, str]] = []
+        self._next_slot: Dict[str, float] = {}
+        self._closed = False
+        self._discarded = False
+        self._cond = threading.Condition()
+
+    def put(self, items: Iterable[Tuple[str, object]]) -> None:
+        """Queue (recipient domain, item) pairs."""
+        with self._cond:
+            for domain, item in items:
+                if not self.throttle.interval(domain):
+                    self._ready.append(item)
+                    continue
+                pending = self._throttled.setdefault(domain, deque())
+                if not pending:
+                    heapq.heappush(self._slots, (self._next_slot.get(domain, 0.0), domain))
+                pending.append(item)
+            self._cond.notify_all()
+
+    def close(self, discard: bool = False) -> None:
+        """No more items: ``take`` returns None once the queue is empty (at once if ``discard``)."""
+        with self._cond:
+            self._closed = True
+            self._discarded = self._discarded or discard
+            self._cond.notify_all()
+
+    def take(self):
+        """Wait for the next item that may be sent now; None when closed and empty."""
+        with self._cond:
+            while not self._discarded:
+                now = time.monotonic()
+                if self._slots and self._slots[0][0] <= now:
+                    _, domain = heapq.heappop(self._slots)
+                    pending = self._throttled[domain]
+                    item = pending.popleft()
+                    self._next_slot[domain] = now + self.throttle.interval(domain)
+                    if pending:
+                        heapq.heappush(self._slots, (self._next_slot[domain], domain))
+                    return item
+                if self._ready:
+                    return self._ready.popleft()
+                if self._slots:
+                    self._cond.wait(self._slots[0][0] - now)
+                elif self._closed:
+                    return None
+                else:
+                    self._cond.wait()
+            return None
+
+
+class SMTPBatchSender:
+    """Sends one message to many recipients over persistent SMTP connections.
+
+    Args:
+        host: SMTP relay (default: SMTP_HOST)
+        port: Port (default: SMTP_PORT or 587)
+        username: Login (default: SMTP_USERNAME; no login if empty)
+        password: Password (default: SMTP_PASSWORD)
+        from_email: Sender address (default: SMTP_FROM_EMAIL or SENDGRID_FROM_EMAIL)
+        security: 'starttls', 'ssl' or 'none' (default: SMTP_SECURITY or 'starttls')
+        batch_size: Recipients per yielded batch of results
+        max_connections: Connections used in parallel
+        messages_per_connection: Messages before a connection is renewed (0 for no limit)
+        throttle: Per-domain rates (default: SMTP_DOMAIN_RATES / SMTP_DEFAULT_DOMAIN_RATE)
+        pipelining: Pipeline commands when the server supports it
+        max_retries: Retries of a message after a 4xx reply or a connection failing before DATA was sent
+        retry_delay: Seconds before the first retry, doubled for each further one
+        timeout: Seconds to wait for the server
+    """
+
+    def __init__(self, host: str = None, port: int = None, username: str = None, password: str = None,
+                 from_email: str = None, security: str = None, batch_size: int = MAX_PERSONALIZATIONS,
+                 max_connections: int = None, messages_per_connection: int = None,
+                 throttle: DomainThrottle = None, pipelining: bool = True, max_retries: int = 3,
+                 retry_delay: float = 1.0, timeout: float = 30.0):
+        self.host = host or get_secret('SMTP_HOST')
+        self.port = int(port or get_secret('SMTP_PORT', 587))
+        self.username = username or get_secret('SMTP_USERNAME')
+        self.password = password or get_secret('SMTP_PASSWORD', '')
+        self.from_email = (from_email or get_secret('SMTP_FROM_EMAIL')
+                           or get_secret('SENDGRID_FROM_EMAIL', 'noreply@elbitat.com'))
+        self.security = (security or get_secret('SMTP_SECURITY', 'starttls')).lower()
+        if self.security not in SECURITY_MODES:
+            raise ValueError(f"Unknown SMTP security {self.security!r} (expected one of {', '.join(SECURITY_MODES)})")
+        self.batch_size = max(1, int(batch_size))
+        self.max_connections = max(1, int(max_connections or get_secret('SMTP_MAX_CONNECTIONS', 4)))
+        self.messages_per_connection = int(messages_per_connection if messages_per_connection is not None
+                                           else get_secret('SMTP_MESSAGES_PER_CONNECTION', 500))
+        if throttle is None:
+            rates = get_secret('SMTP_DOMAIN_RATES')
+            default_rate = float(get_secret('SMTP_DEFAULT_DOMAIN_RATE', 0))
+            throttle = (DomainThrottle.parse(rates, default_rate) if rates
+                        else DomainThrottle(default_rate=default_rate))
+        self.throttle = throttle
+        self.pipelining = pipelining
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.timeout = timeout
+        self._msgid_domain = self.from_email.rsplit('@', 1)[-1]
+
+    def connect(self) -> smtplib.SMTP:
+        """Open a connection, secured and logged in as configured."""
+        if self.security == 'ssl':
+            conn = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout,
+                                    context=ssl.create_default_context())
+        else:
+            conn = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            conn.ehlo()
+            if self.security == 'starttls':
+                conn.starttls(context=ssl.create_default_context())
+                conn.ehlo()
+            if self.username:
+                conn.login(self.username, self.password)
+        except BaseException:
+            conn.close()
+            raise
+        return conn
+
+    def build_message(self, subject: str, html_content: str, recipient: BatchRecipient,
+                      custom_args: Dict[str, str] = None) -> Tuple[str, bytes]:
+        """Render one recipient's email; returns (Message-ID, message bytes).
+
+        Substitution tags are filled in as SendGrid would, and the custom
+        args go in ``X-`` headers (e.g. ``X-Campaign-Id``) for bounce handling.
+        The MIME text is written directly (quoted-printable HTML body), as
+        ``email.message`` takes longer than the SMTP exchange itself.
+        """
+        message_id = make_msgid(domain=self._msgid_domain)
+        headers = [
+            f"From: {_header(self.from_email)}",
+            f"To: {_header(recipient.email)}",
+            f"Subject: {_header(substitute(subject, recipient.substitutions))}",
+            f"Date: {formatdate(localtime=True)}",
+            f"Message-ID: {message_id}",
+        ]
+        for key, value in {**(custom_args or {}), 'contact_id': recipient.contact_id}.items():
+            headers.append(f"X-{key.replace('_', '-').title()}: {_header(str(value))}")
+        headers += ['MIME-Version: 1.0', 'Content-Type: text/html; charset="utf-8"',
+                    'Content-Transfer-Encoding: quoted-printable']
+        body = binascii.b2a_qp(substitute(html_content, recipient.substitutions).encode('utf-8'), istext=True)
+        return message_id.strip('<>'), ('\r\n'.join(headers) + '\r\n\r\n').encode('ascii') + body
+
+    def send(self, subject: str, html_content: str, recipients: Iterable[BatchRecipient],
+             custom_args: Dict[str, str] = None) -> Iterator[List[Dict]]:
+        """Send to all recipients; yields each batch's per-recipient results as it completes.
+
+        Each result has the keys of ``send_email_sendgrid``'s result
+        ('success', 'status_code', 'message_id', 'error') plus 'contact_id'
+        and 'email'. Batches may complete out of order. Recipients are read
+        from ``recipients`` on the calling thread, a batch ahead of delivery.
+        """
+        batches = _chunks(recipients, self.batch_size)
+        if not self.host:
+            for batch in batches:
+                yield [_result(r, {'error': 'SMTP host not configured in secrets'}) for r in batch]
+            return
+
+        messages = _DomainQueue(self.throttle)
+        done: queue.Queue = queue.Queue()
+        workers = [threading.Thread(target=self._work, args=(messages, done, subject, html_content, custom_args),
+                                    name=f"smtp-{i}", daemon=True)
+                   for i in range(self.max_connections)]
+        for worker in workers:
+            worker.start()
+
+        # Batch index -> [results in recipient order, recipients still to send]
+        pending: Dict[int, list] = {}
+        try:
+            for index, batch in enumerate(batches):
+                pending[index] = [[None] * len(batch), len(batch)]
+                messages.put((_domain(r.email), (index, position, r)) for position, r in enumerate(batch))
+                # Keep one batch queued behind the one being sent
+                while len(pending) > 1:
+                    yield from self._collect(done, pending)
+            messages.close()
+            while pending:
+                yield from self._collect(done, pending)
+        finally:
+            messages.close(discard=True)
+            for worker in workers:
+                worker.join()
+
+    def send_batch(self, subject: str, html_content: str, batch: List[BatchRecipient],
+                   custom_args: Dict[str, str] = None) -> List[Dict]:
+        """Send one batch and return its per-recipient results."""
+        return [result for results in self.send(subject, html_content, batch, custom_args) for result in results]
+
+    def _collect(self, done: queue.Queue, pending: Dict[int, list]) -> Iterator[List[Dict]]:
+        index, position, result = done.get()
+        entry = pending[index]
+        entry[0][position] = result
+        entry[1] -= 1
+        if not entry[1]:
+            del pending[index]
+            yield entry[0]
+
+    def _work(self, messages: _DomainQueue, done: queue.Queue, subject: str, html_content: str,
+              custom_args: Optional[Dict[str, str]]) -> None:
+        """Deliver queued messages over one connection until the queue is closed."""
+        connection = _Connection(self)
+        try:
+            while True:
+                item = messages.take()
+                if item is None:
+                    return
+                index, position, recipient = item
+                try:
+                    result = self._deliver(connection, subject, html_content, recipient, custom_args)
+                except Exception as e:
+                    connection.reset()
+                    result = _result(recipient, {'error': f"SMTP error: {e}"})
+                done.put((index, position, result))
+        finally:
+            connection.close()
+
+    def _deliver(self, connection: "_Connection", subject: str, html_content: str,
+                 recipient: BatchRecipient, custom_args: Optional[Dict[str, str]]) -> Dict:
+        try:
+            message_id, message = self.build_message(subject, html_content, recipient, custom_args)
+        except Exception as e:
+            return _result(recipient, {'error': f"Could not build message: {e}"})
+
+        if connection.broken:
+            return _result(recipient, connection.broken)
+        outcome: Dict = {}
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                time.sleep(self.retry_delay * 2 ** (attempt - 1))
+            try:
+                code, reply = connection.send(self.from_email, recipient.email, message)
+            except _ReplyLost as e:
+                # The relay may have queued the message; sending it again could deliver it twice
+                connection.reset()
+                return _result(recipient, {'error': f"{DELIVERY_UNKNOWN} (no reply after the message was sent: "
+                                                    f"{e}) - check the relay's logs before retrying"})
+            except (smtplib.SMTPAuthenticationError, smtplib.SMTPNotSupportedError) as e:
+                # Settings problem: fail this connection's messages without reconnecting for each
+                connection.reset()
+                connection.broken = {'status_code': getattr(e, 'smtp_code', None),
+                                     'error': f"SMTP login failed: {_text(getattr(e, 'smtp_error', e))}"}
+                return _result(recipient, connection.broken)
+            except (smtplib.SMTPException, OSError, UnicodeEncodeError) as e:
+                connection.reset()
+                outcome = {'status_code': getattr(e, 'smtp_code', None), 'error': f"SMTP error: {e}"}
+                if isinstance(e, UnicodeEncodeError):
+                    break
+                continue
+            if code == 250:
+                return _result(recipient, {'success': True, 'status_code': code, 'message_id': message_id})
+            outcome = {'status_code': code, 'error': f"SMTP {code}: {_text(reply)}"}
+            if code == 421:
+                connection.reset()
+            if not 400 <= code < 500:
+                break
+        return _result(recipient, outcome)
+
+
+class _ReplyLost(Exception):
+    """The connection failed after the message was sent, before the server replied."""
+
+
+class _Connection:
+    """One worker's connection to the relay, opened on first use and renewed as needed."""
+
+    def __init__(self, sender: SMTPBatchSender):
+        self.sender = sender
+        self.smtp: Optional[smtplib.SMTP] = None
+        self.sent = 0
+        # Outcome for every message once connecting is known to fail
+        self.broken: Optional[Dict] = None
+
+    def send(self, from_addr: str, to_addr: str, message: bytes) -> Tuple[int, bytes]:
+        """Send one message; returns the server's final (code, reply)."""
+        limit = self.sender.messages_per_connection
+        if self.smtp is not None and limit and self.sent >= limit:
+            self.close()
+        if self.smtp is None:
+            self.smtp = self.sender.connect()
+            self.sent = 0
+        self.sent += 1
+        if self.sender.pipelining and self.smtp.has_extn('pipelining'):
+            return _send_pipelined(self.smtp, from_addr, to_addr, message)
+        return _send_plain(self.smtp, from_addr, to_addr, message)
+
+    def reset(self) -> None:
+        """Drop the connection without a goodbye (after an error)."""
+        if self.smtp is not None:
+            self.smtp.close()
+            self.smtp = None
+
+    def close(self) -> None:
+        if self.smtp is not None:
+            try:
+                self.smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self.reset()
+
+
+def _send_pipelined(smtp: smtplib.SMTP, from_addr: str, to_addr: str, message: bytes) -> Tuple[int, bytes]:
+    """MAIL, RCPT and DATA in one write, then the message (RFC 2920)."""
+    smtp.send(f"MAIL FROM:<{from_addr}>\r\nRCPT TO:<{to_addr}>\r\nDATA\r\n")
+    mail, rcpt, data = smtp.getreply(), smtp.getreply(), smtp.getreply()
+    if data[0] == 354 and (mail[0] != 250 or rcpt[0] not in (250, 251)):
+        # Server took DATA although the envelope failed: end it empty
+        smtp.send(b'.\r\n')
+        smtp.getreply()
+    for code, reply in (mail, rcpt, data):
+        if code not in (250, 251, 354):
+            if code != 421:
+                smtp.rset()
+            return code, reply
+    return _send_data(smtp, message)
+
+
+def _send_plain(smtp: smtplib.SMTP, from_addr: str, to_addr: str, message: bytes) -> Tuple[int, bytes]:
+    """One command per round trip, for servers without PIPELINING."""
+    code, reply = smtp.mail(from_addr)
+    if code == 250:
+        code, reply = smtp.rcpt(to_addr)
+        if code in (250, 251):
+            code, reply = smtp.docmd('DATA')
+            if code == 354:
+                return _send_data(smtp, message)
+    if code != 421:
+        smtp.rset()
+    return code, reply
+
+
+def _send_data(smtp: smtplib.SMTP, message: bytes) -> Tuple[int, bytes]:
+    """Send the message after a 354; returns the server's reply.
+
+    Raises:
+        _ReplyLost: If the reply to the final "." never arrives
+    """
+    smtp.send(_dot_stuff(message) + b'.\r\n')
+    try:
+        return smtp.getreply()
+    except (smtplib.SMTPException, OSError) as e:
+        raise _ReplyLost(str(e) or type(e).__name__) from e
+
+
+def _dot_stuff(message: bytes) -> bytes:
+    """Normalise line endings to CRLF, escape leading dots and end with CRLF."""
+    message = re.sub(rb'(?:\r\n|\n|\r(?!\n))', b'\r\n', message)
+    message = re.sub(rb'(?m)^\.', b'..', message)
+    return message if message.endswith(b'\r\n') else message + b'\r\n'
+
+
+@lru_cache(maxsize=64)
+def _tag_pattern(tags: Tuple[str, ...]) -> re.Pattern:
+    # Longest first, so a tag that is a prefix of another does not win
+    return re.compile('|'.join(re.escape(tag) for tag in sorted(tags, key=len, reverse=True)))
+
+
+def substitute(text: str, substitutions: Dict[str, str]) -> str:
+    """Replace substitution tags (e.g. ``-first_name-``) with their values in one pass."""
+    if not substitutions or not text:
+        return text
+    return _tag_pattern(tuple(substitutions)).sub(lambda m: substitutions[m.group(0)], text)
+
+
+def _header(value: str) -> str:
+    """Header value on one line, RFC 2047-encoded if it is not ASCII."""
+    value = _LINE_BREAKS.sub(' ', value)
+    return value if value.isascii() else Header(value, 'utf-8').encode(linesep='\r\n')
+
+
+def _domain(email: str) -> str:
+    return email.rsplit('@', 1)[-1].strip().lower()
+
+
+def _text(reply) -> str:
+    return reply.decode('utf-8', 'replace') if isinstance(reply, bytes) else str(reply)
+
+
+def _result(recipient: BatchRecipient, outcome: Dict) -> Dict:
+    return {'success': False, 'status_code': None, 'message_id': '', 'error': None, **outcome,
+            'contact_id': recipient.contact_id, 'email': recipient.email}
@@ -0,0 +1,268 @@
+"""JSON file backups of drafts, requests and scheduled posts.
+
+The database is the source of truth; the JSON files in the workspace are
+backups (and the storage of last resort when no database is available).
+How they are written is configured per deployment with the ``backup_mode``
+secret (or the BACKUP_MODE environment variable):
+
+- ``sync`` (default): write the file during the save, pretty-printed
+- ``async``: write-behind - saves only queue a snapshot; a background
+  thread writes the queued snapshots in batches as compact JSON. Repeated
+  saves of the same file between flushes are coalesced into one write.
+- ``off``: no backup files
+
+Every file is written atomically (temporary file + rename), so a crash
+never leaves a truncated JSON file behind. Set ``backup_fsync`` to true to
+also fsync each file and its directory, so a completed save survives a
+power loss too (at the cost of a disk flush per save).
+"""
+
+from __future__ import annotations
+
+import atexit
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from .config import get_secret
+
+BACKUP_MODES = ("sync", "async", "off")
+
+FLUSH_INTERVAL_SECONDS = float(os.getenv("BACKUP_FLUSH_SECONDS", "2"))
+FLUSH_BATCH_SIZE = 100
+
+# Marks a queued deletion
+_DELETE = object()
+
+_lock = threading.Lock()
+_pending: Dict[Path, Any] = {}
+_wakeup = threading.Event()
+_idle = threading.Condition(_lock)
+_writer: Optional[threading.Thread] = None
+_writing = False
+_stats = {'written': 0, 'deleted': 0, 'coalesced': 0, 'errors': 0, 'batches': 0}
+
+
+def get_backup_mode() -> str:
+    """Return the configured backup mode ('sync', 'async' or 'off')."""
+    mode = str(get_secret('backup_mode', 'sync')).lower()
+    if mode not in BACKUP_MODES:
+        print(f"⚠️ Unknown backup_mode '{mode}', using 'sync'")
+        return 'sync'
+    return mode
+
+
+def fsync_enabled() -> bool:
+    """Return whether backup writes are fsynced (the ``backup_fsync`` secret)."""
+    return str(get_secret('backup_fsync', 'false')).lower() in ('1', 'true', 'yes', 'on')
+
+
+def write_json_atomic(path: Path, data: Any, indent: Optional[int] = None,
+                      fsync: bool = False, sync_dir: bool = True) -> None:
+    """Write ``data`` as JSON to ``path`` via a temporary file and a rename.
+
+    Readers see either the previous file or the complete new one, never a
+    partially written file. Temporary files are hidden and end in ``.tmp``,
+    so the ``*.json`` loaders never pick one up.
+
+    Args:
+        path: Target file
+        data: JSON-serialisable document
+        indent: Pretty-print indentation; compact JSON if None
+        fsync: Flush the file to disk before the rename
+        sync_dir: With ``fsync``, also flush the directory so the rename is
+            durable (bulk writers do this once per directory instead)
+    """
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        try:
+            f = tmp.open("w", encoding="utf-8")
+        except FileNotFoundError:
+            # Only pay for creating the folder when it is missing
+            path.parent.mkdir(parents=True, exist_ok=True)
+            f = tmp.open("w", encoding="utf-8")
+        with f:
+            if indent is None:
+                json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+            else:
+                json.dump(data, f, ensure_ascii=False, indent=indent)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    if fsync and sync_dir:
+        fsync_directory(path.parent)
+
+
+def fsync_directory(directory: Path) -> None:
+    """Flush a directory entry to disk (no-op where directories can't be opened)."""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return  # e.g. Windows
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def save_backup(path: Path, data: Any, required: bool = False) -> bool:
+    """Back up ``data`` to the JSON file ``path`` according to the backup mode.
+
+    Args:
+        path: Backup file
+        data: JSON-serialisable document
+        required: The file is the only copy (no database): always write it
+            synchronously, whatever the backup mode
+
+    Returns:
+        True if the file was written or queued, False if backups are off
+
+    Raises:
+        OSError: If a synchronous write fails
+    """
+    mode = 'sync' if required else get_backup_mode()
+    if mode == 'off':
+        return False
+    if mode == 'sync':
+        with _lock:
+            # A queued snapshot of this file would overwrite the newer data
+            _pending.pop(Path(path), None)
+        write_json_atomic(path, data, indent=2, fsync=fsync_enabled())
+        with _lock:
+            _stats['written'] += 1
+        return True
+
+    _enqueue(Path(path), data)
+    return True
+
+
+def save_backups(items: Iterable[Tuple[Path, Any]], required: bool = False) -> int:
+    """Back up many documents at once; like save_backup for each (path, data).
+
+    With fsync enabled, each file is flushed but every directory only once.
+
+    Returns:
+        Number of files written or queued
+    """
+    items = [(Path(path), data) for path, data in items]
+    mode = 'sync' if required else get_backup_mode()
+    if mode == 'off':
+        return 0
+    if mode == 'async':
+        for path, data in items:
+            _enqueue(path, data)
+        return len(items)
+
+    fsync = fsync_enabled()
+    with _lock:
+        for path, _ in items:
+            _pending.pop(path, None)
+    for path, data in items:
+        write_json_atomic(path, data, indent=2, fsync=fsync, sync_dir=False)
+    if fsync:
+        for directory in {path.parent for path, _ in items}:
+            fsync_directory(directory)
+    with _lock:
+        _stats['written'] += len(items)
+    return len(items)
+
+
+def delete_backup(path: Path) -> None:
+    """Remove a backup file (after any queued write of it)."""
+    if get_backup_mode() == 'async':
+        _enqueue(Path(path), _DELETE)
+        return
+    with _lock:
+        _pending.pop(Path(path), None)
+    Path(path).unlink(missing_ok=True)
+
+
+def flush_backups(timeout: Optional[float] = None) -> bool:
+    """Wait until all queued snapshots are written.
+
+    Returns:
+        False if the timeout expired first
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    _wakeup.set()
+    with _lock:
+        while _pending or _writing:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            _idle.wait(remaining)
+    return True
+
+
+def get_backup_stats() -> Dict[str, int]:
+    """Return counters of backup writes plus the number of queued snapshots."""
+    with _lock:
+        return {**_stats, 'pending': len(_pending)}
+
+
+def _enqueue(path: Path, data: Any) -> None:
+    global _writer
+    with _lock:
+        if path in _pending:
+            _stats['coalesced'] += 1
+        _pending[path] = data
+        if _writer is None or not _writer.is_alive():
+            _writer = threading.Thread(target=_run_writer, name="backup-writer", daemon=True)
+            _writer.start()
+        if len(_pending) >= FLUSH_BATCH_SIZE:
+            _wakeup.set()
+
+
+def _run_writer() -> None:
+    global _writing
+    while True:
+        _wakeup.wait(FLUSH_INTERVAL_SECONDS)
+        _wakeup.clear()
+        with _lock:
+            batch = dict(_pending)
+            _pending.clear()
+            _writing = bool(batch)
+        if batch:
+            _write_batch(batch)
+        with _lock:
+            _writing = False
+            _idle.notify_all()
+
+
+def _write_batch(batch: Dict[Path, Any]) -> None:
+    written = deleted = errors = 0
+    fsync = fsync_enabled()
+    for path, data in batch.items():
+        try:
+            if data is _DELETE:
+                path.unlink(missing_ok=True)
+                deleted += 1
+            else:
+                write_json_atomic(path, data, fsync=fsync, sync_dir=False)
+                written += 1
+        except Exception as e:
+            # The database still has the data; the next save retries the file
+            print(f"⚠️ Error writing backup {path.name}: {e}")
+            errors += 1
+    if fsync:
+        for directory in {path.parent for path in batch}:
+            fsync_directory(directory)
+    with _lock:
+        _stats['written'] += written
+        _stats['deleted'] += deleted
+        _stats['errors'] += errors
+        _stats['batches'] += 1
+
+
+@atexit.register
+def _flush_at_exit() -> None:
+    if _pending:
+        flush_backups(timeout=10)
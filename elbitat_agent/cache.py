@@ -0,0 +1,127 @@
+"""In-process read cache for the data layer, invalidated by table versions.
+
+Readers are decorated with ``@cached_by_tables("drafts", ...)``: their
+results are cached per arguments and per version of the tables they read.
+Writers are decorated with ``@invalidates("drafts", ...)``, which bumps the
+table versions after every call so the next read misses the cache.
+
+Streamlit reruns the whole script on every widget interaction; with this
+cache those reruns are served from memory until something is written.
+Entries also expire after MAX_AGE_SECONDS so that writes made by other
+processes (or directly in Supabase) eventually become visible.
+
+Readers that catch their own errors and return a fallback (``[]``, ``{}``,
+``0``) call ``read_failed()`` in the handler, so the fallback is returned
+but not cached and the next call tries the database again.
+"""
+
+from __future__ import annotations
+
+import copy
+import functools
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Tuple
+
+MAX_ENTRIES = 256
+MAX_AGE_SECONDS = 300
+
+_lock = threading.Lock()
+_table_versions: Dict[str, int] = {}
+_entries: "OrderedDict[Tuple, Any]" = OrderedDict()
+_stats = {'hits': 0, 'misses': 0}
+_reads = threading.local()
+
+
+def get_table_version(table: str) -> int:
+    """Return the current version of ``table``."""
+    return _table_versions.get(table, 0)
+
+
+def bump_table_version(*tables: str) -> None:
+    """Invalidate cached reads of ``tables``."""
+    with _lock:
+        for table in tables:
+            _table_versions[table] = _table_versions.get(table, 0) + 1
+
+
+def clear_cache() -> None:
+    """Drop every cached result."""
+    with _lock:
+        _entries.clear()
+
+
+def get_cache_stats() -> Dict[str, int]:
+    """Return hit/miss counters and the number of cached entries."""
+    return {**_stats, 'entries': len(_entries)}
+
+
+def read_failed() -> None:
+    """Mark the result of the cached reader running on this thread as a fallback not to cache."""
+    _reads.failed = True
+
+
+def copy_rows(rows):
+    """Copy a list of flat row dicts (cheaper than a deep copy)."""
+    return [dict(row) for row in rows]
+
+
+def cached_by_tables(*tables: str, copy_result: Callable[[Any], Any] = copy.deepcopy):
+    """Cache a reader's results until one of ``tables`` is written.
+
+    Args:
+        *tables: Tables (or other named data sources) the reader depends on
+        copy_result: Applied to the cached value on every call so callers
+            can modify what they get back without corrupting the cache
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            versions = tuple(get_table_version(t) for t in tables)
+            key = (func.__module__, func.__qualname__, args, tuple(sorted(kwargs.items())), versions)
+            with _lock:
+                entry = _entries.get(key)
+                hit = entry is not None and time.monotonic() - entry[0] < MAX_AGE_SECONDS
+                if hit:
+                    _entries.move_to_end(key)
+                _stats['hits' if hit else 'misses'] += 1
+            if hit:
+                return copy_result(entry[1])
+
+            outer_failed = getattr(_reads, 'failed', False)
+            _reads.failed = False
+            try:
+                result = func(*args, **kwargs)
+            finally:
+                failed = _reads.failed
+                # A failure inside a nested cached reader also fails this one
+                _reads.failed = outer_failed or failed
+
+            with _lock:
+                # Skip storing if the reader failed, or if a write happened while we were reading
+                if not failed and versions == tuple(get_table_version(t) for t in tables):
+                    _entries[key] = (time.monotonic(), result)
+                    while len(_entries) > MAX_ENTRIES:
+                        _entries.popitem(last=False)
+            return copy_result(result)
+
+        wrapper.uncached = func
+        return wrapper
+
+    return decorator
+
+
+def invalidates(*tables: str):
+    """Bump the versions of ``tables`` after every call of a writer."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                return func(*args, **kwargs)
+            finally:
+                bump_table_version(*tables)
+
+        return wrapper
+
+    return decorator
@@ -12,7 +12,9 @@ Set these environment variables or create a .env file:
 from __future__ import annotations
 
 import os
+import sys
 import tempfile
+import threading
 from dataclasses import dataclass
 from pathlib import Path
 
@@ -56,8 +58,90 @@ class SocialMediaConfig:
         return bool(self.tiktok_access_token and self.tiktok_open_id)
 
 
+def get_secret(name: str, default=None):
+    """Return a secret from Streamlit secrets or the environment.
+
+    Streamlit secrets are only consulted when Streamlit is already imported
+    (i.e. inside the app), so the CLI and scripts never pay for importing
+    it; elsewhere the environment variable ``name.upper()`` is used.
+    """
+    st = sys.modules.get("streamlit")
+    if st is not None:
+        try:
+            if name in st.secrets:
+                return st.secrets[name]
+        except Exception:
+            # No secrets file configured
+            pass
+    return os.getenv(name.upper(), default)
+
+
+class Workspace:
+    """The resolved workspace folder.
+
+    Subfolders are created the first time they are asked for and remembered,
+    so repeated lookups are pure in-memory operations.
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+        self._created: set = set()
+        self._lock = threading.Lock()
+
+    def dir(self, name: str) -> Path:
+        """Return the subfolder ``name`` (e.g. 'drafts'), creating it if needed."""
+        path = self.root / name
+        if name not in self._created:
+            with self._lock:
+                path.mkdir(parents=True, exist_ok=True)
+                self._created.add(name)
+        return path
+
+
+_workspace: Workspace | None = None
+_workspace_env: str | None = None
+_workspace_lock = threading.Lock()
+
+
+def get_workspace() -> Workspace:
+    """Return the workspace, resolving it on first use.
+
+    The folder is resolved (and its writability probed) once per process, or
+    again when ELBITAT_WORKSPACE changes or after refresh_workspace().
+    """
+    global _workspace, _workspace_env
+    env = os.getenv("ELBITAT_WORKSPACE")
+    workspace = _workspace
+    if workspace is not None and env == _workspace_env:
+        return workspace
+    with _workspace_lock:
+        if _workspace is None or env != _workspace_env:
+            _workspace = Workspace(_resolve_workspace_path())
+            _workspace_env = env
+        return _workspace
+
+
+def refresh_workspace() -> Workspace:
+    """Forget the resolved workspace (e.g. after its folders were moved or
+    deleted) and resolve it again."""
+    global _workspace
+    with _workspace_lock:
+        _workspace = None
+    return get_workspace()
+
+
 def get_workspace_path() -> Path:
-    r"""Return the base workspace folder where JSON files will live.
+    """Return the base workspace folder where JSON files will live."""
+    return get_workspace().root
+
+
+def get_workspace_dir(name: str) -> Path:
+    """Return a workspace subfolder ('requests', 'drafts', 'scheduled', ...), created on first use."""
+    return get_workspace().dir(name)
+
+
+def _resolve_workspace_path() -> Path:
+    r"""Find the base workspace folder, checking that it is writable.
 
     Default: ~/ElbitatAds (e.g. C:\Users\<user>\ElbitatAds on Windows)
     On cloud/restricted environments: Uses temp directory
@@ -0,0 +1,223 @@
+"""CSV export and import of the email contact list, streamed in chunks.
+
+Export reads the contacts matching the Contact List filters through one
+database cursor, a chunk at a time, and writes them with the ``csv`` module
+(so commas, quotes and line breaks in company names or notes survive).
+Import reads a CSV a row at a time, validates each row and upserts them in
+batches (``database.import_email_contacts``), in one transaction. Either
+way memory stays flat, whether the file has a hundred rows or a hundred
+thousand.
+
+The file has one row per contact with the columns of CSV_COLUMNS. On
+import the header decides which column is which (the export's headers, the
+database field names and a few common variants are recognised), and only
+the Email column is required. Comma, semicolon and tab separated files are
+accepted.
+
+    with open("contacts.csv", "w", newline="", encoding="utf-8") as f:
+        write_contacts_csv(f, status="active")
+    result = import_contacts_csv("contacts.csv")
+    # -> {'rows': 1200, 'inserted': 1150, 'updated': 40, 'invalid': 10, 'errors': [...]}
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import itertools
+import os
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple, Union
+
+from .agents.email_finder import validate_email
+
+# (field, header) of each column, in file order
+CSV_COLUMNS = [
+    ('email', 'Email'),
+    ('company_name', 'Company'),
+    ('website', 'Website'),
+    ('country', 'Country'),
+    ('industry', 'Industry'),
+    ('status', 'Status'),
+    ('source', 'Source'),
+    ('notes', 'Notes'),
+]
+
+# Other header spellings recognised on import (lower case)
+HEADER_ALIASES = {
+    'e-mail': 'email', 'email address': 'email', 'e-mail address': 'email',
+    'company name': 'company_name', 'company_name': 'company_name', 'organisation': 'company_name',
+    'organization': 'company_name', 'url': 'website', 'web site': 'website', 'nation': 'country',
+    'note': 'notes',
+}
+
+IMPORT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+DEFAULT_IMPORT_SOURCE = 'csv_import'
+
+# Positions of the exported fields in a database.CONTACT_COLUMNS row
+_ROW_POSITIONS = {'email': 1, 'company_name': 2, 'website': 3, 'country': 4, 'industry': 5,
+                  'status': 6, 'source': 7, 'notes': 8}
+
+
+class ContactImportError(ValueError):
+    """The file cannot be read as a contact list."""
+
+
+def write_contacts_csv(file, status: str = None, country: str = None, industry: str = None,
+                       search: str = None) -> int:
+    """Write the contacts matching the filters to a text file as CSV.
+
+    Args:
+        file: Text file opened with ``newline=''``
+        status, country, industry, search: Filters, as for query_email_contacts
+
+    Returns:
+        Number of contacts written
+    """
+    from .database import iter_email_contacts
+
+    positions = [_ROW_POSITIONS[field] for field, _ in CSV_COLUMNS]
+    writer = csv.writer(file)
+    writer.writerow([header for _, header in CSV_COLUMNS])
+    count = 0
+    for rows in iter_email_contacts(status, country, industry, search):
+        writer.writerows([['' if row[i] is None else row[i] for i in positions] for row in rows])
+        count += len(rows)
+    return count
+
+
+def export_contacts_csv(path: Union[str, Path], **filters) -> int:
+    """Write the contacts matching the filters to a CSV file; returns how many.
+
+    The file is written next to ``path`` and renamed into place, so a failed
+    export does not leave a truncated file behind.
+    """
+    path = Path(path)
+    tmp = path.with_name(path.name + '.tmp')
+    try:
+        with open(tmp, 'w', newline='', encoding='utf-8') as f:
+            count = write_contacts_csv(f, **filters)
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return count
+
+
+def import_contacts_csv(file, default_status: str = 'active', source: str = DEFAULT_IMPORT_SOURCE,
+                        batch_size: int = IMPORT_BATCH_SIZE) -> Dict:
+    """Validate a contact CSV and insert or update its contacts.
+
+    Rows are matched to existing contacts by email. Empty cells keep the
+    stored value, and an existing contact keeps its status unless the file
+    marks it bounced or unsubscribed (which also puts the address on the
+    suppression list). Invalid rows are skipped and reported.
+
+    Args:
+        file: Path, or a binary or text file object (e.g. a Streamlit upload)
+        default_status: Status of new contacts whose row has none
+        source: Source of contacts whose row has none
+        batch_size: Rows per bulk upsert
+
+    Returns:
+        Dictionary with 'rows' (data rows read), 'inserted', 'updated',
+        'invalid' and 'errors' (the first MAX_REPORTED_ERRORS problems, as
+        "line N: ..." messages)
+
+    Raises:
+        ContactImportError: If the file is not a readable contact CSV
+    """
+    from .database import CONTACT_STATUSES, import_email_contacts
+
+    if default_status not in CONTACT_STATUSES:
+        raise ValueError(f"Unknown contact status {default_status!r}")
+
+    result = {'rows': 0, 'inserted': 0, 'updated': 0, 'invalid': 0, 'errors': []}
+
+    def invalid(line: int, message: str) -> None:
+        result['invalid'] += 1
+        if len(result['errors']) < MAX_REPORTED_ERRORS:
+            result['errors'].append(f"line {line}: {message}")
+
+    def valid_rows() -> Iterator[Tuple]:
+        for line, values in _read_rows(file):
+            result['rows'] += 1
+            email = values.get('email') or ''
+            if not validate_email(email):
+                invalid(line, f"invalid email address {email!r}" if email else "no email address")
+                continue
+            status = (values.get('status') or default_status).lower()
+            if status not in CONTACT_STATUSES:
+                invalid(line, f"unknown status {values['status']!r} (expected one of {', '.join(CONTACT_STATUSES)})")
+                continue
+            yield (email, values.get('company_name'), values.get('website'), values.get('country'),
+                   values.get('industry'), values.get('source') or source, status, values.get('notes'))
+
+    rows = valid_rows()
+    batches = iter(lambda: list(itertools.islice(rows, batch_size)), [])
+    try:
+        result.update(import_email_contacts(batches, source=source))
+    except UnicodeDecodeError as e:
+        raise ContactImportError(f"The file is not UTF-8 encoded text ({e.reason} at byte {e.start}); "
+                                 "save it as 'CSV UTF-8' and try again") from None
+    except csv.Error as e:
+        raise ContactImportError(f"The file is not a valid CSV: {e}") from None
+    return result
+
+
+def _read_rows(file) -> Iterator[Tuple[int, Dict[str, str]]]:
+    """Yield (line number, {field: stripped value or None}) for each non-empty data row."""
+    with _open_text(file) as text:
+        first = text.readline()
+        if not first.strip():
+            raise ContactImportError("The file is empty")
+        # Only the separator is guessed (from the header); quoting is always Excel's
+        try:
+            delimiter = csv.Sniffer().sniff(first, delimiters=',;\t').delimiter
+        except csv.Error:
+            delimiter = ','
+        reader = csv.reader(itertools.chain([first], text), delimiter=delimiter)
+        fields = _header_fields(next(reader))
+        for values in reader:
+            if not any(value.strip() for value in values):
+                continue
+            yield reader.line_num, {field: value.strip() or None
+                                    for field, value in zip(fields, values) if field is not None}
+
+
+def _header_fields(header: List[str]) -> List[Union[str, None]]:
+    """Map header cells to contact fields (None for columns that are not imported)."""
+    known = {field: field for field, _ in CSV_COLUMNS}
+    known.update({label.lower(): field for field, label in CSV_COLUMNS})
+    known.update(HEADER_ALIASES)
+    fields = [known.get(cell.strip().lstrip('\ufeff').lower()) for cell in header]
+    if 'email' not in fields:
+        raise ContactImportError(f"No Email column in the header ({', '.join(header)})")
+    # Only the first of repeated columns is used
+    return [field if field not in fields[:i] else None for i, field in enumerate(fields)]
+
+
+class _open_text:
+    """Context manager giving a text stream over a path or a text/binary file object."""
+
+    def __init__(self, file):
+        self.file = file
+        self._opened = None
+        self._wrapper = None
+
+    def __enter__(self):
+        if isinstance(self.file, (str, Path)):
+            self._opened = open(self.file, newline='', encoding='utf-8-sig')
+            return self._opened
+        if isinstance(self.file, io.TextIOBase):
+            return self.file
+        self._wrapper = io.TextIOWrapper(self.file, encoding='utf-8-sig', newline='')
+        return self._wrapper
+
+    def __exit__(self, *exc):
+        if self._opened is not None:
+            self._opened.close()
+        if self._wrapper is not None:
+            # Leave the caller's file open
+            self._wrapper.detach()
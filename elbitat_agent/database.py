@@ -2,23 +2,31 @@
 
 import sqlite3
 import json
+import re
+import threading
+import time
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Optional
-import streamlit as st
-
-# Try to import Supabase functions
-try:
-    from .supabase_db import (
-        get_supabase_client,
-        save_draft_to_supabase, get_all_drafts_from_supabase, delete_draft_from_supabase,
-        save_request_to_supabase, get_all_requests_from_supabase, delete_request_from_supabase,
-        save_scheduled_post_to_supabase, get_all_scheduled_posts_from_supabase, delete_scheduled_post_from_supabase
-    )
-    USE_SUPABASE = True
-except ImportError:
-    USE_SUPABASE = False
-    print("ℹ️ Supabase not available, using SQLite")
+from typing import Dict, List, Optional, Tuple
+
+from .config import get_secret
+from .models import BRIEF_PREVIEW_CHARS, draft_summary
+from .cache import bump_table_version, cached_by_tables, copy_rows, invalidates, read_failed
+from .suppression import SUPPRESSION_STATUSES, email_hash, normalize_email
+
+_init_lock = threading.Lock()
+_initialized_paths = set()
+
+
+def _supabase():
+    """Return the Supabase adapter module if Supabase is configured, else None.
+    
+    The adapter (and the supabase package) is only imported on first use.
+    """
+    from . import supabase_db
+    if supabase_db.get_supabase_client():
+        return supabase_db
+    return None
 
 
 def get_db_path() -> Path:
@@ -28,8 +36,9 @@ def get_db_path() -> Path:
     which persists across app restarts (but not across redeployments without mounted volumes).
     """
     # Try to use a persistent location
-    if hasattr(st, 'secrets') and 'db_path' in st.secrets:
-        db_path = Path(st.secrets['db_path'])
+    configured = get_secret('db_path')
+    if configured:
+        db_path = Path(configured)
     else:
         # Use app root directory for better persistence on Streamlit Cloud
         # This will be at the same level as streamlit_app.py
@@ -39,12 +48,215 @@ def get_db_path() -> Path:
     return db_path / 'elbitat_ads.db'
 
 
-def init_database():
-    """Initialize the database with required tables."""
-    db_path = get_db_path()
-    conn = sqlite3.connect(str(db_path))
-    cursor = conn.cursor()
+# Seed the dashboard counters and install the triggers that maintain them.
+# "scheduled" counts scheduled posts that have not been posted yet.
+STATS_COUNTER_SQL = '''
+    INSERT OR IGNORE INTO stats_counters (name, value) SELECT 'drafts', COUNT(*) FROM drafts;
+    INSERT OR IGNORE INTO stats_counters (name, value)
+        SELECT 'scheduled', COUNT(*) FROM scheduled_posts WHERE status IS NOT 'posted';
+    INSERT OR IGNORE INTO stats_counters (name, value)
+        SELECT 'posted', COUNT(*) FROM activity_events WHERE event_type = 'posted';
+
+    CREATE TRIGGER IF NOT EXISTS trg_drafts_count_insert AFTER INSERT ON drafts
+    BEGIN
+        UPDATE stats_counters SET value = value + 1 WHERE name = 'drafts';
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_drafts_count_delete AFTER DELETE ON drafts
+    BEGIN
+        UPDATE stats_counters SET value = value - 1 WHERE name = 'drafts';
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_scheduled_count_insert AFTER INSERT ON scheduled_posts
+    WHEN NEW.status IS NOT 'posted'
+    BEGIN
+        UPDATE stats_counters SET value = value + 1 WHERE name = 'scheduled';
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_scheduled_count_delete AFTER DELETE ON scheduled_posts
+    WHEN OLD.status IS NOT 'posted'
+    BEGIN
+        UPDATE stats_counters SET value = value - 1 WHERE name = 'scheduled';
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_scheduled_count_update AFTER UPDATE OF status ON scheduled_posts
+    WHEN (OLD.status IS 'posted') != (NEW.status IS 'posted')
+    BEGIN
+        UPDATE stats_counters
+        SET value = value + (CASE WHEN NEW.status IS 'posted' THEN -1 ELSE 1 END)
+        WHERE name = 'scheduled';
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_posted_count_insert AFTER INSERT ON activity_events
+    WHEN NEW.event_type = 'posted'
+    BEGIN
+        UPDATE stats_counters SET value = value + 1 WHERE name = 'posted';
+    END;
+'''
+
+
+# Full-text search: one FTS5 table per searchable table, keyed by the source
+# row id and kept in sync by triggers. Each entry has a title and a body made
+# of the text fields worth searching.
+SEARCH_DOCUMENTS = {
+    'drafts': (
+        "json_extract({row}.content, '$.request.title')",
+        [
+            "json_extract({row}.content, '$.request.brief')",
+            "json_extract({row}.content, '$.request.goal')",
+            "json_extract({row}.content, '$.request.audience')",
+            "json_extract({row}.content, '$.copy_by_platform.instagram.caption')",
+            "json_extract({row}.content, '$.copy_by_platform.instagram.hashtags')",
+            "json_extract({row}.content, '$.copy_by_platform.facebook.message')",
+            "json_extract({row}.content, '$.copy_by_platform.tiktok.caption')",
+            "json_extract({row}.content, '$.copy_by_platform.tiktok.script')",
+        ],
+    ),
+    'requests': (
+        "json_extract({row}.content, '$.title')",
+        [
+            "json_extract({row}.content, '$.brief')",
+            "json_extract({row}.content, '$.goal')",
+            "json_extract({row}.content, '$.audience')",
+            "json_extract({row}.content, '$.month')",
+        ],
+    ),
+    'email_contacts': (
+        "{row}.company_name",
+        ["{row}.email", "{row}.website", "{row}.country", "{row}.industry", "{row}.notes"],
+    ),
+}
+
+
+def _search_document(table: str, row: str) -> str:
+    """SQL expressions for the (title, body) search entry of a row of ``table``."""
+    title, body = SEARCH_DOCUMENTS[table]
+    body_sql = " || ' ' || ".join(f"coalesce({expr}, '')" for expr in body)
+    return f"{title.format(row=row)}, {body_sql.format(row=row)}"
+
+
+def _search_columns(table: str) -> List[str]:
+    """Columns of ``table`` that its search entry is built from."""
+    title, body = SEARCH_DOCUMENTS[table]
+    found = re.findall(r'\{row\}\.(\w+)', ' '.join([title, *body]))
+    return list(dict.fromkeys(found))
+
+
+def _search_update_trigger_sql(table: str) -> str:
+    """SQL creating the trigger that re-indexes a row when its searched columns change.
+    
+    Updates of other columns (contact status, extracted draft columns) and
+    updates that write the same values (upserts) leave the index alone.
+    """
+    fts = f'{table}_fts'
+    columns = _search_columns(table)
+    changed = ' OR '.join(f'OLD.{column} IS NOT NEW.{column}' for column in columns)
+    return f'''
+        CREATE TRIGGER IF NOT EXISTS trg_{fts}_update AFTER UPDATE OF {', '.join(columns)} ON {table}
+        WHEN {changed}
+        BEGIN
+            DELETE FROM {fts} WHERE rowid = OLD.id;
+            INSERT INTO {fts} (rowid, title, body) VALUES (NEW.id, {_search_document(table, 'NEW')});
+        END;
+    '''
+
+
+def _search_index_sql(table: str) -> str:
+    """SQL creating the FTS5 table for ``table`` and the triggers maintaining it."""
+    fts = f'{table}_fts'
+    new_doc = f"NEW.id, {_search_document(table, 'NEW')}"
+    return f'''
+        CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+            title, body, tokenize = 'unicode61 remove_diacritics 2'
+        );
+        CREATE TRIGGER IF NOT EXISTS trg_{fts}_insert AFTER INSERT ON {table}
+        BEGIN
+            INSERT INTO {fts} (rowid, title, body) VALUES ({new_doc});
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_{fts}_delete AFTER DELETE ON {table}
+        BEGIN
+            DELETE FROM {fts} WHERE rowid = OLD.id;
+        END;
+    ''' + _search_update_trigger_sql(table)
+
+
+def _populate_search_index(cursor, table: str) -> None:
+    """(Re)build the FTS5 table of ``table`` from its current rows."""
+    fts = f'{table}_fts'
+    cursor.execute(f'DELETE FROM {fts}')
+    cursor.execute(f'''
+        INSERT INTO {fts} (rowid, title, body)
+        SELECT t.id, {_search_document(table, 't')} FROM {table} t
+    ''')
+
+
+# Queryable fields extracted from the JSON documents into their own columns.
+# The JSON in `content` stays the source of truth for everything else.
+EXTRACTED_COLUMNS = {
+    'requests': {'title': 'TEXT', 'goal': 'TEXT', 'month': 'TEXT'},
+    'drafts': {'title': 'TEXT', 'goal': 'TEXT', 'month': 'TEXT', 'brief_preview': 'TEXT'},
+    'scheduled_posts': {'title': 'TEXT'},
+}
+
+BACKFILL_EXTRACTED_SQL = {
+    'requests': '''
+        UPDATE requests SET
+            title = json_extract(content, '$.title'),
+            goal = json_extract(content, '$.goal'),
+            month = json_extract(content, '$.month')
+    ''',
+    'drafts': f'''
+        UPDATE drafts SET
+            title = json_extract(content, '$.request.title'),
+            goal = json_extract(content, '$.request.goal'),
+            month = json_extract(content, '$.request.month'),
+            brief_preview = substr(json_extract(content, '$.request.brief'), 1, {BRIEF_PREVIEW_CHARS + 1})
+    ''',
+    'scheduled_posts': '''
+        UPDATE scheduled_posts SET title = json_extract(content, '$.draft.request.title')
+    ''',
+}
+
+
+def _add_missing_columns(cursor, table: str, columns: Dict[str, str]) -> bool:
+    """Add the columns of ``columns`` that ``table`` lacks; return True if any were added."""
+    cursor.execute(f'PRAGMA table_info({table})')
+    existing = {row[1] for row in cursor.fetchall()}
+    missing = [name for name in columns if name not in existing]
+    for name in missing:
+        cursor.execute(f'ALTER TABLE {table} ADD COLUMN {name} {columns[name]}')
+    return bool(missing)
+
+
+def _request_fields(request: Dict) -> tuple:
+    """Extract (title, goal, month, platforms) from a request dictionary."""
+    request = request or {}
+    platforms = request.get('platforms') or []
+    return request.get('title'), request.get('goal'), request.get('month'), list(platforms)
+
+
+# ===== SCHEMA MIGRATIONS =====
+#
+# The schema is built by ordered migration steps. Each step runs once, in its
+# own transaction, and is recorded in the schema_version table; init_database
+# only checks the recorded version when the database is up to date. To change
+# the schema, append a new step - never edit a step that has been released.
+# Steps must also be safe on databases created before versioning existed.
+
+def _execute_script(cursor, script: str) -> None:
+    """Execute a multi-statement script inside the current transaction.
     
+    Unlike ``executescript`` this does not commit first, so a failing
+    migration step is rolled back as a whole.
+    """
+    statement = ''
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            cursor.execute(statement)
+            statement = ''
+    if statement.strip():
+        cursor.execute(statement)
+
+
+def _migrate_base_tables(cursor) -> None:
     # Requests table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS requests (
@@ -132,36 +344,343 @@ def init_database():
         )
     ''')
 
-    # Migration: Fix any contacts with NULL status (from old INSERT OR REPLACE)
+
+def _migrate_contact_status(cursor) -> None:
+    # Fix any contacts with NULL status (from old INSERT OR REPLACE)
     cursor.execute('''
         UPDATE email_contacts
         SET status = 'active'
         WHERE status IS NULL OR status = ''
     ''')
-
+    
     rows_updated = cursor.rowcount
     if rows_updated > 0:
         print(f"✅ Migration: Fixed {rows_updated} contacts with NULL status")
+        bump_table_version('email_contacts')
+
+
+def _migrate_listing_indexes(cursor) -> None:
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_drafts_created_at ON drafts(created_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_email_contacts_status_created ON email_contacts(status, created_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_email_contacts_created_at ON email_contacts(created_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_email_contacts_country ON email_contacts(country)')
+
+
+def _migrate_dashboard_stats(cursor) -> None:
+    # Activity events (posted content etc.) for the dashboard's recent activity
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS activity_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            event_type TEXT NOT NULL,
+            filename TEXT,
+            title TEXT,
+            details TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_activity_events_type_created
+        ON activity_events(event_type, created_at)
+    ''')
+    
+    # Dashboard counters, kept up to date by triggers so reading them is O(1)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS stats_counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    _execute_script(cursor, STATS_COUNTER_SQL)
+
+
+def _migrate_search_index(cursor) -> None:
+    # Full-text search indexes, filled from the existing rows
+    for table in SEARCH_DOCUMENTS:
+        _execute_script(cursor, _search_index_sql(table))
+        _populate_search_index(cursor, table)
+
+
+def _migrate_extracted_columns(cursor) -> None:
+    # Queryable fields extracted from the JSON content
+    for table, columns in EXTRACTED_COLUMNS.items():
+        _add_missing_columns(cursor, table, columns)
+        cursor.execute(BACKFILL_EXTRACTED_SQL[table])
+    
+    # Draft platforms, one row per platform so drafts can be filtered by platform
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS draft_platforms (
+            draft_id INTEGER NOT NULL,
+            platform TEXT NOT NULL,
+            position INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (draft_id, platform)
+        )
+    ''')
+    cursor.execute('''
+        INSERT OR IGNORE INTO draft_platforms (draft_id, platform, position)
+        SELECT d.id, p.value, p.key
+        FROM drafts d, json_each(d.content, '$.request.platforms') p
+        WHERE p.type = 'text'
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_draft_platforms_delete AFTER DELETE ON drafts
+        BEGIN
+            DELETE FROM draft_platforms WHERE draft_id = OLD.id;
+        END
+    ''')
+    
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_draft_platforms_platform ON draft_platforms(platform, draft_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_drafts_goal ON drafts(goal)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_drafts_month ON drafts(month)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_requests_goal ON requests(goal)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_requests_month ON requests(month)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_scheduled_posts_status_time ON scheduled_posts(status, scheduled_time)')
+
+
+def _migrate_email_send_results(cursor) -> None:
+    # Provider message ID per send, to match delivery events back to recipients
+    _add_missing_columns(cursor, 'email_sends', {'message_id': 'TEXT'})
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_email_sends_campaign_contact ON email_sends(campaign_id, contact_id)')
+
+
+def _migrate_campaign_runs(cursor) -> None:
+    # A run stages its recipients up front; the worker claims them in seq
+    # order and checkpoints their outcomes, so a run can stop and resume
+    _execute_script(cursor, '''
+        CREATE TABLE IF NOT EXISTS email_campaign_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            campaign_id INTEGER NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            subject TEXT NOT NULL,
+            template TEXT NOT NULL,
+            batch_size INTEGER NOT NULL DEFAULT 1000,
+            total INTEGER NOT NULL DEFAULT 0,
+            sent INTEGER NOT NULL DEFAULT 0,
+            failed INTEGER NOT NULL DEFAULT 0,
+            skipped INTEGER NOT NULL DEFAULT 0,
+            cursor_seq INTEGER NOT NULL DEFAULT 0,
+            error_message TEXT,
+            worker TEXT,
+            heartbeat_at TIMESTAMP,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP,
+            FOREIGN KEY (campaign_id) REFERENCES email_campaigns(id)
+        );
+        CREATE INDEX IF NOT EXISTS idx_email_campaign_runs_campaign ON email_campaign_runs(campaign_id, id);
+        CREATE TABLE IF NOT EXISTS email_campaign_run_recipients (
+            run_id INTEGER NOT NULL,
+            seq INTEGER NOT NULL,
+            contact_id INTEGER NOT NULL,
+            email TEXT NOT NULL,
+            state TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            message_id TEXT,
+            error_message TEXT,
+            updated_at TIMESTAMP,
+            PRIMARY KEY (run_id, seq),
+            UNIQUE (run_id, contact_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_email_campaign_run_recipients_state
+            ON email_campaign_run_recipients(run_id, state, seq);
+    ''')
+    _add_missing_columns(cursor, 'email_sends', {'run_id': 'INTEGER'})
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_email_sends_run_contact ON email_sends(run_id, contact_id)')
+
+
+def _migrate_email_suppressions(cursor) -> None:
+    # Keyed by the hash of the normalised address (see suppression.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS email_suppressions (
+            email_hash TEXT PRIMARY KEY,
+            email TEXT,
+            reason TEXT NOT NULL,
+            source TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) WITHOUT ROWID
+    ''')
+    placeholders = ', '.join('?' * len(SUPPRESSION_STATUSES))
+    cursor.execute(f'SELECT email, status FROM email_contacts WHERE status IN ({placeholders})',
+                   SUPPRESSION_STATUSES)
+    cursor.executemany('''
+        INSERT OR IGNORE INTO email_suppressions (email_hash, email, reason, source)
+        VALUES (?, ?, ?, 'contact status')
+    ''', [(email_hash(email), email, status) for email, status in cursor.fetchall()])
+
+
+def _migrate_tracking_events(cursor) -> None:
+    # Raw open/click events from the tracking service; the first open and
+    # click of each send are also stamped on email_sends and counted on
+    # email_campaigns
+    _execute_script(cursor, '''
+        CREATE TABLE IF NOT EXISTS email_tracking_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            campaign_id INTEGER NOT NULL,
+            contact_id INTEGER NOT NULL,
+            url TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE INDEX IF NOT EXISTS idx_email_tracking_events_campaign ON email_tracking_events(campaign_id, kind);
+    ''')
+
+
+def _migrate_campaign_renders(cursor) -> None:
+    # A campaign's email rendered once (layout applied, placeholders turned
+    # into substitution tags) and keyed by a hash of its content; campaigns
+    # and runs point at the render they show and send
+    _execute_script(cursor, '''
+        CREATE TABLE IF NOT EXISTS email_campaign_renders (
+            content_hash TEXT PRIMARY KEY,
+            subject TEXT NOT NULL,
+            html TEXT NOT NULL,
+            tags TEXT NOT NULL,
+            preview_subject TEXT NOT NULL,
+            preview_html TEXT NOT NULL,
+            problems TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) WITHOUT ROWID;
+    ''')
+    _add_missing_columns(cursor, 'email_campaigns', {'render_hash': 'TEXT'})
+    _add_missing_columns(cursor, 'email_campaign_runs', {'render_hash': 'TEXT'})
+
 
-    conn.commit()
-    conn.close()
+def _migrate_search_update_triggers(cursor) -> None:
+    # The first search triggers re-indexed a row on any update
+    for table in SEARCH_DOCUMENTS:
+        cursor.execute(f'DROP TRIGGER IF EXISTS trg_{table}_fts_update')
+        _execute_script(cursor, _search_update_trigger_sql(table))
+
+
+# (version, description, step) in the order they are applied
+MIGRATIONS = [
+    (1, 'Base tables', _migrate_base_tables),
+    (2, 'Default status for contacts without one', _migrate_contact_status),
+    (3, 'Indexes for draft and contact listings', _migrate_listing_indexes),
+    (4, 'Activity events and dashboard counters', _migrate_dashboard_stats),
+    (5, 'Full-text search indexes', _migrate_search_index),
+    (6, 'Extracted draft, request and scheduled post columns', _migrate_extracted_columns),
+    (7, 'Email send message IDs', _migrate_email_send_results),
+    (8, 'Resumable email campaign runs', _migrate_campaign_runs),
+    (9, 'Email suppression list', _migrate_email_suppressions),
+    (10, 'Email open and click tracking events', _migrate_tracking_events),
+    (11, 'Pre-rendered campaign emails', _migrate_campaign_renders),
+    (12, 'Re-index search entries only when searched columns change', _migrate_search_update_triggers),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def _get_schema_version(cursor) -> int:
+    try:
+        cursor.execute('SELECT MAX(version) FROM schema_version')
+    except sqlite3.OperationalError:
+        # No schema_version table yet
+        return 0
+    return cursor.fetchone()[0] or 0
+
+
+def get_schema_version() -> int:
+    """Get the version of the last migration applied to the database."""
+    conn = sqlite3.connect(str(get_db_path()))
+    try:
+        return _get_schema_version(conn.cursor())
+    finally:
+        conn.close()
+
+
+def get_connection() -> sqlite3.Connection:
+    """Open a connection to the SQLite database.
+    
+    The schema is brought up to date the first time each database file is
+    used in this process, so importing this module does no database work.
+    """
+    db_path = get_db_path()
+    if db_path not in _initialized_paths:
+        with _init_lock:
+            if db_path not in _initialized_paths:
+                init_database()
+                _initialized_paths.add(db_path)
+    return sqlite3.connect(str(db_path))
+
+
+def init_database():
+    """Bring the database schema up to date.
+    
+    Applies the migration steps newer than the recorded schema version. When
+    the database is already up to date this is a single SELECT.
+    """
+    db_path = get_db_path()
+    conn = sqlite3.connect(str(db_path), isolation_level=None)
+    cursor = conn.cursor()
+    
+    try:
+        if _get_schema_version(cursor) >= SCHEMA_VERSION:
+            return
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description TEXT,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        for version, description, migrate in MIGRATIONS:
+            # Take the write lock, then re-check in case another process
+            # applied this step in the meantime
+            cursor.execute('BEGIN IMMEDIATE')
+            try:
+                if _get_schema_version(cursor) >= version:
+                    cursor.execute('COMMIT')
+                    continue
+                migrate(cursor)
+                cursor.execute('INSERT INTO schema_version (version, description) VALUES (?, ?)',
+                               (version, description))
+                cursor.execute('COMMIT')
+            except Exception:
+                cursor.execute('ROLLBACK')
+                raise
+            print(f"✅ Migration {version}: {description}")
+    finally:
+        conn.close()
+
+
+def _column_filters(goal: str = None, month: str = None, platform: str = None):
+    """Build the WHERE clause and parameters for filtering requests or drafts."""
+    clauses = []
+    params = []
+    if goal:
+        clauses.append('goal = ?')
+        params.append(goal)
+    if month:
+        clauses.append('month = ?')
+        params.append(month)
+    if platform:
+        clauses.append('id IN (SELECT draft_id FROM draft_platforms WHERE platform = ?)')
+        params.append(platform)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+    return where, params
 
 
 # ===== REQUEST OPERATIONS =====
 
+@invalidates('requests')
 def save_request_to_db(filename: str, data: Dict) -> bool:
     """Save a request to the database."""
     try:
-        db_path = get_db_path()
-        conn = sqlite3.connect(str(db_path))
+        conn = get_connection()
         cursor = conn.cursor()
         
         content_json = json.dumps(data, ensure_ascii=False)
+        title, goal, month, _ = _request_fields(data)
         
         cursor.execute('''
-            INSERT OR REPLACE INTO requests (filename, content, updated_at)
-            VALUES (?, ?, ?)
-        ''', (filename, content_json, datetime.now()))
+            INSERT INTO requests (filename, content, title, goal, month, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(filename) DO UPDATE SET
+                content = excluded.content, title = excluded.title, goal = excluded.goal,
+                month = excluded.month, updated_at = excluded.updated_at
+        ''', (filename, content_json, title, goal, month, datetime.now()))
         
         conn.commit()
         conn.close()
@@ -171,14 +690,15 @@ def save_request_to_db(filename: str, data: Dict) -> bool:
         return False
 
 
-def get_all_requests() -> List[Dict]:
-    """Get all requests from the database."""
+@cached_by_tables('requests')
+def get_all_requests(goal: str = None, month: str = None) -> List[Dict]:
+    """Get all requests from the database, optionally filtered by goal and month."""
     try:
-        db_path = get_db_path()
-        conn = sqlite3.connect(str(db_path))
+        conn = get_connection()
         cursor = conn.cursor()
         
-        cursor.execute('SELECT filename, content FROM requests ORDER BY created_at DESC')
+        where, params = _column_filters(goal=goal, month=month)
+        cursor.execute(f'SELECT filename, content FROM requests {where} ORDER BY created_at DESC', params)
         rows = cursor.fetchall()
         conn.close()
         
@@ -190,15 +710,16 @@ def get_all_requests() -> List[Dict]:
         
         return requests
     except Exception as e:
+        read_failed()
         print(f"Error loading requests from DB: {e}")
         return []
 
 
+@invalidates('requests')
 def delete_request_from_db(filename: str) -> bool:
     """Delete a request from the database."""
     try:
-        db_path = get_db_path()
-        conn = sqlite3.connect(str(db_path))
+        conn = get_connection()
         cursor = conn.cursor()
         
         cursor.execute('DELETE FROM requests WHERE filename = ?', (filename,))
@@ -213,29 +734,48 @@ def delete_request_from_db(filename: str) -> bool:
 
 # ===== DRAFT OPERATIONS =====
 
+def _upsert_draft(cursor: sqlite3.Cursor, filename: str, data: Dict) -> None:
+    """Insert or update one draft row and its draft_platforms rows."""
+    content_json = json.dumps(data, ensure_ascii=False)
+    service = data.get('service', '')
+    image_path = data.get('image_path', '')
+    title, goal, month, platforms = _request_fields(data.get('request'))
+    brief = (data.get('request') or {}).get('brief') or ''
+    
+    cursor.execute('''
+        INSERT INTO drafts (filename, content, service, image_path,
+                            title, goal, month, brief_preview, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(filename) DO UPDATE SET
+            content = excluded.content, service = excluded.service,
+            image_path = excluded.image_path, title = excluded.title,
+            goal = excluded.goal, month = excluded.month,
+            brief_preview = excluded.brief_preview, updated_at = excluded.updated_at
+    ''', (filename, content_json, service, image_path, title, goal, month,
+          brief[:BRIEF_PREVIEW_CHARS + 1], datetime.now()))
+    
+    cursor.execute('SELECT id FROM drafts WHERE filename = ?', (filename,))
+    draft_id = cursor.fetchone()[0]
+    cursor.execute('DELETE FROM draft_platforms WHERE draft_id = ?', (draft_id,))
+    cursor.executemany(
+        'INSERT OR IGNORE INTO draft_platforms (draft_id, platform, position) VALUES (?, ?, ?)',
+        [(draft_id, platform, position) for position, platform in enumerate(platforms)]
+    )
+
+
+@invalidates('drafts')
 def save_draft_to_db(filename: str, data: Dict) -> bool:
     """Save a draft to the database (Supabase or SQLite)."""
     # Try Supabase first if available and configured
-    if USE_SUPABASE:
-        client = get_supabase_client()
-        if client:
-            return save_draft_to_supabase(filename, data)
+    supabase = _supabase()
+    if supabase:
+        return supabase.save_draft_to_supabase(filename, data)
     
     # Fallback to SQLite
     try:
-        db_path = get_db_path()
-        conn = sqlite3.connect(str(db_path))
+        conn = get_connection()
         cursor = conn.cursor()
-        
-        content_json = json.dumps(data, ensure_ascii=False)
-        service = data.get('service', '')
-        image_path = data.get('image_path', '')
-        
-        cursor.execute('''
-            INSERT OR REPLACE INTO drafts (filename, content, service, image_path, updated_at)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (filename, content_json, service, image_path, datetime.now()))
-        
+        _upsert_draft(cursor, filename, data)
         conn.commit()
         conn.close()
         return True
@@ -244,13 +784,48 @@ def save_draft_to_db(filename: str, data: Dict) -> bool:
         return False
 
 
-def get_all_drafts() -> List[Dict]:
-    """Get all drafts from the database (Supabase or SQLite)."""
+@invalidates('drafts')
+def save_drafts_to_db(drafts: List[Tuple[str, Dict]]) -> bool:
+    """Save many drafts at once (one transaction, or one Supabase request).
+    
+    Args:
+        drafts: (filename, draft data) pairs
+    
+    Returns:
+        True if all drafts were saved; on failure none are
+    """
+    if not drafts:
+        return True
+    
+    supabase = _supabase()
+    if supabase:
+        return supabase.save_drafts_to_supabase(drafts)
+    
+    try:
+        conn = get_connection()
+        try:
+            with conn:
+                cursor = conn.cursor()
+                for filename, data in drafts:
+                    _upsert_draft(cursor, filename, data)
+        finally:
+            conn.close()
+        return True
+    except Exception as e:
+        print(f"Error saving drafts to DB: {e}")
+        return False
+
+
+@cached_by_tables('drafts')
+def get_all_drafts(goal: str = None, month: str = None, platform: str = None) -> List[Dict]:
+    """Get all drafts from the database (Supabase or SQLite).
+    
+    The goal, month and platform filters apply to the SQLite database.
+    """
     # Try Supabase first if available and configured
-    if USE_SUPABASE:
-        client = get_supabase_client()
-        if client:
-            return get_all_drafts_from_supabase()
+    supabase = _supabase()
+    if supabase:
+        return supabase.get_all_drafts_from_supabase()
     
     # Fallback to SQLite
     try:
@@ -258,10 +833,11 @@ def get_all_drafts() -> List[Dict]:
         print(f"🗄️ Database path: {db_path}")
         print(f"🗄️ Database exists: {db_path.exists()}")
         
-        conn = sqlite3.connect(str(db_path))
+        conn = get_connection()
         cursor = conn.cursor()
         
-        cursor.execute('SELECT filename, content FROM drafts ORDER BY created_at DESC')
+        where, params = _column_filters(goal=goal, month=month, platform=platform)
+        cursor.execute(f'SELECT filename, content FROM drafts {where} ORDER BY created_at DESC', params)
         rows = cursor.fetchall()
         print(f"🗄️ Found {len(rows)} drafts in database")
         conn.close()
@@ -274,24 +850,136 @@ def get_all_drafts() -> List[Dict]:
         
         return drafts
     except Exception as e:
+        read_failed()
         print(f"❌ Error loading drafts from DB: {e}")
         import traceback
         traceback.print_exc()
         return []
 
 
+@cached_by_tables('drafts')
+def get_draft_summaries(limit: int = 12, offset: int = 0, goal: str = None,
+                        month: str = None, platform: str = None) -> Dict:
+    """Get one page of lightweight draft summaries (Supabase or SQLite).
+    
+    Summaries are read from the extracted columns, so the JSON content is
+    never transferred or parsed here.
+    
+    Args:
+        limit: Page size
+        offset: Number of drafts to skip
+        goal: Only drafts with this goal
+        month: Only drafts for this month
+        platform: Only drafts targeting this platform
+    
+    Returns:
+        Dictionary with 'total' (number of matching drafts) and 'items', a
+        list of dicts with '_filename', 'title', 'month', 'goal',
+        'platforms', 'brief_preview' and 'created_at', newest first
+    """
+    # Try Supabase first if available and configured
+    supabase = _supabase()
+    if supabase:
+        return supabase.get_draft_summaries_from_supabase(limit, offset, goal, month, platform)
+    
+    # Fallback to SQLite
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        
+        where, params = _column_filters(goal=goal, month=month, platform=platform)
+        
+        cursor.execute(f'SELECT COUNT(*) FROM drafts {where}', params)
+        total = cursor.fetchone()[0]
+        
+        cursor.execute(f'''
+            SELECT filename, title, month, goal,
+                   (SELECT group_concat(platform) FROM (
+                        SELECT platform FROM draft_platforms
+                        WHERE draft_id = drafts.id ORDER BY position)),
+                   brief_preview, created_at
+            FROM drafts
+            {where}
+            ORDER BY created_at DESC, id DESC
+            LIMIT ? OFFSET ?
+        ''', params + [limit, offset])
+        rows = cursor.fetchall()
+        conn.close()
+        
+        items = []
+        for filename, title, month, goal, platforms, brief, created_at in rows:
+            items.append(draft_summary(filename, title, month, goal,
+                                       platforms.split(',') if platforms else [], brief, created_at))
+        
+        return {'total': total, 'items': items}
+    except Exception as e:
+        read_failed()
+        print(f"Error loading draft summaries from DB: {e}")
+        return {'total': 0, 'items': []}
+
+
+@cached_by_tables('drafts')
+def get_draft_filter_options() -> Dict[str, List[str]]:
+    """Get the distinct goals, months and platforms of the drafts."""
+    options = {'goals': [], 'months': [], 'platforms': []}
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT DISTINCT goal FROM drafts WHERE goal IS NOT NULL ORDER BY goal')
+        options['goals'] = [row[0] for row in cursor.fetchall()]
+        cursor.execute('SELECT DISTINCT month FROM drafts WHERE month IS NOT NULL ORDER BY month DESC')
+        options['months'] = [row[0] for row in cursor.fetchall()]
+        cursor.execute('SELECT DISTINCT platform FROM draft_platforms ORDER BY platform')
+        options['platforms'] = [row[0] for row in cursor.fetchall()]
+        
+        conn.close()
+    except Exception as e:
+        read_failed()
+        print(f"Error loading draft filter options: {e}")
+    return options
+
+
+@cached_by_tables('drafts')
+def get_draft(filename: str) -> Optional[Dict]:
+    """Get the full content of a single draft (Supabase or SQLite)."""
+    # Try Supabase first if available and configured
+    supabase = _supabase()
+    if supabase:
+        return supabase.get_draft_from_supabase(filename)
+    
+    # Fallback to SQLite
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT content FROM drafts WHERE filename = ?', (filename,))
+        row = cursor.fetchone()
+        conn.close()
+        
+        if not row:
+            return None
+        
+        data = json.loads(row[0])
+        data['_filename'] = filename
+        return data
+    except Exception as e:
+        read_failed()
+        print(f"Error loading draft {filename} from DB: {e}")
+        return None
+
+
+@invalidates('drafts')
 def delete_draft_from_db(filename: str) -> bool:
     """Delete a draft from the database (Supabase or SQLite)."""
     # Try Supabase first if available and configured
-    if USE_SUPABASE:
-        client = get_supabase_client()
-        if client:
-            return delete_draft_from_supabase(filename)
+    supabase = _supabase()
+    if supabase:
+        return supabase.delete_draft_from_supabase(filename)
     
     # Fallback to SQLite
     try:
-        db_path = get_db_path()
-        conn = sqlite3.connect(str(db_path))
+        conn = get_connection()
         cursor = conn.cursor()
         
         cursor.execute('DELETE FROM drafts WHERE filename = ?', (filename,))
@@ -306,13 +994,15 @@ def delete_draft_from_db(filename: str) -> bool:
 
 # ===== SCHEDULED POST OPERATIONS =====
 
-def save_scheduled_post_to_db(filename: str, data: Dict) -> bool:
-    """Save a scheduled post to the database."""
-    # Safeguard: Only allow overwrite if explicitly requested (e.g., via an 'overwrite' flag in data)
-    overwrite = data.get('overwrite', False)
+@invalidates('scheduled_posts')
+def save_scheduled_post_to_db(filename: str, data: Dict, overwrite: bool = False) -> bool:
+    """Save a scheduled post to the database.
+    
+    An existing post with the same filename is only replaced if ``overwrite``
+    is set.
+    """
     try:
-        db_path = get_db_path()
-        conn = sqlite3.connect(str(db_path))
+        conn = get_connection()
         cursor = conn.cursor()
         # Check if post already exists
         cursor.execute('SELECT COUNT(*) FROM scheduled_posts WHERE filename = ?', (filename,))
@@ -323,13 +1013,18 @@ def save_scheduled_post_to_db(filename: str, data: Dict) -> bool:
             return False
         content_json = json.dumps(data, ensure_ascii=False)
         service = data.get('service', '')
-        scheduled_time = data.get('scheduled_time', '')
+        scheduled_time = data.get('scheduled_time') or data.get('publish_at') or ''
         status = data.get('status', 'pending')
+        title, _, _, _ = _request_fields((data.get('draft') or {}).get('request'))
         cursor.execute('''
-            INSERT OR REPLACE INTO scheduled_posts 
-            (filename, content, service, scheduled_time, status, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (filename, content_json, service, scheduled_time, status, datetime.now()))
+            INSERT INTO scheduled_posts 
+            (filename, content, service, scheduled_time, status, title, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(filename) DO UPDATE SET
+                content = excluded.content, service = excluded.service,
+                scheduled_time = excluded.scheduled_time, status = excluded.status,
+                title = excluded.title, updated_at = excluded.updated_at
+        ''', (filename, content_json, service, scheduled_time, status, title, datetime.now()))
         conn.commit()
         conn.close()
         return True
@@ -338,14 +1033,20 @@ def save_scheduled_post_to_db(filename: str, data: Dict) -> bool:
         return False
 
 
-def get_all_scheduled_posts() -> List[Dict]:
-    """Get all scheduled posts from the database."""
+@cached_by_tables('scheduled_posts')
+def get_all_scheduled_posts(status: str = None) -> List[Dict]:
+    """Get all scheduled posts from the database, optionally only those with ``status``."""
     try:
-        db_path = get_db_path()
-        conn = sqlite3.connect(str(db_path))
+        conn = get_connection()
         cursor = conn.cursor()
         
-        cursor.execute('SELECT filename, content FROM scheduled_posts ORDER BY scheduled_time ASC')
+        if status:
+            cursor.execute('''
+                SELECT filename, content FROM scheduled_posts
+                WHERE status = ? ORDER BY scheduled_time ASC
+            ''', (status,))
+        else:
+            cursor.execute('SELECT filename, content FROM scheduled_posts ORDER BY scheduled_time ASC')
         rows = cursor.fetchall()
         conn.close()
         
@@ -357,10 +1058,24 @@ def get_all_scheduled_posts() -> List[Dict]:
         
         return posts
     except Exception as e:
+        read_failed()
         print(f"Error loading scheduled posts from DB: {e}")
         return []
 
 
+def get_scheduled_post_filenames() -> List[str]:
+    """Get the filenames of all scheduled posts in the database.
+    
+    Database errors are raised.
+    """
+    conn = get_connection()
+    try:
+        return [row[0] for row in conn.execute('SELECT filename FROM scheduled_posts')]
+    finally:
+        conn.close()
+
+
+@invalidates('scheduled_posts')
 def delete_scheduled_post_from_db(filename: str) -> bool:
     """Delete a scheduled post from the database."""
     # Safeguard: Only allow deletion if explicitly requested (e.g., via a 'confirm_delete' flag in st.session_state)
@@ -370,8 +1085,7 @@ def delete_scheduled_post_from_db(filename: str) -> bool:
         print(f"⛔ Attempted to delete scheduled post '{filename}' without explicit confirmation.")
         return False
     try:
-        db_path = get_db_path()
-        conn = sqlite3.connect(str(db_path))
+        conn = get_connection()
         cursor = conn.cursor()
         cursor.execute('DELETE FROM scheduled_posts WHERE filename = ?', (filename,))
         conn.commit()
@@ -382,11 +1096,11 @@ def delete_scheduled_post_from_db(filename: str) -> bool:
         return False
 
 
+@invalidates('scheduled_posts')
 def update_scheduled_post_status(filename: str, status: str) -> bool:
     """Update the status of a scheduled post."""
     try:
-        db_path = get_db_path()
-        conn = sqlite3.connect(str(db_path))
+        conn = get_connection()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -403,37 +1117,150 @@ def update_scheduled_post_status(filename: str, status: str) -> bool:
         return False
 
 
-# ===== MIGRATION UTILITIES =====
+# ===== ACTIVITY & DASHBOARD STATS =====
 
-def migrate_files_to_db():
-    """Migrate existing files from file system to database (one-time operation)."""
-    from elbitat_agent.config import get_workspace_path
-    from elbitat_agent.file_storage import load_all_requests, load_all_drafts, load_all_scheduled_posts
-    
-    workspace = get_workspace_path()
-    migrated_count = {'requests': 0, 'drafts': 0, 'scheduled': 0}
-    
-    # Migrate requests
+@invalidates('activity_events')
+def record_activity_event(event_type: str, filename: str = None, title: str = None,
+                          details: Dict = None, created_at: datetime = None) -> bool:
+    """Record an activity event (e.g. 'posted') for the dashboard."""
     try:
-        requests = load_all_requests()
-        for req in requests:
-            filename = req.get('_filename', f"request_{datetime.now().timestamp()}.json")
-            if save_request_to_db(filename, req):
-                migrated_count['requests'] += 1
+        conn = get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            INSERT INTO activity_events (event_type, filename, title, details, created_at)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (event_type, filename, title,
+              json.dumps(details, ensure_ascii=False) if details is not None else None,
+              created_at or datetime.now()))
+        
+        conn.commit()
+        conn.close()
+        return True
     except Exception as e:
-        print(f"Error migrating requests: {e}")
-    
-    # Migrate drafts
+        print(f"Error recording activity event: {e}")
+        return False
+
+
+@cached_by_tables('activity_events')
+def get_recent_activity(event_type: str = None, limit: int = 5) -> List[Dict]:
+    """Get the most recent activity events, newest first."""
     try:
-        drafts = load_all_drafts()
-        for draft in drafts:
-            filename = draft.get('_filename', f"draft_{datetime.now().timestamp()}.json")
-            if save_draft_to_db(filename, draft):
-                migrated_count['drafts'] += 1
-    except Exception as e:
-        print(f"Error migrating drafts: {e}")
-    
-    # Migrate scheduled posts
+        conn = get_connection()
+        cursor = conn.cursor()
+        
+        if event_type:
+            cursor.execute('''
+                SELECT event_type, filename, title, details, created_at
+                FROM activity_events
+                WHERE event_type = ?
+                ORDER BY created_at DESC
+                LIMIT ?
+            ''', (event_type, limit))
+        else:
+            cursor.execute('''
+                SELECT event_type, filename, title, details, created_at
+                FROM activity_events
+                ORDER BY created_at DESC
+                LIMIT ?
+            ''', (limit,))
+        
+        rows = cursor.fetchall()
+        conn.close()
+        
+        events = []
+        for row in rows:
+            events.append({
+                'event_type': row[0],
+                'filename': row[1],
+                'title': row[2],
+                'details': json.loads(row[3]) if row[3] else {},
+                'created_at': row[4]
+            })
+        
+        return events
+    except Exception as e:
+        read_failed()
+        print(f"Error loading recent activity: {e}")
+        return []
+
+
+@cached_by_tables('drafts', 'scheduled_posts', 'activity_events')
+def get_dashboard_stats() -> Dict[str, int]:
+    """Get draft/scheduled/posted counts from the maintained counters."""
+    stats = {'drafts': 0, 'scheduled': 0, 'posted': 0}
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT name, value FROM stats_counters')
+        for name, value in cursor.fetchall():
+            stats[name] = value
+        
+        conn.close()
+    except Exception as e:
+        read_failed()
+        print(f"Error loading dashboard stats: {e}")
+    
+    # Drafts live in Supabase when it is configured
+    supabase = _supabase()
+    if supabase:
+        stats['drafts'] = supabase.count_drafts_in_supabase()
+    
+    return stats
+
+
+@invalidates('drafts', 'scheduled_posts', 'activity_events')
+def rebuild_stats_counters() -> bool:
+    """Recompute the dashboard counters from the tables (e.g. after manual edits)."""
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        
+        # One transaction (executescript would commit the DELETE on its own),
+        # so the counters are never seen missing or left empty by a failure
+        cursor.execute('DELETE FROM stats_counters')
+        _execute_script(cursor, STATS_COUNTER_SQL)
+        
+        conn.commit()
+        conn.close()
+        return True
+    except Exception as e:
+        print(f"Error rebuilding stats counters: {e}")
+        return False
+
+
+# ===== MIGRATION UTILITIES =====
+
+def migrate_files_to_db():
+    """Migrate existing files from file system to database (one-time operation)."""
+    from elbitat_agent.config import get_workspace_path
+    from elbitat_agent.file_storage import load_all_requests, load_all_drafts, load_all_scheduled_posts
+    
+    workspace = get_workspace_path()
+    migrated_count = {'requests': 0, 'drafts': 0, 'scheduled': 0}
+    
+    # Migrate requests
+    try:
+        requests = load_all_requests()
+        for req in requests:
+            filename = req.get('_filename', f"request_{datetime.now().timestamp()}.json")
+            if save_request_to_db(filename, req):
+                migrated_count['requests'] += 1
+    except Exception as e:
+        print(f"Error migrating requests: {e}")
+    
+    # Migrate drafts
+    try:
+        drafts = load_all_drafts()
+        for draft in drafts:
+            filename = draft.get('_filename', f"draft_{datetime.now().timestamp()}.json")
+            if save_draft_to_db(filename, draft):
+                migrated_count['drafts'] += 1
+    except Exception as e:
+        print(f"Error migrating drafts: {e}")
+    
+    # Migrate scheduled posts
     try:
         posts = load_all_scheduled_posts()
         for post in posts:
@@ -443,11 +1270,131 @@ def migrate_files_to_db():
     except Exception as e:
         print(f"Error migrating scheduled posts: {e}")
     
+    # Migrate posting results as 'posted' activity events
+    migrated_count['posted'] = 0
+    try:
+        conn = get_connection()
+        already_migrated = {
+            row[0] for row in conn.execute("SELECT filename FROM activity_events WHERE event_type = 'posted'")
+        }
+        conn.close()
+        
+        posted_dir = workspace / "posted"
+        for path in sorted(posted_dir.glob("*.json")) if posted_dir.exists() else []:
+            if path.name in already_migrated:
+                continue
+            with path.open("r", encoding="utf-8") as f:
+                payload = json.load(f)
+            title = payload.get('draft', {}).get('request', {}).get('title')
+            if record_activity_event('posted', path.name, title, payload.get('results', {}),
+                                     created_at=datetime.fromtimestamp(path.stat().st_mtime)):
+                migrated_count['posted'] += 1
+    except Exception as e:
+        print(f"Error migrating posted results: {e}")
+    
     return migrated_count
 
 
+# ===== SEARCH =====
+
+SEARCH_KINDS = {
+    'draft': ('drafts', 'filename'),
+    'request': ('requests', 'filename'),
+    'contact': ('email_contacts', 'id'),
+}
+
+
+def _fts_query(text: str) -> str:
+    """Turn free text into an FTS5 query: all words must match, the last as a prefix."""
+    words = [w.replace('"', '') for w in text.split()]
+    words = [w for w in words if w]
+    if not words:
+        return ''
+    terms = [f'"{w}"' for w in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def search(text: str, kinds: List[str] = None, limit: int = 20) -> List[Dict]:
+    """Full-text search over drafts, requests and email contacts.
+    
+    Searches the local SQLite database (drafts stored in Supabase are not
+    indexed). Titles weigh more than the rest of the text.
+    
+    Args:
+        text: Words to search for (the last word also matches as a prefix)
+        kinds: Restrict to some of 'draft', 'request' and 'contact'
+        limit: Maximum number of results
+    
+    Returns:
+        List of dicts with 'kind', 'ref' (filename, or contact ID), 'title'
+        and 'snippet' (matches wrapped in **), best match first
+    """
+    query = _fts_query(text)
+    if not query:
+        return []
+    return _search(query, tuple(kinds) if kinds else None, limit)
+
+
+@cached_by_tables('drafts', 'requests', 'email_contacts')
+def _search(query: str, kinds: tuple, limit: int) -> List[Dict]:
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        
+        selects = []
+        params = []
+        for kind, (table, ref_column) in SEARCH_KINDS.items():
+            if kinds and kind not in kinds:
+                continue
+            fts = f'{table}_fts'
+            selects.append(f'''
+                SELECT '{kind}', t.{ref_column}, {fts}.title,
+                       snippet({fts}, 1, '**', '**', '...', 12), bm25({fts}, 5.0, 1.0)
+                FROM {fts} JOIN {table} t ON t.id = {fts}.rowid
+                WHERE {fts} MATCH ?
+            ''')
+            params.append(query)
+        
+        if not selects:
+            conn.close()
+            return []
+        
+        cursor.execute(' UNION ALL '.join(selects) + ' ORDER BY 5 LIMIT ?', params + [limit])
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [
+            {'kind': kind, 'ref': ref, 'title': title or 'Untitled', 'snippet': ' '.join(snippet.split())}
+            for kind, ref, title, snippet, _ in rows
+        ]
+    except Exception as e:
+        read_failed()
+        print(f"Error searching: {e}")
+        return []
+
+
+@invalidates('drafts', 'requests', 'email_contacts')
+def rebuild_search_index() -> bool:
+    """Rebuild the full-text search indexes from the source tables."""
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        
+        for table in SEARCH_DOCUMENTS:
+            _populate_search_index(cursor, table)
+        
+        conn.commit()
+        conn.close()
+        return True
+    except Exception as e:
+        print(f"Error rebuilding search index: {e}")
+        return False
+
+
 # ===== EMAIL CONTACT OPERATIONS =====
 
+@invalidates('email_contacts')
 def save_email_contact(email: str, company_name: str = None, website: str = None,
                        country: str = None, industry: str = None, source: str = None,
                        status: str = 'active') -> bool:
@@ -457,7 +1404,7 @@ def save_email_contact(email: str, company_name: str = None, website: str = None
         print(f"💾 Saving contact to: {db_path}")
         print(f"   Email: {email}, Company: {company_name}, Status: {status}")
 
-        conn = sqlite3.connect(str(db_path))
+        conn = get_connection()
         cursor = conn.cursor()
 
         # Check if contact already exists
@@ -502,56 +1449,314 @@ def save_email_contact(email: str, company_name: str = None, website: str = None
         return False
 
 
+@cached_by_tables('email_contacts', copy_result=copy_rows)
 def get_all_email_contacts(status: str = None) -> List[Dict]:
-    """Get all email contacts from the database, optionally filtered by status."""
+    """Get all email contacts from the database, optionally filtered by status.
+    
+    Prefer query_email_contacts (paginated) for listing large contact lists.
+    """
     try:
-        db_path = get_db_path()
-        conn = sqlite3.connect(str(db_path))
+        conn = get_connection()
         cursor = conn.cursor()
         
-        if status:
-            cursor.execute('''
-                SELECT id, email, company_name, website, country, industry, status, source, notes, created_at
-                FROM email_contacts 
-                WHERE status = ?
-                ORDER BY created_at DESC
-            ''', (status,))
-        else:
-            cursor.execute('''
-                SELECT id, email, company_name, website, country, industry, status, source, notes, created_at
-                FROM email_contacts 
-                ORDER BY created_at DESC
-            ''')
+        where, params = _contact_filters(status=status)
+        cursor.execute(f'''
+            SELECT {CONTACT_COLUMNS}
+            FROM email_contacts 
+            {where}
+            ORDER BY created_at DESC
+        ''', params)
         
         rows = cursor.fetchall()
         conn.close()
         
-        contacts = []
-        for row in rows:
-            contacts.append({
-                'id': row[0],
-                'email': row[1],
-                'company_name': row[2],
-                'website': row[3],
-                'country': row[4],
-                'industry': row[5],
-                'status': row[6],
-                'source': row[7],
-                'notes': row[8],
-                'created_at': row[9]
-            })
-        
-        return contacts
+        return [_contact_from_row(row) for row in rows]
     except Exception as e:
+        read_failed()
         print(f"Error loading email contacts: {e}")
         return []
 
 
+CONTACT_COLUMNS = 'id, email, company_name, website, country, industry, status, source, notes, created_at'
+CONTACT_STATUSES = ('new', 'active', 'contacted', 'bounced', 'unsubscribed')
+
+
+def _contact_from_row(row) -> Dict:
+    """Convert an email_contacts row (CONTACT_COLUMNS order) to a dictionary."""
+    return {
+        'id': row[0],
+        'email': row[1],
+        'company_name': row[2],
+        'website': row[3],
+        'country': row[4],
+        'industry': row[5],
+        'status': row[6],
+        'source': row[7],
+        'notes': row[8],
+        'created_at': row[9]
+    }
+
+
+def _like_escape(text: str) -> str:
+    """Escape LIKE wildcards so ``%`` and ``_`` match literally (with ESCAPE '\\')."""
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _contact_filters(status: str = None, country: str = None, industry: str = None,
+                     search: str = None):
+    """Build the WHERE clause and parameters for contact queries."""
+    clauses = []
+    params = []
+    if status:
+        clauses.append('status = ?')
+        params.append(status)
+    if country:
+        # Contacts added manually can list several countries ("Denmark, Sweden")
+        clauses.append("(country = ? OR country LIKE ? ESCAPE '\\' OR country LIKE ? ESCAPE '\\')")
+        escaped = _like_escape(country)
+        params.extend([country, f'{escaped}, %', f'%, {escaped}%'])
+    if industry:
+        clauses.append('industry = ?')
+        params.append(industry)
+    if search:
+        pattern = f'%{_like_escape(search.strip())}%'
+        clauses.append("(email LIKE ? ESCAPE '\\' OR company_name LIKE ? ESCAPE '\\' "
+                       "OR website LIKE ? ESCAPE '\\' OR notes LIKE ? ESCAPE '\\')")
+        params.extend([pattern] * 4)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+    return where, params
+
+
+@cached_by_tables('email_contacts')
+def query_email_contacts(status: str = None, country: str = None, industry: str = None,
+                         search: str = None, limit: int = 50, after: tuple = None) -> Dict:
+    """Query one page of email contacts with server-side filtering.
+    
+    Contacts are ordered newest first and paginated by keyset: pass the
+    'next_cursor' of a page as ``after`` to get the following page.
+    
+    Args:
+        status: Only contacts with this status
+        country: Only contacts in this country
+        industry: Only contacts in this industry
+        search: Text to look for in email, company name, website and notes
+        limit: Page size (0 to only count)
+        after: Cursor returned by the previous page
+    
+    Returns:
+        Dictionary with 'items' (contact dicts), 'total' (number of contacts
+        matching the filters) and 'next_cursor' (None on the last page)
+    """
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        
+        where, params = _contact_filters(status, country, industry, search)
+        
+        cursor.execute(f'SELECT COUNT(*) FROM email_contacts {where}', params)
+        total = cursor.fetchone()[0]
+        
+        items = []
+        if limit > 0:
+            page_where = where
+            page_params = list(params)
+            if after:
+                keyset = '(created_at < ? OR (created_at = ? AND id < ?))'
+                page_where = f'{where} AND {keyset}' if where else f'WHERE {keyset}'
+                page_params.extend([after[0], after[0], after[1]])
+            
+            cursor.execute(f'''
+                SELECT {CONTACT_COLUMNS}
+                FROM email_contacts
+                {page_where}
+                ORDER BY created_at DESC, id DESC
+                LIMIT ?
+            ''', page_params + [limit + 1])
+            rows = cursor.fetchall()
+            items = [_contact_from_row(row) for row in rows[:limit]]
+        
+        conn.close()
+        
+        next_cursor = None
+        if limit > 0 and len(rows) > limit:
+            next_cursor = (items[-1]['created_at'], items[-1]['id'])
+        
+        return {'items': items, 'total': total, 'next_cursor': next_cursor}
+    except Exception as e:
+        read_failed()
+        print(f"Error querying email contacts: {e}")
+        return {'items': [], 'total': 0, 'next_cursor': None}
+
+
+@cached_by_tables('email_contacts')
+def get_email_contact_ids(status: str = None, country: str = None, industry: str = None,
+                          search: str = None) -> List[int]:
+    """Get the IDs of all contacts matching the filters (see query_email_contacts)."""
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        
+        where, params = _contact_filters(status, country, industry, search)
+        cursor.execute(f'SELECT id FROM email_contacts {where} ORDER BY created_at DESC, id DESC', params)
+        ids = [row[0] for row in cursor.fetchall()]
+        
+        conn.close()
+        return ids
+    except Exception as e:
+        read_failed()
+        print(f"Error loading email contact IDs: {e}")
+        return []
+
+
+def get_email_contacts_by_ids(contact_ids: List[int]) -> List[Dict]:
+    """Get the contacts with the given IDs, in the order given."""
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        
+        by_id = {}
+        ids = list(contact_ids)
+        # Stay below SQLite's bound-parameter limit
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            placeholders = ', '.join('?' * len(chunk))
+            cursor.execute(f'SELECT {CONTACT_COLUMNS} FROM email_contacts WHERE id IN ({placeholders})', chunk)
+            for row in cursor.fetchall():
+                by_id[row[0]] = _contact_from_row(row)
+        
+        conn.close()
+        return [by_id[i] for i in ids if i in by_id]
+    except Exception as e:
+        print(f"Error loading email contacts by ID: {e}")
+        return []
+
+
+def iter_email_contacts(status: str = None, country: str = None, industry: str = None,
+                        search: str = None, chunk_size: int = 1000):
+    """Yield the contacts matching the filters as lists of rows (CONTACT_COLUMNS order).
+
+    Rows are read through one cursor ``chunk_size`` at a time, newest first
+    (the order of query_email_contacts), so memory stays flat however many
+    contacts match. Database errors are raised, so a partial export is not
+    mistaken for a complete one.
+    """
+    conn = get_connection()
+    try:
+        where, params = _contact_filters(status, country, industry, search)
+        cursor = conn.execute(f'''
+            SELECT {CONTACT_COLUMNS}
+            FROM email_contacts
+            {where}
+            ORDER BY created_at DESC, id DESC
+        ''', params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                return
+            yield rows
+    finally:
+        conn.close()
+
+
+# Upsert of an imported contact: empty fields keep the stored value, and an
+# existing contact keeps its status unless the import marks it bounced or
+# unsubscribed
+IMPORT_CONTACT_SQL = f'''
+    INSERT INTO email_contacts (email, company_name, website, country, industry, source, status, notes,
+                                updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(email) DO UPDATE SET
+        company_name = COALESCE(excluded.company_name, company_name),
+        website = COALESCE(excluded.website, website),
+        country = COALESCE(excluded.country, country),
+        industry = COALESCE(excluded.industry, industry),
+        source = COALESCE(excluded.source, source),
+        notes = COALESCE(excluded.notes, notes),
+        status = CASE WHEN excluded.status IN ({', '.join(f"'{s}'" for s in SUPPRESSION_STATUSES)})
+                      THEN excluded.status ELSE status END,
+        updated_at = excluded.updated_at
+'''
+
+
+@invalidates('email_contacts', 'email_suppressions')
+def import_email_contacts(batches, source: str = None) -> Dict[str, int]:
+    """Insert or update contacts in bulk, in one transaction.
+
+    Args:
+        batches: Iterable of lists of (email, company_name, website, country,
+            industry, source, status, notes) tuples; each list is written
+            with one executemany
+        source: Suppression list source for bounced/unsubscribed rows
+
+    Returns:
+        Dictionary with 'inserted' and 'updated' counts
+
+    Database errors are raised (and nothing is imported), so the caller can
+    report the failure.
+    """
+    conn = get_connection()
+    conn.isolation_level = None
+    cursor = conn.cursor()
+    try:
+        cursor.execute('BEGIN IMMEDIATE')
+        before = cursor.execute('SELECT COUNT(*) FROM email_contacts').fetchone()[0]
+        rows_written = 0
+        for batch in batches:
+            now = datetime.now()
+            cursor.executemany(IMPORT_CONTACT_SQL, [(*row, now) for row in batch])
+            for status in SUPPRESSION_STATUSES:
+                emails = [row[0] for row in batch if row[6] == status]
+                if emails:
+                    _suppress(cursor, emails, status, source)
+            rows_written += len(batch)
+        after = cursor.execute('SELECT COUNT(*) FROM email_contacts').fetchone()[0]
+        cursor.execute('COMMIT')
+    except BaseException:
+        cursor.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+    return {'inserted': after - before, 'updated': rows_written - (after - before)}
+
+
+@cached_by_tables('email_contacts')
+def get_contact_filter_options() -> Dict[str, List]:
+    """Get the distinct countries and industries, and contact counts per status."""
+    options = {'countries': [], 'industries': [], 'status_counts': {}}
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("SELECT DISTINCT country FROM email_contacts WHERE country IS NOT NULL AND country != ''")
+        countries = set()
+        for (value,) in cursor.fetchall():
+            countries.update(c.strip() for c in value.split(',') if c.strip())
+        options['countries'] = sorted(countries)
+        
+        cursor.execute("SELECT DISTINCT industry FROM email_contacts WHERE industry IS NOT NULL AND industry != '' ORDER BY industry")
+        options['industries'] = [row[0] for row in cursor.fetchall()]
+        
+        cursor.execute('SELECT status, COUNT(*) FROM email_contacts GROUP BY status')
+        options['status_counts'] = dict(cursor.fetchall())
+        
+        conn.close()
+    except Exception as e:
+        read_failed()
+        print(f"Error loading contact filter options: {e}")
+    return options
+
+
+@invalidates('email_contacts', 'email_suppressions')
 def update_email_contact_status(contact_id: int, status: str) -> bool:
-    """Update the status of an email contact."""
+    """Update the status of an email contact.
+    
+    Bounced and unsubscribed contacts are added to the suppression list.
+    Moving a contact to another status lifts a suppression that came from
+    its status; suppressions from other sources (webhooks, imports, manual)
+    are kept.
+    """
     try:
-        db_path = get_db_path()
-        conn = sqlite3.connect(str(db_path))
+        conn = get_connection()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -560,6 +1765,14 @@ def update_email_contact_status(contact_id: int, status: str) -> bool:
             WHERE id = ?
         ''', (status, datetime.now(), contact_id))
         
+        cursor.execute('SELECT email FROM email_contacts WHERE id = ?', (contact_id,))
+        row = cursor.fetchone()
+        if row and status in SUPPRESSION_STATUSES:
+            _suppress(cursor, [row[0]], status, 'contact status')
+        elif row:
+            cursor.execute("DELETE FROM email_suppressions WHERE email_hash = ? AND source = 'contact status'",
+                           (email_hash(row[0]),))
+        
         conn.commit()
         conn.close()
         return True
@@ -568,11 +1781,11 @@ def update_email_contact_status(contact_id: int, status: str) -> bool:
         return False
 
 
+@invalidates('email_contacts')
 def delete_email_contact(contact_id: int) -> bool:
     """Delete an email contact from the database."""
     try:
-        db_path = get_db_path()
-        conn = sqlite3.connect(str(db_path))
+        conn = get_connection()
         cursor = conn.cursor()
         
         cursor.execute('DELETE FROM email_contacts WHERE id = ?', (contact_id,))
@@ -587,11 +1800,11 @@ def delete_email_contact(contact_id: int) -> bool:
 
 # ===== EMAIL CAMPAIGN OPERATIONS =====
 
+@invalidates('email_campaigns')
 def save_email_campaign(name: str, subject: str, template: str) -> Optional[int]:
     """Save an email campaign and return its ID."""
     try:
-        db_path = get_db_path()
-        conn = sqlite3.connect(str(db_path))
+        conn = get_connection()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -608,15 +1821,16 @@ def save_email_campaign(name: str, subject: str, template: str) -> Optional[int]
         return None
 
 
+@cached_by_tables('email_campaigns', copy_result=copy_rows)
 def get_all_email_campaigns() -> List[Dict]:
     """Get all email campaigns from the database."""
     try:
-        db_path = get_db_path()
-        conn = sqlite3.connect(str(db_path))
+        conn = get_connection()
         cursor = conn.cursor()
         
         cursor.execute('''
-            SELECT id, name, subject, template, status, sent_count, opened_count, clicked_count, created_at
+            SELECT id, name, subject, template, status, sent_count, opened_count, clicked_count, created_at,
+                   render_hash
             FROM email_campaigns 
             ORDER BY created_at DESC
         ''')
@@ -635,37 +1849,645 @@ def get_all_email_campaigns() -> List[Dict]:
                 'sent_count': row[5],
                 'opened_count': row[6],
                 'clicked_count': row[7],
-                'created_at': row[8]
+                'created_at': row[8],
+                'render_hash': row[9]
             })
         
         return campaigns
     except Exception as e:
+        read_failed()
         print(f"Error loading campaigns: {e}")
         return []
 
 
-def record_email_send(campaign_id: int, contact_id: int, status: str = 'sent') -> bool:
-    """Record that an email was sent to a contact."""
+RENDER_COLUMNS = 'content_hash, subject, html, tags, preview_subject, preview_html, problems, created_at'
+_RENDER_KEYS = RENDER_COLUMNS.split(', ')
+
+
+@invalidates('email_campaign_renders', 'email_campaigns')
+def save_email_campaign_render(render: Dict, campaign_id: int = None) -> bool:
+    """Store a rendered campaign email (see email_campaigns.render_campaign).
+    
+    Renders are keyed by their content hash, so storing one that exists is
+    a no-op. With ``campaign_id``, the campaign is pointed at the render.
+    """
     try:
-        db_path = get_db_path()
-        conn = sqlite3.connect(str(db_path))
+        conn = get_connection()
         cursor = conn.cursor()
         
         cursor.execute('''
-            INSERT INTO email_sends (campaign_id, contact_id, status, sent_at)
-            VALUES (?, ?, ?, ?)
-        ''', (campaign_id, contact_id, status, datetime.now()))
+            INSERT OR IGNORE INTO email_campaign_renders
+                (content_hash, subject, html, tags, preview_subject, preview_html, problems, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (render['content_hash'], render['subject'], render['html'], json.dumps(render['tags']),
+              render['preview_subject'], render['preview_html'], json.dumps(render['problems']), datetime.now()))
+        if campaign_id is not None:
+            cursor.execute('UPDATE email_campaigns SET render_hash = ? WHERE id = ?',
+                           (render['content_hash'], campaign_id))
+        
+        conn.commit()
+        conn.close()
+        return True
+    except Exception as e:
+        print(f"Error saving campaign render: {e}")
+        return False
+
+
+@cached_by_tables('email_campaign_renders')
+def get_email_campaign_render(content_hash: str) -> Optional[Dict]:
+    """Get a stored campaign render by its content hash."""
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute(f'SELECT {RENDER_COLUMNS} FROM email_campaign_renders WHERE content_hash = ?',
+                       (content_hash,))
+        row = cursor.fetchone()
+        conn.close()
+        if row is None:
+            return None
+        render = dict(zip(_RENDER_KEYS, row))
+        render['tags'] = {tag: tuple(field) for tag, field in json.loads(render['tags']).items()}
+        render['problems'] = json.loads(render['problems'])
+        return render
+    except Exception as e:
+        read_failed()
+        print(f"Error loading campaign render: {e}")
+        return None
+
+
+@invalidates('email_sends', 'email_campaigns', 'email_contacts')
+def record_email_sends(campaign_id: int, outcomes: List[Dict], run_id: int = None) -> Optional[str]:
+    """Record many send outcomes in one transaction.
+    
+    Inserts the email_sends rows with one executemany, adds the number sent
+    to the campaign's sent_count in one update and marks the contacts sent
+    to as contacted in another. With ``run_id`` the run's recipients are
+    checkpointed in the same transaction.
+    
+    Args:
+        outcomes: {'contact_id', 'state' ('sent', 'failed' or 'skipped'),
+                   'message_id', 'error'} per recipient; skipped recipients
+                   only update the run
+        run_id: The campaign run that sent them
+    
+    Returns:
+        The run's status after the checkpoint ('running' unless it was
+        paused or cancelled meanwhile), or None without ``run_id``
+    
+    Database errors are raised, so a run's worker stops instead of losing track.
+    """
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        now = datetime.now()
+        
+        cursor.executemany('''
+            INSERT INTO email_sends (campaign_id, contact_id, status, sent_at, error_message, message_id, run_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', [(campaign_id, o['contact_id'], o['state'], now, o.get('error'), o.get('message_id'), run_id)
+              for o in outcomes if o['state'] in ('sent', 'failed')])
+        
+        sent = [o['contact_id'] for o in outcomes if o['state'] == 'sent']
+        if sent:
+            cursor.execute('''
+                UPDATE email_campaigns SET sent_count = sent_count + ?, updated_at = ?
+                WHERE id = ?
+            ''', (len(sent), now, campaign_id))
+            cursor.execute('''
+                UPDATE email_contacts SET status = 'contacted', updated_at = ?
+                WHERE id IN (SELECT value FROM json_each(?))
+            ''', (now, json.dumps(sent)))
+        
+        status = _checkpoint_run_recipients(cursor, run_id, outcomes, now) if run_id is not None else None
+        conn.commit()
+        return status
+    finally:
+        conn.close()
+
+
+class EmailSendRecorder:
+    """Buffers send outcomes and records them with ``record_email_sends``.
+    
+    Outcomes are flushed once ``flush_size`` of them are buffered or
+    ``flush_interval`` seconds after the last flush, so recording a large
+    send takes a handful of transactions instead of several per email.
+    Outcomes still buffered when the process dies are lost; a run's
+    recipients among them are sent again when the run is resumed.
+    
+    Args:
+        campaign_id: Campaign the sends belong to
+        run_id: Campaign run to checkpoint with each flush
+        flush_size: Outcomes to buffer before flushing
+        flush_interval: Seconds after which a non-empty buffer is flushed
+    """
+    
+    def __init__(self, campaign_id: int, run_id: int = None, flush_size: int = 1000,
+                 flush_interval: float = 1.0):
+        self.campaign_id = campaign_id
+        self.run_id = run_id
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.status: Optional[str] = None
+        self._pending: List[Dict] = []
+        self._last_flush = time.monotonic()
+    
+    def add(self, outcomes: List[Dict]) -> Optional[str]:
+        """Buffer outcomes, flushing if due; return the run status seen at the last flush."""
+        self._pending.extend(outcomes)
+        if (len(self._pending) >= self.flush_size
+                or time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+        return self.status
+    
+    def flush(self) -> Optional[str]:
+        """Record the buffered outcomes now; return the run status."""
+        if self._pending:
+            self.status = record_email_sends(self.campaign_id, self._pending, self.run_id)
+            self._pending = []
+        self._last_flush = time.monotonic()
+        return self.status
+    
+    def __enter__(self) -> "EmailSendRecorder":
+        return self
+    
+    def __exit__(self, *exc) -> None:
+        self.flush()
+
+
+# ===== EMAIL CAMPAIGN RUNS =====
+#
+# A run is one send of a campaign to a fixed list of recipients, staged in
+# email_campaign_run_recipients in send order (seq). The worker takes the
+# pending recipients after the run's cursor a batch at a time, marking them
+# 'sending', and checkpoints each batch's outcomes (sent, failed, skipped).
+# Recipients still 'sending' when a run stopped are reconciled against
+# email_sends when it is claimed again, so nobody is sent to twice.
+
+# A 'running' run whose worker has not checkpointed for this long is
+# assumed dead and can be claimed again
+RUN_STALE_SECONDS = 300
+
+RUN_COLUMNS = ('id, campaign_id, status, subject, template, batch_size, total, sent, failed, skipped, '
+               'cursor_seq, error_message, worker, heartbeat_at, created_at, started_at, finished_at, '
+               'render_hash')
+_RUN_KEYS = RUN_COLUMNS.split(', ')
+
+
+def _run_from_row(row) -> Dict:
+    """Convert an email_campaign_runs row (RUN_COLUMNS order) to a dictionary."""
+    run = dict(zip(_RUN_KEYS, row))
+    run['pending'] = run['total'] - run['sent'] - run['failed'] - run['skipped']
+    return run
+
+
+def create_email_campaign_run(campaign_id: int, contact_ids: List[int], subject: str,
+                              template: str, batch_size: int = 1000, render_hash: str = None) -> Optional[int]:
+    """Stage a campaign run for the given contacts and return its ID.
+    
+    Contacts are staged in the order given (duplicates and unknown IDs
+    dropped); contacts already 'contacted' are staged as skipped. The run
+    sends the stored render ``render_hash`` (see save_email_campaign_render).
+    """
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        now = datetime.now()
         
-        # Update campaign sent count
         cursor.execute('''
-            UPDATE email_campaigns 
-            SET sent_count = sent_count + 1, updated_at = ?
-            WHERE id = ?
-        ''', (datetime.now(), campaign_id))
+            INSERT INTO email_campaign_runs (campaign_id, subject, template, batch_size, render_hash, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (campaign_id, subject, template, batch_size, render_hash, now))
+        run_id = cursor.lastrowid
+        
+        ids = list(dict.fromkeys(contact_ids))
+        by_id = {}
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            placeholders = ', '.join('?' * len(chunk))
+            cursor.execute(f'SELECT id, email, status FROM email_contacts WHERE id IN ({placeholders})', chunk)
+            by_id.update((row[0], row[1:]) for row in cursor.fetchall())
+        
+        rows = []
+        for contact_id in ids:
+            if contact_id in by_id:
+                email, status = by_id[contact_id]
+                state = 'skipped' if status == 'contacted' else 'pending'
+                rows.append((run_id, len(rows) + 1, contact_id, email, state, now))
+        cursor.executemany('''
+            INSERT INTO email_campaign_run_recipients (run_id, seq, contact_id, email, state, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', rows)
+        cursor.execute('UPDATE email_campaign_runs SET total = ?, skipped = ? WHERE id = ?',
+                       (len(rows), sum(1 for row in rows if row[4] == 'skipped'), run_id))
         
         conn.commit()
         conn.close()
+        return run_id
+    except Exception as e:
+        print(f"Error creating campaign run: {e}")
+        return None
+
+
+def get_email_campaign_run(run_id: int) -> Optional[Dict]:
+    """Get a campaign run, with its progress counts."""
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute(f'SELECT {RUN_COLUMNS} FROM email_campaign_runs WHERE id = ?', (run_id,))
+        row = cursor.fetchone()
+        conn.close()
+        return _run_from_row(row) if row else None
+    except Exception as e:
+        print(f"Error loading campaign run: {e}")
+        return None
+
+
+def get_email_campaign_runs(campaign_id: int = None, limit: int = 20) -> List[Dict]:
+    """Get the most recent campaign runs, optionally of one campaign."""
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        where, params = ('WHERE campaign_id = ?', [campaign_id]) if campaign_id is not None else ('', [])
+        cursor.execute(f'SELECT {RUN_COLUMNS} FROM email_campaign_runs {where} ORDER BY id DESC LIMIT ?',
+                       params + [limit])
+        rows = cursor.fetchall()
+        conn.close()
+        return [_run_from_row(row) for row in rows]
+    except Exception as e:
+        print(f"Error loading campaign runs: {e}")
+        return []
+
+
+def claim_email_campaign_run(run_id: int, worker: str) -> bool:
+    """Mark a run as running for ``worker``; return False if it cannot be run now.
+    
+    Pending, paused and failed runs can be claimed, as can running runs
+    whose worker stopped checkpointing. Recipients left 'sending' by a
+    previous worker take the outcome recorded in email_sends, or go back
+    to pending if their send was never recorded.
+    """
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        now = datetime.now()
+        stale = datetime.fromtimestamp(now.timestamp() - RUN_STALE_SECONDS)
+        
+        cursor.execute('''
+            UPDATE email_campaign_runs
+            SET status = 'running', worker = ?, heartbeat_at = ?, started_at = COALESCE(started_at, ?),
+                finished_at = NULL, error_message = NULL
+            WHERE id = ? AND (status IN ('pending', 'paused', 'failed')
+                              OR (status = 'running' AND (heartbeat_at IS NULL OR heartbeat_at < ?)))
+        ''', (worker, now, now, run_id, stale))
+        if cursor.rowcount == 0:
+            conn.rollback()
+            conn.close()
+            return False
+        
+        cursor.execute('''
+            SELECT r.seq, r.contact_id,
+                   (SELECT s.status FROM email_sends s WHERE s.run_id = r.run_id AND s.contact_id = r.contact_id
+                    ORDER BY s.id DESC LIMIT 1),
+                   (SELECT s.message_id FROM email_sends s WHERE s.run_id = r.run_id AND s.contact_id = r.contact_id
+                    ORDER BY s.id DESC LIMIT 1)
+            FROM email_campaign_run_recipients r
+            WHERE r.run_id = ? AND r.state = 'sending'
+        ''', (run_id,))
+        interrupted = cursor.fetchall()
+        if interrupted:
+            recorded = [(status, message_id, now, run_id, seq)
+                        for seq, _, status, message_id in interrupted if status in ('sent', 'failed')]
+            cursor.executemany('''
+                UPDATE email_campaign_run_recipients SET state = ?, message_id = ?, updated_at = ?
+                WHERE run_id = ? AND seq = ?
+            ''', recorded)
+            unsent = [seq for seq, _, status, _ in interrupted if status not in ('sent', 'failed')]
+            cursor.executemany('''
+                UPDATE email_campaign_run_recipients SET state = 'pending', updated_at = ?
+                WHERE run_id = ? AND seq = ?
+            ''', [(now, run_id, seq) for seq in unsent])
+            cursor.executemany("UPDATE email_contacts SET status = 'contacted', updated_at = ? WHERE id = ?",
+                               [(now, contact_id) for _, contact_id, status, _ in interrupted if status == 'sent'])
+            cursor.execute('UPDATE email_campaign_runs SET sent = sent + ?, failed = failed + ? WHERE id = ?',
+                           (sum(1 for r in recorded if r[0] == 'sent'),
+                            sum(1 for r in recorded if r[0] == 'failed'), run_id))
+            if unsent:
+                # Move the cursor back so the unsent recipients are taken again
+                cursor.execute('UPDATE email_campaign_runs SET cursor_seq = MIN(cursor_seq, ?) WHERE id = ?',
+                               (min(unsent) - 1, run_id))
+        
+        conn.commit()
+        conn.close()
+        if interrupted:
+            bump_table_version('email_contacts')
         return True
     except Exception as e:
-        print(f"Error recording email send: {e}")
+        print(f"Error claiming campaign run: {e}")
         return False
+
+
+def next_email_campaign_run_batch(run_id: int, limit: int) -> List[Dict]:
+    """Take the next pending recipients after the run's cursor, marking them 'sending'.
+    
+    Returns:
+        Up to ``limit`` recipients ({'seq', 'contact_id', 'email'}) in send
+        order; none once the run is no longer running (paused or cancelled)
+    
+    Database errors are raised, so the worker stops instead of losing track.
+    """
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT r.seq, r.contact_id, r.email
+            FROM email_campaign_run_recipients r
+            JOIN email_campaign_runs run ON run.id = r.run_id
+            WHERE r.run_id = ? AND r.state = 'pending' AND r.seq > run.cursor_seq AND run.status = 'running'
+            ORDER BY r.seq
+            LIMIT ?
+        ''', (run_id, limit))
+        rows = cursor.fetchall()
+        if rows:
+            now = datetime.now()
+            cursor.executemany('''
+                UPDATE email_campaign_run_recipients
+                SET state = 'sending', attempts = attempts + 1, updated_at = ?
+                WHERE run_id = ? AND seq = ?
+            ''', [(now, run_id, row[0]) for row in rows])
+            cursor.execute('UPDATE email_campaign_runs SET cursor_seq = ?, heartbeat_at = ? WHERE id = ?',
+                           (rows[-1][0], now, run_id))
+        
+        conn.commit()
+        return [{'seq': seq, 'contact_id': contact_id, 'email': email} for seq, contact_id, email in rows]
+    finally:
+        conn.close()
+
+
+def _checkpoint_run_recipients(cursor, run_id: int, outcomes: List[Dict], now: datetime) -> str:
+    """Record outcomes of a run's 'sending' recipients; return the run's status."""
+    counts = {'sent': 0, 'failed': 0, 'skipped': 0}
+    for state in counts:
+        cursor.executemany('''
+            UPDATE email_campaign_run_recipients
+            SET state = ?, message_id = ?, error_message = ?, updated_at = ?
+            WHERE run_id = ? AND contact_id = ? AND state = 'sending'
+        ''', [(state, o.get('message_id'), o.get('error'), now, run_id, o['contact_id'])
+              for o in outcomes if o['state'] == state])
+        counts[state] = max(cursor.rowcount, 0)
+    cursor.execute('''
+        UPDATE email_campaign_runs
+        SET sent = sent + ?, failed = failed + ?, skipped = skipped + ?, heartbeat_at = ?
+        WHERE id = ?
+    ''', (counts['sent'], counts['failed'], counts['skipped'], now, run_id))
+    cursor.execute('SELECT status FROM email_campaign_runs WHERE id = ?', (run_id,))
+    return cursor.fetchone()[0]
+
+
+def set_email_campaign_run_status(run_id: int, status: str, from_statuses: Tuple[str, ...],
+                                  error_message: str = None) -> bool:
+    """Move a run to ``status`` if it is currently in one of ``from_statuses``.
+    
+    Returns:
+        Whether the status changed
+    """
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        
+        placeholders = ', '.join('?' * len(from_statuses))
+        finished = datetime.now() if status in ('completed', 'failed', 'cancelled') else None
+        cursor.execute(f'''
+            UPDATE email_campaign_runs SET status = ?, error_message = ?, finished_at = ?
+            WHERE id = ? AND status IN ({placeholders})
+        ''', (status, error_message, finished, run_id, *from_statuses))
+        changed = cursor.rowcount > 0
+        
+        conn.commit()
+        conn.close()
+        return changed
+    except Exception as e:
+        print(f"Error updating campaign run status: {e}")
+        return False
+
+
+def finish_email_campaign_run(run_id: int) -> Optional[str]:
+    """Mark a running run completed if no recipient is left to send; return its status."""
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            UPDATE email_campaign_runs SET status = 'completed', finished_at = ?
+            WHERE id = ? AND status = 'running' AND NOT EXISTS (
+                SELECT 1 FROM email_campaign_run_recipients
+                WHERE run_id = ? AND state IN ('pending', 'sending'))
+        ''', (datetime.now(), run_id, run_id))
+        cursor.execute('SELECT status FROM email_campaign_runs WHERE id = ?', (run_id,))
+        row = cursor.fetchone()
+        
+        conn.commit()
+        conn.close()
+        return row[0] if row else None
+    except Exception as e:
+        print(f"Error finishing campaign run: {e}")
+        return None
+
+
+def retry_failed_email_campaign_run(run_id: int) -> int:
+    """Put a run's failed recipients back to pending; return how many.
+    
+    A completed or failed run becomes paused, so it can be claimed again.
+    """
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT COUNT(*), MIN(seq) FROM email_campaign_run_recipients
+            WHERE run_id = ? AND state = 'failed'
+        ''', (run_id,))
+        count, first_seq = cursor.fetchone()
+        if count:
+            cursor.execute('''
+                UPDATE email_campaign_run_recipients SET state = 'pending', error_message = NULL, updated_at = ?
+                WHERE run_id = ? AND state = 'failed'
+            ''', (datetime.now(), run_id))
+            cursor.execute('''
+                UPDATE email_campaign_runs
+                SET failed = failed - ?, cursor_seq = MIN(cursor_seq, ?), finished_at = NULL,
+                    status = CASE WHEN status IN ('completed', 'failed') THEN 'paused' ELSE status END
+                WHERE id = ?
+            ''', (count, first_seq - 1, run_id))
+        
+        conn.commit()
+        conn.close()
+        return count
+    except Exception as e:
+        print(f"Error retrying campaign run: {e}")
+        return 0
+
+
+# ===== EMAIL SUPPRESSIONS =====
+
+def _suppress(cursor, emails: List[str], reason: str, source: str = None) -> int:
+    """Add addresses to the suppression list; return how many were new."""
+    now = datetime.now()
+    cursor.executemany('''
+        INSERT OR IGNORE INTO email_suppressions (email_hash, email, reason, source, created_at)
+        VALUES (?, ?, ?, ?, ?)
+    ''', [(email_hash(email), normalize_email(email), reason, source, now) for email in emails])
+    return max(cursor.rowcount, 0)
+
+
+@invalidates('email_suppressions')
+def suppress_emails(emails: List[str], reason: str, source: str = None) -> int:
+    """Add addresses to the suppression list so they are never emailed again.
+    
+    Args:
+        emails: Addresses to suppress (already suppressed ones are left as they are)
+        reason: Why, e.g. 'bounced', 'unsubscribed', 'complaint' or 'manual'
+        source: Where it came from, e.g. 'sendgrid webhook'
+    
+    Returns:
+        Number of addresses added
+    """
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        added = _suppress(cursor, [e for e in emails if normalize_email(e)], reason, source)
+        conn.commit()
+        conn.close()
+        return added
+    except Exception as e:
+        print(f"Error suppressing emails: {e}")
+        return 0
+
+
+@invalidates('email_suppressions')
+def unsuppress_email(email: str) -> bool:
+    """Remove an address from the suppression list; return whether it was on it."""
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM email_suppressions WHERE email_hash = ?', (email_hash(email),))
+        removed = cursor.rowcount > 0
+        conn.commit()
+        conn.close()
+        return removed
+    except Exception as e:
+        print(f"Error removing suppression: {e}")
+        return False
+
+
+def get_suppression_reasons(hashes: List[str]) -> Dict[str, str]:
+    """Look up suppression hashes; return {hash: reason} for those on the list.
+    
+    Database errors are raised: an empty result would let suppressed
+    addresses be mailed.
+    """
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        reasons = {}
+        for start in range(0, len(hashes), 500):
+            chunk = hashes[start:start + 500]
+            placeholders = ', '.join('?' * len(chunk))
+            cursor.execute(f'SELECT email_hash, reason FROM email_suppressions WHERE email_hash IN ({placeholders})',
+                           chunk)
+            reasons.update(cursor.fetchall())
+        return reasons
+    finally:
+        conn.close()
+
+
+def is_email_suppressed(email: str) -> bool:
+    """Whether an address is on the suppression list."""
+    return bool(get_suppression_reasons([email_hash(email)]))
+
+
+@cached_by_tables('email_suppressions')
+def count_suppressions() -> int:
+    """Number of addresses on the suppression list."""
+    try:
+        conn = get_connection()
+        count = conn.execute('SELECT COUNT(*) FROM email_suppressions').fetchone()[0]
+        conn.close()
+        return count
+    except Exception as e:
+        read_failed()
+        print(f"Error counting suppressions: {e}")
+        return 0
+
+
+def iter_suppression_hashes(chunk_size: int = 10000):
+    """Yield every suppression hash, reading the table in chunks."""
+    conn = get_connection()
+    try:
+        cursor = conn.execute('SELECT email_hash FROM email_suppressions')
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                return
+            for (key,) in rows:
+                yield key
+    finally:
+        conn.close()
+
+
+# ===== EMAIL TRACKING =====
+
+@invalidates('email_sends', 'email_campaigns')
+def record_tracking_events(events: List[Tuple[str, int, int, Optional[str], datetime]]) -> Dict[str, int]:
+    """Record a batch of open and click events in one transaction.
+    
+    Every event is stored in email_tracking_events. The first open and the
+    first click of each send set email_sends.opened_at / clicked_at and are
+    added to the campaign's opened_count / clicked_count (a click counts as
+    an open too, as images are often blocked).
+    
+    Args:
+        events: (kind ('open' or 'click'), campaign_id, contact_id, url, time)
+    
+    Returns:
+        Number of new opens and clicks counted: {'opens', 'clicks'}
+    
+    Database errors are raised, so the caller can keep the events and retry.
+    """
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        
+        cursor.executemany('''
+            INSERT INTO email_tracking_events (kind, campaign_id, contact_id, url, created_at)
+            VALUES (?, ?, ?, ?, ?)
+        ''', events)
+        
+        # Earliest event per send, for opens (any event) and clicks
+        first = {'open': {}, 'click': {}}
+        for kind, campaign_id, contact_id, _, at in events:
+            for counted in (('open', 'click') if kind == 'click' else ('open',)):
+                key = (campaign_id, contact_id)
+                if key not in first[counted] or at < first[counted][key]:
+                    first[counted][key] = at
+        
+        counts = {'opens': 0, 'clicks': 0}
+        for kind, column, counter in (('open', 'opened_at', 'opened_count'), ('click', 'clicked_at', 'clicked_count')):
+            by_campaign = {}
+            for (campaign_id, contact_id), at in first[kind].items():
+                by_campaign.setdefault(campaign_id, []).append((at, campaign_id, contact_id))
+            for campaign_id, rows in by_campaign.items():
+                cursor.executemany(f'''
+                    UPDATE email_sends SET {column} = ?
+                    WHERE campaign_id = ? AND contact_id = ? AND status = 'sent' AND {column} IS NULL
+                ''', rows)
+                new = max(cursor.rowcount, 0)
+                if new:
+                    cursor.execute(f'UPDATE email_campaigns SET {counter} = {counter} + ? WHERE id = ?',
+                                   (new, campaign_id))
+                counts[f'{kind}s'] += new
+        
+        conn.commit()
+        return counts
+    finally:
+        conn.close()
@@ -1,41 +1,38 @@
 from __future__ import annotations
 
 import json
+import threading
 from pathlib import Path
-from typing import List, Dict
+from typing import Iterable, List, Dict, Tuple
 from datetime import datetime
 
-from .models import AdRequest, AdDraft
-from .config import get_workspace_path
+from .models import AdRequest, AdDraft, draft_summary
+from .config import get_workspace_dir
+from .cache import invalidates
+from .backup import save_backup, save_backups, delete_backup
 
-# Import database functions
+# Import database functions (the schema is set up lazily on first use)
 try:
     from .database import (
-        init_database,
         save_request_to_db, get_all_requests as get_requests_from_db, delete_request_from_db,
-        save_draft_to_db, get_all_drafts as get_drafts_from_db, delete_draft_from_db,
+        save_draft_to_db, save_drafts_to_db, get_all_drafts as get_drafts_from_db, delete_draft_from_db,
+        get_draft_summaries as get_draft_summaries_from_db, get_draft as get_draft_from_db,
         save_scheduled_post_to_db, get_all_scheduled_posts as get_scheduled_from_db,
-        delete_scheduled_post_from_db
+        get_scheduled_post_filenames as get_scheduled_filenames_from_db, delete_scheduled_post_from_db
     )
     USE_DATABASE = True
-    # Initialize database on import
-    init_database()
 except Exception as e:
     print(f"Database not available, using file storage: {e}")
     USE_DATABASE = False
 
 
-def _ensure_dirs() -> None:
-    base = get_workspace_path()
-    for sub in ["config", "requests", "drafts", "scheduled", "posted", "logs"]:
-        (base / sub).mkdir(parents=True, exist_ok=True)
+# Scheduled post directories already copied into the database
+_backfilled_dirs = set()
+_backfill_lock = threading.Lock()
 
 
 def list_request_files() -> List[Path]:
-    _ensure_dirs()
-    base = get_workspace_path()
-    req_dir = base / "requests"
-    return sorted(req_dir.glob("*.json"))
+    return sorted(get_workspace_dir("requests").glob("*.json"))
 
 
 def load_request(path: Path) -> AdRequest:
@@ -55,18 +52,21 @@ def load_all_requests() -> List[AdRequest]:
     return [load_request(p) for p in list_request_files()]
 
 
+def draft_filename(draft: AdDraft) -> str:
+    """Default filename of a draft, derived from its request title."""
+    # Sanitize filename: remove/replace problematic characters
+    safe_title = draft.request.title.replace(" ", "_").replace("/", "_").replace("\\", "_").lower()
+    # Remove any other path separators or special chars
+    safe_title = "".join(c if c.isalnum() or c in "_-" else "_" for c in safe_title)
+    return f"{safe_title}.draft.json"
+
+
+@invalidates('drafts')
 def save_draft(draft: AdDraft, filename: str | None = None) -> Path:
-    _ensure_dirs()
-    base = get_workspace_path()
-    drafts_dir = base / "drafts"
-    drafts_dir.mkdir(parents=True, exist_ok=True)
+    drafts_dir = get_workspace_dir("drafts")
 
     if filename is None:
-        # Sanitize filename: remove/replace problematic characters
-        safe_title = draft.request.title.replace(" ", "_").replace("/", "_").replace("\\", "_").lower()
-        # Remove any other path separators or special chars
-        safe_title = "".join(c if c.isalnum() or c in "_-" else "_" for c in safe_title)
-        filename = f"{safe_title}.draft.json"
+        filename = draft_filename(draft)
 
     # Ensure filename doesn't create subdirectories
     filename = filename.replace("/", "_").replace("\\", "_")
@@ -76,13 +76,36 @@ def save_draft(draft: AdDraft, filename: str | None = None) -> Path:
     if USE_DATABASE:
         save_draft_to_db(filename, draft_dict)
 
-    # Also save to file system as backup
+    # Also save to file system as backup (the only copy without a database)
     path = drafts_dir / filename
-    with path.open("w", encoding="utf-8") as f:
-        json.dump(draft_dict, f, indent=2, ensure_ascii=False)
+    save_backup(path, draft_dict, required=not USE_DATABASE)
     return path
 
 
+@invalidates('drafts')
+def save_drafts(drafts: Iterable[Tuple[str, Dict]]) -> bool:
+    """Save many drafts at once: one database transaction, one batch of backup files.
+
+    Args:
+        drafts: (filename, draft dictionary) pairs
+
+    Returns:
+        True if the drafts were saved to the database or the file system
+    """
+    drafts = [(filename.replace("/", "_").replace("\\", "_"), data) for filename, data in drafts]
+    saved = USE_DATABASE and save_drafts_to_db(drafts)
+
+    drafts_dir = get_workspace_dir("drafts")
+    try:
+        save_backups(((drafts_dir / filename, data) for filename, data in drafts),
+                     required=not saved)
+        return True
+    except Exception as e:
+        print(f"Error saving drafts: {e}")
+        return saved
+
+
+@invalidates('drafts')
 def save_draft_dict(draft_dict: Dict, filename: str) -> bool:
     """Save a draft dictionary directly to database and file system."""
     # Sanitize filename
@@ -93,15 +116,9 @@ def save_draft_dict(draft_dict: Dict, filename: str) -> bool:
         save_draft_to_db(filename, draft_dict)
 
     # Also save to file system as backup
-    _ensure_dirs()
-    base = get_workspace_path()
-    drafts_dir = base / "drafts"
-    drafts_dir.mkdir(parents=True, exist_ok=True)
-    path = drafts_dir / filename
-
+    path = get_workspace_dir("drafts") / filename
     try:
-        with path.open("w", encoding="utf-8") as f:
-            json.dump(draft_dict, f, indent=2, ensure_ascii=False)
+        save_backup(path, draft_dict, required=not USE_DATABASE)
         return True
     except Exception as e:
         print(f"Error saving draft: {e}")
@@ -122,9 +139,7 @@ def load_all_drafts() -> List[Dict]:
 
     # Fallback to file system
     print("📁 Loading drafts from file system...")
-    _ensure_dirs()
-    base = get_workspace_path()
-    drafts_dir = base / "drafts"
+    drafts_dir = get_workspace_dir("drafts")
     drafts = []
 
     for path in sorted(drafts_dir.glob("*.json")):
@@ -140,6 +155,57 @@ def load_all_drafts() -> List[Dict]:
     return drafts
 
 
+def list_draft_summaries(limit: int = 12, offset: int = 0, goal: str = None,
+                         month: str = None, platform: str = None) -> Dict:
+    """List one page of draft summaries (title, month, goal, platforms, brief preview).
+    
+    Returns:
+        Dictionary with 'total' and 'items' (see database.get_draft_summaries)
+    """
+    if USE_DATABASE:
+        return get_draft_summaries_from_db(limit, offset, goal, month, platform)
+
+    # Fallback to file system
+    paths = sorted(get_workspace_dir("drafts").glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True)
+    items = []
+    for path in paths:
+        try:
+            with path.open("r", encoding="utf-8") as f:
+                request = json.load(f).get("request", {})
+        except Exception as e:
+            print(f"Error loading {path.name}: {e}")
+            continue
+        if (goal and request.get("goal") != goal) or (month and request.get("month") != month) \
+                or (platform and platform not in request.get("platforms", [])):
+            continue
+        items.append(draft_summary(path.name, request.get("title"), request.get("month"),
+                                    request.get("goal"), request.get("platforms", []),
+                                    request.get("brief")))
+
+    return {"total": len(items), "items": items[offset:offset + limit]}
+
+
+def load_draft(filename: str) -> Dict | None:
+    """Load the full content of a single draft from database or file system."""
+    if USE_DATABASE:
+        draft = get_draft_from_db(filename)
+        if draft is not None:
+            return draft
+
+    path = get_workspace_dir("drafts") / filename
+    if not path.exists():
+        return None
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            data = json.load(f)
+        data['_filename'] = filename
+        return data
+    except Exception as e:
+        print(f"Error loading {filename}: {e}")
+        return None
+
+
+@invalidates('requests')
 def save_request(data: Dict, filename: str = None) -> bool:
     """Save a request to database and/or file system."""
     if filename is None:
@@ -155,14 +221,9 @@ def save_request(data: Dict, filename: str = None) -> bool:
         save_request_to_db(filename, data)
 
     # Also save to file system as backup
-    _ensure_dirs()
-    base = get_workspace_path()
-    requests_dir = base / "requests"
-    path = requests_dir / filename
-
+    path = get_workspace_dir("requests") / filename
     try:
-        with path.open("w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        save_backup(path, data, required=not USE_DATABASE)
         return True
     except Exception as e:
         print(f"Error saving request file: {e}")
@@ -191,8 +252,12 @@ def load_all_requests_dict() -> List[Dict]:
     return requests
 
 
-def save_scheduled_post(data: Dict, filename: str = None) -> bool:
-    """Save a scheduled post to database and/or file system."""
+@invalidates('scheduled_posts')
+def save_scheduled_post(data: Dict, filename: str = None, overwrite: bool = False) -> bool:
+    """Save a scheduled post to database and/or file system.
+
+    ``overwrite`` allows replacing a post already in the database.
+    """
     if filename is None:
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         service = data.get('service', 'post')
@@ -202,35 +267,57 @@ def save_scheduled_post(data: Dict, filename: str = None) -> bool:
 
     # Save to database
     if USE_DATABASE:
-        save_scheduled_post_to_db(filename, data)
+        save_scheduled_post_to_db(filename, data, overwrite=overwrite)
 
     # Also save to file system as backup
-    _ensure_dirs()
-    base = get_workspace_path()
-    scheduled_dir = base / "scheduled"
-    path = scheduled_dir / filename
-
+    path = get_workspace_dir("scheduled") / filename
     try:
-        with path.open("w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        save_backup(path, data, required=not USE_DATABASE)
         return True
     except Exception as e:
         print(f"Error saving scheduled post file: {e}")
         return USE_DATABASE
 
 
-def load_all_scheduled_posts() -> List[Dict]:
-    """Load all scheduled posts from database or file system."""
+def _backfill_scheduled_posts() -> None:
+    """Copy scheduled posts that exist only as files into the database.
+
+    Runs once per workspace: posts approved before the database was in use
+    (or written by older versions of the CLI) would otherwise not be listed.
+    Published posts have no file left, so file-only posts are pending.
+    """
+    scheduled_dir = get_workspace_dir("scheduled")
+    with _backfill_lock:
+        if scheduled_dir in _backfilled_dirs:
+            return
+        known = set(get_scheduled_filenames_from_db())
+        for path in sorted(scheduled_dir.glob("*.json")):
+            if path.name in known:
+                continue
+            try:
+                with path.open("r", encoding="utf-8") as f:
+                    save_scheduled_post_to_db(path.name, json.load(f))
+            except Exception as e:
+                print(f"Error importing scheduled post {path.name}: {e}")
+        _backfilled_dirs.add(scheduled_dir)
+
+
+def load_all_scheduled_posts(status: str = None) -> List[Dict]:
+    """Load all scheduled posts from database or file system.
+
+    Args:
+        status: Only posts with this status (database only; the backup files
+            are removed once a post is published)
+    """
     if USE_DATABASE:
         try:
-            return get_scheduled_from_db()
+            _backfill_scheduled_posts()
+            return get_scheduled_from_db(status)
         except Exception as e:
             print(f"Error loading from database: {e}")
 
     # Fallback to file system
-    _ensure_dirs()
-    base = get_workspace_path()
-    scheduled_dir = base / "scheduled"
+    scheduled_dir = get_workspace_dir("scheduled")
     posts = []
 
     for path in sorted(scheduled_dir.glob("*.json")):
@@ -245,6 +332,7 @@ def load_all_scheduled_posts() -> List[Dict]:
     return posts
 
 
+@invalidates('drafts')
 def delete_draft(filename: str) -> bool:
     """Delete a draft from database and file system."""
     success = True
@@ -255,10 +343,7 @@ def delete_draft(filename: str) -> bool:
 
     # Delete from file system
     try:
-        base = get_workspace_path()
-        path = base / "drafts" / filename
-        if path.exists():
-            path.unlink()
+        delete_backup(get_workspace_dir("drafts") / filename)
     except Exception as e:
         print(f"Error deleting draft file: {e}")
         success = False
@@ -266,6 +351,7 @@ def delete_draft(filename: str) -> bool:
     return success
 
 
+@invalidates('scheduled_posts')
 def delete_scheduled_post(filename: str) -> bool:
     """Delete a scheduled post from database and file system."""
     success = True
@@ -276,10 +362,7 @@ def delete_scheduled_post(filename: str) -> bool:
 
     # Delete from file system
     try:
-        base = get_workspace_path()
-        path = base / "scheduled" / filename
-        if path.exists():
-            path.unlink()
+        delete_backup(get_workspace_dir("scheduled") / filename)
     except Exception as e:
         print(f"Error deleting scheduled post file: {e}")
         success = False
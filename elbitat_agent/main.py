@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import argparse
 from datetime import datetime
+from pathlib import Path
 from typing import List
 import json
 
@@ -137,6 +138,101 @@ def cmd_auto_post(draft_name: str, platforms: List[str] | None = None) -> None:
     print(f"\nResults saved to: {base / 'posted' / f'{draft_name}.posted.json'}")
 
 
+def cmd_export_snapshot(path: str, source: str) -> None:
+    """Export requests, drafts, scheduled posts and posting results to one file."""
+    from .snapshot import export_snapshot
+
+    counts = export_snapshot(Path(path), source=source)
+    print(f"Exported {sum(counts.values())} record(s) to {path}:")
+    for kind, count in counts.items():
+        print(f"- {kind}: {count}")
+
+
+def cmd_import_snapshot(path: str) -> None:
+    """Restore a snapshot written by export-snapshot."""
+    from .snapshot import import_snapshot, SnapshotError
+
+    if not Path(path).exists():
+        print(f"Error: Snapshot not found: {path}")
+        return
+    try:
+        counts = import_snapshot(Path(path))
+    except SnapshotError as e:
+        print(f"Error: {e}")
+        return
+    print(f"Imported {sum(counts.values())} record(s) from {path}:")
+    for kind, count in counts.items():
+        print(f"- {kind}: {count}")
+
+
+def cmd_campaign_runs(campaign_id: int | None) -> None:
+    """List recent email campaign runs and their progress."""
+    from .database import get_email_campaign_runs
+
+    runs = get_email_campaign_runs(campaign_id)
+    if not runs:
+        print("No campaign runs found.")
+        return
+
+    for run in runs:
+        print(f"Run {run['id']} (campaign {run['campaign_id']}): {run['status']} - "
+              f"{run['sent']} sent, {run['failed']} failed, {run['skipped']} skipped, "
+              f"{run['pending']} pending of {run['total']}")
+        if run['error_message']:
+            print(f"  Error: {run['error_message']}")
+
+
+def cmd_resume_campaign_run(run_id: int, retry_failed: bool, backend: str | None) -> None:
+    """Resume a paused, failed or interrupted campaign run in the foreground."""
+    from .agents.campaign_runs import retry_failed_recipients, run_campaign
+
+    if retry_failed:
+        print(f"Retrying {retry_failed_recipients(run_id)} failed recipient(s)")
+    try:
+        run = run_campaign(run_id, backend=backend)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
+    if run is None:
+        print(f"Run {run_id} cannot be resumed (not found, finished, or running elsewhere)")
+        return
+    print(f"Run {run_id}: {run['status']} - {run['sent']} sent, {run['failed']} failed, "
+          f"{run['skipped']} skipped, {run['pending']} pending of {run['total']}")
+
+
+def cmd_export_contacts(path: str, status: str | None) -> None:
+    """Export email contacts to a CSV file."""
+    from .contacts_csv import export_contacts_csv
+
+    count = export_contacts_csv(path, status=status)
+    print(f"Exported {count} contact(s) to {path}")
+
+
+def cmd_import_contacts(path: str, status: str) -> None:
+    """Import email contacts from a CSV file."""
+    from .contacts_csv import ContactImportError, import_contacts_csv
+
+    try:
+        result = import_contacts_csv(path, default_status=status)
+    except ContactImportError as e:
+        print(f"Error: {e}")
+        return
+    print(f"Read {result['rows']} row(s) from {path}: {result['inserted']} new, "
+          f"{result['updated']} updated, {result['invalid']} invalid")
+    for error in result['errors']:
+        print(f"- {error}")
+
+
+def cmd_tracking_server(host: str, port: int) -> None:
+    """Run the email open/click tracking service."""
+    from .tracking import run_tracking_server
+
+    try:
+        run_tracking_server(host, port)
+    except ValueError as e:
+        print(f"Error: {e}")
+
+
 def main(argv: List[str] | None = None) -> None:
     parser = argparse.ArgumentParser(description="Elbitat social media agent with automated posting")
     sub = parser.add_subparsers(dest="command")
@@ -151,6 +247,36 @@ def main(argv: List[str] | None = None) -> None:
     post_parser.add_argument("draft_name", help="Name of the draft to post (without .json extension)")
     post_parser.add_argument("--platforms", nargs="+", help="Specific platforms to post to (instagram, facebook, tiktok)")
 
+    export_parser = sub.add_parser("export-snapshot", help="Export all data to a single gzip NDJSON snapshot file")
+    export_parser.add_argument("path", help="Snapshot file to write (e.g. backup.ndjson.gz)")
+    export_parser.add_argument("--source", choices=["database", "files"], default="database",
+                               help="Read from the database (default) or the workspace JSON files")
+
+    import_parser = sub.add_parser("import-snapshot", help="Restore a snapshot file into the database")
+    import_parser.add_argument("path", help="Snapshot file to read")
+
+    runs_parser = sub.add_parser("campaign-runs", help="List recent email campaign runs")
+    runs_parser.add_argument("--campaign", type=int, help="Only runs of this campaign ID")
+
+    resume_parser = sub.add_parser("resume-campaign-run", help="Resume an interrupted email campaign run")
+    resume_parser.add_argument("run_id", type=int, help="ID of the run (see campaign-runs)")
+    resume_parser.add_argument("--retry-failed", action="store_true", help="Also retry recipients whose send failed")
+    resume_parser.add_argument("--backend", choices=["sendgrid", "smtp"],
+                               help="Delivery backend (default: the EMAIL_BACKEND setting, or sendgrid)")
+
+    export_contacts_parser = sub.add_parser("export-contacts", help="Export email contacts to a CSV file")
+    export_contacts_parser.add_argument("path", help="CSV file to write")
+    export_contacts_parser.add_argument("--status", help="Only contacts with this status")
+
+    import_contacts_parser = sub.add_parser("import-contacts", help="Import email contacts from a CSV file")
+    import_contacts_parser.add_argument("path", help="CSV file with an Email column (see export-contacts)")
+    import_contacts_parser.add_argument("--status", choices=["active", "new"], default="active",
+                                        help="Status of new contacts whose row has none (default active)")
+
+    tracking_parser = sub.add_parser("tracking-server", help="Run the email open/click tracking service")
+    tracking_parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on (default 127.0.0.1)")
+    tracking_parser.add_argument("--port", type=int, default=8765, help="Port to listen on (default 8765)")
+
     args = parser.parse_args(argv)
 
     if args.command == "list-requests":
@@ -165,6 +291,20 @@ def main(argv: List[str] | None = None) -> None:
         cmd_check_api()
     elif args.command == "auto-post":
         cmd_auto_post(args.draft_name, args.platforms)
+    elif args.command == "export-snapshot":
+        cmd_export_snapshot(args.path, args.source)
+    elif args.command == "import-snapshot":
+        cmd_import_snapshot(args.path)
+    elif args.command == "campaign-runs":
+        cmd_campaign_runs(args.campaign)
+    elif args.command == "resume-campaign-run":
+        cmd_resume_campaign_run(args.run_id, args.retry_failed, args.backend)
+    elif args.command == "export-contacts":
+        cmd_export_contacts(args.path, args.status)
+    elif args.command == "import-contacts":
+        cmd_import_contacts(args.path, args.status)
+    elif args.command == "tracking-server":
+        cmd_tracking_server(args.host, args.port)
     else:
         parser.print_help()
 
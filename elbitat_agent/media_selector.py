@@ -14,7 +14,8 @@ import random
 from pathlib import Path
 from typing import List
 
-from .config import get_workspace_path
+from .config import get_workspace_dir
+from .cache import cached_by_tables
 
 
 def get_media_library_path() -> Path:
@@ -26,6 +27,7 @@ def get_media_library_path() -> Path:
     return project_root / "Foto Elbitat"
 
 
+@cached_by_tables('media', copy_result=list)
 def list_media_files(category: str | None = None) -> List[Path]:
     """List all image files in the media library.
     
@@ -134,8 +136,7 @@ def copy_selected_images_to_workspace(image_paths: List[Path], ad_title: str) ->
     Returns:
         List of destination paths in the workspace
     """
-    workspace = get_workspace_path()
-    media_dir = workspace / "media" / ad_title.replace(" ", "_").lower()
+    media_dir = get_workspace_dir("media") / ad_title.replace(" ", "_").lower()
     media_dir.mkdir(parents=True, exist_ok=True)
     
     destination_paths = []
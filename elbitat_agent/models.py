@@ -56,3 +56,23 @@ class AdDraft:
             "copy_by_platform": self.copy_by_platform,
             "selected_images": self.selected_images,
         }
+
+
+BRIEF_PREVIEW_CHARS = 100
+
+
+def draft_summary(filename: str, title: Optional[str], month: Optional[str], goal: Optional[str],
+                  platforms: Optional[List[str]], brief: Optional[str], created_at=None) -> Dict:
+    """Build the lightweight summary of a draft used for listings."""
+    brief = brief or ""
+    if len(brief) > BRIEF_PREVIEW_CHARS:
+        brief = brief[:BRIEF_PREVIEW_CHARS] + "..."
+    return {
+        "_filename": filename,
+        "title": title or "Untitled",
+        "month": month,
+        "goal": goal,
+        "platforms": platforms or [],
+        "brief_preview": brief,
+        "created_at": created_at,
+    }
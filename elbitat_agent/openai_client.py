@@ -0,0 +1,259 @@
+"""Shared OpenAI client with concurrency limits, retries and call metrics.
+
+All AI agents go through ``chat_completion`` (or ``async_chat_completion``)
+instead of constructing their own ``OpenAI`` client per call:
+
+- the sync and async clients are created lazily, once per process
+- a process-wide semaphore caps the number of in-flight requests, sync
+  and async calls together
+- rate limits, timeouts and 5xx errors are retried with exponential
+  backoff, honouring the ``retry-after`` header, within a retry budget
+- latency and token usage of every call are recorded for inspection
+
+Tunable with environment variables:
+- OPENAI_MAX_CONCURRENCY: Maximum concurrent requests (default 4)
+- OPENAI_TIMEOUT: Per-request timeout in seconds (default 60)
+- OPENAI_MAX_RETRIES: Retries per call (default 4)
+- OPENAI_RETRY_BUDGET: Maximum total seconds spent waiting on retries per call (default 60)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, List, Optional
+
+DEFAULT_MODEL = "gpt-4o-mini"
+
+MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "4"))
+REQUEST_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "60"))
+MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "4"))
+RETRY_BUDGET_SECONDS = float(os.getenv("OPENAI_RETRY_BUDGET", "60"))
+
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 20.0
+
+_lock = threading.Lock()
+_client = None
+_async_client = None
+_semaphore = threading.BoundedSemaphore(MAX_CONCURRENCY)
+# Async calls wait for a ``_semaphore`` slot here, off the event loop; the
+# rest queue in the pool, so at most MAX_CONCURRENCY threads are blocked
+_slot_waiters = ThreadPoolExecutor(max_workers=MAX_CONCURRENCY, thread_name_prefix="openai-slot")
+
+
+@dataclass
+class CallMetrics:
+    """Latency and token usage of one completed (or failed) API call."""
+
+    model: str
+    started_at: float
+    latency_seconds: float
+    retries: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+    error: Optional[str] = None
+
+
+_metrics: Deque[CallMetrics] = deque(maxlen=500)
+
+
+def get_api_key() -> Optional[str]:
+    """Return the OpenAI API key from Streamlit secrets or the environment."""
+    from .config import get_secret
+    return get_secret('OPENAI_API_KEY')
+
+
+def get_client():
+    """Return the process-wide sync ``OpenAI`` client, creating it on first use.
+
+    Raises:
+        ImportError: If the openai package is not installed
+        ValueError: If no API key is configured
+    """
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                from openai import OpenAI
+                _client = OpenAI(api_key=_require_api_key(), timeout=REQUEST_TIMEOUT, max_retries=0)
+    return _client
+
+
+def get_async_client():
+    """Return the process-wide ``AsyncOpenAI`` client, creating it on first use."""
+    global _async_client
+    if _async_client is None:
+        with _lock:
+            if _async_client is None:
+                from openai import AsyncOpenAI
+                _async_client = AsyncOpenAI(api_key=_require_api_key(), timeout=REQUEST_TIMEOUT, max_retries=0)
+    return _async_client
+
+
+def reset_clients() -> None:
+    """Drop the cached clients (e.g. after the API key changed)."""
+    global _client, _async_client
+    with _lock:
+        _client = None
+        _async_client = None
+
+
+def chat_completion(messages: List[Dict[str, str]], model: str = DEFAULT_MODEL, **kwargs):
+    """Create a chat completion through the shared client.
+
+    Args:
+        messages: Chat messages with 'role' and 'content'
+        model: Model name
+        **kwargs: Passed through to ``client.chat.completions.create``
+
+    Returns:
+        The OpenAI ``ChatCompletion`` response
+    """
+    client = get_client()
+    started = time.time()
+    retries = 0
+    while True:
+        try:
+            with _semaphore:
+                response = client.chat.completions.create(model=model, messages=messages, **kwargs)
+            _record(model, started, retries, response=response)
+            return response
+        except Exception as e:
+            delay = _retry_delay(e, retries, started)
+            if delay is None:
+                _record(model, started, retries, error=e)
+                raise
+            retries += 1
+            print(f"⏳ OpenAI call failed ({type(e).__name__}), retry {retries}/{MAX_RETRIES} in {delay:.1f}s")
+            time.sleep(delay)
+
+
+async def async_chat_completion(messages: List[Dict[str, str]], model: str = DEFAULT_MODEL, **kwargs):
+    """Async variant of ``chat_completion`` sharing the same limits and metrics."""
+    client = get_async_client()
+    started = time.time()
+    retries = 0
+    while True:
+        try:
+            await _acquire_slot()
+            try:
+                response = await client.chat.completions.create(model=model, messages=messages, **kwargs)
+            finally:
+                _semaphore.release()
+            _record(model, started, retries, response=response)
+            return response
+        except Exception as e:
+            delay = _retry_delay(e, retries, started)
+            if delay is None:
+                _record(model, started, retries, error=e)
+                raise
+            retries += 1
+            print(f"⏳ OpenAI call failed ({type(e).__name__}), retry {retries}/{MAX_RETRIES} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+
+def get_call_metrics() -> List[CallMetrics]:
+    """Return the most recent call metrics (oldest first)."""
+    return list(_metrics)
+
+
+def get_metrics_summary() -> Dict[str, Any]:
+    """Aggregate the recorded call metrics."""
+    calls = list(_metrics)
+    latencies = sorted(m.latency_seconds for m in calls)
+    return {
+        'calls': len(calls),
+        'errors': sum(1 for m in calls if m.error),
+        'retries': sum(m.retries for m in calls),
+        'prompt_tokens': sum(m.prompt_tokens for m in calls),
+        'completion_tokens': sum(m.completion_tokens for m in calls),
+        'avg_latency_seconds': sum(latencies) / len(latencies) if latencies else 0.0,
+        'p95_latency_seconds': latencies[int(len(latencies) * 0.95)] if latencies else 0.0,
+    }
+
+
+def _require_api_key() -> str:
+    api_key = get_api_key()
+    if not api_key:
+        raise ValueError("OPENAI_API_KEY not found in secrets or environment variables")
+    return api_key
+
+
+async def _acquire_slot() -> None:
+    """Take a slot of ``_semaphore`` (shared with sync calls) without blocking the event loop."""
+    if _semaphore.acquire(blocking=False):
+        return
+    acquire = asyncio.get_running_loop().run_in_executor(_slot_waiters, _semaphore.acquire)
+    try:
+        await asyncio.shield(acquire)
+    except asyncio.CancelledError:
+        # A waiter that already started still takes the slot; hand it back
+        acquire.add_done_callback(lambda f: f.cancelled() or _semaphore.release())
+        raise
+
+
+def _retry_delay(error: Exception, retries: int, started: float) -> Optional[float]:
+    """Return how long to wait before retrying ``error``, or None to give up."""
+    if retries >= MAX_RETRIES or not _is_retryable(error):
+        return None
+
+    delay = _retry_after_seconds(error)
+    if delay is None:
+        delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** retries)
+        delay *= random.uniform(0.5, 1.0)
+
+    if time.time() - started + delay > RETRY_BUDGET_SECONDS:
+        return None
+    return delay
+
+
+def _is_retryable(error: Exception) -> bool:
+    try:
+        import openai
+    except ImportError:
+        return False
+    if isinstance(error, (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in (408, 409, 429) or error.status_code >= 500
+    return False
+
+
+def _retry_after_seconds(error: Exception) -> Optional[float]:
+    """Read the server's ``retry-after-ms`` / ``retry-after`` header, if any."""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if not headers:
+        return None
+    try:
+        if headers.get('retry-after-ms'):
+            return float(headers['retry-after-ms']) / 1000
+        if headers.get('retry-after'):
+            return float(headers['retry-after'])
+    except (TypeError, ValueError):
+        return None
+    return None
+
+
+def _record(model: str, started: float, retries: int, response=None, error: Optional[Exception] = None) -> None:
+    metrics = CallMetrics(
+        model=model,
+        started_at=started,
+        latency_seconds=time.time() - started,
+        retries=retries,
+        error=f"{type(error).__name__}: {error}" if error else None,
+    )
+    usage = getattr(response, 'usage', None)
+    if usage is not None:
+        metrics.prompt_tokens = getattr(usage, 'prompt_tokens', 0) or 0
+        metrics.completion_tokens = getattr(usage, 'completion_tokens', 0) or 0
+        metrics.total_tokens = getattr(usage, 'total_tokens', 0) or 0
+    _metrics.append(metrics)
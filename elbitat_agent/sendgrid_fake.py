@@ -0,0 +1,166 @@
+"""Local stand-in for SendGrid's v3 mail/send endpoint, for offline testing.
+
+Runs an HTTP server on localhost that validates requests the way SendGrid
+does (bearer key, 1-1000 personalizations, sender, subject and content
+present) and answers ``202 Accepted`` with an ``X-Message-Id``. Responses
+can be delayed to simulate network round trips, and failures (e.g. a 429
+with ``Retry-After``) can be queued to exercise retries.
+
+Point the sender at it with the SENDGRID_API_URL setting::
+
+    with FakeSendGridServer(latency=0.05) as server:
+        os.environ["SENDGRID_API_URL"] = server.url
+        ...
+        print(server.recipients)
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+MAX_PERSONALIZATIONS = 1000
+
+
+class FakeSendGridServer:
+    """Threaded local mail/send endpoint.
+
+    Args:
+        latency: Seconds to wait before answering each request
+        api_key: If set, requests must use this key
+    """
+
+    def __init__(self, latency: float = 0.0, api_key: Optional[str] = None):
+        self.latency = latency
+        self.api_key = api_key
+        self.requests: List[Dict] = []
+        self._failures: deque = deque()
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.max_in_flight = 0
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}/v3/mail/send"
+
+    @property
+    def recipients(self) -> List[str]:
+        """Addresses of all accepted personalizations, in arrival order."""
+        with self._lock:
+            return [to['email'] for request in self.requests if request['status'] == 202
+                    for p in request['payload']['personalizations'] for to in p['to']]
+
+    def messages(self) -> List[Dict[str, str]]:
+        """The accepted emails as delivered: substitutions applied to subject and body."""
+        with self._lock:
+            requests = [r['payload'] for r in self.requests if r['status'] == 202]
+        messages = []
+        for payload in requests:
+            for p in payload['personalizations']:
+                subject = p.get('subject') or payload['subject']
+                html = payload['content'][0]['value']
+                for tag, value in (p.get('substitutions') or {}).items():
+                    subject = subject.replace(tag, value)
+                    html = html.replace(tag, value)
+                for to in p['to']:
+                    messages.append({'email': to['email'], 'subject': subject, 'html': html})
+        return messages
+
+    def fail_next(self, status: int, count: int = 1, retry_after: Optional[float] = None,
+                  message: str = "Injected failure") -> None:
+        """Answer the next ``count`` requests with ``status`` instead of accepting them."""
+        with self._lock:
+            for _ in range(count):
+                self._failures.append((status, retry_after, message))
+
+    def start(self) -> "FakeSendGridServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-sendgrid", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeSendGridServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _respond(self, headers: Dict[str, str], body: bytes):
+        """Return (status, headers, JSON body, parsed payload) for a request."""
+        if self.api_key and headers.get('Authorization') != f"Bearer {self.api_key}":
+            return 401, {}, {'errors': [{'message': 'The provided authorization grant is invalid'}]}, None
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return 400, {}, {'errors': [{'message': 'Bad Request'}]}, None
+
+        with self._lock:
+            failure = self._failures.popleft() if self._failures else None
+        if failure:
+            status, retry_after, message = failure
+            extra = {'Retry-After': str(retry_after)} if retry_after is not None else {}
+            return status, extra, {'errors': [{'message': message}]}, payload
+
+        errors = _validate(payload)
+        if errors:
+            return 400, {}, {'errors': [{'message': m} for m in errors]}, payload
+        return 202, {'X-Message-Id': uuid.uuid4().hex[:22]}, None, payload
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                with fake._lock:
+                    fake._in_flight += 1
+                    fake.max_in_flight = max(fake.max_in_flight, fake._in_flight)
+                try:
+                    if fake.latency:
+                        time.sleep(fake.latency)
+                    body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                    status, headers, response, payload = fake._respond(dict(self.headers), body)
+                    with fake._lock:
+                        fake.requests.append({'status': status, 'payload': payload})
+                    data = json.dumps(response).encode() if response is not None else b''
+                    self.send_response(status)
+                    for name, value in headers.items():
+                        self.send_header(name, value)
+                    self.send_header('Content-Length', str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                finally:
+                    with fake._lock:
+                        fake._in_flight -= 1
+
+            def log_message(self, *args):
+                pass  # keep test output quiet
+
+        return Handler
+
+
+def _validate(payload: Dict) -> List[str]:
+    errors = []
+    personalizations = payload.get('personalizations') or []
+    if not 1 <= len(personalizations) <= MAX_PERSONALIZATIONS:
+        errors.append(f"The personalizations field must have between 1 and {MAX_PERSONALIZATIONS} items")
+    for p in personalizations:
+        for to in p.get('to') or [{}]:
+            if '@' not in (to.get('email') or ''):
+                errors.append(f"Does not contain a valid address: {to.get('email')!r}")
+    if not (payload.get('from') or {}).get('email'):
+        errors.append("The from object must be provided for every email send")
+    if not payload.get('subject') and not all(p.get('subject') for p in personalizations):
+        errors.append("The subject is required")
+    if not payload.get('content'):
+        errors.append("Unless a valid template_id is provided, the content parameter is required")
+    return errors
@@ -0,0 +1,279 @@
+"""Local SMTP sink for testing the SMTP delivery backend offline.
+
+Runs a threaded SMTP server on localhost that speaks enough ESMTP for
+``smtplib`` and ``smtp_delivery.SMTPBatchSender``: EHLO (advertising
+PIPELINING and AUTH PLAIN), AUTH, MAIL, RCPT, DATA, RSET, NOOP and QUIT.
+Accepted messages are kept in memory. Each read from a client can be
+delayed to simulate the network round trip (pipelined commands arrive in
+one read, so they pay it once), recipients can be rejected, temporary
+failures can be queued, connections can be limited to a number of
+messages (answered with 421, as busy relays do), and a connection can be
+dropped after a message is queued but before the reply is sent.
+
+Point the sender at it with the SMTP_* settings::
+
+    with FakeSMTPServer(latency=0.005) as server:
+        os.environ["SMTP_HOST"], os.environ["SMTP_PORT"] = server.host, str(server.port)
+        os.environ["SMTP_SECURITY"] = "none"
+        ...
+        print(server.recipients)
+"""
+
+from __future__ import annotations
+
+import base64
+import email
+import email.policy
+import socketserver
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Dict, Iterable, List, Optional
+
+
+class FakeSMTPServer:
+    """Threaded local SMTP server.
+
+    Args:
+        latency: Seconds to wait after each read from a client
+        username: If set, clients must log in (AUTH PLAIN) with it and ``password``
+        password: Password for ``username``
+        reject: Recipient addresses answered with ``550``
+        messages_per_connection: Messages accepted per connection before the
+            server answers ``421`` and disconnects (None for no limit)
+        pipelining: Whether to advertise PIPELINING
+    """
+
+    def __init__(self, latency: float = 0.0, username: Optional[str] = None, password: Optional[str] = None,
+                 reject: Iterable[str] = (), messages_per_connection: Optional[int] = None,
+                 pipelining: bool = True):
+        self.latency = latency
+        self.username = username
+        self.password = password
+        self.reject = {address.lower() for address in reject}
+        self.messages_per_connection = messages_per_connection
+        self.pipelining = pipelining
+        self.accepted: List[Dict] = []
+        self.connections = 0
+        self.logins = 0
+        self.reads = 0
+        self._failures: deque = deque()
+        self._dropped_replies = 0
+        self._lock = threading.Lock()
+        self._server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def host(self) -> str:
+        return self._server.server_address[0]
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    @property
+    def recipients(self) -> List[str]:
+        """Addresses of all accepted messages, in arrival order."""
+        with self._lock:
+            return [rcpt for message in self.accepted for rcpt in message['recipients']]
+
+    def messages(self) -> List[Dict[str, str]]:
+        """The accepted emails as delivered: recipient, subject, HTML body and headers."""
+        with self._lock:
+            accepted = list(self.accepted)
+        messages = []
+        for message in accepted:
+            parsed = email.message_from_bytes(message['data'].replace(b'\r\n', b'\n'), policy=email.policy.default)
+            body = parsed.get_body(('html', 'plain'))
+            for rcpt in message['recipients']:
+                messages.append({'email': rcpt, 'subject': str(parsed['Subject']),
+                                 'html': body.get_content() if body is not None else '',
+                                 'headers': dict(parsed.items()), 'at': message['at']})
+        return messages
+
+    def fail_next(self, code: int, count: int = 1, message: str = "Injected failure") -> None:
+        """Answer the next ``count`` MAIL commands with ``code`` instead of accepting them."""
+        with self._lock:
+            for _ in range(count):
+                self._failures.append((code, message))
+
+    def drop_reply_next(self, count: int = 1) -> None:
+        """Queue the next ``count`` messages, then disconnect instead of replying to the final "."."""
+        with self._lock:
+            self._dropped_replies += count
+
+    def start(self) -> "FakeSMTPServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-smtp", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeSMTPServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _handler(self):
+        fake = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                with fake._lock:
+                    fake.connections += 1
+                session = _Session(fake)
+                self.request.sendall(b"220 fake-smtp ESMTP ready\r\n")
+                buffer = b''
+                while not session.closed:
+                    data = self.request.recv(65536)
+                    if not data:
+                        return
+                    if fake.latency:
+                        time.sleep(fake.latency)
+                    with fake._lock:
+                        fake.reads += 1
+                    buffer, replies = session.feed(buffer + data)
+                    if replies:
+                        self.request.sendall(b''.join(replies))
+
+        return Handler
+
+
+class _Session:
+    """SMTP state of one client connection."""
+
+    def __init__(self, fake: FakeSMTPServer):
+        self.fake = fake
+        self.closed = False
+        self.authenticated = fake.username is None
+        self.delivered = 0
+        self.in_data = False
+        self._reset()
+
+    def _reset(self) -> None:
+        self.mail_from: Optional[str] = None
+        self.recipients: List[str] = []
+
+    def feed(self, buffer: bytes):
+        """Handle the complete commands (and message data) in ``buffer``; return (rest, replies)."""
+        replies = []
+        while not self.closed:
+            if self.in_data:
+                if buffer.startswith(b'.\r\n'):
+                    data, buffer = b'', buffer[3:]
+                else:
+                    end = buffer.find(b'\r\n.\r\n')
+                    if end < 0:
+                        break
+                    data, buffer = buffer[:end + 2], buffer[end + 5:]
+                self.in_data = False
+                replies.append(self._message((b'\r\n' + data).replace(b'\r\n..', b'\r\n.')[2:]))
+                continue
+            end = buffer.find(b'\r\n')
+            if end < 0:
+                break
+            line, buffer = buffer[:end].decode('utf-8', 'replace'), buffer[end + 2:]
+            replies.append(self._command(line))
+        return buffer, replies
+
+    def _command(self, line: str) -> bytes:
+        verb, _, argument = line.partition(' ')
+        verb = verb.upper()
+        if verb == 'EHLO':
+            features = ['fake-smtp', '8BITMIME', 'SIZE 35882577']
+            if self.fake.pipelining:
+                features.append('PIPELINING')
+            if self.fake.username is not None:
+                features.append('AUTH PLAIN')
+            return _multiline(250, features)
+        if verb == 'HELO':
+            return _reply(250, 'fake-smtp')
+        if verb == 'AUTH':
+            return self._auth(argument)
+        if verb == 'MAIL':
+            if not self.authenticated:
+                return _reply(530, '5.7.0 Authentication required')
+            with self.fake._lock:
+                failure = self.fake._failures.popleft() if self.fake._failures else None
+            if failure:
+                return _reply(*failure)
+            limit = self.fake.messages_per_connection
+            if limit is not None and self.delivered >= limit:
+                self.closed = True
+                return _reply(421, '4.7.0 Too many messages on this connection, try again')
+            self._reset()
+            self.mail_from = _address(argument)
+            return _reply(250, '2.1.0 Ok')
+        if verb == 'RCPT':
+            if self.mail_from is None:
+                return _reply(503, '5.5.1 Need MAIL first')
+            address = _address(argument)
+            if '@' not in address or address.lower() in self.fake.reject:
+                return _reply(550, f'5.1.1 <{address}>: Recipient address rejected')
+            self.recipients.append(address)
+            return _reply(250, '2.1.5 Ok')
+        if verb == 'DATA':
+            if not self.recipients:
+                return _reply(554, '5.5.1 No valid recipients')
+            self.in_data = True
+            return _reply(354, 'End data with <CR><LF>.<CR><LF>')
+        if verb == 'RSET':
+            self._reset()
+            return _reply(250, '2.0.0 Ok')
+        if verb == 'NOOP':
+            return _reply(250, '2.0.0 Ok')
+        if verb == 'QUIT':
+            self.closed = True
+            return _reply(221, '2.0.0 Bye')
+        return _reply(502, '5.5.2 Command not recognized')
+
+    def _auth(self, argument: str) -> bytes:
+        mechanism, _, response = argument.partition(' ')
+        if mechanism.upper() != 'PLAIN' or self.fake.username is None:
+            return _reply(504, '5.5.4 Unrecognized authentication type')
+        try:
+            _, username, password = base64.b64decode(response).decode('utf-8').split('\0')
+        except ValueError:
+            return _reply(501, '5.5.2 Cannot decode response')
+        if (username, password) != (self.fake.username, self.fake.password):
+            return _reply(535, '5.7.8 Authentication credentials invalid')
+        self.authenticated = True
+        with self.fake._lock:
+            self.fake.logins += 1
+        return _reply(235, '2.7.0 Authentication successful')
+
+    def _message(self, data: bytes) -> bytes:
+        queue_id = uuid.uuid4().hex[:12].upper()
+        with self.fake._lock:
+            self.fake.accepted.append({'mail_from': self.mail_from, 'recipients': list(self.recipients),
+                                       'data': data, 'at': time.monotonic(), 'queue_id': queue_id})
+            if self.fake._dropped_replies:
+                self.fake._dropped_replies -= 1
+                self.closed = True
+                return b''
+        self.delivered += 1
+        self._reset()
+        return _reply(250, f'2.0.0 Ok: queued as {queue_id}')
+
+
+def _address(argument: str) -> str:
+    """Address from a ``FROM:<a@b>`` / ``TO:<a@b>`` argument (parameters ignored)."""
+    _, _, value = argument.partition(':')
+    value = value.strip()
+    if value.startswith('<'):
+        value = value[1:value.find('>')] if '>' in value else value[1:]
+    return value.split(' ', 1)[0]
+
+
+def _reply(code: int, text: str) -> bytes:
+    return f"{code} {text}\r\n".encode('utf-8')
+
+
+def _multiline(code: int, lines: List[str]) -> bytes:
+    return ''.join(f"{code}{' ' if i == len(lines) - 1 else '-'}{line}\r\n"
+                   for i, line in enumerate(lines)).encode('utf-8')
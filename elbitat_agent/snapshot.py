@@ -0,0 +1,283 @@
+"""Single-file snapshots of requests, drafts, scheduled posts and posting results.
+
+A snapshot is gzip-compressed NDJSON: a header line followed by one record
+per line::
+
+    {"format": "elbitat-snapshot", "version": 1, "created_at": "...", "source": "database"}
+    {"kind": "drafts", "filename": "x.draft.json", "content": {...}, "created_at": "...", ...}
+
+Export streams rows straight from a SQLite cursor (or the workspace JSON
+files) into the compressed file, and import streams records back, so memory
+stays flat however big the snapshot is. Import writes everything in one
+transaction with batched ``executemany`` upserts, and the extracted columns
+and draft platforms of each batch are rebuilt with set-based SQL. A failed
+import leaves the database unchanged; posting results are written to
+``posted/`` only once the transaction has committed.
+
+Snapshots use the local SQLite database; Supabase deployments can export
+from (and later migrate) the workspace files instead.
+"""
+
+from __future__ import annotations
+
+import gzip
+import itertools
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+from .backup import write_json_atomic
+from .cache import bump_table_version
+from .config import get_workspace_dir, get_workspace_path
+
+SNAPSHOT_FORMAT = "elbitat-snapshot"
+SNAPSHOT_VERSION = 1
+IMPORT_BATCH_SIZE = 500
+
+# Snapshot kind -> workspace folder
+KIND_FOLDERS = {
+    'requests': 'requests',
+    'drafts': 'drafts',
+    'scheduled_posts': 'scheduled',
+    'posted': 'posted',
+}
+
+# Columns (besides filename and content) stored per table
+TABLE_COLUMNS = {
+    'requests': ['created_at', 'updated_at'],
+    'drafts': ['service', 'image_path', 'created_at', 'updated_at'],
+    'scheduled_posts': ['service', 'scheduled_time', 'status', 'created_at', 'updated_at'],
+}
+
+# Used when a record lacks the column (e.g. a snapshot of the workspace files)
+COLUMN_DEFAULTS = {'created_at': 'CURRENT_TIMESTAMP', 'updated_at': 'CURRENT_TIMESTAMP', 'status': "'pending'"}
+
+UPSERT_SQL = {
+    table: f'''
+        INSERT INTO {table} (filename, content, {', '.join(columns)})
+        VALUES (?, ?, {', '.join(f"COALESCE(?, {COLUMN_DEFAULTS[c]})" if c in COLUMN_DEFAULTS else '?' for c in columns)})
+        ON CONFLICT(filename) DO UPDATE SET
+            content = excluded.content,
+            {', '.join(f'{c} = excluded.{c}' for c in columns if c != 'created_at')}
+    '''
+    for table, columns in TABLE_COLUMNS.items()
+}
+
+
+class SnapshotError(ValueError):
+    """The file is not a snapshot this version can read."""
+
+
+def export_snapshot(path: Path, source: str = 'database') -> Dict[str, int]:
+    """Write a snapshot of the data to ``path``.
+
+    Args:
+        path: Snapshot file (conventionally ``*.ndjson.gz``)
+        source: 'database' (requests, drafts and scheduled posts from SQLite)
+            or 'files' (the workspace JSON folders). Posting results only
+            exist as files and are always read from ``posted/``.
+
+    Returns:
+        Number of records written per kind
+    """
+    if source not in ('database', 'files'):
+        raise ValueError(f"Unknown snapshot source: {source}")
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    counts = {kind: 0 for kind in KIND_FOLDERS}
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    header = {'format': SNAPSHOT_FORMAT, 'version': SNAPSHOT_VERSION,
+              'created_at': datetime.now().isoformat(), 'source': source}
+    try:
+        with gzip.open(tmp, 'wt', encoding='utf-8') as out:
+            out.write(json.dumps(header) + '\n')
+            records = _database_records() if source == 'database' else _file_records(('requests', 'drafts', 'scheduled_posts'))
+            for kind, line in itertools.chain(records, _file_records(('posted',))):
+                out.write(line + '\n')
+                counts[kind] += 1
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return counts
+
+
+def import_snapshot(path: Path) -> Dict[str, int]:
+    """Restore a snapshot into the database (posting results into ``posted/``).
+
+    Existing rows with the same filename are overwritten; other rows are
+    kept. All database writes happen in one transaction. Posting results
+    are written to ``posted/`` in a second pass over the file once the
+    transaction has committed, so a failed import leaves no files behind.
+
+    Returns:
+        Number of records restored per kind
+
+    Raises:
+        SnapshotError: If the file is not a supported snapshot, or is
+            damaged (the message names the line)
+    """
+    from .database import get_connection
+
+    counts = {kind: 0 for kind in KIND_FOLDERS}
+    batches: Dict[str, List[tuple]] = {kind: [] for kind in KIND_FOLDERS}
+
+    conn = get_connection()
+    conn.isolation_level = None
+    cursor = conn.cursor()
+    try:
+        cursor.execute('BEGIN IMMEDIATE')
+        known_posted = {row[0] for row in cursor.execute(
+            "SELECT filename FROM activity_events WHERE event_type = 'posted'")}
+
+        for record in _read_records(path):
+            kind = record['kind']
+            if kind == 'posted':
+                _record_posted(cursor, record, known_posted)
+            else:
+                content = json.dumps(record['content'], ensure_ascii=False)
+                batches[kind].append((record['filename'], content,
+                                      *(record.get(c) for c in TABLE_COLUMNS[kind])))
+                if len(batches[kind]) >= IMPORT_BATCH_SIZE:
+                    _upsert_batch(cursor, kind, batches[kind])
+                    batches[kind].clear()
+            counts[kind] += 1
+
+        for kind, rows in batches.items():
+            if rows:
+                _upsert_batch(cursor, kind, rows)
+        cursor.execute('COMMIT')
+    except BaseException:
+        cursor.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+        bump_table_version('requests', 'drafts', 'scheduled_posts', 'activity_events')
+
+    if counts['posted']:
+        posted_dir = get_workspace_dir("posted")
+        for record in _read_records(path):
+            if record['kind'] == 'posted':
+                filename = Path(record['filename']).name  # never outside posted/
+                write_json_atomic(posted_dir / filename, record['content'], indent=2)
+    return counts
+
+
+def _record_line(kind: str, filename: str, content_json: str, **columns) -> str:
+    """Serialise a record, embedding the already-encoded JSON content as is."""
+    if '\n' in content_json:
+        content_json = json.dumps(json.loads(content_json), ensure_ascii=False)
+    meta = json.dumps({'kind': kind, 'filename': filename, **columns},
+                      ensure_ascii=False, default=str, separators=(',', ':'))
+    return f'{meta[:-1]},"content":{content_json}}}'
+
+
+def _database_records() -> Iterator[tuple]:
+    from .database import get_connection
+
+    conn = get_connection()
+    try:
+        for table, columns in TABLE_COLUMNS.items():
+            # Iterating the cursor fetches rows lazily
+            cursor = conn.execute(f"SELECT filename, content, {', '.join(columns)} FROM {table} ORDER BY id")
+            for filename, content_json, *values in cursor:
+                yield table, _record_line(table, filename, content_json, **dict(zip(columns, values)))
+    finally:
+        conn.close()
+
+
+def _file_records(kinds) -> Iterator[tuple]:
+    base = get_workspace_path()
+    for kind in kinds:
+        folder = base / KIND_FOLDERS[kind]
+        for path in sorted(folder.glob("*.json")) if folder.exists() else []:
+            try:
+                content_json = path.read_text(encoding="utf-8")
+                content = json.loads(content_json)
+            except Exception as e:
+                print(f"Skipping {path.name}: {e}")
+                continue
+            modified = datetime.fromtimestamp(path.stat().st_mtime).isoformat(sep=' ')
+            if kind == 'posted':
+                columns = {'modified_at': modified}
+            else:
+                # The columns the save_*_to_db functions derive from the content
+                columns = {'created_at': modified, 'updated_at': modified}
+                if kind == 'drafts':
+                    columns.update(service=content.get('service', ''), image_path=content.get('image_path', ''))
+                elif kind == 'scheduled_posts':
+                    columns.update(service=content.get('service', ''), status=content.get('status'),
+                                   scheduled_time=content.get('scheduled_time') or content.get('publish_at') or '')
+            yield kind, _record_line(kind, path.name, content_json, **columns)
+
+
+def _read_records(path: Path) -> Iterator[Dict]:
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        try:
+            header = json.loads(f.readline() or 'null')
+        except (json.JSONDecodeError, EOFError, OSError, UnicodeDecodeError) as e:
+            raise SnapshotError(f"{path} is not a snapshot: {e}")
+        if not isinstance(header, dict) or header.get('format') != SNAPSHOT_FORMAT:
+            raise SnapshotError(f"{path} is not a snapshot")
+        if header.get('version', 0) > SNAPSHOT_VERSION:
+            raise SnapshotError(f"Snapshot version {header.get('version')} is newer than supported ({SNAPSHOT_VERSION})")
+
+        for number, line in _numbered_lines(f, path):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise SnapshotError(f"Invalid record on line {number}: {e}")
+            if (not isinstance(record, dict) or record.get('kind') not in KIND_FOLDERS
+                    or not record.get('filename') or not isinstance(record.get('content'), dict)):
+                raise SnapshotError(f"Invalid record on line {number}")
+            yield record
+
+
+def _numbered_lines(f, path: Path) -> Iterator[tuple]:
+    """(line number, line) after the header; a truncated or corrupt file raises SnapshotError."""
+    number = 1
+    try:
+        for number, line in enumerate(f, start=2):
+            yield number, line
+    except (EOFError, OSError, UnicodeDecodeError) as e:
+        raise SnapshotError(f"{path} is damaged after line {number}: {e}")
+
+
+def _upsert_batch(cursor, kind: str, rows: List[tuple]) -> None:
+    """Upsert a batch and rebuild the extracted columns (and platforms) of just those rows."""
+    from .database import BACKFILL_EXTRACTED_SQL
+
+    cursor.executemany(UPSERT_SQL[kind], rows)
+    filenames = [row[0] for row in rows]
+    in_batch = f"filename IN ({', '.join('?' * len(filenames))})"
+    cursor.execute(f"{BACKFILL_EXTRACTED_SQL[kind]} WHERE {in_batch}", filenames)
+    if kind == 'drafts':
+        cursor.execute(f"DELETE FROM draft_platforms WHERE draft_id IN (SELECT id FROM drafts WHERE {in_batch})",
+                       filenames)
+        cursor.execute(f'''
+            INSERT OR IGNORE INTO draft_platforms (draft_id, platform, position)
+            SELECT d.id, p.value, p.key
+            FROM drafts d, json_each(d.content, '$.request.platforms') p
+            WHERE d.{in_batch} AND p.type = 'text'
+        ''', filenames)
+
+
+def _record_posted(cursor, record: Dict, known: set) -> None:
+    """Add the activity event of a posting result (its file is written after the commit)."""
+    filename = Path(record['filename']).name
+    if filename in known:
+        return
+    payload = record['content']
+    title = (payload.get('draft') or {}).get('request', {}).get('title')
+    cursor.execute('''
+        INSERT INTO activity_events (event_type, filename, title, details, created_at)
+        VALUES ('posted', ?, ?, ?, ?)
+    ''', (filename, title, json.dumps(payload.get('results', {}), ensure_ascii=False),
+          record.get('modified_at') or datetime.now()))
+    known.add(filename)
+
@@ -1,20 +1,71 @@
-"""Supabase cloud database adapter for persistent storage."""
+"""Supabase cloud database adapter for persistent storage.
+
+The Supabase client is created once per process and reused by every
+operation. It is health-checked (a cheap query) when it has not been checked
+for HEALTH_CHECK_SECONDS, and rebuilt after connection errors.
+
+Set the Supabase URL to ``sqlite://<path>`` to use the SQLite-backed stand-in
+from ``supabase_fake`` instead of a real project (offline tests, benchmarks).
+"""
 
 import json
-from typing import Dict, List, Optional
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
-import streamlit as st
+
+from .config import get_secret
+from .models import draft_summary
+from .cache import read_failed
+
+HEALTH_CHECK_SECONDS = float(os.getenv("SUPABASE_HEALTH_CHECK_SECONDS", "300"))
+
+_client_lock = threading.Lock()
+_client = None
+_client_unavailable = False
+_last_health_check = 0.0
 
 
 def get_supabase_client():
-    """Initialize and return Supabase client."""
+    """Return the process-wide Supabase client, or None if Supabase is not available.
+    
+    The client is created on first use. When the supabase package or the
+    credentials are missing, that is remembered so later calls return None
+    immediately (see reset_supabase_client).
+    """
+    global _client, _client_unavailable, _last_health_check
+    if _client_unavailable:
+        return None
+    
+    if _client is not None:
+        if time.monotonic() - _last_health_check < HEALTH_CHECK_SECONDS:
+            return _client
+        # Not checked for a while: make sure the connection still works
+        if check_supabase_health():
+            return _client
+    
+    with _client_lock:
+        if _client is None and not _client_unavailable:
+            _client = _create_client()
+            _client_unavailable = _client is None
+            _last_health_check = time.monotonic()
+        return _client
+
+
+def _create_client():
+    url = get_secret("supabase_url")
+    key = get_secret("supabase_key")
+    
+    if url and url.startswith("sqlite://"):
+        from .supabase_fake import FakeSupabaseClient
+        print(f"🧪 Using local Supabase stand-in: {url}")
+        return FakeSupabaseClient.from_url(url)
+    
     try:
         from supabase import create_client, Client
         
-        # Get credentials from Streamlit secrets
-        url = st.secrets.get("supabase_url")
-        key = st.secrets.get("supabase_key")
-        
+        # Get credentials from Streamlit secrets (or SUPABASE_URL / SUPABASE_KEY)
         if not url or not key:
             print("⚠️ Supabase credentials not found in secrets")
             return None
@@ -30,6 +81,56 @@ def get_supabase_client():
         return None
 
 
+def set_supabase_client(client) -> None:
+    """Use ``client`` (e.g. a FakeSupabaseClient) for all Supabase operations."""
+    global _client, _client_unavailable, _last_health_check
+    with _client_lock:
+        _client = client
+        _client_unavailable = client is None
+        _last_health_check = time.monotonic()
+
+
+def reset_supabase_client() -> None:
+    """Drop the cached client; the next operation reconnects (or re-checks availability)."""
+    global _client, _client_unavailable
+    with _client_lock:
+        _client = None
+        _client_unavailable = False
+
+
+def check_supabase_health() -> bool:
+    """Run a cheap query to check the connection, reconnecting once if it fails."""
+    global _last_health_check
+    for attempt in range(2):
+        client = _client
+        if client is None:
+            client = get_supabase_client()
+            if client is None:
+                return False
+        try:
+            client.table('drafts').select('id').limit(1).execute()
+            _last_health_check = time.monotonic()
+            return True
+        except Exception as e:
+            print(f"⚠️ Supabase health check failed: {e}")
+            if attempt == 0:
+                reset_supabase_client()
+    return False
+
+
+def _on_error(error: Exception) -> None:
+    """Drop the cached client after connection-level errors so the next call reconnects."""
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        reset_supabase_client()
+        return
+    try:
+        import httpx
+    except ImportError:
+        return
+    if isinstance(error, httpx.TransportError):
+        reset_supabase_client()
+
+
 def init_supabase_tables():
     """
     Initialize Supabase tables if they don't exist.
@@ -95,11 +196,39 @@ def save_draft_to_supabase(filename: str, data: Dict) -> bool:
         return True
     except Exception as e:
         print(f"❌ Error saving draft to Supabase: {e}")
+        _on_error(e)
         import traceback
         traceback.print_exc()
         return False
 
 
+def save_drafts_to_supabase(drafts: List[Tuple[str, Dict]]) -> bool:
+    """Save many drafts to Supabase with a single upsert request."""
+    try:
+        client = get_supabase_client()
+        if not client:
+            return False
+        
+        now = datetime.now().isoformat()
+        client.table('drafts').upsert([
+            {
+                'filename': filename,
+                'content': data,
+                'service': data.get('service', ''),
+                'image_path': data.get('image_path', ''),
+                'updated_at': now
+            }
+            for filename, data in drafts
+        ], on_conflict='filename').execute()
+        
+        print(f"✅ Saved {len(drafts)} drafts to Supabase")
+        return True
+    except Exception as e:
+        print(f"❌ Error saving drafts to Supabase: {e}")
+        _on_error(e)
+        return False
+
+
 def get_all_drafts_from_supabase() -> List[Dict]:
     """Get all drafts from Supabase."""
     try:
@@ -118,12 +247,87 @@ def get_all_drafts_from_supabase() -> List[Dict]:
         print(f"✅ Loaded {len(drafts)} drafts from Supabase")
         return drafts
     except Exception as e:
+        read_failed()
         print(f"❌ Error loading drafts from Supabase: {e}")
+        _on_error(e)
         import traceback
         traceback.print_exc()
         return []
 
 
+def get_draft_summaries_from_supabase(limit: int = 12, offset: int = 0, goal: str = None,
+                                      month: str = None, platform: str = None) -> Dict:
+    """Get one page of draft summaries from Supabase (see database.get_draft_summaries)."""
+    try:
+        client = get_supabase_client()
+        if not client:
+            return {'total': 0, 'items': []}
+        
+        query = client.table('drafts').select(
+            'filename, created_at, '
+            'title:content->request->>title, month:content->request->>month, '
+            'goal:content->request->>goal, platforms:content->request->platforms, '
+            'brief:content->request->>brief',
+            count='exact'
+        )
+        if goal:
+            query = query.eq('content->request->>goal', goal)
+        if month:
+            query = query.eq('content->request->>month', month)
+        if platform:
+            query = query.filter('content->request->platforms', 'cs', json.dumps([platform]))
+        
+        result = query.order('created_at', desc=True).range(offset, offset + limit - 1).execute()
+        
+        items = [
+            draft_summary(row['filename'], row.get('title'), row.get('month'), row.get('goal'),
+                           row.get('platforms') or [], row.get('brief'), row.get('created_at'))
+            for row in result.data
+        ]
+        return {'total': result.count or 0, 'items': items}
+    except Exception as e:
+        read_failed()
+        print(f"❌ Error loading draft summaries from Supabase: {e}")
+        _on_error(e)
+        return {'total': 0, 'items': []}
+
+
+def count_drafts_in_supabase() -> int:
+    """Count drafts in Supabase without fetching them."""
+    try:
+        client = get_supabase_client()
+        if not client:
+            return 0
+        
+        result = client.table('drafts').select('id', count='exact').limit(1).execute()
+        return result.count or 0
+    except Exception as e:
+        print(f"❌ Error counting drafts in Supabase: {e}")
+        _on_error(e)
+        return 0
+
+
+def get_draft_from_supabase(filename: str) -> Optional[Dict]:
+    """Get the full content of a single draft from Supabase."""
+    try:
+        client = get_supabase_client()
+        if not client:
+            return None
+        
+        result = client.table('drafts').select('content').eq('filename', filename).limit(1).execute()
+        if not result.data:
+            return None
+        
+        data = result.data[0]['content']
+        data['_filename'] = filename
+        return data
+    except Exception as e:
+        read_failed()
+        print(f"❌ Error loading draft from Supabase: {e}")
+        _on_error(e)
+        return None
+
+
 def delete_draft_from_supabase(filename: str) -> bool:
     """Delete a draft from Supabase."""
     try:
@@ -136,6 +340,7 @@ def delete_draft_from_supabase(filename: str) -> bool:
         return True
     except Exception as e:
         print(f"❌ Error deleting draft from Supabase: {e}")
+        _on_error(e)
         return False
 
 
@@ -158,6 +363,7 @@ def save_request_to_supabase(filename: str, data: Dict) -> bool:
         return True
     except Exception as e:
         print(f"❌ Error saving request to Supabase: {e}")
+        _on_error(e)
         return False
 
 
@@ -180,6 +386,7 @@ def get_all_requests_from_supabase() -> List[Dict]:
         return requests
     except Exception as e:
         print(f"❌ Error loading requests from Supabase: {e}")
+        _on_error(e)
         return []
 
 
@@ -195,6 +402,7 @@ def delete_request_from_supabase(filename: str) -> bool:
         return True
     except Exception as e:
         print(f"❌ Error deleting request from Supabase: {e}")
+        _on_error(e)
         return False
 
 
@@ -222,6 +430,7 @@ def save_scheduled_post_to_supabase(filename: str, data: Dict) -> bool:
         return True
     except Exception as e:
         print(f"❌ Error saving scheduled post to Supabase: {e}")
+        _on_error(e)
         return False
 
 
@@ -244,6 +453,7 @@ def get_all_scheduled_posts_from_supabase() -> List[Dict]:
         return posts
     except Exception as e:
         print(f"❌ Error loading scheduled posts from Supabase: {e}")
+        _on_error(e)
         return []
 
 
@@ -259,4 +469,5 @@ def delete_scheduled_post_from_supabase(filename: str) -> bool:
         return True
     except Exception as e:
         print(f"❌ Error deleting scheduled post from Supabase: {e}")
+        _on_error(e)
         return False
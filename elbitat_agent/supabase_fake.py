@@ -0,0 +1,279 @@
+"""SQLite-backed stand-in for the Supabase client, for offline testing.
+
+Implements the subset of the supabase-py table API used by
+``supabase_db``: ``table().select() / upsert() / insert() / delete()`` with
+``eq``, ``filter(..., 'cs', ...)``, ``order``, ``range``, ``limit`` and
+``execute``, including PostgREST JSON paths (``content->request->>title``)
+and ``count='exact'``.
+
+Enable it by setting the Supabase URL to ``sqlite://<path>`` (or
+``sqlite://:memory:``) instead of a real project URL; the key is ignored.
+An optional per-request latency simulates network round trips so the
+Supabase code path can be benchmarked realistically.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+URL_PREFIX = "sqlite://"
+
+# Mirrors the tables documented in supabase_db.init_supabase_tables
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS drafts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        filename TEXT UNIQUE NOT NULL,
+        content TEXT NOT NULL,
+        service TEXT,
+        image_path TEXT,
+        created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now')),
+        updated_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+    );
+    CREATE TABLE IF NOT EXISTS requests (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        filename TEXT UNIQUE NOT NULL,
+        content TEXT NOT NULL,
+        created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now')),
+        updated_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+    );
+    CREATE TABLE IF NOT EXISTS scheduled_posts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        filename TEXT UNIQUE NOT NULL,
+        content TEXT NOT NULL,
+        scheduled_time TEXT,
+        status TEXT DEFAULT 'pending',
+        created_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now')),
+        updated_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+    );
+'''
+
+# jsonb columns: stored as JSON text, returned decoded
+JSON_COLUMNS = {"content"}
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+_PATH_SPLIT = re.compile(r"(->>|->)")
+
+
+@dataclass
+class FakeResponse:
+    """Mimics postgrest's APIResponse."""
+
+    data: List[Dict[str, Any]]
+    count: Optional[int] = None
+
+
+def _identifier(name: str) -> str:
+    name = name.strip()
+    if not _IDENTIFIER.match(name):
+        raise ValueError(f"Unsupported column or table name: {name!r}")
+    return name
+
+
+def _column_sql(expr: str) -> Tuple[str, bool]:
+    """Translate a column or PostgREST JSON path into SQL.
+
+    Returns:
+        (SQL expression, whether the path selects JSON (``->``) rather than text)
+    """
+    parts = _PATH_SPLIT.split(expr.strip())
+    column = _identifier(parts[0])
+    if len(parts) == 1:
+        return column, False
+
+    keys = [_identifier(key) for key in parts[2::2]]
+    return f"json_extract({column}, '$.{'.'.join(keys)}')", parts[-2] == "->"
+
+
+def _select_sql(expr: str) -> Tuple[str, bool]:
+    """Like _column_sql, for selected values: (SQL, whether to JSON-decode the result)."""
+    sql, is_json = _column_sql(expr)
+    if is_json:
+        # json_quote keeps arrays/objects as JSON and quotes scalars, so the
+        # result always decodes with json.loads
+        return f"json_quote({sql})", True
+    return sql, sql in JSON_COLUMNS
+
+
+class FakeQuery:
+    """One table query being built, like postgrest's request builders."""
+
+    def __init__(self, client: "FakeSupabaseClient", table: str):
+        self._client = client
+        self._table = _identifier(table)
+        self._action = "select"
+        self._columns: List[Tuple[str, str, bool]] = []
+        self._count: Optional[str] = None
+        self._rows: List[Dict[str, Any]] = []
+        self._on_conflict: Optional[str] = None
+        self._where: List[str] = []
+        self._params: List[Any] = []
+        self._order: List[str] = []
+        self._limit: Optional[int] = None
+        self._offset: int = 0
+
+    # --- actions ---
+
+    def select(self, columns: str = "*", count: Optional[str] = None) -> "FakeQuery":
+        self._action = "select"
+        self._count = count
+        self._columns = []
+        for spec in columns.split(","):
+            spec = spec.strip()
+            if spec == "*":
+                continue
+            alias, _, expr = spec.rpartition(":")
+            sql, is_json = _select_sql(expr)
+            name = alias or _PATH_SPLIT.split(expr)[-1].strip()
+            self._columns.append((name, sql, is_json))
+        return self
+
+    def upsert(self, rows, on_conflict: str = "id") -> "FakeQuery":
+        self._action = "upsert"
+        self._rows = rows if isinstance(rows, list) else [rows]
+        self._on_conflict = _identifier(on_conflict)
+        return self
+
+    def insert(self, rows) -> "FakeQuery":
+        self._action = "insert"
+        self._rows = rows if isinstance(rows, list) else [rows]
+        return self
+
+    def delete(self) -> "FakeQuery":
+        self._action = "delete"
+        return self
+
+    # --- filters and modifiers ---
+
+    def eq(self, column: str, value: Any) -> "FakeQuery":
+        sql, _ = _column_sql(column)
+        self._where.append(f"{sql} = ?")
+        self._params.append(value)
+        return self
+
+    def filter(self, column: str, operator: str, criteria: str) -> "FakeQuery":
+        if operator != "cs":
+            raise NotImplementedError(f"Filter operator {operator!r} is not supported by the fake")
+        sql, _ = _column_sql(column)
+        for value in json.loads(criteria):
+            self._where.append(f"EXISTS (SELECT 1 FROM json_each({sql}) WHERE value = ?)")
+            self._params.append(value)
+        return self
+
+    def order(self, column: str, desc: bool = False) -> "FakeQuery":
+        self._order.append(f"{_identifier(column)} {'DESC' if desc else 'ASC'}")
+        return self
+
+    def limit(self, count: int) -> "FakeQuery":
+        self._limit = count
+        return self
+
+    def range(self, start: int, end: int) -> "FakeQuery":
+        self._offset = start
+        self._limit = end - start + 1
+        return self
+
+    # --- execution ---
+
+    def execute(self) -> FakeResponse:
+        if self._client.latency:
+            time.sleep(self._client.latency)
+        with self._client._lock:
+            conn = self._client._conn
+            try:
+                if self._action == "select":
+                    response = self._execute_select(conn)
+                elif self._action in ("upsert", "insert"):
+                    response = self._execute_write(conn)
+                else:
+                    response = self._execute_delete(conn)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        self._client.requests += 1
+        return response
+
+    def _where_sql(self) -> str:
+        return f"WHERE {' AND '.join(self._where)}" if self._where else ""
+
+    def _execute_select(self, conn: sqlite3.Connection) -> FakeResponse:
+        columns = self._columns or [(name, name, name in JSON_COLUMNS) for name in self._client.columns(self._table)]
+        sql = f"SELECT {', '.join(c[1] for c in columns)} FROM {self._table} {self._where_sql()}"
+        if self._order:
+            sql += f" ORDER BY {', '.join(self._order)}"
+        if self._limit is not None or self._offset:
+            sql += f" LIMIT {int(self._limit if self._limit is not None else -1)} OFFSET {int(self._offset)}"
+
+        data = []
+        for row in conn.execute(sql, self._params):
+            data.append({
+                name: json.loads(value) if is_json and value is not None else value
+                for (name, _, is_json), value in zip(columns, row)
+            })
+
+        count = None
+        if self._count:
+            count = conn.execute(f"SELECT COUNT(*) FROM {self._table} {self._where_sql()}", self._params).fetchone()[0]
+        return FakeResponse(data, count)
+
+    def _execute_write(self, conn: sqlite3.Connection) -> FakeResponse:
+        data = []
+        for row in self._rows:
+            names = [_identifier(name) for name in row]
+            values = [json.dumps(v, ensure_ascii=False) if isinstance(v, (dict, list)) else v for v in row.values()]
+            sql = f"INSERT INTO {self._table} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})"
+            if self._action == "upsert":
+                updates = ", ".join(f"{n} = excluded.{n}" for n in names if n != self._on_conflict)
+                sql += f" ON CONFLICT({self._on_conflict}) DO UPDATE SET {updates}" if updates else \
+                    f" ON CONFLICT({self._on_conflict}) DO NOTHING"
+            conn.execute(sql, values)
+            data.append(dict(row))
+        return FakeResponse(data)
+
+    def _execute_delete(self, conn: sqlite3.Connection) -> FakeResponse:
+        if not self._where:
+            # PostgREST refuses unfiltered deletes too
+            raise ValueError("DELETE requires a filter")
+        conn.execute(f"DELETE FROM {self._table} {self._where_sql()}", self._params)
+        return FakeResponse([])
+
+
+class FakeSupabaseClient:
+    """Drop-in replacement for ``supabase.Client`` backed by SQLite.
+
+    Args:
+        path: SQLite database file, or ':memory:'
+        latency: Seconds to sleep per executed request (simulated round trip)
+    """
+
+    def __init__(self, path: str = ":memory:", latency: float = 0.0):
+        self.path = path
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+        self._columns: Dict[str, List[str]] = {}
+
+    @classmethod
+    def from_url(cls, url: str, latency: float = 0.0) -> "FakeSupabaseClient":
+        """Create a client from a ``sqlite://<path>`` URL."""
+        return cls(url[len(URL_PREFIX):] or ":memory:", latency=latency)
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    def columns(self, table: str) -> List[str]:
+        if table not in self._columns:
+            info = self._conn.execute(f"PRAGMA table_info({_identifier(table)})").fetchall()
+            self._columns[table] = [row[1] for row in info]
+        return self._columns[table]
+
+    def close(self) -> None:
+        self._conn.close()
@@ -0,0 +1,116 @@
+"""Suppression list lookups: addresses that must not be emailed again.
+
+Bounced, unsubscribed and complained-about addresses are kept in the
+``email_suppressions`` table, keyed by a SHA-256 hash of the normalised
+address (so an entry outlives the contact it came from, and the lookup is a
+primary-key probe). Before a send, ``load_suppression_filter`` reads the
+hashes into a Bloom filter; recipients are checked against it in memory
+and only the (rare) possible matches are confirmed in the database.
+
+    suppressions = load_suppression_filter()
+    blocked = suppressions.suppressed(["anna@agency.example", ...])
+    # -> {'anna@agency.example': 'unsubscribed'}
+"""
+
+from __future__ import annotations
+
+import hashlib
+import math
+from typing import Dict, Iterable
+
+# Contact statuses that put the address on the suppression list
+SUPPRESSION_STATUSES = ('bounced', 'unsubscribed')
+
+# False positive rate of the in-memory filter; positives are confirmed in
+# the database, so this only costs an occasional indexed lookup
+FILTER_ERROR_RATE = 0.001
+
+
+def normalize_email(email: str) -> str:
+    """Normalise an address for comparison (trimmed, lower case)."""
+    return (email or '').strip().lower()
+
+
+def email_hash(email: str) -> str:
+    """SHA-256 hex digest of the normalised address (the suppression key)."""
+    return hashlib.sha256(normalize_email(email).encode('utf-8')).hexdigest()
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over ``email_hash`` keys.
+
+    The key is already a uniform hash, so its first 16 bytes give the two
+    base hashes for double hashing instead of hashing again.
+
+    Args:
+        capacity: Expected number of keys
+        error_rate: Target false positive rate at that capacity
+    """
+
+    def __init__(self, capacity: int, error_rate: float = FILTER_ERROR_RATE):
+        capacity = max(int(capacity), 1024)
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str) -> Iterable[int]:
+        h1 = int(key[:16], 16)
+        h2 = int(key[16:32], 16) | 1
+        size = self.size
+        return ((h1 + i * h2) % size for i in range(self.hash_count))
+
+    def add(self, key: str) -> None:
+        bits = self.bits
+        for position in self._positions(key):
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class SuppressionFilter:
+    """In-memory view of the suppression list for the duration of a send.
+
+    Args:
+        bloom: Filter holding the hashes of all suppressed addresses
+    """
+
+    def __init__(self, bloom: BloomFilter):
+        self.bloom = bloom
+
+    def __len__(self) -> int:
+        return self.bloom.count
+
+    def add(self, email: str) -> None:
+        """Add an address suppressed after the filter was loaded."""
+        self.bloom.add(email_hash(email))
+
+    def suppressed(self, emails: Iterable[str]) -> Dict[str, str]:
+        """Return the suppressed addresses among ``emails``, with the reason for each."""
+        from .database import get_suppression_reasons
+
+        candidates = {}
+        for email in emails:
+            key = email_hash(email)
+            if key in self.bloom:
+                candidates.setdefault(key, []).append(email)
+        if not candidates:
+            return {}
+        reasons = get_suppression_reasons(list(candidates))
+        return {email: reason for key, reason in reasons.items() for email in candidates[key]}
+
+    def is_suppressed(self, email: str) -> bool:
+        return bool(self.suppressed([email]))
+
+
+def load_suppression_filter(error_rate: float = FILTER_ERROR_RATE) -> SuppressionFilter:
+    """Read all suppression hashes into a new filter (one sequential scan)."""
+    from .database import count_suppressions, iter_suppression_hashes
+
+    bloom = BloomFilter(count_suppressions(), error_rate)
+    for key in iter_suppression_hashes():
+        bloom.add(key)
+    return SuppressionFilter(bloom)
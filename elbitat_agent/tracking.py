@@ -0,0 +1,338 @@
+"""Open and click tracking for campaign emails: signed links and a small HTTP service.
+
+Each campaign email gets a 1x1 pixel and has its links rewritten to go
+through the tracking service, with per-recipient signed tokens (HMAC-SHA256
+of the campaign, contact and target URL, so tokens cannot be forged or
+turned into an open redirect):
+
+    GET /o/<token>.gif   ->  200, transparent GIF      (an open)
+    GET /c/<token>       ->  302 to the original URL   (a click)
+
+The service answers from memory: events go into a buffer that a background
+thread flushes to SQLite in batches (``database.record_tracking_events``),
+so a request never waits on the database. Run it with:
+
+    python -m elbitat_agent.main tracking-server --port 8765
+
+Settings (Streamlit secrets, or upper-cased environment variables):
+    TRACKING_SECRET - key for signing tokens; tracking is off without it
+    TRACKING_BASE_URL - public URL of the service, e.g. https://t.elbitat.com
+    TRACKING_FLUSH_SECONDS - how often buffered events are written (default 1)
+"""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import hmac
+import re
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+from .config import get_secret
+
+# 1x1 transparent GIF
+PIXEL = base64.b64decode(b'R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7')
+
+OPEN_TAG = '-track_open-'
+_LINK = re.compile(r'''(<a\b[^>]*?\bhref\s*=\s*)(["'])(https?://[^"']+)\2''', re.IGNORECASE)
+_SIGNATURE_BYTES = 12
+
+
+class TrackingTokenError(ValueError):
+    """A tracking token that is malformed or not signed with our key."""
+
+
+def tracking_enabled() -> bool:
+    """Whether campaign emails should carry tracking links."""
+    return bool(get_secret('TRACKING_SECRET') and get_secret('TRACKING_BASE_URL'))
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _unb64(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def make_token(kind: str, campaign_id: int, contact_id: int, url: str = '', secret: str = None) -> str:
+    """Sign a tracking event ('open' or 'click') for one recipient."""
+    secret = secret or get_secret('TRACKING_SECRET')
+    payload = f"{kind[0]}|{campaign_id}|{contact_id}|{url}".encode('utf-8')
+    signature = hmac.new(secret.encode('utf-8'), payload, hashlib.sha256).digest()[:_SIGNATURE_BYTES]
+    return f"{_b64(payload)}.{_b64(signature)}"
+
+
+def verify_token(token: str, secret: str = None) -> Tuple[str, int, int, Optional[str]]:
+    """Check a token's signature and return (kind, campaign_id, contact_id, url).
+
+    Raises:
+        TrackingTokenError: If the token is malformed or the signature is wrong
+    """
+    secret = secret or get_secret('TRACKING_SECRET')
+    try:
+        encoded, signature = token.split('.', 1)
+        payload = _unb64(encoded)
+        expected = hmac.new(secret.encode('utf-8'), payload, hashlib.sha256).digest()[:_SIGNATURE_BYTES]
+        if not hmac.compare_digest(expected, _unb64(signature)):
+            raise TrackingTokenError("Bad signature")
+        kind, campaign_id, contact_id, url = payload.decode('utf-8').split('|', 3)
+        kind = {'o': 'open', 'c': 'click'}[kind]
+        return kind, int(campaign_id), int(contact_id), url or None
+    except TrackingTokenError:
+        raise
+    except (ValueError, KeyError, UnicodeDecodeError) as e:
+        raise TrackingTokenError(f"Malformed token: {e}") from None
+
+
+def instrument_html(html: str) -> Tuple[str, List[str]]:
+    """Prepare an email body for tracking with substitution tags.
+
+    Absolute links are replaced by ``-track_click_<n>-`` tags and a pixel
+    with the ``-track_open-`` tag is added; ``recipient_tracking`` gives the
+    values of the tags for one recipient.
+
+    Returns:
+        (HTML with tags, the original URL of each click tag in order)
+    """
+    links: List[str] = []
+
+    def replace(match: re.Match) -> str:
+        url = match.group(3)
+        if url not in links:
+            links.append(url)
+        return f'{match.group(1)}{match.group(2)}-track_click_{links.index(url)}-{match.group(2)}'
+
+    html = _LINK.sub(replace, html)
+    pixel = f'<img src="{OPEN_TAG}" width="1" height="1" alt="" style="display:none">'
+    if re.search(r'</body\s*>', html, re.IGNORECASE):
+        html = re.sub(r'(</body\s*>)', lambda m: pixel + m.group(1), html, count=1, flags=re.IGNORECASE)
+    else:
+        html += pixel
+    return html, links
+
+
+def recipient_tracking(campaign_id: int, contact_id: int, links: List[str],
+                       base_url: str = None, secret: str = None,
+                       substitutions: Dict[str, str] = None) -> Dict[str, str]:
+    """Substitution values of the tracking tags for one recipient.
+
+    Links personalised with substitution tags (``?agency=-company_name-``)
+    are filled in with the recipient's ``substitutions`` before signing, as
+    the tags are no longer in the email for the provider to replace.
+    """
+    base_url = (base_url or get_secret('TRACKING_BASE_URL')).rstrip('/')
+    values = {OPEN_TAG: f"{base_url}/o/{make_token('open', campaign_id, contact_id, secret=secret)}.gif"}
+    for i, url in enumerate(links):
+        if substitutions:
+            url = _fill_tags(url, substitutions)
+        values[f'-track_click_{i}-'] = f"{base_url}/c/{make_token('click', campaign_id, contact_id, url, secret)}"
+    return values
+
+
+def _fill_tags(url: str, substitutions: Dict[str, str]) -> str:
+    # Longest tags first: ``-name-`` is a prefix of the tag of ``{{name|fallback}}``.
+    # Values are percent-encoded as one component, so "Rossi & Figli" stays one query value.
+    for tag in sorted(substitutions, key=len, reverse=True):
+        if tag in url:
+            url = url.replace(tag, quote(str(substitutions[tag]), safe=''))
+    return url
+
+
+class EventBuffer:
+    """Collects tracking events in memory and writes them in batches.
+
+    A background thread flushes the buffer every ``flush_interval``
+    seconds, or sooner once ``flush_size`` events are waiting. If a write
+    fails the events are kept for the next flush (up to ``max_pending``).
+
+    Args:
+        flush_interval: Seconds between flushes (default: TRACKING_FLUSH_SECONDS or 1)
+        flush_size: Events that trigger an early flush
+        max_pending: Most events kept while the database is unavailable
+    """
+
+    def __init__(self, flush_interval: float = None, flush_size: int = 5000, max_pending: int = 200000):
+        self.flush_interval = float(flush_interval if flush_interval is not None
+                                    else get_secret('TRACKING_FLUSH_SECONDS', 1))
+        self.flush_size = flush_size
+        self.max_pending = max_pending
+        self.stats = {'events': 0, 'flushes': 0, 'opens': 0, 'clicks': 0, 'dropped': 0, 'errors': 0}
+        self._events: List[Tuple] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, kind: str, campaign_id: int, contact_id: int, url: Optional[str] = None) -> None:
+        with self._lock:
+            self._events.append((kind, campaign_id, contact_id, url, datetime.now()))
+            self.stats['events'] += 1
+            full = len(self._events) >= self.flush_size
+        if full:
+            self._wake.set()
+
+    def flush(self) -> int:
+        """Write the buffered events now; return how many were written."""
+        from .database import record_tracking_events
+
+        with self._flush_lock:
+            with self._lock:
+                events, self._events = self._events, []
+            if not events:
+                return 0
+            try:
+                counts = record_tracking_events(events)
+            except Exception as e:
+                print(f"Error writing tracking events: {e}")
+                with self._lock:
+                    self._events[:0] = events
+                    overflow = len(self._events) - self.max_pending
+                    if overflow > 0:
+                        del self._events[:overflow]
+                        self.stats['dropped'] += overflow
+                    self.stats['errors'] += 1
+                return 0
+            self.stats['flushes'] += 1
+            self.stats['opens'] += counts['opens']
+            self.stats['clicks'] += counts['clicks']
+            return len(events)
+
+    def start(self) -> "EventBuffer":
+        self._thread = threading.Thread(target=self._run, name="tracking-flush", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop the flush thread after a final flush."""
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+
+class TrackingServer:
+    """HTTP service for the tracking pixel and click redirects.
+
+    Args:
+        host: Interface to listen on
+        port: Port (0 for any free port)
+        secret: Token signing key (default: TRACKING_SECRET)
+        buffer: Event buffer (default: a new one)
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 8765, secret: str = None,
+                 buffer: EventBuffer = None):
+        self.secret = secret or get_secret('TRACKING_SECRET')
+        if not self.secret:
+            raise ValueError("TRACKING_SECRET is not configured")
+        self.buffer = buffer or EventBuffer()
+        self.rejected = 0
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def serve_forever(self) -> None:
+        self.buffer.start()
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            self.buffer.stop()
+
+    def start(self) -> "TrackingServer":
+        """Serve on a background thread."""
+        self._thread = threading.Thread(target=self.serve_forever, name="tracking-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and write the buffered events."""
+        self._server.shutdown()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "TrackingServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _handler(self):
+        tracker = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive, and no Nagle delay between the headers and the body
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                path = self.path.split('?', 1)[0]
+                if path.startswith('/o/'):
+                    self._track(path[3:].removesuffix('.gif'), 'open')
+                elif path.startswith('/c/'):
+                    self._track(path[3:], 'click')
+                elif path == '/health':
+                    self._reply(200, b'ok', 'text/plain')
+                else:
+                    self._reply(404, b'Not found', 'text/plain')
+
+            def _track(self, token: str, expected_kind: str):
+                try:
+                    kind, campaign_id, contact_id, url = verify_token(token, tracker.secret)
+                    if kind != expected_kind:
+                        raise TrackingTokenError("Wrong kind of token")
+                except TrackingTokenError:
+                    tracker.rejected += 1
+                    self._reply(404, b'Not found', 'text/plain')
+                    return
+                tracker.buffer.add(kind, campaign_id, contact_id, url)
+                if kind == 'open':
+                    self._reply(200, PIXEL, 'image/gif')
+                else:
+                    self._reply(302, b'', 'text/plain', {'Location': url})
+
+            def _reply(self, status: int, body: bytes, content_type: str, headers: Dict[str, str] = None):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('Cache-Control', 'no-store, max-age=0')
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass  # one line per open would swamp the log
+
+        return Handler
+
+
+def run_tracking_server(host: str = '127.0.0.1', port: int = 8765) -> None:
+    """Run the tracking service in the foreground until interrupted."""
+    server = TrackingServer(host, port)
+    print(f"Tracking service on {server.url} (events flushed every {server.buffer.flush_interval:g} s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stats = server.buffer.stats
+        print(f"Stopped: {stats['events']} events, {stats['opens']} new opens, {stats['clicks']} new clicks")
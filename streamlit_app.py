@@ -21,25 +21,55 @@ import yaml
 from yaml.loader import SafeLoader
 import copy
 
-from elbitat_agent.config import get_workspace_path
+from elbitat_agent.config import get_workspace_path, get_workspace_dir, refresh_workspace
+from elbitat_agent.cache import bump_table_version
+from elbitat_agent.backup import delete_backup
 from elbitat_agent.file_storage import (
     load_all_requests, list_request_files,
     load_all_drafts, save_request, save_scheduled_post, delete_draft, delete_scheduled_post,
-    load_all_scheduled_posts, load_all_requests_dict, save_draft_dict
+    load_all_scheduled_posts, load_all_requests_dict, save_draft_dict,
+    list_draft_summaries, load_draft
 )
 from elbitat_agent.agents.orchestrator import generate_drafts_for_all_requests
 from elbitat_agent.agents.auto_poster import auto_post_draft, check_api_configuration
 from elbitat_agent.agents.email_finder import discover_contacts, bulk_save_contacts
 from elbitat_agent.agents.email_campaigns import (
-    send_campaign, send_test_email, get_default_templates, personalize_email
+    send_campaign, send_test_email, get_default_templates, personalize_email, template_problems,
+    PREVIEW_CONTACT, campaign_html, campaign_render, has_unsubscribe_link, stage_campaign_render
 )
+from elbitat_agent.agents.campaign_runs import (
+    create_campaign_run, start_campaign_run, pause_campaign_run, cancel_campaign_run,
+    retry_failed_recipients
+)
+from elbitat_agent.agents.email_delivery import email_backend, sending_enabled
+from elbitat_agent.contacts_csv import ContactImportError, import_contacts_csv, write_contacts_csv
 from elbitat_agent.database import (
-    get_all_email_contacts, update_email_contact_status, delete_email_contact,
-    save_email_campaign, get_all_email_campaigns
+    query_email_contacts, get_email_contact_ids, get_contact_filter_options,
+    update_email_contact_status, delete_email_contact,
+    save_email_campaign, get_all_email_campaigns, get_email_campaign_runs,
+    get_dashboard_stats, get_recent_activity, update_scheduled_post_status, search,
+    get_draft_filter_options
 )
 from elbitat_agent.models import AdRequest, AdDraft
 
 
+# Number of draft cards per page on the Drafts page
+DRAFTS_PAGE_SIZE = 12
+
+# Filter choices offered on the Drafts page (plus any other values in use)
+DRAFT_GOALS = ["awareness", "bookings", "leads", "engagement"]
+DRAFT_PLATFORMS = ["instagram", "facebook", "tiktok"]
+
+# Number of contacts per page on the Contact List tab
+CONTACTS_PAGE_SIZE = 25
+
+# Maximum search results offered when picking campaign recipients
+RECIPIENT_OPTIONS_LIMIT = 100
+
+# Maximum results shown by the sidebar search
+SEARCH_RESULTS_LIMIT = 10
+
+
 # Page configuration
 st.set_page_config(
     page_title="Elbitat Social Agent",
@@ -198,11 +228,11 @@ def show_dashboard():
     
     # Get statistics
     api_status = check_api_configuration()
-    workspace = get_workspace_path()
+    stats = get_dashboard_stats()
     
-    drafts_count = len(list((workspace / "drafts").glob("*.json"))) if (workspace / "drafts").exists() else 0
-    scheduled_count = len(list((workspace / "scheduled").glob("*.json"))) if (workspace / "scheduled").exists() else 0
-    posted_count = len(list((workspace / "posted").glob("*.json"))) if (workspace / "posted").exists() else 0
+    drafts_count = stats['drafts']
+    scheduled_count = stats['scheduled']
+    posted_count = stats['posted']
     
     # Metrics row
     col1, col2, col3, col4 = st.columns(4)
@@ -252,25 +282,19 @@ def show_dashboard():
     st.divider()
     st.subheader("📈 Recent Activity")
     
-    if posted_count > 0:
-        posted_dir = workspace / "posted"
-        recent_posts = sorted(posted_dir.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True)[:5]
-        
-        for post_file in recent_posts:
-            with open(post_file, 'r', encoding='utf-8') as f:
-                post_data = json.load(f)
-                draft = post_data.get('draft', {})
-                results = post_data.get('results', {})
+    recent_posts = get_recent_activity('posted', limit=5) if posted_count > 0 else []
+    
+    if recent_posts:
+        for event in recent_posts:
+            with st.expander(f"📱 {event.get('title') or 'Untitled'}"):
+                st.write(f"**Posted:** {str(event['created_at'])[:16]}")
                 
-                with st.expander(f"📱 {draft.get('request', {}).get('title', 'Untitled')}"):
-                    st.write(f"**Posted:** {datetime.fromtimestamp(post_file.stat().st_mtime).strftime('%Y-%m-%d %H:%M')}")
-                    
-                    for platform, result in results.items():
-                        status = result.get('status', 'unknown')
-                        if status == 'success':
-                            st.success(f"✓ {platform.upper()}: Posted")
-                        elif status == 'error':
-                            st.error(f"✗ {platform.upper()}: {result.get('error', 'Error')}")
+                for platform, result in event['details'].items():
+                    status = result.get('status', 'unknown')
+                    if status == 'success':
+                        st.success(f"✓ {platform.upper()}: Posted")
+                    elif status == 'error':
+                        st.error(f"✗ {platform.upper()}: {result.get('error', 'Error')}")
     else:
         st.info("No posts published yet. Create your first campaign!")
 
@@ -292,6 +316,11 @@ def show_marketing_strategy_page():
         if 'marketing_plan' not in st.session_state:
             st.session_state.marketing_plan = None
         
+        if 'marketing_context' not in st.session_state:
+            from elbitat_agent.agents.conversation_context import ConversationContext
+            from elbitat_agent.agents.marketing_strategist import CHAT_TOKEN_BUDGET
+            st.session_state.marketing_context = ConversationContext(token_budget=CHAT_TOKEN_BUDGET)
+        
         # Display conversation history
         st.subheader("💬 Conversation")
     
@@ -324,6 +353,7 @@ def show_marketing_strategy_page():
                 if st.form_submit_button("🔄 New Chat"):
                     st.session_state.marketing_conversation = []
                     st.session_state.marketing_plan = None
+                    st.session_state.marketing_context.reset()
                     st.rerun()
     
         # Handle send message
@@ -341,7 +371,8 @@ def show_marketing_strategy_page():
                 try:
                     response = chat_with_marketing_agent(
                         user_input,
-                        st.session_state.marketing_conversation[:-1]  # Exclude the message we just added
+                        st.session_state.marketing_conversation[:-1],  # Exclude the message we just added
+                        context=st.session_state.marketing_context
                     )
                     
                     st.session_state.marketing_conversation.append({
@@ -441,9 +472,7 @@ def show_marketing_strategy_page():
                             post_requests = convert_plan_to_post_requests(plan, start_date)
                             
                             # Save each request
-                            workspace = get_workspace_path()
-                            requests_dir = workspace / "requests"
-                            requests_dir.mkdir(parents=True, exist_ok=True)
+                            requests_dir = get_workspace_dir("requests")
                             
                             for i, request_data in enumerate(post_requests):
                                 filename = f"marketing_{plan.get('campaign_name', 'campaign').replace(' ', '_').lower()}_post{i+1:02d}.json"
@@ -466,6 +495,7 @@ def show_marketing_strategy_page():
                 if st.button("🗑️ Clear"):
                     st.session_state.marketing_plan = None
                     st.session_state.marketing_conversation = []
+                    st.session_state.marketing_context.reset()
                     st.rerun()
     
     except Exception as e:
@@ -570,9 +600,7 @@ def show_chat_page():
             elif campaign_type == "Multi-Post Series" and (not services or end_date <= start_date):
                 st.error("For multi-post campaigns, please provide services and valid date range")
             else:
-                workspace = get_workspace_path()
-                requests_dir = workspace / "requests"
-                requests_dir.mkdir(parents=True, exist_ok=True)
+                requests_dir = get_workspace_dir("requests")
                 
                 safe_title = title.replace(" ", "_").lower()
                 
@@ -691,16 +719,43 @@ def show_drafts_page():
                 except Exception as e:
                     st.error(f"Error: {str(e)}")
     
-    workspace = get_workspace_path()
-    drafts_dir = workspace / "drafts"
+    # Filters (applied in the database on the extracted draft columns)
+    filter_options = get_draft_filter_options()
+    col_goal, col_platform, col_month = st.columns(3)
+    with col_goal:
+        goal_filter = st.selectbox(
+            "Goal", ["All"] + sorted(set(DRAFT_GOALS) | set(filter_options['goals'])), key='drafts_goal_filter'
+        )
+    with col_platform:
+        platform_filter = st.selectbox(
+            "Platform", ["All"] + sorted(set(DRAFT_PLATFORMS) | set(filter_options['platforms'])), key='drafts_platform_filter'
+        )
+    with col_month:
+        month_filter = st.selectbox("Month", ["All"] + filter_options['months'], key='drafts_month_filter')
+    
+    draft_filters = {
+        'goal': None if goal_filter == "All" else goal_filter,
+        'platform': None if platform_filter == "All" else platform_filter,
+        'month': None if month_filter == "All" else month_filter,
+    }
+    if st.session_state.get('drafts_filter_key') != draft_filters:
+        st.session_state['drafts_filter_key'] = draft_filters
+        st.session_state['drafts_page_number'] = 0
+    
+    # Load one page of draft summaries; full drafts are loaded only when opened
+    page_number = st.session_state.get('drafts_page_number', 0)
+    page = list_draft_summaries(limit=DRAFTS_PAGE_SIZE, offset=page_number * DRAFTS_PAGE_SIZE, **draft_filters)
+    total_pages = max(1, -(-page['total'] // DRAFTS_PAGE_SIZE))
     
-    if not drafts_dir.exists():
-        st.info("No drafts available. Create a campaign first!")
-        return
+    if page_number >= total_pages:
+        st.session_state['drafts_page_number'] = total_pages - 1
+        st.rerun()
     
-    draft_files = sorted(drafts_dir.glob("*.json"))
+    if not page['items'] and any(draft_filters.values()):
+        st.info("No drafts match the selected filters.")
+        return
     
-    if not draft_files:
+    if not page['items']:
         st.info("No drafts available. Create a campaign first!")
         
         col1, col2 = st.columns(2)
@@ -739,32 +794,39 @@ def show_drafts_page():
     # Display drafts in grid
     cols = st.columns(3)
     
-    for idx, draft_file in enumerate(draft_files):
+    for idx, summary in enumerate(page['items']):
         with cols[idx % 3]:
-            with open(draft_file, 'r', encoding='utf-8') as f:
-                draft_data = json.load(f)
-            
-            request = draft_data['request']
+            draft_filename = summary['_filename']
             
             with st.container():
-                st.markdown(f"### {request['title']}")
-                st.write(f"**Month:** {request.get('month', 'N/A')}")
-                st.write(f"**Goal:** {request['goal']}")
-                st.write(f"**Platforms:** {', '.join(request['platforms'])}")
+                st.markdown(f"### {summary['title']}")
+                st.write(f"**Month:** {summary.get('month') or 'N/A'}")
+                st.write(f"**Goal:** {summary.get('goal') or 'N/A'}")
+                st.write(f"**Platforms:** {', '.join(summary['platforms'])}")
                 
                 # Brief preview
-                brief = request.get('brief', '')
-                if len(brief) > 100:
-                    st.write(f"{brief[:100]}...")
-                else:
-                    st.write(brief)
+                st.write(summary['brief_preview'])
                 
                 # Review button
-                if st.button(f"👁️ Review", key=f"review_{draft_file.stem}"):
-                    st.session_state['selected_draft'] = draft_file.stem
+                if st.button(f"👁️ Review", key=f"review_{draft_filename}"):
+                    st.session_state['selected_draft'] = draft_filename
                     st.session_state['show_draft_detail'] = True
                     st.rerun()
     
+    # Pagination
+    if total_pages > 1:
+        col_prev, col_info, col_next = st.columns([1, 2, 1])
+        with col_prev:
+            if st.button("⬅️ Previous", disabled=page_number == 0, use_container_width=True):
+                st.session_state['drafts_page_number'] = page_number - 1
+                st.rerun()
+        with col_info:
+            st.caption(f"Page {page_number + 1} of {total_pages} ({page['total']} drafts)")
+        with col_next:
+            if st.button("Next ➡️", disabled=page_number >= total_pages - 1, use_container_width=True):
+                st.session_state['drafts_page_number'] = page_number + 1
+                st.rerun()
+    
     # Show draft detail modal
     if st.session_state.get('show_draft_detail'):
         show_draft_detail_modal()
@@ -772,16 +834,15 @@ def show_drafts_page():
 
 def show_draft_detail_modal():
     """Display detailed draft view in modal-like container."""
-    draft_name = st.session_state.get('selected_draft')
-    workspace = get_workspace_path()
-    draft_file = workspace / "drafts" / f"{draft_name}.json"
+    draft_filename = st.session_state.get('selected_draft')
+    draft_data = load_draft(draft_filename) if draft_filename else None
     
-    if not draft_file.exists():
+    if draft_data is None:
         st.error("Draft not found")
         return
     
-    with open(draft_file, 'r', encoding='utf-8') as f:
-        draft_data = json.load(f)
+    draft_data.pop('_filename', None)
+    draft_name = Path(draft_filename).stem
     
     request = draft_data['request']
     copy_by_platform = draft_data['copy_by_platform']
@@ -855,7 +916,7 @@ def show_draft_detail_modal():
                                 draft_data['copy_by_platform'] = new_copy
                                 
                                 # Save updated draft to database
-                                save_draft_dict(draft_data, draft_file.name)
+                                save_draft_dict(draft_data, draft_filename)
                                 
                                 st.success("✅ Content regenerated!")
                                 st.rerun()
@@ -922,7 +983,7 @@ def show_draft_detail_modal():
                                 draft_data['selected_images'] = selected_new_images
                                 
                                 # Save updated draft to database
-                                save_draft_dict(draft_data, draft_file.name)
+                                save_draft_dict(draft_data, draft_filename)
                                 
                                 st.success(f"✅ Updated with {len(selected_new_images)} images!")
                                 st.session_state[f'show_image_selector_{draft_name}'] = False
@@ -989,24 +1050,19 @@ def show_draft_detail_modal():
     
     with col1:
         if st.button("🗑️ Delete", use_container_width=True):
-            draft_file.unlink()
+            delete_draft(draft_filename)
             st.success("Draft deleted!")
             st.session_state['show_draft_detail'] = False
             st.rerun()
     
     with col2:
         if st.button("✅ Approve for Later", use_container_width=True):
-            # Move to scheduled
-            scheduled_dir = workspace / "scheduled"
-            scheduled_dir.mkdir(parents=True, exist_ok=True)
-            
-            scheduled_file = scheduled_dir / f"{draft_name}.scheduled.json"
-            with open(scheduled_file, 'w', encoding='utf-8') as f:
-                json.dump({
-                    'draft': draft_data,
-                    'approved_at': datetime.now().isoformat(),
-                    'approved': True
-                }, f, indent=2, ensure_ascii=False)
+            # Move to scheduled (database and scheduled/ folder)
+            save_scheduled_post({
+                'draft': draft_data,
+                'approved_at': datetime.now().isoformat(),
+                'approved': True
+            }, f"{draft_name}.scheduled.json")
             
             st.success("Approved for later posting!")
             st.session_state['show_draft_detail'] = False
@@ -1041,24 +1097,19 @@ def show_schedule_page():
     """Display scheduled posts page."""
     st.markdown('<p class="main-header">📅 Scheduled Posts</p>', unsafe_allow_html=True)
     
-    workspace = get_workspace_path()
-    scheduled_dir = workspace / "scheduled"
+    scheduled_posts = load_all_scheduled_posts(status='pending')
     
-    if not scheduled_dir.exists() or not list(scheduled_dir.glob("*.json")):
+    if not scheduled_posts:
         st.info("No scheduled posts yet. Approve drafts to schedule them.")
         if st.button("📝 Review Drafts"):
             st.session_state['page'] = 'drafts'
             st.rerun()
         return
     
-    scheduled_files = sorted(scheduled_dir.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True)
-    
-    st.write(f"**{len(scheduled_files)} post(s) scheduled for weekly publishing**")
+    st.write(f"**{len(scheduled_posts)} post(s) scheduled for weekly publishing**")
     
-    for sched_file in scheduled_files:
-        with open(sched_file, 'r', encoding='utf-8') as f:
-            sched_data = json.load(f)
-        
+    for sched_data in scheduled_posts:
+        sched_name = sched_data['_filename']
         draft = sched_data.get('draft', {})
         request = draft.get('request', {})
         approved_at = sched_data.get('approved_at', '')
@@ -1072,7 +1123,7 @@ def show_schedule_page():
                 st.write(f"**Brief:** {request.get('brief', '')[:100]}...")
             
             with col2:
-                if st.button("🚀 Post Now", key=f"post_{sched_file.stem}"):
+                if st.button("🚀 Post Now", key=f"post_{Path(sched_name).stem}"):
                     # Post immediately
                     ad_draft = AdDraft(
                         request=AdRequest.from_dict(request),
@@ -1084,7 +1135,8 @@ def show_schedule_page():
                         results = auto_post_draft(ad_draft)
                     
                     st.success("Posted!")
-                    sched_file.unlink()
+                    update_scheduled_post_status(sched_name, 'posted')
+                    delete_backup(get_workspace_dir("scheduled") / sched_name)
                     st.rerun()
 
 
@@ -1150,6 +1202,7 @@ def show_settings_page():
     
     with col2:
         if st.button("🔄 Refresh Library", use_container_width=True):
+            bump_table_version('media')
             st.rerun()
     
     st.divider()
@@ -1207,6 +1260,7 @@ def show_settings_page():
                     st.error(f"Error uploading {uploaded_file.name}: {str(e)}")
             
             if success_count > 0:
+                bump_table_version('media')
                 st.success(f"✅ Successfully uploaded {success_count} image(s) to '{category}' category!")
                 st.balloons()
                 st.rerun()
@@ -1443,6 +1497,12 @@ def show_settings_page():
         - `scheduled/` - Approved posts for publishing
         - `posted/` - Published post results
         """)
+        
+        # The workspace is resolved once per process; re-check it if its
+        # folders were moved or deleted while the app was running
+        if st.button("🔄 Re-check Workspace Folder"):
+            refresh_workspace()
+            st.rerun()
 
 
 def show_email_campaigns_page():
@@ -1531,9 +1591,7 @@ def show_email_campaigns_page():
                 if st.button("💾 Save All Contacts to Database", use_container_width=True):
                     with st.spinner(f"Saving {len(discovered_contacts)} contacts..."):
                         try:
-                            # Ensure database is initialized
-                            from elbitat_agent.database import init_database, get_db_path
-                            init_database()
+                            from elbitat_agent.database import get_db_path
 
                             db_path = get_db_path()
                             st.info(f"Database: {db_path}")
@@ -1604,8 +1662,7 @@ def show_email_campaigns_page():
                     st.error("Please select at least one country.")
                 else:
                     try:
-                        from elbitat_agent.database import init_database, save_email_contact
-                        init_database()
+                        from elbitat_agent.database import save_email_contact
                         # Convert list of countries to comma-separated string
                         country_str = ", ".join(manual_country) if isinstance(manual_country, list) else str(manual_country)
                         success = save_email_contact(
@@ -1626,39 +1683,50 @@ def show_email_campaigns_page():
                     except Exception as e:
                         st.error(f"Error: {str(e)}")
         
+        # Bulk import
+        with st.expander("📤 Import Contacts from CSV"):
+            st.write("Upload a CSV with an **Email** column and optionally Company, Website, Country, "
+                     "Industry, Status, Source and Notes (the columns of the export). Existing contacts "
+                     "are updated; empty cells keep their current values.")
+            import_file = st.file_uploader("Contacts CSV", type=['csv'], key='contacts_csv_upload')
+            import_status = st.selectbox("Status for new contacts", ["active", "new"], key='contacts_csv_status')
+            
+            if import_file is not None and st.button("📤 Import Contacts", use_container_width=True):
+                try:
+                    with st.spinner("Importing contacts..."):
+                        result = import_contacts_csv(import_file, default_status=import_status)
+                    st.success(f"✅ Imported {result['rows'] - result['invalid']} of {result['rows']} rows: "
+                               f"{result['inserted']} new, {result['updated']} updated")
+                    if result['invalid']:
+                        st.warning(f"Skipped {result['invalid']} invalid row(s):\n\n" +
+                                   "\n".join(f"- {error}" for error in result['errors']))
+                except ContactImportError as e:
+                    st.error(f"Could not import the file: {e}")
+                except Exception as e:
+                    st.error(f"Import failed, no contacts were changed: {e}")
+        
         st.divider()
         
         # Debug info
         from elbitat_agent.database import get_db_path
-        import sqlite3
         db_path = get_db_path()
+        filter_options = get_contact_filter_options()
         with st.expander("🔍 Debug Info"):
             st.write(f"**Database location:** `{db_path}`")
             st.write(f"**Database exists:** {db_path.exists()}")
             if db_path.exists():
                 st.write(f"**Database size:** {db_path.stat().st_size} bytes")
                 
-                # Count total contacts
-                try:
-                    conn = sqlite3.connect(str(db_path))
-                    cursor = conn.cursor()
-                    cursor.execute("SELECT COUNT(*) FROM email_contacts")
-                    total_count = cursor.fetchone()[0]
-                    st.write(f"**Total contacts in DB:** {total_count}")
-                    
-                    # Show status breakdown
-                    cursor.execute("SELECT status, COUNT(*) FROM email_contacts GROUP BY status")
-                    status_counts = cursor.fetchall()
-                    st.write("**Status breakdown:**")
-                    for status, count in status_counts:
-                        st.write(f"  - {status}: {count}")
-                    
-                    conn.close()
-                except Exception as e:
-                    st.error(f"Error querying database: {e}")
+                status_counts = filter_options['status_counts']
+                st.write(f"**Total contacts in DB:** {sum(status_counts.values())}")
+                
+                # Show status breakdown
+                st.write("**Status breakdown:**")
+                for status, count in status_counts.items():
+                    st.write(f"  - {status}: {count}")
         
         # Filter options
-        col1, col2 = st.columns([3, 1])
+        col1, col2, col3, col4 = st.columns([2, 2, 2, 1])
         
         with col1:
             status_filter = st.selectbox(
@@ -1668,20 +1736,49 @@ def show_email_campaigns_page():
             )
         
         with col2:
+            country_filter = st.selectbox(
+                "Filter by Country",
+                ["All"] + filter_options['countries'],
+                index=0
+            )
+        
+        with col3:
+            industry_filter = st.selectbox(
+                "Filter by Industry",
+                ["All"] + filter_options['industries'],
+                index=0
+            )
+        
+        with col4:
+            st.write("")
             if st.button("🔄 Refresh", use_container_width=True):
+                bump_table_version('email_contacts')
                 st.rerun()
         
+        search_text = st.text_input("🔎 Search", placeholder="Email, company, website or notes")
+        
+        contact_filters = {
+            'status': None if status_filter == "All" else status_filter,
+            'country': None if country_filter == "All" else country_filter,
+            'industry': None if industry_filter == "All" else industry_filter,
+            'search': search_text.strip() or None,
+        }
+        
+        # Keyset pagination: keep the cursors of the pages visited so far and
+        # start over whenever the filters change
+        if st.session_state.get('contacts_filter_key') != contact_filters:
+            st.session_state.contacts_filter_key = contact_filters
+            st.session_state.contacts_cursors = [None]
+        cursors = st.session_state.contacts_cursors
+        
         # Get contacts from database
         try:
-            # Ensure database is initialized
-            from elbitat_agent.database import init_database
-            init_database()
-            
-            filter_val = None if status_filter == "All" else status_filter
-            contacts = get_all_email_contacts(status=filter_val)
+            page = query_email_contacts(**contact_filters, limit=CONTACTS_PAGE_SIZE, after=cursors[-1])
+            contacts = page['items']
             
             if contacts:
-                st.info(f"📊 Total contacts: {len(contacts)}")
+                first = (len(cursors) - 1) * CONTACTS_PAGE_SIZE + 1
+                st.info(f"📊 Total contacts: {page['total']} (showing {first}-{first + len(contacts) - 1})")
                 
                 # Display contacts in a table
                 for contact in contacts:
@@ -1724,25 +1821,46 @@ def show_email_campaigns_page():
                                     st.success("Contact deleted!")
                                     st.rerun()
                 
-                # Export to CSV
+                # Page navigation
+                nav1, nav2, nav3 = st.columns([1, 2, 1])
+                with nav1:
+                    if st.button("⬅️ Previous", disabled=len(cursors) == 1, use_container_width=True):
+                        cursors.pop()
+                        st.rerun()
+                with nav2:
+                    total_pages = max(1, -(-page['total'] // CONTACTS_PAGE_SIZE))
+                    st.markdown(f"<div style='text-align: center;'>Page {len(cursors)} of {total_pages}</div>", unsafe_allow_html=True)
+                with nav3:
+                    if st.button("Next ➡️", disabled=page['next_cursor'] is None, use_container_width=True):
+                        cursors.append(page['next_cursor'])
+                        st.rerun()
+                
+                # Export to CSV (all pages matching the filters)
                 if st.button("📥 Export to CSV", use_container_width=True):
-                    import io
-                    output = io.StringIO()
-                    output.write("Email,Company,Website,Country,Industry,Status,Source\n")
-                    for contact in contacts:
-                        output.write(f"{contact['email']},{contact['company_name']},{contact.get('website', '')},{contact.get('country', '')},{contact.get('industry', '')},{contact['status']},{contact.get('source', '')}\n")
+                    import tempfile
+                    # Rows are streamed from the database into a spooled file
+                    # (on disk beyond 8 MB); only the finished file is read back
+                    with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024, mode='w+',
+                                                       newline='', encoding='utf-8') as export_file:
+                        exported = write_contacts_csv(export_file, **contact_filters)
+                        export_file.seek(0)
+                        csv_data = export_file.read()
                     
                     st.download_button(
-                        label="Download CSV",
-                        data=output.getvalue(),
+                        label=f"Download CSV ({exported} contacts)",
+                        data=csv_data,
                         file_name=f"contacts_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
                         mime="text/csv"
                     )
+            elif len(cursors) > 1:
+                # The page we were on emptied (e.g. contacts deleted): go back
+                cursors.pop()
+                st.rerun()
             else:
-                st.warning(f"No contacts found with status filter: '{status_filter}'")
+                st.warning("No contacts found matching the selected filters")
                 st.info("""
                 **Troubleshooting:**
-                - Try selecting "All" status filter to see all contacts
+                - Try selecting "All" in the filters and clearing the search to see all contacts
                 - Newly saved contacts have 'new' or 'active' status by default
                 - Use the 'Find Contacts' tab to discover new leads
                 - Check if contacts were successfully saved (you should see a success message)
@@ -1920,14 +2038,10 @@ def show_email_campaigns_page():
             st.markdown("### 👁️ Preview - How Recipients Will See It")
             st.caption("Sample data: John from Acme Corp (Denmark)")
 
-            sample_contact = {
-                'company_name': 'Acme Corp',
-                'first_name': 'John',
-                'email': 'john@acme.com',
-                'website': 'https://acme.com',
-                'country': 'Denmark'
-            }
-            preview = personalize_email(email_content, sample_contact)
+            preview = personalize_email(campaign_html(email_content), PREVIEW_CONTACT)
+
+            for problem in template_problems(subject or '') + template_problems(email_content):
+                st.warning(f"⚠️ {problem}")
 
             # Render the HTML using st.components.v1.html for accurate preview
             import streamlit.components.v1 as components
@@ -1950,6 +2064,8 @@ def show_email_campaigns_page():
                 try:
                     campaign_id = save_email_campaign(campaign_name, subject, email_content)
                     if campaign_id:
+                        # Render once now, for the Send tab's preview and for sending
+                        stage_campaign_render(subject, email_content, campaign_id)
                         st.success(f"✅ Campaign '{campaign_name}' saved! Go to 'Send Campaign' tab to send it.")
                     else:
                         st.error("Failed to save campaign")
@@ -1976,55 +2092,110 @@ def show_email_campaigns_page():
                 campaign_id = int(selected_campaign_str.split("ID: ")[1].rstrip(")"))
                 campaign = next(c for c in campaigns if c['id'] == campaign_id)
                 
-                # Display campaign details
+                # Display campaign details (from the stored render)
+                render = campaign_render(campaign)
                 st.markdown(f"**Campaign:** {campaign['name']}")
                 st.markdown(f"**Subject:** {campaign['subject']}")
                 
+                if render:
+                    for problem in render['problems']:
+                        st.warning(f"⚠️ {problem}")
+                    
+                    with st.expander("👁️ Preview"):
+                        st.caption(f"Sample data: John from Acme Corp (Denmark) - subject: {render['preview_subject']}")
+                        import streamlit.components.v1 as components
+                        components.html(render['preview_html'], height=500, scrolling=True)
+                
                 with st.expander("View Email Template"):
                     st.text(campaign['template'])
                 
-                # Get active contacts
-                contacts = get_all_email_contacts(status='active')
+                col1, col2, col3 = st.columns(3)
+                col1.metric("Sent", campaign['sent_count'] or 0)
+                col2.metric("Opened", campaign['opened_count'] or 0)
+                col3.metric("Clicked", campaign['clicked_count'] or 0)
                 
-                if contacts:
-                    st.info(f"Found {len(contacts)} active contacts")
+                # Count active contacts (without loading them)
+                active_count = query_email_contacts(status='active', limit=0)['total']
+                
+                if active_count:
+                    st.info(f"Found {active_count} active contacts")
                     
                     # Contact selection
                     all_contacts = st.checkbox("Send to all active contacts", value=True)
                     
                     if not all_contacts:
-                        selected_emails = st.multiselect(
+                        recipient_search = st.text_input(
+                            "Find Recipients",
+                            placeholder="Search by email, company, website or notes"
+                        )
+                        matches = query_email_contacts(
+                            status='active',
+                            search=recipient_search.strip() or None,
+                            limit=RECIPIENT_OPTIONS_LIMIT
+                        )
+                        if matches['total'] > RECIPIENT_OPTIONS_LIMIT:
+                            st.caption(f"Showing {RECIPIENT_OPTIONS_LIMIT} of {matches['total']} matches - refine the search to narrow down")
+                        
+                        # Keep earlier selections available while the search changes
+                        options = {c['id']: f"{c['company_name']} ({c['email']})" for c in matches['items']}
+                        options.update(st.session_state.get('send_recipient_labels', {}))
+                        selected_ids = st.multiselect(
                             "Select Recipients",
-                            [f"{c['company_name']} ({c['email']})" for c in contacts]
+                            list(options),
+                            format_func=options.get,
+                            key="send_recipient_ids"
                         )
-                        contact_ids = [
-                            contacts[i]['id'] 
-                            for i, c in enumerate(contacts) 
-                            if f"{c['company_name']} ({c['email']})" in selected_emails
-                        ]
-                    else:
-                        contact_ids = [c['id'] for c in contacts]
+                        st.session_state.send_recipient_labels = {i: options[i] for i in selected_ids}
+                        contact_ids = list(selected_ids)
                     
-                    st.markdown(f"**Recipients:** {len(contact_ids)} contacts")
+                    recipient_count = active_count if all_contacts else len(contact_ids)
+                    st.markdown(f"**Recipients:** {recipient_count} contacts")
                     
-                    # Email sending disabled
                     st.markdown("---")
-                    st.info("📧 **Email Sending Feature**")
-                    st.warning("""
-                    Email sending is currently disabled. The system can discover and save contacts, 
-                    but sending functionality requires email service configuration (SendGrid, Gmail SMTP, etc.).
-                    
-                    **What you can do now:**
-                    - ✅ Search and discover business contacts
-                    - ✅ Save contacts to database
-                    - ✅ Create and save email campaigns
-                    - ✅ Export contact lists to CSV
-                    
-                    **To enable email sending:**
-                    Configure an email service provider in the Settings or contact support.
-                    """)
+                    if not sending_enabled():
+                        # Email sending disabled unless opted in
+                        st.info("📧 **Email Sending Feature**")
+                        st.warning("""
+                        Email sending is currently disabled. The system can discover and save contacts,
+                        but sending functionality requires email service configuration (SendGrid, Gmail SMTP, etc.).
+
+                        **What you can do now:**
+                        - ✅ Search and discover business contacts
+                        - ✅ Save contacts to database
+                        - ✅ Create and save email campaigns
+                        - ✅ Export contact lists to CSV
+
+                        **To enable email sending:**
+                        Configure an email service provider and set `EMAIL_SENDING_ENABLED = "true"` in the app secrets.
+                        """)
+                    else:
+                        try:
+                            backend = email_backend()
+                            st.caption(f"Sending with {backend} (EMAIL_BACKEND). Contacts already contacted "
+                                       "and addresses on the suppression list are skipped.")
+                        except ValueError as e:
+                            backend = None
+                            st.error(str(e))
+
+                        can_unsubscribe = bool(render) and has_unsubscribe_link(render['html'])
+                        if render and not can_unsubscribe:
+                            st.warning("⚠️ Add an unsubscribe link to the template before sending, e.g. "
+                                       "`<a href=\"mailto:info@elbitat.com?subject=Unsubscribe\">Unsubscribe</a>`")
+
+                        if st.button("🚀 Send Campaign", type="primary", use_container_width=True,
+                                     disabled=backend is None or not can_unsubscribe or not recipient_count):
+                            if all_contacts:
+                                contact_ids = get_email_contact_ids(status='active')
+                            run_id = create_campaign_run(campaign_id, contact_ids)
+                            if run_id and start_campaign_run(run_id, backend):
+                                st.success(f"✅ Sending to {recipient_count} contacts (run {run_id}) - "
+                                           "progress is shown below")
+                            else:
+                                st.error("Failed to start sending")
                 else:
                     st.warning("No active contacts found. Add contacts in the 'Find Contacts' or 'Contact List' tabs.")
+                
+                show_campaign_runs(campaign_id)
             else:
                 st.info("No campaigns found. Create a campaign in the 'Create Campaign' tab first.")
         
@@ -2032,6 +2203,86 @@ def show_email_campaigns_page():
             st.error(f"Error loading campaigns: {str(e)}")
 
 
+def show_campaign_runs(campaign_id: int):
+    """Display a campaign's recent runs with their progress and controls."""
+    runs = get_email_campaign_runs(campaign_id, limit=5)
+    if not runs:
+        return
+    
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        st.markdown("### 📬 Sending Progress")
+    with col2:
+        if st.button("🔄 Refresh", key="refresh_campaign_runs", use_container_width=True):
+            st.rerun()
+    
+    icons = {'pending': '⏳', 'running': '📤', 'paused': '⏸️', 'completed': '✅', 'failed': '❌', 'cancelled': '🚫'}
+    for run in runs:
+        done = run['total'] - run['pending']
+        st.markdown(f"{icons.get(run['status'], '')} **Run {run['id']}** - {run['status']} "
+                    f"({str(run['created_at'])[:16]})")
+        st.progress(done / run['total'] if run['total'] else 1.0,
+                    text=f"{done} of {run['total']}: {run['sent']} sent, {run['failed']} failed, "
+                         f"{run['skipped']} skipped")
+        if run['error_message']:
+            st.caption(f"Stopped: {run['error_message']}")
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            if run['status'] in ('pending', 'running'):
+                if st.button("⏸️ Pause", key=f"pause_run_{run['id']}", use_container_width=True):
+                    pause_campaign_run(run['id'])
+                    st.rerun()
+            elif run['status'] in ('paused', 'failed'):
+                if st.button("▶️ Resume", key=f"resume_run_{run['id']}", use_container_width=True):
+                    try:
+                        if start_campaign_run(run['id']):
+                            st.rerun()
+                        st.error("The run is already being sent")
+                    except ValueError as e:
+                        # Sending disabled, or no unsubscribe link
+                        st.error(str(e))
+        with col2:
+            if run['failed'] and run['status'] in ('completed', 'paused', 'failed'):
+                if st.button(f"🔁 Retry {run['failed']} failed", key=f"retry_run_{run['id']}",
+                             use_container_width=True):
+                    retry_failed_recipients(run['id'])
+                    st.rerun()
+        with col3:
+            if run['status'] in ('pending', 'running', 'paused', 'failed'):
+                if st.button("🚫 Cancel", key=f"cancel_run_{run['id']}", use_container_width=True):
+                    cancel_campaign_run(run['id'])
+                    st.rerun()
+
+
+def show_sidebar_search():
+    """Display the full-text search box and its results in the sidebar."""
+    query = st.text_input("🔎 Search", placeholder="Drafts, requests, contacts", key="sidebar_search")
+    if not query.strip():
+        return
+    
+    results = search(query, limit=SEARCH_RESULTS_LIMIT)
+    if not results:
+        st.caption("No matches")
+        return
+    
+    icons = {'draft': '📝', 'request': '📋', 'contact': '📧'}
+    for i, result in enumerate(results):
+        st.markdown(f"{icons[result['kind']]} **{result['title']}**")
+        if result['snippet']:
+            st.caption(result['snippet'])
+        if result['kind'] == 'draft':
+            if st.button("Open draft", key=f"search_open_{i}"):
+                st.session_state.page = 'drafts'
+                st.session_state['selected_draft'] = result['ref']
+                st.session_state['show_draft_detail'] = True
+                st.rerun()
+        elif result['kind'] == 'contact':
+            if st.button("Go to contacts", key=f"search_open_{i}"):
+                st.session_state.page = 'email campaigns'
+                st.rerun()
+
+
 def main():
     """Main application entry point."""
     
@@ -2081,6 +2332,10 @@ def main():
         
         st.divider()
         
+        show_sidebar_search()
+        
+        st.divider()
+        
         st.caption("Elbitat Social Media Agent v2.0")
         st.caption("Powered by Streamlit")
     